@@ -0,0 +1,753 @@
+#!/usr/bin/env python3
+"""
+ShadowCaster - Performance Benchmarks
+Times config loading, command rendering, template I/O and batch rendering
+
+Usage:
+    python3 benchmark_shadowcaster.py                   # full run, print results
+    python3 benchmark_shadowcaster.py --quick           # smaller sizes for CI
+    python3 benchmark_shadowcaster.py --save            # write benchmarks/baseline.json
+    python3 benchmark_shadowcaster.py --compare         # flag regressions vs the baseline
+    python3 benchmark_shadowcaster.py --only templates  # scenarios whose name contains a word
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import math
+import platform
+import shutil
+import io
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+# Add to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from utils.config_loader import ConfigLoader, CATALOG_INDEX_FILE
+from utils.config_bundle import build_bundle
+from utils.display import Colors, Display, Menu
+from utils.renderer import Renderer
+from utils.picker import PagedMenu
+from utils.file_manager import FileManager, ClipboardManager, osc52_sequence
+from utils import instrumentation
+from modules.builder_registry import get_builder_class
+from modules.batch import BatchEngine
+from modules.daemon import CatalogDaemon, DaemonClient
+from utils.result_cache import ResultCache
+from utils.scheduler import Scheduler, FakeClock
+from utils.scope import Scope
+from utils.search_index import SearchIndex
+from modules.parsers import NmapXmlParser, FfufJsonParser, Finding
+from modules.results_db import ResultsDB
+
+
+BASELINE_FILE = Path(__file__).parent / 'benchmarks' / 'baseline.json'
+
+# A scenario regresses when its p50 or peak memory grows by more than this
+DEFAULT_THRESHOLD = 0.25
+
+# Slowdowns smaller than this are timer noise, whatever the ratio
+MIN_DELTA_MS = 0.05
+
+TEMPLATE_STORE_SIZES = (1000, 10000, 100000)
+BATCH_SIZE = 1000000
+BATCH_CHUNK = 10000
+
+# --quick divides the large sizes by this
+QUICK_DIVISOR = 10
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Scenario:
+    """A named, repeatable piece of work"""
+    
+    def __init__(self, name, run, iterations, ops=1, setup=None):
+        """
+        Initialize scenario
+        
+        Args:
+            name: Scenario name used in reports and baselines
+            run: Callable timed once per iteration
+            iterations: Number of timed iterations
+            ops: Operations performed per iteration (for throughput)
+            setup: Untimed callable run before every iteration (e.g. to make it cold)
+        """
+        self.name = name
+        self.run = run
+        self.iterations = iterations
+        self.ops = ops
+        self.setup = setup
+    
+    def measure(self):
+        """Time every iteration, then measure peak memory of one more under tracemalloc"""
+        timings = []
+        
+        for _ in range(self.iterations):
+            if self.setup:
+                self.setup()
+            gc.disable()
+            start = time.perf_counter()
+            self.run()
+            timings.append(time.perf_counter() - start)
+            gc.enable()
+        
+        if self.setup:
+            self.setup()
+        tracemalloc.start()
+        self.run()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        
+        total = sum(timings)
+        return {
+            'iterations': self.iterations,
+            'ops': self.ops,
+            'p50_ms': round(percentile(timings, 0.50) * 1000, 4),
+            'p95_ms': round(percentile(timings, 0.95) * 1000, 4),
+            'throughput': round(self.ops * self.iterations / total, 1) if total else None,
+            'peak_kb': round(peak / 1024, 1)
+        }
+
+
+class BenchmarkSuite:
+    """Builds scenarios on throwaway copies of the catalog and template stores"""
+    
+    def __init__(self, quick=False):
+        """Initialize benchmark suite"""
+        self.quick = quick
+        self.tmp_dir = Path(tempfile.mkdtemp(prefix='shadowcaster-bench-'))
+        self.config_dir = self.tmp_dir / 'configs'
+        shutil.copytree(ConfigLoader().config_dir, self.config_dir,
+                        ignore=shutil.ignore_patterns('.*'))
+        self.tool_ids = sorted(p.name[:-len('_config.json')] for p in self.config_dir.glob('*_config.json'))
+    
+    def close(self):
+        """Remove temporary files"""
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+    
+    def scaled(self, size):
+        """Shrink large sizes in quick mode"""
+        return max(1, size // QUICK_DIVISOR) if self.quick else size
+    
+    def catalog_scenarios(self):
+        """list_available_tools, load_config and load_spec across the whole catalog"""
+        n_tools = len(self.tool_ids)
+        state = {}
+        
+        bundle_file = self.tmp_dir / 'catalog.bundle'
+        build_bundle(self.config_dir, bundle_file)
+        
+        def fresh_loader():
+            state['loader'] = ConfigLoader(self.config_dir, use_bundle=False)
+        
+        def fresh_bundle_loader():
+            state['loader'] = ConfigLoader(self.config_dir, bundle_file=bundle_file)
+        
+        def drop_index():
+            (self.config_dir / CATALOG_INDEX_FILE).unlink(missing_ok=True)
+            fresh_loader()
+        
+        def list_tools():
+            state['loader'].list_available_tools()
+        
+        def load_all():
+            loader = state['loader']
+            for tool_id in self.tool_ids:
+                loader.load_config(tool_id)
+        
+        def load_all_specs():
+            loader = state['loader']
+            for tool_id in self.tool_ids:
+                loader.load_spec(tool_id)
+        
+        warm = ConfigLoader(self.config_dir)
+        warm.list_available_tools()
+        for tool_id in self.tool_ids:
+            warm.load_config(tool_id)
+        
+        def load_all_warm():
+            for tool_id in self.tool_ids:
+                warm.load_config(tool_id)
+        
+        return [
+            Scenario('catalog_list_cold', list_tools, 20, n_tools, setup=drop_index),
+            Scenario('catalog_list_warm', list_tools, 200, n_tools, setup=fresh_loader),
+            Scenario('load_config_cold', load_all, 20, n_tools, setup=fresh_loader),
+            Scenario('load_config_cold_bundle', load_all, 20, n_tools, setup=fresh_bundle_loader),
+            Scenario('load_config_warm', load_all_warm, 200, n_tools),
+            Scenario('load_spec_cold', load_all_specs, 20, n_tools, setup=fresh_loader)
+        ]
+    
+    def search_scenarios(self):
+        """Catalog search queries against a warm, persisted index"""
+        index = SearchIndex(self.config_dir)
+        index.refresh()
+        queries = ['wordlist', 'rate limit', '-sS', 'proxychai', 'nonexistentword']
+        
+        def query():
+            for text in queries:
+                index.search(text)
+        
+        return [Scenario('search_query', query, 200, len(queries))]
+    
+    def render_scenarios(self):
+        """Builder creation and rendering for every tool (build_command minus the prompts)"""
+        loader = ConfigLoader(self.config_dir)
+        selections = []
+        
+        for tool_id in self.tool_ids:
+            spec = loader.load_spec(tool_id)
+            if not spec:
+                continue
+            # First option of every category, like a user ticking one flag per section
+            flags = [category.options[0].flag for category in spec.categories if category.options]
+            required = {name: 'example.com' for name in spec.required_names}
+            selections.append((spec, get_builder_class(tool_id), flags, required))
+        
+        def render_all():
+            for spec, builder_class, flags, required in selections:
+                builder = builder_class(spec)
+                builder.selected_flags = list(flags)
+                builder.required_params = dict(required)
+                builder.render_command()
+        
+        templates = []
+        for spec, builder_class, flags, required in selections:
+            builder = builder_class(spec)
+            builder.selected_flags = list(flags)
+            builder.required_params = dict(required)
+            templates.append(builder.compile_template())
+        
+        def render_compiled():
+            for template in templates:
+                template.render()
+        
+        return [
+            Scenario('render_all_tools', render_all, 200, len(selections)),
+            Scenario('render_compiled_templates', render_compiled, 200, len(templates))
+        ]
+    
+    def template_scenarios(self):
+        """Paging, counting and prefix lookups on synthetic template stores"""
+        scenarios = []
+        
+        for size in TEMPLATE_STORE_SIZES:
+            size = self.scaled(size)
+            templates_dir = self.tmp_dir / f'templates_{size}'
+            file_manager = FileManager(templates_dir=templates_dir, output_dir=self.tmp_dir / 'output')
+            file_manager.template_store.save_many(
+                {
+                    'name': f"tpl-{i:06d}",
+                    'tool': self.tool_ids[i % len(self.tool_ids)],
+                    'command': f"nmap -sS -p 1-1024 10.0.{i // 256 % 256}.{i % 256}",
+                    'description': f"Synthetic template {i}",
+                    'created': '2025-01-01T00:00:00'
+                }
+                for i in range(size)
+            )
+            file_manager.template_store.close()
+            
+            state = {}
+            
+            def reopen(templates_dir=templates_dir, state=state):
+                if 'fm' in state:
+                    state['fm'].template_store.close()
+                state['fm'] = FileManager(templates_dir=templates_dir, output_dir=self.tmp_dir / 'output')
+            
+            def first_page(state=state):
+                state['fm'].list_templates(limit=50)
+                state['fm'].count_templates()
+            
+            warm = FileManager(templates_dir=templates_dir, output_dir=self.tmp_dir / 'output')
+            warm.list_templates(limit=50)
+            
+            def first_page_warm(warm=warm):
+                warm.list_templates(limit=50)
+                warm.count_templates()
+            
+            def prefix_lookup(warm=warm, size=size):
+                warm.list_templates(prefix=f"tpl-{size // 2:06d}"[:-1], limit=50)
+                warm.load_template(f"tpl-{size // 3:06d}")
+            
+            scenarios += [
+                Scenario(f'templates_{size}_page_cold', first_page, 20, setup=reopen),
+                Scenario(f'templates_{size}_page_warm', first_page_warm, 100),
+                Scenario(f'templates_{size}_prefix', prefix_lookup, 100)
+            ]
+        
+        return scenarios
+    
+    def batch_scenarios(self):
+        """Streaming batch rendering, timed per chunk of commands"""
+        size = self.scaled(BATCH_SIZE)
+        chunks = max(1, size // BATCH_CHUNK)
+        
+        engine = BatchEngine(ConfigLoader(self.config_dir))
+        records = (
+            {'tool': 'nmap', 'flags': ['-sS', ['-p', '80,443']],
+             'required': {'target': f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}"}}
+            for i in range((chunks + 1) * BATCH_CHUNK)
+        )
+        rendered = engine.render_stream(records)
+        
+        fan_out = engine.fan_out({'tool': 'nmap', 'flags': ['-sS', ['-p', '80,443']]},
+                                 (f"host{i}.example.com" for i in range((chunks + 1) * BATCH_CHUNK)))
+        
+        def render_chunk():
+            for _ in range(BATCH_CHUNK):
+                next(rendered)
+        
+        def fan_out_chunk():
+            for _ in range(BATCH_CHUNK):
+                next(fan_out)
+        
+        # Every subset of nmap's scan types plus -p, i.e. mostly invalid selections
+        index = ConfigLoader(self.config_dir).load_spec('nmap').flag_index
+        flags = [option.flag for option in index.options[:7]]
+        masks = [index.mask(f for bit, f in enumerate(flags) if n >> bit & 1)[0] for n in range(1 << len(flags))]
+        selections = masks * max(1, BATCH_CHUNK // len(masks))
+        
+        def validate_chunk():
+            valid = index.valid
+            for mask in selections:
+                valid(mask)
+        
+        # Both streams hold one extra chunk for the tracemalloc pass
+        return [
+            Scenario(f'batch_render_{size}', render_chunk, chunks, BATCH_CHUNK),
+            Scenario(f'batch_fanout_{size}', fan_out_chunk, chunks, BATCH_CHUNK),
+            Scenario('flag_validate_masks', validate_chunk, 20, len(selections))
+        ]
+    
+    def instrumentation_scenarios(self):
+        """Cost of spans and counters while instrumentation is disabled"""
+        calls = 100000
+        
+        def disabled_spans():
+            for _ in range(calls):
+                with instrumentation.span('bench.noop', tool='nmap'):
+                    pass
+        
+        def disabled_counts():
+            for _ in range(calls):
+                instrumentation.count('bench.noop')
+        
+        def empty_loop():
+            for _ in range(calls):
+                pass
+        
+        return [
+            Scenario('instrumentation_empty_loop', empty_loop, 20, calls),
+            Scenario('instrumentation_span_disabled', disabled_spans, 20, calls),
+            Scenario('instrumentation_count_disabled', disabled_counts, 20, calls)
+        ]
+    
+    def daemon_scenarios(self):
+        """Round trips to a catalog daemon serving from memory, one request each"""
+        catalog = CatalogDaemon(str(self.tmp_dir / 'daemon.sock'), ConfigLoader(self.config_dir),
+                                FileManager(templates_dir=self.tmp_dir / 'daemon-templates'))
+        catalog.bind()
+        catalog.warm()
+        threading.Thread(target=catalog.serve_forever, daemon=True).start()
+        
+        client = DaemonClient(catalog.socket_path).connect()
+        requests = 200
+        record = {'tool': 'nmap', 'required': {'target': '10.0.0.1'}, 'flags': ['-sS', ['-p', '80,443']]}
+        
+        def render_requests():
+            for _ in range(requests):
+                client.render([record])
+        
+        def validate_requests():
+            for _ in range(requests):
+                client.validate('nmap', ['-sS', '-sT'])
+        
+        return [
+            Scenario('daemon_render_roundtrip', render_requests, 20, requests),
+            Scenario('daemon_validate_roundtrip', validate_requests, 20, requests)
+        ]
+    
+    def display_scenarios(self):
+        """Drawing menus as frames: the tool menu from scratch and as a diff, and filtering 10k entries"""
+        options = [(tool['name'], tool['description']) for tool in ConfigLoader(self.config_dir).list_available_tools()]
+        stream = io.StringIO()
+        renderer = Renderer(stream, color=True, size=(200, 2 * len(options) + 20))
+        
+        def reset():
+            stream.seek(0)
+            stream.truncate()
+        
+        def full_redraw():
+            reset()
+            renderer.invalidate()
+        
+        def draw_menu():
+            saved = Display.renderer
+            Display.renderer = renderer
+            try:
+                Display.clear_screen()
+                Display.print_header("ShadowCaster")
+                Menu.render_menu("Select a Tool", options)
+                Display.flush()
+            finally:
+                Display.renderer = saved
+        
+        # Typing a filter into a 10k-entry template menu, one frame per key
+        tools = ['nmap', 'hydra', 'gobuster', 'sqlmap', 'ffuf']
+        templates = [(f"template_{i}_{tools[i % 5]}", f"{tools[i * 7 % 5]}: host{i}.example.com port {i % 1000}")
+                     for i in range(10000)]
+        keystrokes = ['h', 'ho', 'hos', 'host', 'host1', 'host1 ', 'host1 n', 'host1 nm', 'host1 nma', 'host1',
+                      'port', 'port 4', 'port 42', '']
+        state = {}
+        
+        def open_menu():
+            saved = Display.renderer
+            Display.renderer = renderer
+            try:
+                reset()
+                state['menu'] = PagedMenu("Select Template", templates)
+            finally:
+                Display.renderer = saved
+        
+        def type_filter():
+            saved = Display.renderer
+            Display.renderer = renderer
+            try:
+                menu = state['menu']
+                for query in keystrokes:
+                    menu.set_query(query)
+                    menu.render()
+                    renderer.flush()
+            finally:
+                Display.renderer = saved
+        
+        return [
+            Scenario('display_tool_menu_full', draw_menu, 200, len(options), setup=full_redraw),
+            Scenario('display_tool_menu_diff', draw_menu, 200, len(options), setup=reset),
+            Scenario('display_filter_10k_frames', type_filter, 20, len(keystrokes), setup=open_menu)
+        ]
+    
+    def clipboard_scenarios(self):
+        """Clipboard work that no longer spawns processes: cached detection and OSC 52 encoding"""
+        calls = 10000
+        command = "nmap -sS -p 1-65535 -T4 10.0.0.1"
+        ClipboardManager.detect_backend()
+        
+        def detect_warm():
+            for _ in range(calls):
+                ClipboardManager.detect_backend()
+        
+        def encode_osc52():
+            for _ in range(calls):
+                osc52_sequence(command)
+        
+        return [
+            Scenario('clipboard_detect_warm', detect_warm, 20, calls),
+            Scenario('clipboard_osc52_encode', encode_osc52, 20, calls)
+        ]
+    
+    def result_cache_scenarios(self):
+        """Answering a repeated dig/whois run from the result cache instead of the network"""
+        lookups = 2000
+        cache = ResultCache(self.tmp_dir / 'result_cache.db', ConfigLoader(self.config_dir))
+        output = b'example.com.\t300\tIN\tMX\t10 mail.example.com.\n' * 40
+        commands = [f'dig -t MX +short host{i}.example.com' for i in range(100)]
+        for command in commands:
+            cache.put(command, 0, output, 0.2)
+        
+        def hit():
+            for i in range(lookups):
+                cache.get(commands[i % len(commands)])
+        
+        reordered = [['dig', f'host{i}.example.com', '+short', '-t', 'MX'] for i in range(100)]
+        
+        def key():
+            for i in range(lookups):
+                cache.key(reordered[i % len(reordered)])
+        
+        return [
+            Scenario('result_cache_hit', hit, 10, lookups),
+            Scenario('result_cache_key', key, 10, lookups)
+        ]
+    
+    def scheduler_scenarios(self):
+        """Dispatching a large fan-out across many hosts under per-host caps and pacing"""
+        jobs = self.scaled(20000)
+        hosts = 200
+        
+        async def runner(item):
+            await asyncio.sleep(0.01)
+            return False
+        
+        def dispatch():
+            scheduler = Scheduler(max_concurrency=32, per_host=2, rate=50, burst=2)
+            for i in range(jobs):
+                scheduler.submit(i, i % 3, f'10.0.0.{i % hosts}')
+            FakeClock().run(scheduler.run(runner))
+        
+        return [Scenario('scheduler_dispatch', dispatch, 5, jobs)]
+    
+    def scope_scenarios(self):
+        """Compiling a 100k-entry scope and checking targets against it"""
+        entries = self.scaled(100000)
+        lines = [f'10.{i >> 8 & 255}.{i & 255}.0/25' for i in range(entries // 2)]
+        lines += [f'host{i}.lab{i % 100}.example.com' for i in range(entries // 4)]
+        lines += [f'*.svc{i}.example.net' for i in range(entries // 4 - 100)]
+        lines += [f'!10.{i}.7.0/26' for i in range(100)]
+        scope = Scope.from_lines(lines)
+        scope.compile()
+        
+        checks = self.scaled(50000)
+        targets = []
+        for i in range(checks // 4):
+            targets.append(f'10.{i & 255}.{i >> 8 & 255}.{i & 127}')
+            targets.append(f'2001:db8::{i:x}')
+            targets.append(f'host{i}.lab{i % 100}.example.com')
+            targets.append(f'api.svc{i}.example.net')
+        
+        def compile_scope():
+            Scope.from_lines(lines).compile()
+        
+        def check():
+            contains = scope.contains
+            for target in targets:
+                contains(target)
+        
+        return [
+            Scenario('scope_compile', compile_scope, 3, entries),
+            Scenario('scope_check', check, 5, len(targets))
+        ]
+    
+    def parser_scenarios(self):
+        """Streaming a large nmap XML scan and ffuf report into findings"""
+        hosts = self.scaled(20000)
+        ports = ''.join(f'<port protocol="tcp" portid="{port}"><state state="open"/>'
+                        f'<service name="http" product="nginx" version="1.24"/></port>' for port in (22, 80, 443, 8080))
+        nmap_path = self.tmp_dir / 'scan.xml'
+        with open(nmap_path, 'w') as f:
+            f.write('<?xml version="1.0"?>\n<nmaprun scanner="nmap">\n')
+            for i in range(hosts):
+                f.write(f'<host><status state="up"/><address addr="10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" '
+                        f'addrtype="ipv4"/><hostnames/><ports>{ports}</ports></host>\n')
+            f.write('</nmaprun>\n')
+        
+        results = self.scaled(100000)
+        ffuf_path = self.tmp_dir / 'ffuf.json'
+        with open(ffuf_path, 'w') as f:
+            f.write('{"commandline": "ffuf -u http://t/FUZZ", "results": [')
+            f.write(','.join(json.dumps({'input': {'FUZZ': f'w{i}'}, 'status': 200, 'length': i,
+                                         'url': f'http://t/w{i}', 'redirectlocation': ''}) for i in range(results)))
+            f.write('], "config": {}}')
+        
+        def parse_nmap():
+            for _ in NmapXmlParser().parse(nmap_path):
+                pass
+        
+        def parse_ffuf():
+            for _ in FfufJsonParser().parse(ffuf_path):
+                pass
+        
+        return [
+            Scenario('parse_nmap_xml', parse_nmap, 3, hosts * 4),
+            Scenario('parse_ffuf_json', parse_ffuf, 3, results)
+        ]
+    
+    def results_db_scenarios(self):
+        """Ingesting findings and querying a store of a million of them"""
+        services = (('ssh', 22, 'OpenSSH 8.9p1'), ('http', 80, 'nginx 1.18.0'), ('https', 443, 'nginx 1.25.3'),
+                    ('mysql', 3306, 'MySQL 8.0.36'), ('smtp', 25, 'Postfix smtpd'))
+        
+        def findings(n):
+            for i in range(n):
+                service, port, detail = services[i % 5]
+                yield Finding(f'10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}', port, 'tcp', 'open', service,
+                              detail=detail)
+        
+        store = ResultsDB(self.tmp_dir / 'findings.db')
+        batch = self.scaled(50000)
+        runs = iter(range(1000))
+        fresh = []
+        
+        def fill_store():
+            # Built on first use so other --only runs skip it
+            if not store.count():
+                store.ingest(findings(self.scaled(1000000)), 'nmap', 'nmap -sV 10.0.0.0/8')
+        
+        def new_db():
+            fresh[:] = [ResultsDB(self.tmp_dir / f'ingest{next(runs)}.db')]
+        
+        def ingest():
+            fresh[0].ingest(findings(batch), 'nmap')
+        
+        def query():
+            store.count(port=443, state='open', detail='nginx 1.18')
+            list(store.query(limit=1000, port=443, state='open', detail='nginx 1.25'))
+            list(store.query(host='10.3.4.*'))
+            store.count(service='mysql')
+        
+        return [
+            Scenario('results_db_ingest', ingest, 3, batch, setup=new_db),
+            Scenario('results_db_query', query, 5, 4, setup=fill_store)
+        ]
+    
+    def scenarios(self):
+        """All scenarios, in report order"""
+        return (self.catalog_scenarios() + self.search_scenarios() + self.render_scenarios() +
+                self.template_scenarios() + self.batch_scenarios() + self.daemon_scenarios() +
+                self.result_cache_scenarios() + self.scheduler_scenarios() + self.scope_scenarios() +
+                self.parser_scenarios() + self.results_db_scenarios() + self.display_scenarios() +
+                self.clipboard_scenarios() + self.instrumentation_scenarios())
+
+
+def run_benchmarks(quick=False, only=None):
+    """
+    Run the benchmark suite
+    
+    Args:
+        quick: Use smaller store and batch sizes
+        only: Run only scenarios whose name contains this text
+    
+    Returns:
+        Results document with 'meta' and 'results' keys
+    """
+    suite = BenchmarkSuite(quick)
+    results = {}
+    
+    # Benchmarks measure the disabled (production default) code paths
+    instrumentation.disable()
+    
+    try:
+        for scenario in suite.scenarios():
+            if only and only not in scenario.name:
+                continue
+            results[scenario.name] = scenario.measure()
+            print_result(scenario.name, results[scenario.name])
+    finally:
+        suite.close()
+    
+    return {
+        'meta': {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'quick': quick
+        },
+        'results': results
+    }
+
+
+def print_result(name, result):
+    """Print one result row"""
+    throughput = f"{result['throughput']:,.0f}/s" if result['throughput'] else '-'
+    print(f"  {name:<34}{result['p50_ms']:>10.3f}{result['p95_ms']:>10.3f}"
+          f"{throughput:>15}{result['peak_kb']:>11.1f}")
+
+
+def compare_results(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare results against a baseline
+    
+    Args:
+        current: Results document from run_benchmarks()
+        baseline: Results document to compare against
+        threshold: Allowed relative growth of p50 and peak memory
+    
+    Returns:
+        List of (scenario, metric, baseline value, current value) regressions
+    """
+    regressions = []
+    
+    for name, result in current['results'].items():
+        base = baseline.get('results', {}).get(name)
+        if base is None:
+            continue
+        
+        if (result['p50_ms'] > base['p50_ms'] * (1 + threshold) and
+                result['p50_ms'] - base['p50_ms'] > MIN_DELTA_MS):
+            regressions.append((name, 'p50_ms', base['p50_ms'], result['p50_ms']))
+        
+        if result['peak_kb'] > base['peak_kb'] * (1 + threshold) and result['peak_kb'] - base['peak_kb'] > 1:
+            regressions.append((name, 'peak_kb', base['peak_kb'], result['peak_kb']))
+    
+    return regressions
+
+
+def missing_from_baseline(current, baseline):
+    """Names of scenarios that ran but have no baseline entry to compare against"""
+    recorded = baseline.get('results', {})
+    return [name for name in current['results'] if name not in recorded]
+
+
+def main(argv=None):
+    """Run benchmarks from the command line"""
+    parser = argparse.ArgumentParser(description="ShadowCaster performance benchmarks")
+    parser.add_argument('--quick', action='store_true', help=f"divide store and batch sizes by {QUICK_DIVISOR}")
+    parser.add_argument('--only', help="only run scenarios whose name contains this text")
+    parser.add_argument('--save', nargs='?', const=str(BASELINE_FILE), metavar='FILE',
+                        help="write results as the new baseline")
+    parser.add_argument('--compare', nargs='?', const=str(BASELINE_FILE), metavar='FILE',
+                        help="compare against a baseline and exit 1 on regressions")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f"allowed relative slowdown for --compare (default {DEFAULT_THRESHOLD})")
+    args = parser.parse_args(argv)
+    
+    baseline = None
+    if args.compare:
+        try:
+            with open(args.compare, 'r') as f:
+                baseline = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"{Colors.RED}Cannot read baseline {args.compare}: {e}{Colors.END}")
+            return 2
+        
+        if baseline.get('meta', {}).get('quick') != args.quick:
+            print(f"{Colors.YELLOW}Baseline was recorded with quick={baseline.get('meta', {}).get('quick')}; "
+                  f"scenario sizes may not match{Colors.END}")
+    
+    print(f"\n{Colors.BOLD}{Colors.HEADER}ShadowCaster Benchmarks{Colors.END}\n")
+    print(f"{Colors.BOLD}  {'SCENARIO':<34}{'P50 ms':>10}{'P95 ms':>10}{'THROUGHPUT':>15}{'PEAK KB':>11}{Colors.END}")
+    
+    current = run_benchmarks(args.quick, args.only)
+    
+    if args.save:
+        Path(args.save).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.save, 'w') as f:
+            json.dump(current, f, indent=2)
+            f.write('\n')
+        print(f"\n{Colors.GREEN}Baseline saved to {args.save}{Colors.END}")
+    
+    if baseline is None:
+        return 0
+    
+    missing = missing_from_baseline(current, baseline)
+    if missing:
+        print(f"\n{Colors.YELLOW}Not in the baseline, not compared ({len(missing)}): {', '.join(missing)}{Colors.END}")
+    
+    regressions = compare_results(current, baseline, args.threshold)
+    
+    if not regressions:
+        print(f"\n{Colors.GREEN}No regressions beyond {args.threshold:.0%}{Colors.END}")
+        return 0
+    
+    print(f"\n{Colors.RED}{Colors.BOLD}Regressions beyond {args.threshold:.0%}:{Colors.END}")
+    for name, metric, before, after in regressions:
+        print(f"{Colors.RED}  {name:<34}{metric:<9}{before:>12.3f} -> {after:.3f} "
+              f"(+{(after / before - 1) if before else 0:.0%}){Colors.END}")
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
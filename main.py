@@ -29,30 +29,93 @@ from utils.config_loader import ConfigLoader
 from utils.display import Display, Menu, Colors
 from utils.file_manager import FileManager, ClipboardManager
 from utils.command_builder import CommandBuilder
-from modules.tool_builders import (
-    NmapBuilder, HydraBuilder, SQLMapBuilder,
-    WPScanBuilder, GobusterBuilder, AircrackBuilder
-)
+from utils import instrumentation
+from modules.builder_registry import TOOL_BUILDERS, get_builder_class
 
 
 class ShadowCaster:
     """Main application class"""
     
-    TOOL_BUILDERS = {
-        'nmap': NmapBuilder,
-        'hydra': HydraBuilder,
-        'sqlmap': SQLMapBuilder,
-        'wpscan': WPScanBuilder,
-        'gobuster': GobusterBuilder,
-        'aircrack': AircrackBuilder
-    }
+    TOOL_BUILDERS = TOOL_BUILDERS
     
     def __init__(self):
-        """Initialize ShadowCaster"""
+        """Initialize ShadowCaster (no filesystem access until first use)"""
         self.config_loader = ConfigLoader()
         self.file_manager = FileManager()
         self.hint_mode = False
         self.current_command = None
+        self.output_compression = None
+        self.use_result_cache = True
+        self.scope = None
+        self.scope_path = None
+        self._executor = None
+        self._search_index = None
+        self._result_cache = None
+        self._results_db = None
+    
+    @property
+    def executor(self):
+        """Execution queue, created on first use"""
+        if self._executor is None:
+            from utils.executor import CommandExecutor, OUTPUT_CAPTURE
+            self._executor = CommandExecutor(output=OUTPUT_CAPTURE, capture_dir=self.file_manager.get_output_dir(),
+                                             compression=self.output_compression,
+                                             result_cache=self.active_result_cache, scope=self.scope,
+                                             results_db=self.results_db, config_loader=self.config_loader)
+        return self._executor
+    
+    @property
+    def result_cache(self):
+        """Cache of recent command results, opened on first use"""
+        if self._result_cache is None:
+            from utils.result_cache import ResultCache, RESULT_CACHE_FILE
+            self._result_cache = ResultCache(self.file_manager.output_dir / RESULT_CACHE_FILE, self.config_loader)
+        return self._result_cache
+    
+    @property
+    def results_db(self):
+        """Store of findings parsed from executed commands, opened on first use"""
+        if self._results_db is None:
+            from modules.results_db import ResultsDB, RESULTS_DB_FILE
+            self._results_db = ResultsDB(self.file_manager.output_dir / RESULTS_DB_FILE, self.config_loader)
+        return self._results_db
+    
+    @property
+    def active_result_cache(self):
+        """The result cache, or None while caching is turned off"""
+        return self.result_cache if self.use_result_cache else None
+    
+    def load_scope(self, path: str = None) -> bool:
+        """
+        Load the scope file that limits which targets commands may name
+        
+        Args:
+            path: Scope file; None falls back to $SHADOWCASTER_SCOPE
+        
+        Returns:
+            True if loaded (or nothing is configured), False on error
+        """
+        from utils.scope import ScopeError, load_scope
+        
+        try:
+            scope = load_scope(path)
+        except ScopeError as e:
+            Display.print_error(f"Could not load scope: {e}")
+            return False
+        
+        self.scope = scope
+        self.scope_path = (path or os.environ.get('SHADOWCASTER_SCOPE')) if scope is not None else None
+        if self._executor is not None:
+            self._executor.scope = scope
+        return True
+    
+    @property
+    def search_index(self):
+        """Tool and flag search index, loaded on first search"""
+        if self._search_index is None:
+            from utils.search_index import SearchIndex
+            self._search_index = SearchIndex(self.config_loader.config_dir)
+        return self._search_index
     
     def print_banner(self):
         """Print application banner"""
@@ -69,7 +132,11 @@ class ShadowCaster:
 {Colors.CYAN}{Colors.BOLD}Penetration Testing Command Generator{Colors.END}
 {Colors.YELLOW}Build commands for ethical hacking tools safely{Colors.END}
         """
-        print(banner)
+        Display.print_text(banner)
+    
+    def pending_count(self) -> int:
+        """Number of queued jobs, without creating the executor"""
+        return len(self._executor.pending_jobs()) if self._executor else 0
     
     def main_menu(self):
         """Display main menu"""
@@ -77,8 +144,10 @@ class ShadowCaster:
         
         options = [
             ("Build New Command", "Interactively build a penetration testing command"),
+            ("Search Tools & Flags", "Find tools and options by keyword (e.g. proxy, rate limit)"),
             ("Load Template", "Load a previously saved command template"),
             ("Manage Templates", "View, edit, or delete saved templates"),
+            ("Execution Queue", f"Run queued commands in parallel ({self.pending_count()} pending)"),
             ("Settings", "Configure application settings"),
             ("Exit", "Quit ShadowCaster")
         ]
@@ -92,6 +161,11 @@ class ShadowCaster:
         
         options = [
             ("Toggle Hint Mode", f"Currently: {'ON' if self.hint_mode else 'OFF'}"),
+            ("Toggle Output Compression", f"Captured output logs: {self.output_compression or 'uncompressed'}"),
+            ("Toggle Result Cache", f"Reuse recent results of dig, whois, sslscan...: "
+                                    f"{'ON' if self.use_result_cache else 'OFF'}"),
+            ("Clear Result Cache", "Forget all cached command results"),
+            ("Load Scope File", f"Allowed targets: {self.scope_path or 'any (no scope loaded)'}"),
             ("Clear All Templates", "Delete all saved templates"),
             ("Back to Main Menu", "")
         ]
@@ -101,18 +175,45 @@ class ShadowCaster:
         if indices[0] == 0:
             self.hint_mode = not self.hint_mode
             Display.print_success(f"Hint mode turned {'ON' if self.hint_mode else 'OFF'}")
-            input(f"{Colors.BOLD}Press Enter to continue...{Colors.END}")
+            Menu.pause()
         
         elif indices[0] == 1:
+            self.output_compression = None if self.output_compression else 'gzip'
+            if self._executor is not None:
+                self._executor.compression = self.output_compression
+            Display.print_success(f"Captured output will be {'gzip compressed' if self.output_compression else 'uncompressed'}")
+            Menu.pause()
+        
+        elif indices[0] == 2:
+            self.use_result_cache = not self.use_result_cache
+            if self._executor is not None:
+                self._executor.result_cache = self.active_result_cache
+            Display.print_success(f"Result cache turned {'ON' if self.use_result_cache else 'OFF'}")
+            Menu.pause()
+        
+        elif indices[0] == 3:
+            Display.print_success(f"Dropped {self.result_cache.clear()} cached results")
+            Menu.pause()
+        
+        elif indices[0] == 4:
+            path = Menu.get_text_input("Scope file (empty to allow any target): ", required=False)
+            if not path:
+                self.scope = self.scope_path = None
+                if self._executor is not None:
+                    self._executor.scope = None
+                Display.print_success("Scope cleared")
+            elif self.load_scope(path):
+                Display.print_success(f"Loaded {len(self.scope)} scope entries from {path}")
+            Menu.pause()
+        
+        elif indices[0] == 5:
             if Menu.confirm("Are you sure you want to delete all templates?"):
-                templates = self.file_manager.list_templates()
-                for template in templates:
-                    self.file_manager.delete_template(template['name'])
-                Display.print_success(f"Deleted {len(templates)} templates")
-            input(f"{Colors.BOLD}Press Enter to continue...{Colors.END}")
+                deleted = self.file_manager.clear_templates()
+                Display.print_success(f"Deleted {deleted} templates")
+            Menu.pause()
     
-    def build_command(self):
-        """Build a new command"""
+    def build_command(self, tool_id: str = None):
+        """Build a new command, optionally skipping tool selection"""
         # Get available tools
         tools = self.config_loader.list_available_tools()
         
@@ -120,10 +221,13 @@ class ShadowCaster:
             Display.print_error("No tools configured. Check configs directory.")
             return
         
-        Display.print_subheader("Available Tools")
-        tool_index = Menu.display_tools(tools)
-        selected_tool = tools[tool_index]
-        tool_id = selected_tool['id']
+        selected_tool = next((t for t in tools if t['id'] == tool_id), None)
+        
+        if selected_tool is None:
+            Display.print_subheader("Available Tools")
+            tool_index = Menu.display_tools(tools)
+            selected_tool = tools[tool_index]
+            tool_id = selected_tool['id']
         
         # Load tool configuration
         config = self.config_loader.load_config(tool_id)
@@ -132,7 +236,7 @@ class ShadowCaster:
             return
         
         # Create builder
-        builder_class = self.TOOL_BUILDERS.get(tool_id, CommandBuilder)
+        builder_class = get_builder_class(tool_id)
         builder = builder_class(config)
         builder.set_hint_mode(self.hint_mode)
         
@@ -146,12 +250,17 @@ class ShadowCaster:
         self.current_command = command
         self.handle_command_options(builder, command)
     
-    def handle_command_options(self, builder, command: str):
-        """Handle options for completed command"""
+    def handle_command_options(self, builder, command: str, compiled_template=None, template_name: str = None):
+        """Handle options for completed command (template_name: the saved template it came from)"""
         while True:
             Display.clear_screen()
             Display.print_header(f"{builder.tool_name} - Command Built Successfully")
             Display.print_command(command)
+            if self.scope is not None:
+                try:
+                    self.scope.check_command(command, builder.spec)
+                except ValueError as e:
+                    Display.print_warning(f"Not runnable, {e}")
             
             options = [
                 ("Preview Command", "Display the command in detail"),
@@ -159,6 +268,7 @@ class ShadowCaster:
                 ("Save to File", "Save command as executable script"),
                 ("Save as Template", "Save command as reusable template"),
                 ("Execute Command", "Run the command (with confirmation)"),
+                ("Add to Execution Queue", "Queue the command to run later in parallel"),
                 ("Build Another", "Create a new command"),
                 ("Back to Main Menu", "Return to main menu")
             ]
@@ -168,14 +278,15 @@ class ShadowCaster:
             
             if choice == 0:
                 builder.preview_command(command)
-                input(f"{Colors.BOLD}Press Enter to continue...{Colors.END}")
+                Menu.pause()
             
             elif choice == 1:
                 if ClipboardManager.copy_to_clipboard(command):
                     Display.print_success("Command copied to clipboard!")
                 else:
-                    Display.print_error("Failed to copy to clipboard. Install xclip or xsel.")
-                input(f"{Colors.BOLD}Press Enter to continue...{Colors.END}")
+                    Display.print_error("Failed to copy to clipboard. Install xclip, xsel or wl-copy, "
+                                        "or set SHADOWCASTER_CLIPBOARD=osc52 in a terminal that supports it.")
+                Menu.pause()
             
             elif choice == 2:
                 filename = Menu.get_text_input("Enter filename (optional): ", required=False)
@@ -184,45 +295,82 @@ class ShadowCaster:
                     Display.print_success(f"Command saved to: {path}")
                 else:
                     Display.print_error("Failed to save command")
-                input(f"{Colors.BOLD}Press Enter to continue...{Colors.END}")
+                Menu.pause()
             
             elif choice == 3:
                 template_name = Menu.get_text_input("Enter template name: ")
                 description = Menu.get_text_input("Enter description (optional): ", required=False)
-                path = self.file_manager.save_template(template_name, builder.tool_name.lower(), command, description)
+                compiled = builder.compile_template() if builder.command else compiled_template
+                path = self.file_manager.save_template(template_name, builder.tool_name.lower(), command,
+                                                       description, compiled)
                 if path:
                     Display.print_success(f"Template saved: {template_name}")
                 else:
                     Display.print_error("Failed to save template")
-                input(f"{Colors.BOLD}Press Enter to continue...{Colors.END}")
+                Menu.pause()
             
             elif choice == 4:
                 Display.clear_screen()
                 Display.print_warning("EXECUTION WARNING")
-                print("You are about to execute a system command. Make sure you:")
-                print("  • Understand what this command does")
-                print("  • Have proper authorization")
-                print("  • Are in an appropriate testing environment\n")
+                Display.print_text("You are about to execute a system command. Make sure you:\n"
+                                   "  • Understand what this command does\n"
+                                   "  • Have proper authorization\n"
+                                   "  • Are in an appropriate testing environment\n")
                 
-                if builder.execute_command(command):
+                if builder.execute_command(command, self.file_manager.get_output_dir(), self.output_compression,
+                                           self.active_result_cache, scope=self.scope,
+                                           results_db=self.results_db, template=template_name):
                     Display.print_success("Command executed successfully")
                 
-                input(f"{Colors.BOLD}Press Enter to continue...{Colors.END}")
+                Menu.pause()
             
             elif choice == 5:
+                try:
+                    job = self.executor.submit(command, template=template_name)
+                    Display.print_success(f"Queued as job {job.id} ({len(self.executor.pending_jobs())} pending)")
+                except ValueError as e:
+                    Display.print_error(f"Could not queue command: {e}")
+                Menu.pause()
+            
+            elif choice == 6:
                 self.build_command()
                 return
             
             else:
                 return
     
+    def search_tools(self):
+        """Search tools and flags by keyword"""
+        self.search_index.refresh()
+        
+        query = Menu.get_text_input("Search for: ")
+        results = self.search_index.search(query, limit=30)
+        
+        if not results:
+            Display.print_info(f"Nothing matches '{query}'")
+            Menu.pause()
+            return
+        
+        options = []
+        for result in results:
+            if result['flag'] is None:
+                options.append((result['tool_name'], result['description']))
+            else:
+                options.append((f"{result['tool_name']}: {result['flag']}",
+                                f"[{result['category']}] {result['description']}"))
+        options.append(("Back to Main Menu", ""))
+        
+        indices = Menu.display_menu(f"Results for '{query}' - select one to build a command", options)
+        if indices[0] < len(results):
+            self.build_command(results[indices[0]]['tool'])
+    
     def load_template(self):
         """Load and use a saved template"""
         templates = self.file_manager.list_templates()
         
         if not templates:
             Display.print_info("No saved templates found")
-            input(f"{Colors.BOLD}Press Enter to continue...{Colors.END}")
+            Menu.pause()
             return
         
         Display.print_subheader("Saved Templates")
@@ -233,9 +381,19 @@ class ShadowCaster:
         
         self.current_command = selected_template['command']
         
+        # Re-render with new slot values when the template was saved compiled
+        compiled = self.file_manager.load_compiled_template(selected_template['name'])
+        if compiled and compiled.fields and Menu.confirm("Change template parameters?"):
+            values = {}
+            for field in compiled.fields:
+                default = compiled.defaults.get(field, '')
+                value = Menu.get_text_input(f"Enter {field}: ", required=not default, hint=default or None)
+                values[field] = value or default
+            self.current_command = compiled.render(**values)
+        
         # Create a dummy builder for display
         builder = CommandBuilder({'name': selected_template['tool'].title(), 'command': ''})
-        self.handle_command_options(builder, self.current_command)
+        self.handle_command_options(builder, self.current_command, compiled, selected_template['name'])
     
     def manage_templates(self):
         """Manage saved templates"""
@@ -243,7 +401,7 @@ class ShadowCaster:
         
         if not templates:
             Display.print_info("No saved templates found")
-            input(f"{Colors.BOLD}Press Enter to continue...{Colors.END}")
+            Menu.pause()
             return
         
         while True:
@@ -264,7 +422,7 @@ class ShadowCaster:
             Display.print_header(f"Template: {selected_template['name']}")
             Display.print_info(f"Tool: {selected_template['tool']}")
             Display.print_info(f"Description: {selected_template['description']}")
-            print()
+            Display.print_text()
             Display.print_command(selected_template['command'])
             
             options = [
@@ -278,7 +436,8 @@ class ShadowCaster:
             if indices[0] == 0:
                 self.current_command = selected_template['command']
                 builder = CommandBuilder({'name': selected_template['tool'].title(), 'command': ''})
-                self.handle_command_options(builder, self.current_command)
+                compiled = self.file_manager.load_compiled_template(selected_template['name'])
+                self.handle_command_options(builder, self.current_command, compiled, selected_template['name'])
                 return
             
             elif indices[0] == 1:
@@ -286,13 +445,122 @@ class ShadowCaster:
                     self.file_manager.delete_template(selected_template['name'])
                     Display.print_success("Template deleted")
                     templates = self.file_manager.list_templates()
-                    input(f"{Colors.BOLD}Press Enter to continue...{Colors.END}")
+                    Menu.pause()
+    
+    def pacing_summary(self) -> str:
+        """Describe the executor's per-host limits and retries"""
+        executor = self.executor
+        per_host = f"{executor.per_host} per host" if executor.per_host else "no per-host cap"
+        rate = f"{executor.host_rate:g} starts/s per host" if executor.host_rate else "unpaced"
+        return f"{per_host}, {rate}, {executor.retries} retries"
+    
+    def set_pacing(self):
+        """Ask for per-host concurrency, start rate and retry count"""
+        executor = self.executor
+        try:
+            value = Menu.get_text_input("Jobs at once per target host (empty for no cap): ", required=False)
+            per_host = int(value) if value else None
+            value = Menu.get_text_input("Job starts per second per target host (empty for no limit): ",
+                                        required=False)
+            host_rate = float(value) if value else None
+            value = Menu.get_text_input("Retries for jobs that exit non-zero: ", required=False)
+            retries = int(value) if value else 0
+        except ValueError:
+            Display.print_error("Enter a number")
+            Menu.pause()
+            return
+        
+        if (per_host is not None and per_host < 1) or (host_rate is not None and host_rate <= 0) or retries < 0:
+            Display.print_error("Limits must be positive")
+            Menu.pause()
+            return
+        
+        executor.per_host = per_host
+        executor.host_rate = host_rate
+        executor.retries = retries
+    
+    def execution_queue(self):
+        """Run and inspect queued commands"""
+        while True:
+            Display.clear_screen()
+            Display.print_header("Execution Queue")
+            Display.print_text(self.executor.status_table())
+            
+            options = [
+                ("Run Pending Jobs", f"Run with up to {self.executor.max_concurrency} jobs at once"),
+                ("Set Concurrency", "Change how many jobs run in parallel"),
+                ("Set Timeout", "Change the per-job timeout"),
+                ("Set Pacing", self.pacing_summary()),
+                ("View Job Output", "Show the latest output of a job"),
+                ("Cancel Job", "Remove a pending job from the queue"),
+                ("Clear Finished Jobs", "Forget completed jobs"),
+                ("Back to Main Menu", "")
+            ]
+            
+            indices = Menu.display_menu("Queue Options", options)
+            choice = indices[0]
+            
+            if choice == 0:
+                if not self.executor.pending_jobs():
+                    Display.print_info("No pending jobs")
+                elif Menu.confirm("Run all pending jobs? Make sure every target is in scope"):
+                    self.executor.run_all(live=True)
+                Menu.pause()
+            
+            elif choice == 1:
+                value = Menu.get_text_input("Maximum parallel jobs: ")
+                if value.isdigit() and int(value) > 0:
+                    self.executor.max_concurrency = int(value)
+                else:
+                    Display.print_error("Enter a positive number")
+                    Menu.pause()
+            
+            elif choice == 2:
+                value = Menu.get_text_input("Timeout in seconds (empty for none): ", required=False)
+                try:
+                    self.executor.default_timeout = float(value) if value else None
+                    for job in self.executor.pending_jobs():
+                        job.timeout = self.executor.default_timeout
+                except ValueError:
+                    Display.print_error("Enter a number of seconds")
+                    Menu.pause()
+            
+            elif choice == 3:
+                self.set_pacing()
+            
+            elif choice == 4:
+                value = Menu.get_text_input("Job ID: ")
+                job = self.executor.get_job(int(value)) if value.isdigit() else None
+                if job is None or job.capture is None:
+                    Display.print_error("No output captured for that job")
+                else:
+                    Display.print_subheader(f"Job {job.id}: {job.command}")
+                    Display.print_text(job.capture.tail_text())
+                    Display.print_info(f"Full output ({job.capture.bytes_written} bytes): {job.log_path}")
+                Menu.pause()
+            
+            elif choice == 5:
+                value = Menu.get_text_input("Job ID to cancel: ")
+                if value.isdigit() and self.executor.cancel(int(value)):
+                    Display.print_success(f"Job {value} cancelled")
+                else:
+                    Display.print_error("No pending job with that ID")
+                Menu.pause()
+            
+            elif choice == 6:
+                self.executor.clear_finished()
+            
+            else:
+                return
     
     def run(self):
         """Main application loop"""
         self.print_banner()
         
         while True:
+            # Keep the metrics file current for scrapers while the app stays open
+            instrumentation.flush()
+            
             try:
                 choice = self.main_menu()
                 
@@ -300,32 +568,118 @@ class ShadowCaster:
                     self.build_command()
                 
                 elif choice == 1:
-                    self.load_template()
+                    self.search_tools()
                 
                 elif choice == 2:
-                    self.manage_templates()
+                    self.load_template()
                 
                 elif choice == 3:
-                    self.settings_menu()
+                    self.manage_templates()
                 
                 elif choice == 4:
+                    self.execution_queue()
+                
+                elif choice == 5:
+                    self.settings_menu()
+                
+                elif choice == 6:
                     Display.print_success("Goodbye!")
                     break
             
             except KeyboardInterrupt:
-                print(f"\n{Colors.YELLOW}Interrupted by user{Colors.END}")
+                Display.print_text(f"\n{Colors.YELLOW}Interrupted by user{Colors.END}")
                 if Menu.confirm("Exit ShadowCaster?"):
                     Display.print_success("Goodbye!")
                     break
             
             except Exception as e:
                 Display.print_error(f"An error occurred: {e}")
-                input(f"{Colors.BOLD}Press Enter to continue...{Colors.END}")
+                Menu.pause()
+
+
+# Run in a child interpreter by --startup-profile
+PROFILE_SNIPPET = """
+import time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+app = main.ShadowCaster()
+initialized = time.perf_counter()
+app.config_loader.list_available_tools()
+listed = time.perf_counter()
+print(imported - start, initialized - imported, listed - initialized)
+"""
+
+
+def parse_importtime(output: str):
+    """Parse `python -X importtime` output into (module, self us, cumulative us, depth) rows"""
+    rows = []
+    
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+            depth = (len(name) - len(name.lstrip())) // 2
+            rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+        except ValueError:
+            continue
+    
+    return rows
+
+
+def startup_profile(top: int = 10):
+    """Report import and init times broken down by module"""
+    import subprocess
+    
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROFILE_SNIPPET],
+        cwd=str(Path(__file__).parent), capture_output=True, text=True
+    )
+    
+    if result.returncode != 0:
+        Display.print_error(f"Startup profile failed:\n{result.stderr.strip()}")
+        return
+    
+    import_time, init_time, list_time = (float(x) for x in result.stdout.split()[-3:])
+    rows = parse_importtime(result.stderr)
+    
+    Display.print_header("Startup Profile")
+    print(f"  {'import main':<40}{import_time * 1000:>9.1f} ms")
+    print(f"  {'ShadowCaster()':<40}{init_time * 1000:>9.1f} ms")
+    print(f"  {'first list_available_tools()':<40}{list_time * 1000:>9.1f} ms")
+    
+    Display.print_subheader("ShadowCaster modules (self / cumulative)")
+    for name, self_us, cumulative_us, _ in rows:
+        if name == 'main' or name.split('.')[0] in ('utils', 'modules'):
+            print(f"  {name:<40}{self_us / 1000:>9.1f} ms {cumulative_us / 1000:>9.1f} ms")
+    
+    Display.print_subheader(f"Slowest other imports (top {top}, cumulative)")
+    # Only count top-level entries so nested imports are not counted twice
+    others = [r for r in rows if r[3] == 1 and r[0].split('.')[0] not in ('utils', 'modules', 'main')]
+    for name, self_us, cumulative_us, _ in sorted(others, key=lambda r: -r[2])[:top]:
+        print(f"  {name:<40}{self_us / 1000:>9.1f} ms {cumulative_us / 1000:>9.1f} ms")
 
 
 def main():
     """Entry point"""
+    if '--startup-profile' in sys.argv[1:]:
+        startup_profile()
+        return
+    
     app = ShadowCaster()
+    if '--no-cache' in sys.argv[1:]:
+        app.use_result_cache = False
+    
+    scope_path = None
+    if '--scope' in sys.argv[1:]:
+        index = sys.argv.index('--scope')
+        if index + 1 >= len(sys.argv):
+            Display.print_error("--scope needs a scope file")
+            sys.exit(2)
+        scope_path = sys.argv[index + 1]
+    if (scope_path or os.environ.get('SHADOWCASTER_SCOPE')) and not app.load_scope(scope_path):
+        sys.exit(2)
     app.run()
 
 
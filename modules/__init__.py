@@ -1,21 +1,35 @@
 """
 ShadowCaster Modules Package
+
+Attributes are imported on first access so that importing one submodule
+does not pull in every builder.
 """
 
-from .tool_builders import (
-    NmapBuilder,
-    HydraBuilder,
-    SQLMapBuilder,
-    WPScanBuilder,
-    GobusterBuilder,
-    AircrackBuilder
-)
-
-__all__ = [
-    'NmapBuilder',
-    'HydraBuilder',
-    'SQLMapBuilder',
-    'WPScanBuilder',
-    'GobusterBuilder',
-    'AircrackBuilder'
-]
+import importlib
+
+_EXPORTS = {
+    'NmapBuilder': 'tool_builders',
+    'HydraBuilder': 'tool_builders',
+    'SQLMapBuilder': 'tool_builders',
+    'WPScanBuilder': 'tool_builders',
+    'GobusterBuilder': 'tool_builders',
+    'AircrackBuilder': 'tool_builders',
+    'TOOL_BUILDERS': 'builder_registry',
+    'get_builder_class': 'builder_registry'
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
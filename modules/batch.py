@@ -0,0 +1,502 @@
+"""
+Batch Command Generation
+Renders commands headlessly from spec files instead of interactive menus
+
+Copyright (C) 2025
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Spec records look like:
+    
+    {"tool": "nmap",
+     "required": {"target": "10.0.0.1"},
+     "flags": ["-sS", {"flag": "-p", "value": "80,443"}, ["-oN", "scan.txt"]]}
+
+JSONL (one record per line) is read as a stream; YAML files are read one
+document at a time and each document may hold a record or a list of them.
+
+Flags are checked against the tool's config before anything is rendered:
+unknown flags and combinations the config marks as conflicting (or
+missing a flag they require) reject the record.
+
+A single record can also be fanned out over a target list, in which case
+the target parameter is left out of "required" and filled per target.
+
+With a scope (--scope FILE or $SHADOWCASTER_SCOPE), records naming an
+out-of-scope target are rejected and fan-out skips out-of-scope targets.
+"""
+
+import argparse
+import ipaddress
+import json
+import sys
+from typing import Dict, Any, Iterable, Iterator, List, Tuple
+
+from utils.config_loader import ConfigLoader
+from utils.command_builder import CommandBuilder
+from utils.config_model import ToolSpec
+from utils.scope import NON_TARGET_PARAMS, Scope, ScopeError, load_scope
+from modules.builder_registry import get_builder_class
+
+
+class BatchSpecError(ValueError):
+    """Raised when a spec record cannot be rendered"""
+
+
+def _iter_jsonl(stream) -> Iterator[Dict[str, Any]]:
+    """Yield records from a JSON-lines stream"""
+    for line_no, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            raise BatchSpecError(f"line {line_no}: invalid JSON ({e})")
+
+
+def _iter_documents(documents) -> Iterator[Dict[str, Any]]:
+    """Flatten documents that hold either one record or a list of records"""
+    for document in documents:
+        if document is None:
+            continue
+        if isinstance(document, list):
+            yield from document
+        else:
+            yield document
+
+
+def iter_spec(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Iterate over spec records in a file
+    
+    Args:
+        path: Spec file (.jsonl/.ndjson, .json, .yaml/.yml) or '-' for
+              JSON lines on stdin
+    
+    Returns:
+        Iterator of raw spec records
+    """
+    if path == '-':
+        yield from _iter_jsonl(sys.stdin)
+        return
+    
+    lowered = path.lower()
+    
+    with open(path, 'r') as f:
+        if lowered.endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise BatchSpecError("PyYAML is required for YAML spec files (pip install pyyaml)")
+            
+            yield from _iter_documents(yaml.safe_load_all(f))
+        
+        elif lowered.endswith('.json'):
+            # A plain JSON document has to be parsed in one go
+            try:
+                yield from _iter_documents([json.load(f)])
+            except json.JSONDecodeError as e:
+                raise BatchSpecError(f"invalid JSON ({e})")
+        
+        else:
+            yield from _iter_jsonl(f)
+
+
+def expand_target(entry: str) -> Iterator[str]:
+    """Expand a CIDR range into host addresses lazily; other targets pass through"""
+    if '/' in entry and '://' not in entry:
+        try:
+            network = ipaddress.ip_network(entry, strict=False)
+        except ValueError:
+            yield entry
+            return
+        
+        for host in network.hosts():
+            yield str(host)
+    else:
+        yield entry
+
+
+def iter_targets(sources: Iterable[str], expand_cidr: bool = True) -> Iterator[str]:
+    """
+    Iterate over targets from scope files
+    
+    Args:
+        sources: Target files, one target per line, or '-' for stdin
+        expand_cidr: Expand CIDR ranges into individual hosts
+    
+    Returns:
+        Iterator of targets; blank lines and '#' comments are skipped
+    """
+    for source in sources:
+        stream = sys.stdin if source == '-' else open(source, 'r')
+        
+        try:
+            for line in stream:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                
+                if expand_cidr:
+                    yield from expand_target(line)
+                else:
+                    yield line
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+
+class TargetFanOut:
+    """
+    Renders one builder selection for many targets
+    
+    The command is rendered once with a placeholder in the target slot and
+    split around it, so each target only costs a string concatenation.
+    """
+    
+    PLACEHOLDER = '\x00target\x00'
+    
+    def __init__(self, builder, target_param: str, scope: Scope = None):
+        """
+        Initialize fan-out from a builder whose target param holds PLACEHOLDER
+        
+        Args:
+            scope: Skip targets outside this scope (see rejected)
+        """
+        self.target_param = target_param
+        self.scope = scope
+        self.rejected = []
+        command = builder.render_command()
+        
+        if self.PLACEHOLDER not in command:
+            raise BatchSpecError(f"{builder.spec.id}: '{target_param}' is not placed on the command line")
+        self.prefix, _, self.suffix = command.partition(self.PLACEHOLDER)
+    
+    def render(self, target: str) -> str:
+        """Render the command for a single target"""
+        if self.scope is not None and not self.scope.contains(target):
+            raise ScopeError(f"out of scope: {target}")
+        return self.prefix + target + self.suffix
+    
+    def fan_out(self, targets: Iterable[str]) -> Iterator[str]:
+        """Render the command for each target lazily; out-of-scope targets go to rejected"""
+        prefix, suffix = self.prefix, self.suffix
+        
+        if self.scope is None:
+            for target in targets:
+                yield prefix + target + suffix
+            return
+        
+        contains = self.scope.contains
+        for target in targets:
+            if contains(target):
+                yield prefix + target + suffix
+            else:
+                self.rejected.append(target)
+
+
+class BatchEngine:
+    """Renders commands for spec records without any prompts"""
+    
+    def __init__(self, config_loader: ConfigLoader = None, allow_unknown_flags: bool = False,
+                 scope: Scope = None):
+        """
+        Initialize batch engine
+        
+        Args:
+            config_loader: Loader to read tool configs with
+            allow_unknown_flags: Accept flags the tool's config does not list
+                                 (conflicts are still checked)
+            scope: Reject records and skip fan-out targets outside this scope
+        """
+        self.config_loader = config_loader or ConfigLoader()
+        self.allow_unknown_flags = allow_unknown_flags
+        self.scope = scope
+        self._tools = {}
+        self.rendered = 0
+        self.skipped = 0
+    
+    def get_tool(self, tool_id: str) -> Tuple[ToolSpec, type]:
+        """Get (spec, builder class) for a tool, loading the config once"""
+        if not isinstance(tool_id, str):
+            raise BatchSpecError(f"tool must be a string, not {tool_id!r}")
+        tool = self._tools.get(tool_id)
+        
+        if tool is None:
+            spec = self.config_loader.load_spec(tool_id)
+            if spec is None:
+                raise BatchSpecError(f"unknown tool '{tool_id}'")
+            
+            tool = (spec, get_builder_class(tool_id))
+            self._tools[tool_id] = tool
+        
+        return tool
+    
+    @staticmethod
+    def parse_flags(flags: Iterable[Any]) -> List[str]:
+        """Convert spec flag entries into formatted command-line flags"""
+        selected = []
+        for entry in flags or []:
+            if isinstance(entry, str):
+                selected.append(entry)
+            elif isinstance(entry, dict) and entry.get('flag'):
+                selected.append(CommandBuilder.format_flag(entry['flag'], entry.get('value')))
+            elif isinstance(entry, (list, tuple)) and 1 <= len(entry) <= 2:
+                selected.append(CommandBuilder.format_flag(*entry))
+            else:
+                raise BatchSpecError(f"invalid flag entry {entry!r}")
+        
+        return selected
+    
+    def get_target_param(self, tool_id: str) -> str:
+        """Guess which required parameter holds the target for a tool"""
+        spec, _ = self.get_tool(tool_id)
+        required = spec.required_names
+        
+        for name in ('target', 'host', 'url', 'domain', 'hostname', 'query'):
+            if name in required:
+                return name
+        
+        if len(required) == 1:
+            return required[0]
+        
+        raise BatchSpecError(f"{tool_id}: cannot tell which parameter is the target, set target_param")
+    
+    def compile_fan_out(self, record: Dict[str, Any], target_param: str = None) -> TargetFanOut:
+        """Compile a spec record into a fan-out renderer"""
+        if not isinstance(record, dict) or not record.get('tool'):
+            raise BatchSpecError(f"record has no 'tool': {record!r}")
+        
+        tool_id = record['tool']
+        target_param = target_param or record.get('target_param') or self.get_target_param(tool_id)
+        if not isinstance(target_param, str):
+            raise BatchSpecError(f"{tool_id}: target_param must be a string, not {target_param!r}")
+        
+        required = dict(self._required_values(tool_id, record.get('required')))
+        required[target_param] = TargetFanOut.PLACEHOLDER
+        
+        builder = self.create_builder(tool_id, required, record.get('flags'))
+        return TargetFanOut(builder, target_param, self.scope)
+    
+    def fan_out(self, record: Dict[str, Any], targets: Iterable[str], target_param: str = None) -> Iterator[str]:
+        """
+        Render one spec record for every target
+        
+        Args:
+            record: Spec record without the target parameter
+            targets: Iterable of targets (see iter_targets)
+            target_param: Required parameter to fill; guessed when omitted
+        
+        Returns:
+            Iterator of rendered commands
+        """
+        fan_out = self.compile_fan_out(record, target_param)
+        
+        for command in fan_out.fan_out(targets):
+            self.rendered += 1
+            yield command
+            if fan_out.rejected:
+                self._report_rejected(fan_out.rejected)
+        
+        self._report_rejected(fan_out.rejected)
+    
+    def _report_rejected(self, rejected: List[str]):
+        """Report and forget fan-out targets skipped as out of scope"""
+        for target in rejected:
+            print(f"skipped out-of-scope target {target}", file=sys.stderr)
+        self.skipped += len(rejected)
+        rejected.clear()
+    
+    @staticmethod
+    def _required_values(tool_id: str, required: Any) -> Dict[str, Any]:
+        """Check that required values are a mapping of names to strings or numbers"""
+        if required is None:
+            return {}
+        if not isinstance(required, dict):
+            raise BatchSpecError(f"{tool_id}: 'required' must be a mapping, not {required!r}")
+        for name, value in required.items():
+            if not isinstance(value, (str, int, float)) or isinstance(value, bool):
+                raise BatchSpecError(f"{tool_id}: required parameter '{name}' must be a string or number, "
+                                     f"not {value!r}")
+        return required
+    
+    def create_builder(self, tool_id: str, required: Dict[str, Any] = None, flags: Iterable[Any] = None):
+        """Create a builder pre-filled with required values and flags"""
+        spec, builder_class = self.get_tool(tool_id)
+        
+        required = self._required_values(tool_id, required)
+        missing = [name for name in spec.required_names if name not in required]
+        if missing:
+            raise BatchSpecError(f"{tool_id}: missing required parameter(s): {', '.join(missing)}")
+        unknown = [name for name in required if name not in spec.required_names]
+        if unknown:
+            raise BatchSpecError(f"{tool_id}: unknown required parameter(s): {', '.join(map(str, unknown))}")
+        
+        selected = self.parse_flags(flags)
+        problems = spec.flag_index.validate(selected, self.allow_unknown_flags)
+        if problems:
+            raise BatchSpecError(f"{tool_id}: {'; '.join(problems)}")
+        
+        if self.scope is not None:
+            bad = []
+            for name, value in required.items():
+                # The fan-out placeholder is checked per target instead
+                if value != TargetFanOut.PLACEHOLDER:
+                    bad += self.scope.value_violations(str(value), name not in NON_TARGET_PARAMS)
+            bad += self.scope.violations([token.strip('"') for flag in selected for token in flag.split()], spec)
+            if bad:
+                raise BatchSpecError(f"{tool_id}: out of scope: {', '.join(dict.fromkeys(bad))}")
+        
+        builder = builder_class(spec)
+        builder.required_params = {name: str(value) for name, value in required.items()}
+        builder.selected_flags = selected
+        return builder
+    
+    def render(self, record: Dict[str, Any]) -> str:
+        """Render a single spec record into a command"""
+        if not isinstance(record, dict) or not record.get('tool'):
+            raise BatchSpecError(f"record has no 'tool': {record!r}")
+        
+        builder = self.create_builder(record['tool'], record.get('required'), record.get('flags'))
+        return builder.render_command()
+    
+    def render_stream(self, records: Iterable[Dict[str, Any]], skip_invalid: bool = False) -> Iterator[str]:
+        """
+        Render spec records lazily
+        
+        Args:
+            records: Iterable of spec records
+            skip_invalid: Report and skip bad records instead of raising
+        
+        Returns:
+            Iterator of rendered commands
+        """
+        for number, record in enumerate(records, 1):
+            try:
+                command = self.render(record)
+            except BatchSpecError as e:
+                if not skip_invalid:
+                    raise BatchSpecError(f"record {number}: {e}")
+                self.skipped += 1
+                print(f"record {number}: {e}", file=sys.stderr)
+                continue
+            
+            self.rendered += 1
+            yield command
+
+
+def write_commands(commands: Iterable[str], output) -> int:
+    """Write commands one per line, returning how many were written"""
+    count = 0
+    for command in commands:
+        output.write(command)
+        output.write('\n')
+        count += 1
+    return count
+
+
+def main(argv: List[str] = None) -> int:
+    """Batch command-line entry point"""
+    parser = argparse.ArgumentParser(
+        prog='python -m modules.batch',
+        description='Generate ShadowCaster commands without interactive prompts'
+    )
+    subparsers = parser.add_subparsers(dest='action', required=True)
+    
+    render_parser = subparsers.add_parser('render', help='Render commands from a spec file')
+    render_parser.add_argument('spec', help="Spec file (.jsonl, .json, .yaml) or '-' for stdin")
+    render_parser.add_argument('-o', '--output', help='Write commands to a file instead of stdout')
+    render_parser.add_argument('--skip-invalid', action='store_true',
+                               help='Report and skip invalid records instead of stopping')
+    render_parser.add_argument('--allow-unknown-flags', action='store_true',
+                               help="Accept flags that are not in the tool's config")
+    render_parser.add_argument('--clipboard', action='store_true',
+                               help='Also copy all rendered commands to the clipboard at once')
+    render_parser.add_argument('--scope', help='Scope file; reject out-of-scope targets (default: $SHADOWCASTER_SCOPE)')
+    
+    fanout_parser = subparsers.add_parser('fanout', help='Render one spec record for many targets')
+    fanout_parser.add_argument('spec', help='Spec file holding a single record without the target')
+    fanout_parser.add_argument('-t', '--targets', action='append', default=[],
+                               help="Target file, one per line, or '-' for stdin (repeatable)")
+    fanout_parser.add_argument('--cidr', action='append', default=[],
+                               help='CIDR range or single target to include (repeatable)')
+    fanout_parser.add_argument('--target-param', help='Required parameter that receives the target')
+    fanout_parser.add_argument('--no-expand', action='store_true',
+                               help='Pass CIDR ranges through instead of expanding them')
+    fanout_parser.add_argument('-o', '--output', help='Write commands to a file instead of stdout')
+    fanout_parser.add_argument('--allow-unknown-flags', action='store_true',
+                               help="Accept flags that are not in the tool's config")
+    fanout_parser.add_argument('--clipboard', action='store_true',
+                               help='Also copy all rendered commands to the clipboard at once')
+    fanout_parser.add_argument('--scope', help='Scope file; skip out-of-scope targets (default: $SHADOWCASTER_SCOPE)')
+    
+    args = parser.parse_args(argv)
+    try:
+        scope = load_scope(args.scope)
+    except ScopeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    
+    engine = BatchEngine(allow_unknown_flags=args.allow_unknown_flags, scope=scope)
+    output = sys.stdout
+    copied = [] if args.clipboard else None
+    
+    def collect(commands):
+        for command in commands:
+            copied.append(command)
+            yield command
+    
+    try:
+        if args.output:
+            output = open(args.output, 'w')
+        
+        if args.action == 'fanout':
+            records = list(iter_spec(args.spec))
+            if len(records) != 1:
+                raise BatchSpecError(f"fanout spec must hold exactly one record, found {len(records)}")
+            
+            def targets():
+                for entry in args.cidr:
+                    if args.no_expand:
+                        yield entry
+                    else:
+                        yield from expand_target(entry)
+                yield from iter_targets(args.targets, not args.no_expand)
+            
+            commands = engine.fan_out(records[0], targets(), args.target_param)
+        else:
+            commands = engine.render_stream(iter_spec(args.spec), args.skip_invalid)
+        
+        write_commands(commands if copied is None else collect(commands), output)
+    except (BatchSpecError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    
+    print(f"Rendered {engine.rendered} command(s), skipped {engine.skipped}", file=sys.stderr)
+    
+    if copied:
+        from utils.file_manager import ClipboardManager
+        if not ClipboardManager.copy_many(copied):
+            print("Error: could not copy commands to the clipboard", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,56 @@
+"""
+Builder Registry
+Maps tool ids to builder classes by dotted path, imported on first use
+
+Copyright (C) 2025
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import importlib
+
+
+DEFAULT_BUILDER = 'utils.command_builder.CommandBuilder'
+
+# Tool id -> "module.path.ClassName"; tools not listed use DEFAULT_BUILDER
+TOOL_BUILDERS = {
+    'nmap': 'modules.tool_builders.NmapBuilder',
+    'hydra': 'modules.tool_builders.HydraBuilder',
+    'sqlmap': 'modules.tool_builders.SQLMapBuilder',
+    'wpscan': 'modules.tool_builders.WPScanBuilder',
+    'gobuster': 'modules.tool_builders.GobusterBuilder',
+    'aircrack': 'modules.tool_builders.AircrackBuilder'
+}
+
+_resolved = {}
+
+
+def resolve_builder(path: str) -> type:
+    """Import a builder class from its dotted path"""
+    builder_class = _resolved.get(path)
+    
+    if builder_class is None:
+        module_name, _, class_name = path.rpartition('.')
+        try:
+            builder_class = getattr(importlib.import_module(module_name), class_name)
+        except (ImportError, AttributeError) as e:
+            raise ImportError(f"Cannot load builder '{path}': {e}")
+        _resolved[path] = builder_class
+    
+    return builder_class
+
+
+def get_builder_class(tool_id: str) -> type:
+    """Get the builder class for a tool id"""
+    return resolve_builder(TOOL_BUILDERS.get(tool_id, DEFAULT_BUILDER))
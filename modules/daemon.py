@@ -0,0 +1,671 @@
+"""
+Catalog Daemon
+Keeps the catalog, compiled builders and templates resident and serves
+requests over a Unix domain socket
+
+Copyright (C) 2025
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Every message in either direction is one frame: a 4-byte big-endian body
+length followed by a UTF-8 JSON object. A request names an operation:
+    
+    {"op": "render", "records": [{"tool": "nmap", "required": {"target": "10.0.0.1"}}]}
+    {"op": "render", "record": {"tool": "nmap", "flags": ["-sS"]}, "targets": ["10.0.0.0/30"]}
+    {"op": "render", "template": "web-scan", "values": {"target": "10.0.0.1"}}
+    {"op": "validate", "tool": "nmap", "flags": ["-sS", "-sT"]}
+    {"op": "search", "query": "proxy", "limit": 5}
+    {"op": "list", "what": "tools"}
+
+and the answer is {"ok": true, "result": ...} or {"ok": false, "error": "..."}.
+A connection may carry any number of requests, one after another.
+
+Only the client half is imported at module load, so `python3 -m
+modules.daemon render ...` starts without reading configs or templates.
+"""
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+
+FRAME_HEADER = struct.Struct('!I')
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+
+SOCKET_ENV = 'SHADOWCASTER_SOCKET'
+
+# Records sent per request when streaming a spec file through the client
+RENDER_CHUNK = 512
+
+# Most targets one fan-out request may expand to; larger ones belong to
+# the batch CLI, which streams its output
+MAX_FANOUT_TARGETS = 65536
+
+
+def default_socket_path() -> str:
+    """Socket path from $SHADOWCASTER_SOCKET, else a per-user path"""
+    path = os.environ.get(SOCKET_ENV)
+    if path:
+        return path
+    
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir:
+        return os.path.join(runtime_dir, 'shadowcaster.sock')
+    return os.path.join(os.environ.get('TMPDIR', '/tmp'), f'shadowcaster-{os.getuid()}.sock')
+
+
+class ProtocolError(ValueError):
+    """Raised when a frame is malformed, oversized or cut short"""
+
+
+class DaemonError(RuntimeError):
+    """Raised by the client when the daemon answers with an error"""
+
+
+def send_message(sock: socket.socket, message: Dict[str, Any]):
+    """Write one framed JSON message"""
+    body = json.dumps(message, separators=(',', ':')).encode('utf-8')
+    if len(body) > MAX_FRAME_SIZE:
+        raise ProtocolError(f"message of {len(body)} bytes exceeds the {MAX_FRAME_SIZE} byte limit")
+    sock.sendall(FRAME_HEADER.pack(len(body)) + body)
+
+
+def read_message(reader) -> Optional[Dict[str, Any]]:
+    """
+    Read one framed JSON message from a buffered binary stream
+    
+    Returns:
+        The message, or None if the peer closed the connection between messages
+    """
+    header = reader.read(FRAME_HEADER.size)
+    if not header:
+        return None
+    if len(header) < FRAME_HEADER.size:
+        raise ProtocolError("connection closed inside a frame header")
+    
+    (length,) = FRAME_HEADER.unpack(header)
+    if length > MAX_FRAME_SIZE:
+        raise ProtocolError(f"frame of {length} bytes exceeds the {MAX_FRAME_SIZE} byte limit")
+    
+    body = reader.read(length)
+    if len(body) < length:
+        raise ProtocolError("connection closed inside a frame")
+    
+    try:
+        message = json.loads(body)
+    except ValueError as e:
+        raise ProtocolError(f"invalid JSON ({e})")
+    
+    if not isinstance(message, dict):
+        raise ProtocolError("message is not a JSON object")
+    return message
+
+
+class DaemonClient:
+    """
+    Connection to a running daemon
+    
+    Keep one client open for many requests; connecting is the only part
+    that costs more than a round trip.
+    """
+    
+    def __init__(self, socket_path: str = None, timeout: float = 30.0):
+        """
+        Initialize client
+        
+        Args:
+            socket_path: Daemon socket (default: default_socket_path())
+            timeout: Seconds to wait for each answer
+        """
+        self.socket_path = socket_path or default_socket_path()
+        self.timeout = timeout
+        self._sock = None
+        self._reader = None
+    
+    def connect(self) -> 'DaemonClient':
+        """Connect to the daemon; raises OSError if it is not running"""
+        if self._sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.socket_path)
+            except OSError:
+                sock.close()
+                raise
+            self._sock = sock
+            self._reader = sock.makefile('rb')
+        return self
+    
+    def close(self):
+        """Close the connection"""
+        if self._sock is not None:
+            self._reader.close()
+            self._sock.close()
+            self._sock = self._reader = None
+    
+    def __enter__(self):
+        return self.connect()
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+    
+    def request(self, op: str, **params) -> Any:
+        """
+        Send one request and wait for its answer
+        
+        Returns:
+            The result of the operation
+        
+        Raises:
+            DaemonError: If the daemon rejected the request
+            ProtocolError: If the answer could not be read
+        """
+        self.connect()
+        params['op'] = op
+        send_message(self._sock, params)
+        
+        response = read_message(self._reader)
+        if response is None:
+            self.close()
+            raise ProtocolError("daemon closed the connection")
+        if not response.get('ok'):
+            raise DaemonError(response.get('error') or 'request failed')
+        return response.get('result')
+    
+    def ping(self) -> Dict[str, Any]:
+        return self.request('ping')
+    
+    def render(self, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Render spec records; see CatalogDaemon.op_render for the result"""
+        return self.request('render', records=records)
+    
+    def fan_out(self, record: Dict[str, Any], targets: List[str], target_param: str = None,
+                expand_cidr: bool = True) -> List[str]:
+        """Render one spec record for every target"""
+        return self.request('render', record=record, targets=targets,
+                            target_param=target_param, expand_cidr=expand_cidr)['commands']
+    
+    def render_template(self, name: str, values: Dict[str, str] = None) -> str:
+        """Render a saved template"""
+        return self.request('render', template=name, values=values or {})['commands'][0]
+    
+    def validate(self, tool: str, flags: List[Any], required: Dict[str, Any] = None) -> List[str]:
+        """Get the problems with a flag selection (empty when valid)"""
+        return self.request('validate', tool=tool, flags=flags, required=required)['problems']
+    
+    def search(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        return self.request('search', query=query, limit=limit)
+    
+    def list(self, what: str = 'tools', **params) -> List[Dict[str, Any]]:
+        """List 'tools' or 'templates'"""
+        return self.request('list', what=what, **params)
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """Answers framed requests on one connection until the client hangs up"""
+    
+    def handle(self):
+        catalog = self.server.catalog
+        
+        while True:
+            try:
+                request = read_message(self.rfile)
+            except ProtocolError as e:
+                # The stream can no longer be trusted to be on a frame boundary
+                self._send({'ok': False, 'error': str(e)})
+                return
+            except OSError:
+                return
+            
+            if request is None or not self._send(catalog.handle(request)):
+                return
+    
+    def _send(self, response: Dict[str, Any]) -> bool:
+        try:
+            send_message(self.request, response)
+        except ProtocolError as e:
+            return self._send({'ok': False, 'error': str(e)})
+        except OSError:
+            return False
+        return True
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class CatalogDaemon:
+    """
+    Serves catalog requests from memory
+    
+    Configs, compiled specs and builder classes are loaded once through a
+    BatchEngine, and the search index is opened once. Connections are
+    served on their own threads, but requests run one at a time under a
+    lock so they never race on the shared caches. Config edits are picked
+    up by the 'reload' operation.
+    """
+    
+    def __init__(self, socket_path: str = None, config_loader=None, file_manager=None,
+                 allow_unknown_flags: bool = False, scope=None):
+        """
+        Initialize daemon
+        
+        Args:
+            socket_path: Socket to listen on (default: default_socket_path())
+            config_loader: Loader to read tool configs with
+            file_manager: File manager to read templates with
+            allow_unknown_flags: Accept flags a tool's config does not list
+            scope: Scope that rendered commands must stay inside
+        """
+        from modules.batch import BatchEngine
+        from utils.config_loader import ConfigLoader
+        from utils.file_manager import FileManager
+        from utils.search_index import SearchIndex
+        
+        self.socket_path = socket_path or default_socket_path()
+        self.config_loader = config_loader or ConfigLoader()
+        self.engine = BatchEngine(self.config_loader, allow_unknown_flags, scope)
+        self.search_index = SearchIndex(self.config_loader.config_dir)
+        self.file_manager = file_manager or FileManager()
+        
+        self.handlers = {
+            'ping': self.op_ping,
+            'list': self.op_list,
+            'render': self.op_render,
+            'validate': self.op_validate,
+            'search': self.op_search,
+            'stats': self.op_stats,
+            'reload': self.op_reload,
+            'shutdown': self.op_shutdown
+        }
+        
+        self._tools = None
+        self._lock = threading.Lock()
+        self._server = None
+        self.started = time.time()
+        self.requests = 0
+        self.errors = 0
+    
+    def warm(self) -> int:
+        """Load every tool's spec and builder and the search index; returns the tool count"""
+        from utils.instrumentation import span
+        
+        with span('daemon.warm') as s:
+            tools = self._list_tools()
+            for tool in tools:
+                try:
+                    self.engine.get_tool(tool['id'])
+                except ValueError:
+                    continue
+            self.search_index.refresh()
+            s.set(tools=len(tools))
+        return len(tools)
+    
+    def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Answer one decoded request"""
+        from utils.instrumentation import span
+        
+        op = request.get('op')
+        handler = self.handlers.get(op)
+        if handler is None:
+            return {'ok': False, 'error': f"unknown op {op!r}"}
+        
+        with self._lock:
+            self.requests += 1
+            try:
+                with span('daemon.request', op=op):
+                    result = handler(request)
+            except ValueError as e:
+                self.errors += 1
+                return {'ok': False, 'error': str(e)}
+            except Exception as e:
+                # A bad request must not take the daemon down
+                self.errors += 1
+                return {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+        
+        return {'ok': True, 'result': result}
+    
+    def _list_tools(self) -> List[Dict[str, Any]]:
+        if self._tools is None:
+            self._tools = self.config_loader.list_available_tools()
+        return self._tools
+    
+    def op_ping(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        return {'pid': os.getpid(), 'uptime': round(time.time() - self.started, 3)}
+    
+    def op_list(self, request: Dict[str, Any]) -> List[Dict[str, Any]]:
+        what = request.get('what', 'tools')
+        
+        if what == 'tools':
+            return self._list_tools()
+        if what == 'templates':
+            return self.file_manager.list_templates(request.get('offset', 0), request.get('limit'),
+                                                    request.get('prefix'))
+        raise ValueError(f"cannot list {what!r}; use 'tools' or 'templates'")
+    
+    def op_render(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Render spec records, a fan-out or a saved template
+        
+        Returns:
+            {"commands": [...], "errors": [[record index, message], ...]};
+            a record that fails has None in its command slot. A fan-out
+            lists skipped out-of-scope targets as [target, message].
+        """
+        from modules.batch import BatchSpecError, expand_target
+        
+        if 'template' in request:
+            template = self.file_manager.load_compiled_template(request['template'])
+            if template is None:
+                raise ValueError(f"no compiled template named {request['template']!r}")
+            command = template.render(**(request.get('values') or {}))
+            if self.engine.scope is not None:
+                program = command.split(None, 1)[0] if command.strip() else ''
+                self.engine.scope.check_command(command, self.config_loader.spec_for_command(program))
+            return {'commands': [command], 'errors': []}
+        
+        if 'targets' in request:
+            fan_out = self.engine.compile_fan_out(request.get('record'), request.get('target_param'))
+            targets = request['targets']
+            if not isinstance(targets, list):
+                raise ValueError("'targets' must be a list")
+            if request.get('expand_cidr', True):
+                targets = (host for entry in targets for host in expand_target(entry))
+            
+            # Requests hold the daemon lock, so a /8 or an IPv6 /64 is refused
+            # after the cap instead of being enumerated
+            targets = list(islice(targets, MAX_FANOUT_TARGETS + 1))
+            if len(targets) > MAX_FANOUT_TARGETS:
+                raise ValueError(f"fan-out expands to more than {MAX_FANOUT_TARGETS} targets; split the ranges "
+                                 "or use 'python3 -m modules.batch fanout'")
+            
+            commands = []
+            size = 0
+            for command in fan_out.fan_out(targets):
+                # Estimated encoded size, so an oversized answer is a clear error
+                size += len(command) + command.count('"') + command.count('\\') + 3
+                if size > MAX_FRAME_SIZE - 4096:
+                    raise ValueError("fan-out result exceeds the frame size limit; split the targets")
+                commands.append(command)
+            return {'commands': commands, 'errors': [[target, 'out of scope'] for target in fan_out.rejected]}
+        
+        records = request.get('records')
+        if records is None:
+            records = [request.get('record')]
+        
+        commands = []
+        errors = []
+        for number, record in enumerate(records):
+            try:
+                commands.append(self.engine.render(record))
+            except BatchSpecError as e:
+                commands.append(None)
+                errors.append([number, str(e)])
+        
+        return {'commands': commands, 'errors': errors}
+    
+    def op_validate(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        tool_id = request.get('tool')
+        if not tool_id:
+            raise ValueError("validate needs a 'tool'")
+        
+        spec, _ = self.engine.get_tool(tool_id)
+        selected = self.engine.parse_flags(request.get('flags'))
+        problems = spec.flag_index.validate(selected, request.get('allow_unknown', self.engine.allow_unknown_flags))
+        
+        required = request.get('required')
+        if required is not None:
+            missing = [name for name in spec.required_names if name not in required]
+            if missing:
+                problems.append(f"missing required parameter(s): {', '.join(missing)}")
+        
+        return {'valid': not problems, 'problems': problems}
+    
+    def op_search(self, request: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return self.search_index.search(request.get('query', ''), request.get('limit', 20))
+    
+    def op_stats(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'tools_loaded': len(self.engine._tools),
+            'config_cache': self.config_loader.cache_stats()
+        }
+    
+    def op_reload(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Drop everything derived from configs and load it again"""
+        self.engine._tools.clear()
+        self.config_loader.clear_cache()
+        self.config_loader.close_bundle()
+        self._tools = None
+        return {'tools': self.warm()}
+    
+    def op_shutdown(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        if self._server is not None:
+            # shutdown() waits for serve_forever(), which is waiting for this request
+            threading.Thread(target=self._server.shutdown, daemon=True).start()
+        return {'pid': os.getpid()}
+    
+    def _claim_socket(self):
+        """Remove a stale socket file; refuse to start over a live daemon"""
+        if not os.path.exists(self.socket_path):
+            return
+        
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.socket_path)
+        except OSError:
+            os.unlink(self.socket_path)
+        else:
+            raise OSError(f"a daemon is already listening on {self.socket_path}")
+        finally:
+            probe.close()
+    
+    def bind(self):
+        """Create the listening socket, readable and writable by this user only"""
+        self._claim_socket()
+        
+        old_umask = os.umask(0o177)
+        try:
+            self._server = _UnixServer(self.socket_path, _RequestHandler)
+        finally:
+            os.umask(old_umask)
+        self._server.catalog = self
+    
+    def serve_forever(self):
+        """Serve until shutdown() or a 'shutdown' request, then remove the socket"""
+        if self._server is None:
+            self.bind()
+        
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            self._server = None
+            try:
+                os.unlink(self.socket_path)
+            except OSError:
+                pass
+    
+    def shutdown(self):
+        """Stop serve_forever() from another thread"""
+        if self._server is not None:
+            self._server.shutdown()
+
+
+def _iter_chunks(records: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def main(argv: List[str] = None) -> int:
+    """Daemon and thin client command-line entry point"""
+    parser = argparse.ArgumentParser(
+        prog='python3 -m modules.daemon',
+        description='Serve the ShadowCaster catalog from memory, or query a running daemon'
+    )
+    parser.add_argument('-s', '--socket', help=f'Socket path (default: ${SOCKET_ENV} or a per-user path)')
+    subparsers = parser.add_subparsers(dest='action', required=True)
+    
+    serve_parser = subparsers.add_parser('serve', help='Run the daemon in the foreground')
+    serve_parser.add_argument('--scope', help='Scope file rendered targets must stay inside '
+                              '(default: $SHADOWCASTER_SCOPE)')
+    serve_parser.add_argument('--allow-unknown-flags', action='store_true',
+                              help="Accept flags that are not in the tool's config")
+    
+    subparsers.add_parser('status', help='Show whether a daemon is running')
+    subparsers.add_parser('stop', help='Stop the running daemon')
+    subparsers.add_parser('reload', help='Reload configs after editing them')
+    
+    render_parser = subparsers.add_parser('render', help='Render commands from a spec file')
+    render_parser.add_argument('spec', help="Spec file (.jsonl, .json, .yaml) or '-' for stdin")
+    render_parser.add_argument('--skip-invalid', action='store_true',
+                               help='Report and skip invalid records instead of stopping')
+    
+    validate_parser = subparsers.add_parser('validate', help='Check a flag selection for a tool')
+    validate_parser.add_argument('tool', help='Tool id, e.g. nmap')
+    validate_parser.add_argument('flags', nargs=argparse.REMAINDER, help='Flags as they would be typed')
+    
+    search_parser = subparsers.add_parser('search', help='Search tools and options')
+    search_parser.add_argument('query', nargs='+')
+    search_parser.add_argument('-n', '--limit', type=int, default=20)
+    
+    list_parser = subparsers.add_parser('list', help='List tools or templates')
+    list_parser.add_argument('what', nargs='?', default='tools', choices=['tools', 'templates'])
+    
+    args = parser.parse_args(argv)
+    
+    if args.action == 'serve':
+        from utils.scope import ScopeError, load_scope
+        try:
+            scope = load_scope(args.scope)
+        except ScopeError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+        
+        catalog = CatalogDaemon(args.socket, allow_unknown_flags=args.allow_unknown_flags, scope=scope)
+        try:
+            catalog.bind()
+        except OSError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+        
+        tools = catalog.warm()
+        print(f"Serving {tools} tools on {catalog.socket_path} (pid {os.getpid()})", file=sys.stderr)
+        try:
+            catalog.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return 0
+    
+    client = DaemonClient(args.socket)
+    try:
+        client.connect()
+    except OSError as e:
+        print(f"Daemon not running on {client.socket_path} ({e.strerror or e}); "
+              "start it with 'python3 -m modules.daemon serve'", file=sys.stderr)
+        return 1
+    
+    try:
+        if args.action == 'status':
+            info = client.ping()
+            print(f"Daemon running (pid {info['pid']}, up {info['uptime']:.0f}s) on {client.socket_path}")
+        
+        elif args.action == 'stop':
+            client.request('shutdown')
+            print("Daemon stopped", file=sys.stderr)
+        
+        elif args.action == 'reload':
+            print(f"Reloaded {client.request('reload')['tools']} tools", file=sys.stderr)
+        
+        elif args.action == 'render':
+            from modules.batch import BatchSpecError, iter_spec
+            
+            spec_errors = []
+            
+            def records():
+                # With --skip-invalid, the records read before a malformed
+                # one are still rendered before the error is reported
+                try:
+                    yield from iter_spec(args.spec)
+                except BatchSpecError as e:
+                    if not args.skip_invalid:
+                        raise
+                    spec_errors.append(e)
+            
+            rendered = skipped = offset = 0
+            try:
+                for chunk in _iter_chunks(records(), RENDER_CHUNK):
+                    result = client.render(chunk)
+                    for number, message in result['errors']:
+                        if not args.skip_invalid:
+                            print(f"Error: record {offset + number + 1}: {message}", file=sys.stderr)
+                            return 1
+                        print(f"record {offset + number + 1}: {message}", file=sys.stderr)
+                    
+                    lines = [command for command in result['commands'] if command is not None]
+                    if lines:
+                        sys.stdout.write('\n'.join(lines) + '\n')
+                    rendered += len(lines)
+                    skipped += len(result['errors'])
+                    offset += len(chunk)
+            except BatchSpecError as e:
+                spec_errors.append(e)
+            
+            if spec_errors:
+                sys.stdout.flush()
+                print(f"Error: {spec_errors[0]}", file=sys.stderr)
+                return 1
+            print(f"Rendered {rendered} command(s), skipped {skipped}", file=sys.stderr)
+        
+        elif args.action == 'validate':
+            problems = client.validate(args.tool, args.flags)
+            for problem in problems:
+                print(problem)
+            return 1 if problems else 0
+        
+        elif args.action == 'search':
+            for result in client.search(' '.join(args.query), args.limit):
+                label = result['flag'] or result['tool']
+                print(f"{result['tool']:<12} {label:<20} {result['description'] or ''}")
+        
+        elif args.action == 'list':
+            for entry in client.list(args.what):
+                print(f"{entry.get('id') or entry.get('name'):<20} {entry.get('description') or ''}")
+    
+    except (DaemonError, ProtocolError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        client.close()
+    
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
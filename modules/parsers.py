@@ -0,0 +1,493 @@
+"""
+Output Parsers
+Reads tool result files back as a stream of normalized findings
+
+Copyright (C) 2025
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+A tool's config names its parser:
+    
+    {"name": "Nmap", ..., "parser": "nmap_xml"}
+
+Parsers read incrementally and yield Finding records as they go, so a
+multi-gigabyte nmap XML file is parsed in flat memory: each <host> element
+is cleared once its findings are out. Besides the built-in names below, a
+config may give the dotted path of an OutputParser subclass.
+"""
+
+import argparse
+import contextlib
+import gzip
+import importlib
+import io
+import json
+import re
+import sys
+from operator import attrgetter
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from urllib.parse import urlsplit
+from xml.etree import ElementTree
+
+
+FINDING_FIELDS = ('host', 'port', 'protocol', 'state', 'service', 'path', 'status', 'size', 'detail')
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+CHUNK_SIZE = 64 * 1024
+
+ANSI_RE = re.compile(r'\x1b\[[0-9;]*[A-Za-z]')
+
+_field_values = attrgetter(*FINDING_FIELDS)
+
+
+class ParseError(ValueError):
+    """Raised for unreadable tool output and unknown parsers"""
+
+
+class Finding:
+    """One normalized result: an open port, a found path, a resolved name..."""
+    
+    __slots__ = FINDING_FIELDS
+    
+    def __init__(self, host: str = None, port: int = None, protocol: str = None, state: str = None,
+                 service: str = None, path: str = None, status: int = None, size: int = None,
+                 detail: str = None):
+        self.host = host
+        self.port = port
+        self.protocol = protocol
+        self.state = state
+        self.service = service
+        self.path = path
+        self.status = status
+        self.size = size
+        self.detail = detail
+    
+    def as_tuple(self) -> tuple:
+        """Field values in FINDING_FIELDS order"""
+        return _field_values(self)
+    
+    def as_dict(self) -> Dict[str, Any]:
+        """Fields that are set"""
+        return {name: getattr(self, name) for name in FINDING_FIELDS if getattr(self, name) is not None}
+    
+    def __eq__(self, other):
+        return isinstance(other, Finding) and self.as_tuple() == other.as_tuple()
+    
+    def __repr__(self):
+        fields = ', '.join(f"{name}={value!r}" for name, value in self.as_dict().items())
+        return f"Finding({fields})"
+
+
+@contextlib.contextmanager
+def _open_text(source):
+    """Open a path (optionally .gz) or wrap a file object as text"""
+    if isinstance(source, (str, Path)):
+        opener = gzip.open if str(source).endswith('.gz') else open
+        with opener(source, 'rt', encoding='utf-8', errors='replace') as f:
+            yield f
+    elif isinstance(source, io.TextIOBase):
+        yield source
+    else:
+        yield io.TextIOWrapper(source, encoding='utf-8', errors='replace')
+
+
+def _url_parts(url: str):
+    """Split a URL into (host, port, path, scheme); port falls back to the scheme's default"""
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return None, None, url, None
+    
+    path = parts.path or '/'
+    if parts.query:
+        path = f"{path}?{parts.query}"
+    return parts.hostname, port or DEFAULT_PORTS.get(parts.scheme), path, parts.scheme or None
+
+
+class OutputParser:
+    """
+    Base class for parsers of one result format
+    
+    Subclasses implement parse(); output_flags name the flags whose value
+    is the result file.
+    """
+    
+    name = None
+    output_flags = ()
+    
+    def on_stdout(self, argv: List[str]) -> bool:
+        """Whether the command prints this format on stdout (so a captured log can be parsed)"""
+        return False
+    
+    def parse(self, source, target: str = None) -> Iterator[Finding]:
+        """
+        Yield findings from a result file
+        
+        Args:
+            source: Path (".gz" is decompressed) or open file object
+            target: URL the tool was pointed at, for formats that only
+                    print paths
+        """
+        raise NotImplementedError
+    
+    def output_path(self, argv: List[str]) -> Optional[str]:
+        """Get the result file a command line writes, if any"""
+        for i, token in enumerate(argv):
+            name, equals, value = token.partition('=')
+            if name in self.output_flags:
+                if equals:
+                    return value
+                if i + 1 < len(argv):
+                    return argv[i + 1]
+        return None
+    
+    @staticmethod
+    def target_of(argv: List[str]) -> Optional[str]:
+        """Get the first URL in a command line"""
+        for token in argv:
+            if '://' in token:
+                return token
+        return None
+
+
+class NmapXmlParser(OutputParser):
+    """nmap -oX output: one finding per port, or per host when no ports were scanned"""
+    
+    name = 'nmap_xml'
+    output_flags = ('-oX',)
+    
+    def output_path(self, argv: List[str]) -> Optional[str]:
+        path = super().output_path(argv)
+        if path is None and '-oA' in argv[:-1]:
+            path = argv[argv.index('-oA') + 1] + '.xml'
+        return path
+    
+    def parse(self, source, target: str = None) -> Iterator[Finding]:
+        with contextlib.ExitStack() as stack:
+            if isinstance(source, (str, Path)) and str(source).endswith('.gz'):
+                source = stack.enter_context(gzip.open(source, 'rb'))
+            
+            try:
+                events = ElementTree.iterparse(source, events=('start', 'end'))
+                _, root = next(events)
+                for event, element in events:
+                    if event == 'end' and element.tag == 'host':
+                        yield from self._host(element)
+                        # Drop the finished host so memory stays flat
+                        root.clear()
+            except StopIteration:
+                return
+            except ElementTree.ParseError as e:
+                raise ParseError(f"invalid nmap XML: {e}")
+    
+    @staticmethod
+    def _host(element) -> Iterator[Finding]:
+        status = element.find('status')
+        state = status.get('state') if status is not None else None
+        
+        host = None
+        for address in element.iterfind('address'):
+            if address.get('addrtype') in ('ipv4', 'ipv6'):
+                host = address.get('addr')
+                break
+        hostname = element.find('hostnames/hostname')
+        if host is None and hostname is not None:
+            host = hostname.get('name')
+        
+        ports = element.findall('ports/port')
+        if not ports:
+            yield Finding(host, state=state, detail=hostname.get('name') if hostname is not None else None)
+            return
+        
+        for port in ports:
+            port_state = port.find('state')
+            service = port.find('service')
+            detail = None
+            if service is not None:
+                detail = ' '.join(filter(None, (service.get('product'), service.get('version'),
+                                                service.get('extrainfo')))) or None
+            yield Finding(
+                host,
+                int(port.get('portid')),
+                port.get('protocol'),
+                port_state.get('state') if port_state is not None else None,
+                service.get('name') if service is not None else None,
+                detail=detail
+            )
+
+
+class GobusterParser(OutputParser):
+    """gobuster output, read line by line: dir, dns and vhost modes"""
+    
+    name = 'gobuster'
+    output_flags = ('-o', '--output')
+    
+    def on_stdout(self, argv: List[str]) -> bool:
+        return True
+    
+    # /admin (Status: 301) [Size: 178] [--> http://10.0.0.1/admin/]
+    PATH_RE = re.compile(r'^(?P<path>\S+)\s+\(Status:\s*(?P<status>\d+)\)'
+                         r'(?:\s*\[Size:\s*(?P<size>\d+)\])?(?:\s*\[-->\s*(?P<redirect>[^\]]+)\])?')
+    
+    # Found: www.example.com [10.0.0.5]  /  Found: dev.example.com Status: 200 [Size: 1234]
+    FOUND_RE = re.compile(r'^Found:\s+(?P<name>\S+)(?:\s+\[(?P<addresses>[^\]]*)\])?'
+                          r'(?:\s+Status:\s*(?P<status>\d+))?(?:\s*\[Size:\s*(?P<size>\d+)\])?')
+    
+    def parse(self, source, target: str = None) -> Iterator[Finding]:
+        host, port, _, scheme = _url_parts(target) if target else (None, None, None, None)
+        
+        with _open_text(source) as f:
+            for line in f:
+                # Progress updates are redrawn with \r; findings end the line
+                for segment in ANSI_RE.sub('', line).split('\r'):
+                    finding = self._line(segment.strip(), host, port, scheme)
+                    if finding is not None:
+                        yield finding
+    
+    def _line(self, line: str, host: str, port: int, scheme: str) -> Optional[Finding]:
+        if not line:
+            return None
+        
+        match = self.PATH_RE.match(line)
+        if match:
+            path = match.group('path')
+            if '://' in path:
+                found_host, found_port, path, found_scheme = _url_parts(path)
+            else:
+                found_host, found_port, found_scheme = host, port, scheme
+            size = match.group('size')
+            return Finding(found_host, found_port, 'tcp', service=found_scheme, path=path,
+                           status=int(match.group('status')), size=int(size) if size else None,
+                           detail=match.group('redirect'))
+        
+        match = self.FOUND_RE.match(line)
+        if match:
+            status, size = match.group('status'), match.group('size')
+            return Finding(match.group('name').rstrip('.'), port if status else None,
+                           service=scheme if status else None,
+                           status=int(status) if status else None, size=int(size) if size else None,
+                           detail=match.group('addresses') or None)
+        return None
+
+
+class _JsonReader:
+    """Decodes JSON values one at a time from a text stream"""
+    
+    def __init__(self, stream, chunk_size: int = CHUNK_SIZE):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self._decoder = json.JSONDecoder()
+    
+    def _fill(self) -> bool:
+        """Read another chunk, dropping what has been consumed"""
+        if self.eof:
+            return False
+        chunk = self.stream.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+    
+    def peek(self) -> str:
+        """Get the next non-whitespace character without consuming it ('' at the end)"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ''
+    
+    def skip(self, char: str) -> bool:
+        """Consume char if it comes next"""
+        if self.peek() == char:
+            self.pos += 1
+            return True
+        return False
+    
+    def expect(self, char: str):
+        if not self.skip(char):
+            raise ParseError(f"expected {char!r}, found {self.peek() or 'end of input'!r}")
+    
+    def value(self) -> Any:
+        """Decode the next complete value"""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self.buffer, self.pos)
+                # A number at the end of the buffer may continue in the next chunk
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+
+class FfufJsonParser(OutputParser):
+    """
+    ffuf JSON output: a "-of json" report or "-json" lines
+    
+    The report's "results" array is decoded one entry at a time, so its
+    size does not matter.
+    """
+    
+    name = 'ffuf_json'
+    output_flags = ('-o',)
+    
+    def __init__(self, chunk_size: int = CHUNK_SIZE):
+        self.chunk_size = chunk_size
+    
+    def on_stdout(self, argv: List[str]) -> bool:
+        return '-json' in argv
+    
+    def parse(self, source, target: str = None) -> Iterator[Finding]:
+        with _open_text(source) as f:
+            reader = _JsonReader(f, self.chunk_size)
+            try:
+                while reader.peek():
+                    reader.expect('{')
+                    fields = {}
+                    while not reader.skip('}'):
+                        key = reader.value()
+                        reader.expect(':')
+                        if key == 'results' and reader.skip('['):
+                            while not reader.skip(']'):
+                                yield self._finding(reader.value())
+                                reader.skip(',')
+                        else:
+                            fields[key] = reader.value()
+                        reader.skip(',')
+                    
+                    # A JSON line is a single result
+                    if 'url' in fields:
+                        yield self._finding(fields)
+            except json.JSONDecodeError as e:
+                raise ParseError(f"invalid ffuf JSON: {e}")
+    
+    @staticmethod
+    def _finding(result: Dict[str, Any]) -> Finding:
+        if not isinstance(result, dict):
+            raise ParseError(f"expected a result object, got {type(result).__name__}")
+        host, port, path, scheme = _url_parts(result.get('url', ''))
+        return Finding(host or result.get('host'), port, 'tcp', service=scheme, path=path,
+                       status=result.get('status'), size=result.get('length'),
+                       detail=result.get('redirectlocation') or None)
+
+
+# Parser name (the config's "parser" value) -> class
+PARSERS = {parser.name: parser for parser in (NmapXmlParser, GobusterParser, FfufJsonParser)}
+
+
+def get_parser(name: str) -> OutputParser:
+    """
+    Get a parser by registered name or by "module.path.ClassName"
+    
+    Raises:
+        ParseError: If no such parser exists
+    """
+    parser_class = PARSERS.get(name)
+    
+    if parser_class is None and '.' in name:
+        module_name, _, class_name = name.rpartition('.')
+        try:
+            parser_class = getattr(importlib.import_module(module_name), class_name)
+        except (ImportError, AttributeError) as e:
+            raise ParseError(f"cannot load parser '{name}': {e}")
+        PARSERS[name] = parser_class
+    
+    if parser_class is None:
+        raise ParseError(f"unknown parser '{name}' (known: {', '.join(sorted(PARSERS))})")
+    return parser_class()
+
+
+def parser_for(tool_id: str, config_loader=None) -> Optional[OutputParser]:
+    """Get the parser a tool's config names, or None"""
+    if config_loader is None:
+        from utils.config_loader import ConfigLoader
+        config_loader = ConfigLoader()
+    spec = config_loader.load_spec(tool_id)
+    if spec is None or not spec.parser:
+        return None
+    return get_parser(spec.parser)
+
+
+def parse_output(tool_id: str, source, target: str = None, config_loader=None) -> Iterator[Finding]:
+    """
+    Parse a result file with the parser configured for a tool
+    
+    Raises:
+        ParseError: If the tool has no parser or the output is malformed
+    """
+    parser = parser_for(tool_id, config_loader)
+    if parser is None:
+        raise ParseError(f"no parser configured for '{tool_id}'")
+    return parser.parse(source, target)
+
+
+def write_findings(findings: Iterable[Finding], output, fmt: str = 'jsonl') -> int:
+    """Write findings as JSON lines or tab-separated values; returns how many"""
+    written = 0
+    if fmt == 'tsv':
+        output.write('\t'.join(FINDING_FIELDS) + '\n')
+    for finding in findings:
+        if fmt == 'tsv':
+            output.write('\t'.join('' if v is None else str(v) for v in finding.as_tuple()) + '\n')
+        else:
+            output.write(json.dumps(finding.as_dict()) + '\n')
+        written += 1
+    return written
+
+
+def main(argv=None) -> int:
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(
+        prog='python3 -m modules.parsers',
+        description='Parse tool result files into normalized findings'
+    )
+    parser.add_argument('tool', help="Tool id whose configured parser to use (e.g. nmap), or a parser name")
+    parser.add_argument('files', nargs='+', help="Result files ('-' for stdin, .gz is decompressed)")
+    parser.add_argument('--target', help='URL the tool was run against (for gobuster path listings)')
+    parser.add_argument('--format', choices=('jsonl', 'tsv'), default='jsonl', help='Output format')
+    args = parser.parse_args(argv)
+    
+    try:
+        output_parser = get_parser(args.tool) if args.tool in PARSERS else parser_for(args.tool)
+        if output_parser is None:
+            raise ParseError(f"no parser configured for '{args.tool}'")
+        
+        def findings():
+            for path in args.files:
+                yield from output_parser.parse(sys.stdin.buffer if path == '-' else path, args.target)
+        
+        count = write_findings(findings(), sys.stdout, args.format)
+    except (ParseError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    
+    print(f"Parsed {count} finding(s)", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,451 @@
+"""
+Results Database
+Indexed store of the findings parsed from executed commands
+
+Copyright (C) 2025
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Every ingested result file becomes a run (tool, command line, template
+and source file) holding its findings. Findings are indexed on host, port,
+service and tool, so a question such as "every host with 443 open running
+nginx 1.1x" is one indexed query:
+    
+    python3 -m modules.results_db query --port 443 --state open --detail "nginx 1.1"
+"""
+
+import argparse
+import csv
+import io
+import json
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from modules.parsers import FINDING_FIELDS, Finding, ParseError, get_parser, parser_for
+
+
+RESULTS_DB_FILE = 'results.db'
+
+DEFAULT_DB_PATH = Path(__file__).resolve().parent.parent / 'output' / RESULTS_DB_FILE
+
+# Findings written per transaction
+DEFAULT_BATCH_SIZE = 5000
+
+EXPORT_FIELDS = ('tool',) + FINDING_FIELDS + ('command', 'template', 'created')
+
+# Filters matched exactly, or as a glob when they hold * ? or [
+TEXT_FILTERS = ('tool', 'host', 'protocol', 'state', 'service', 'path', 'template')
+
+# Filters matching one number or any of several
+NUMBER_FILTERS = ('port', 'status', 'run')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    tool TEXT NOT NULL,
+    command TEXT,
+    template TEXT,
+    source TEXT,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS findings (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL,
+    tool TEXT NOT NULL,
+    host TEXT,
+    port INTEGER,
+    protocol TEXT,
+    state TEXT,
+    service TEXT,
+    path TEXT,
+    status INTEGER,
+    size INTEGER,
+    detail TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_findings_host ON findings (host);
+CREATE INDEX IF NOT EXISTS idx_findings_port ON findings (port, state);
+CREATE INDEX IF NOT EXISTS idx_findings_service ON findings (service);
+CREATE INDEX IF NOT EXISTS idx_findings_tool ON findings (tool);
+CREATE INDEX IF NOT EXISTS idx_findings_run ON findings (run_id);
+"""
+
+INSERT_FINDING = (
+    f"INSERT INTO findings (run_id, tool, {', '.join(FINDING_FIELDS)}) "
+    f"VALUES ({', '.join('?' * (len(FINDING_FIELDS) + 2))})"
+)
+
+# Columns a query returns, in EXPORT_FIELDS order
+SELECT_COLUMNS = ', '.join(['f.tool'] + [f"f.{name}" for name in FINDING_FIELDS] +
+                           ['r.command', 'r.template', 'r.created'])
+
+
+class ResultsDB:
+    """
+    SQLite store of parsed findings
+    
+    One connection is shared by the executor's worker threads; ingestion
+    and queries take turns on a lock.
+    """
+    
+    def __init__(self, db_path: Union[str, Path] = DEFAULT_DB_PATH, config_loader=None,
+                 clock: Callable[[], float] = time.time):
+        """
+        Initialize results database
+        
+        Args:
+            db_path: Database file, created on first use
+            config_loader: Loader used to find a command's tool and parser
+            clock: Time source for run timestamps (replaceable in tests)
+        """
+        self.db_path = Path(db_path)
+        self.config_loader = config_loader
+        self.clock = clock
+        self.last_run_id = None
+        self._conn = None
+        self._lock = threading.RLock()
+    
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Database connection, opened on first use"""
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            # Findings can be re-ingested from their result files, so an
+            # fsync per batch buys nothing
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+    
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+    
+    def ingest(self, findings: Iterable[Finding], tool: str, command: str = None, template: str = None,
+               source: str = None, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+        """
+        Store findings as a new run
+        
+        Findings are written in batches of batch_size, one transaction
+        each. If the iterable raises (a truncated scan, say), the findings
+        read so far are kept and the error is passed on.
+        
+        Returns:
+            Number of findings stored
+        """
+        stored = 0
+        with self._lock:
+            conn = self.conn
+            with conn:
+                run_id = conn.execute(
+                    "INSERT INTO runs (tool, command, template, source, created) VALUES (?, ?, ?, ?, ?)",
+                    (tool, command, template, source, self.clock())
+                ).lastrowid
+            self.last_run_id = run_id
+            
+            prefix = (run_id, tool)
+            batch = []
+            try:
+                for finding in findings:
+                    batch.append(prefix + finding.as_tuple())
+                    if len(batch) >= batch_size:
+                        with conn:
+                            conn.executemany(INSERT_FINDING, batch)
+                        stored += len(batch)
+                        batch = []
+            finally:
+                if batch:
+                    with conn:
+                        conn.executemany(INSERT_FINDING, batch)
+                    stored += len(batch)
+        return stored
+    
+    def ingest_file(self, tool: str, path: Union[str, Path], command: str = None, template: str = None,
+                    target: str = None) -> int:
+        """
+        Parse a result file with the tool's configured parser and store it
+        
+        Raises:
+            ParseError: If the tool has no parser or the file is malformed
+            OSError: If the file cannot be read
+        """
+        parser = parser_for(tool, self.config_loader)
+        if parser is None:
+            raise ParseError(f"no parser configured for '{tool}'")
+        path = Path(path)
+        if not path.is_file():
+            raise FileNotFoundError(f"no such result file: {path}")
+        return self.ingest(parser.parse(path, target), tool, command, template, str(path))
+    
+    def ingest_job(self, job) -> Optional[int]:
+        """
+        Store the findings of a finished executor job
+        
+        The result file named by the command's output flag is parsed, or
+        the job's captured log when the tool prints its results.
+        
+        Returns:
+            Number of findings stored, or None when the job has nothing to parse
+        """
+        if self.config_loader is None:
+            return None
+        spec = self.config_loader.spec_for_command(job.argv[0])
+        if spec is None or not spec.parser:
+            return None
+        
+        parser = get_parser(spec.parser)
+        path = parser.output_path(job.argv)
+        if path and path != '-':
+            source = Path(path)
+            if not source.is_file():
+                return None
+        elif job.log_path is not None and (path == '-' or parser.on_stdout(job.argv)):
+            source = job.log_path
+            if source.suffix == '.zst':
+                from utils.output_capture import read_log
+                source = io.BytesIO(read_log(source))
+        else:
+            return None
+        
+        return self.ingest(parser.parse(source, parser.target_of(job.argv)), spec.id, job.command,
+                           getattr(job, 'template', None), str(path if path and path != '-' else job.log_path))
+    
+    @staticmethod
+    def _where(filters: Dict[str, Any]) -> Tuple[str, list]:
+        """Build a WHERE clause from query filters"""
+        clauses = []
+        params = []
+        
+        for name, value in filters.items():
+            if value is None:
+                continue
+            
+            column = 'r.template' if name == 'template' else f"f.{name}"
+            if name in TEXT_FILTERS:
+                value = str(value)
+                clauses.append(f"{column} GLOB ?" if any(c in value for c in '*?[') else f"{column} = ?")
+                params.append(value)
+            elif name in NUMBER_FILTERS:
+                column = 'f.run_id' if name == 'run' else column
+                values = [int(v) for v in value] if isinstance(value, (list, tuple, set)) else [int(value)]
+                clauses.append(f"{column} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+            elif name == 'detail':
+                # Substring, case-insensitive; % and _ in the text are literal
+                escaped = str(value).replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+                clauses.append("f.detail LIKE ? ESCAPE '\\'")
+                params.append(f"%{escaped}%")
+            else:
+                raise ValueError(f"unknown filter '{name}'")
+        
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+    
+    def query(self, limit: int = None, **filters) -> Iterator[Dict[str, Any]]:
+        """
+        Find stored findings, oldest first
+        
+        Filters: tool, host, protocol, state, service, path and template
+        match exactly or as a glob ("10.0.*"); port, status and run take a
+        number or a list of numbers; detail matches a substring.
+        
+        Yields:
+            Dicts with the EXPORT_FIELDS keys
+        """
+        where, params = self._where(filters)
+        sql = f"SELECT {SELECT_COLUMNS} FROM findings f JOIN runs r ON r.id = f.run_id{where} ORDER BY f.id"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        
+        with self._lock:
+            cursor = self.conn.execute(sql, params)
+        # Exports of millions of rows are streamed a page at a time
+        while True:
+            with self._lock:
+                rows = cursor.fetchmany(1000)
+            if not rows:
+                break
+            for row in rows:
+                yield dict(zip(EXPORT_FIELDS, row))
+    
+    def count(self, **filters) -> int:
+        """Count findings matching the query filters"""
+        where, params = self._where(filters)
+        with self._lock:
+            return self.conn.execute(
+                f"SELECT COUNT(*) FROM findings f JOIN runs r ON r.id = f.run_id{where}", params
+            ).fetchone()[0]
+    
+    def hosts(self, **filters) -> List[str]:
+        """Get the distinct hosts with findings matching the query filters"""
+        where, params = self._where(filters)
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT DISTINCT f.host FROM findings f JOIN runs r ON r.id = f.run_id{where} "
+                f"{'AND' if where else 'WHERE'} f.host IS NOT NULL ORDER BY f.host", params
+            ).fetchall()
+        return [row[0] for row in rows]
+    
+    def runs(self) -> List[Dict[str, Any]]:
+        """List ingested runs with their finding counts, newest first"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT r.id, r.tool, r.command, r.template, r.source, r.created, "
+                "(SELECT COUNT(*) FROM findings f WHERE f.run_id = r.id) "
+                "FROM runs r ORDER BY r.id DESC"
+            ).fetchall()
+        keys = ('id', 'tool', 'command', 'template', 'source', 'created', 'findings')
+        return [dict(zip(keys, row)) for row in rows]
+    
+    def delete_run(self, run_id: int) -> bool:
+        """Forget a run and its findings"""
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM findings WHERE run_id = ?", (run_id,))
+            return self.conn.execute("DELETE FROM runs WHERE id = ?", (run_id,)).rowcount > 0
+    
+    def stats(self) -> Dict[str, int]:
+        """Get run, finding and host counts"""
+        with self._lock:
+            runs = self.conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+            findings, hosts = self.conn.execute("SELECT COUNT(*), COUNT(DISTINCT host) FROM findings").fetchone()
+        return {'runs': runs, 'findings': findings, 'hosts': hosts}
+
+
+def write_rows(rows: Iterable[Dict[str, Any]], output, fmt: str = 'jsonl') -> int:
+    """
+    Write query results as CSV, JSON lines or an aligned table
+    
+    Returns:
+        Number of rows written
+    """
+    written = 0
+    if fmt == 'csv':
+        writer = csv.DictWriter(output, EXPORT_FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            written += 1
+    elif fmt == 'jsonl':
+        for row in rows:
+            output.write(json.dumps({k: v for k, v in row.items() if v is not None}) + '\n')
+            written += 1
+    else:
+        columns = ('host', 'port', 'protocol', 'state', 'service', 'path', 'status', 'detail')
+        output.write(f"{'HOST':<40} {'PORT':>5} {'PROTO':<5} {'STATE':<8} {'SERVICE':<12} "
+                     f"{'PATH':<30} {'CODE':>4}  DETAIL\n")
+        for row in rows:
+            values = ['' if row[c] is None else str(row[c]) for c in columns]
+            output.write(f"{values[0]:<40} {values[1]:>5} {values[2]:<5} {values[3]:<8} {values[4]:<12} "
+                         f"{values[5]:<30} {values[6]:>4}  {values[7]}\n")
+            written += 1
+    return written
+
+
+def main(argv=None) -> int:
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(
+        prog='python3 -m modules.results_db',
+        description='Store and query findings parsed from tool output'
+    )
+    parser.add_argument('--db', default=str(DEFAULT_DB_PATH), help='Database file (default: output/results.db)')
+    subparsers = parser.add_subparsers(dest='action', required=True)
+    
+    ingest_parser = subparsers.add_parser('ingest', help='Parse result files and store their findings')
+    ingest_parser.add_argument('tool', help='Tool id whose configured parser to use (e.g. nmap)')
+    ingest_parser.add_argument('files', nargs='+', help='Result files (.gz is decompressed)')
+    ingest_parser.add_argument('--command', help='Command line that produced the files')
+    ingest_parser.add_argument('--template', help='Template the command came from')
+    ingest_parser.add_argument('--target', help='URL the tool was run against (for gobuster path listings)')
+    
+    for name, help_text in (('query', 'Export matching findings'), ('hosts', 'List hosts with matching findings')):
+        query_parser = subparsers.add_parser(name, help=help_text)
+        for text_filter in TEXT_FILTERS:
+            query_parser.add_argument(f'--{text_filter}', help=f'{text_filter.title()} (exact, or a glob such as "10.0.*")')
+        query_parser.add_argument('--port', help='Port or comma-separated ports')
+        query_parser.add_argument('--status', help='HTTP status or comma-separated statuses')
+        query_parser.add_argument('--run', type=int, help='Run id (see "runs")')
+        query_parser.add_argument('--detail', help='Text the detail contains, e.g. "nginx 1.1"')
+        if name == 'query':
+            query_parser.add_argument('--limit', type=int, help='Stop after this many findings')
+            query_parser.add_argument('--format', choices=('table', 'csv', 'jsonl'), default='table',
+                                      help='Output format (default: table)')
+            query_parser.add_argument('-o', '--output', help='Write to a file instead of stdout')
+    
+    subparsers.add_parser('runs', help='List ingested runs')
+    delete_parser = subparsers.add_parser('delete', help='Forget a run and its findings')
+    delete_parser.add_argument('run', type=int, help='Run id')
+    subparsers.add_parser('stats', help='Show database totals')
+    
+    args = parser.parse_args(argv)
+    from utils.config_loader import ConfigLoader
+    db = ResultsDB(args.db, ConfigLoader())
+    
+    try:
+        if args.action == 'ingest':
+            for path in args.files:
+                stored = db.ingest_file(args.tool, path, args.command, args.template, args.target)
+                print(f"{path}: stored {stored} finding(s) as run {db.last_run_id}", file=sys.stderr)
+        
+        elif args.action in ('query', 'hosts'):
+            filters = {name: getattr(args, name) for name in TEXT_FILTERS + ('run', 'detail')}
+            for name in ('port', 'status'):
+                value = getattr(args, name)
+                filters[name] = [int(v) for v in value.split(',')] if value else None
+            
+            if args.action == 'hosts':
+                for host in db.hosts(**filters):
+                    print(host)
+            else:
+                output = open(args.output, 'w', newline='') if args.output else sys.stdout
+                try:
+                    written = write_rows(db.query(args.limit, **filters), output, args.format)
+                finally:
+                    if output is not sys.stdout:
+                        output.close()
+                print(f"{written} finding(s)", file=sys.stderr)
+        
+        elif args.action == 'runs':
+            for run in db.runs():
+                created = time.strftime('%Y-%m-%d %H:%M', time.localtime(run['created']))
+                origin = f" [template {run['template']}]" if run['template'] else ''
+                print(f"{run['id']:>5}  {created}  {run['tool']:<10} {run['findings']:>7} findings  "
+                      f"{run['command'] or run['source'] or ''}{origin}")
+        
+        elif args.action == 'delete':
+            if not db.delete_run(args.run):
+                print(f"Error: no run {args.run}", file=sys.stderr)
+                return 1
+        
+        else:
+            stats = db.stats()
+            print(f"{stats['runs']} runs, {stats['findings']} findings on {stats['hosts']} hosts ({args.db})")
+    except (ParseError, OSError, sqlite3.Error) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    except ValueError as e:
+        print(f"Error: invalid number: {e}", file=sys.stderr)
+        return 1
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -35,27 +35,30 @@ def check_python_version():
 
 
 def check_clipboard_support():
-    """Check for clipboard utilities"""
-    clipboard_tools = {
-        'xclip': 'X11 clipboard',
-        'xsel': 'Wayland clipboard',
-        'pbcopy': 'macOS clipboard'
-    }
-    
-    found = []
-    for tool, desc in clipboard_tools.items():
-        if os.system(f'which {tool} > /dev/null 2>&1') == 0:
-            print(f"✓ Found {tool} ({desc})")
-            found.append(tool)
-    
-    if not found:
+    """Check for clipboard utilities and cache the backend ShadowCaster will use"""
+    import shutil
+    sys.path.insert(0, str(Path(__file__).parent))
+    from utils.file_manager import ClipboardManager, CLIPBOARD_COMMANDS, OSC52
+    
+    for tool, _, required_env in CLIPBOARD_COMMANDS:
+        if shutil.which(tool):
+            note = f" (needs ${required_env})" if required_env and not os.environ.get(required_env) else ""
+            print(f"✓ Found {tool}{note}")
+    
+    backend, _ = ClipboardManager.detect_backend(refresh=True)
+    
+    if backend == OSC52:
+        print("✓ Using terminal clipboard escapes (OSC 52); the terminal must allow them")
+    elif backend:
+        print(f"✓ Using {backend} for clipboard support")
+    else:
         print("⚠ No clipboard tools found (optional)")
         print("  Install xclip (xsel) for clipboard support:")
         print("  Ubuntu/Debian: sudo apt install xclip")
         print("  Fedora: sudo dnf install xclip")
         print("  Arch: sudo pacman -S xclip")
     
-    return len(found) > 0
+    return backend is not None
 
 
 def create_directories():
@@ -104,6 +107,16 @@ def verify_configs():
     return all_valid
 
 
+def build_config_bundle():
+    """Compile configs into the memory-mapped bundle used for fast loading"""
+    sys.path.insert(0, str(Path(__file__).parent))
+    from utils.config_bundle import build_bundle
+    
+    path, written = build_bundle(Path(__file__).parent / 'configs')
+    print(f"✓ Bundled {written} configs into {path.name}")
+    return True
+
+
 def main():
     """Run setup checks"""
     print("\n" + "="*50)
@@ -114,6 +127,7 @@ def main():
         ("Python Version", check_python_version),
         ("Create Directories", create_directories),
         ("Configuration Files", verify_configs),
+        ("Config Bundle", build_config_bundle),
         ("Clipboard Support", check_clipboard_support),
     ]
     
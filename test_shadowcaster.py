@@ -5,25 +5,59 @@ Verifies core components work correctly
 """
 
 import sys
+import asyncio
+import contextlib
+import io
 import json
+import os
+import pickle
+import shutil
+import subprocess
+import tempfile
+import time
 from pathlib import Path
 
 # Add to path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from utils.config_loader import ConfigLoader
-from utils.display import Display, Colors
+from utils.config_loader import ConfigLoader, thaw_config
+from utils.display import Display, Menu, Colors
+from utils.renderer import Renderer, CLEAR_SCREEN, ERASE_DOWN
+from utils.picker import FilterIndex, PagedMenu, KEY_DOWN, KEY_PAGE_DOWN, KEY_END, KEY_ENTER, KEY_TAB, KEY_BACKSPACE
+from utils.file_manager import FileManager, ClipboardManager, OSC52, osc52_sequence
+from utils.command_builder import CommandBuilder
+from utils.command_template import CommandTemplate
+from utils.executor import CommandExecutor, Job, OUTPUT_DISCARD, OUTPUT_CAPTURE
+from utils.output_capture import RingBuffer, RotatingLogWriter, read_log
+from utils.search_index import SearchIndex
+from utils.config_bundle import ConfigBundle, build_bundle
+from utils.config_model import ToolSpec, ConfigError, RenderArg, compile_spec
+from utils import instrumentation
 from modules.tool_builders import (
     NmapBuilder, HydraBuilder, SQLMapBuilder,
     WPScanBuilder, GobusterBuilder, AircrackBuilder
 )
+from modules.builder_registry import get_builder_class
+from benchmark_shadowcaster import Scenario, compare_results, missing_from_baseline, percentile
+from modules.batch import BatchEngine, BatchSpecError, TargetFanOut, iter_spec, expand_target
+from modules.daemon import CatalogDaemon, DaemonClient, DaemonError, read_message
+from utils.result_cache import ResultCache, canonical_argv
+from utils.scheduler import Scheduler, TokenBucket, FakeClock, target_host
+from utils.scope import Scope, ScopeError, host_of
+from modules.parsers import (
+    Finding, ParseError, NmapXmlParser, GobusterParser, FfufJsonParser, get_parser, parser_for
+)
+from modules.results_db import ResultsDB, write_rows
 
 
 class TestShadowCaster:
     """Test suite for ShadowCaster"""
     
     def __init__(self):
-        self.loader = ConfigLoader()
+        # Work on a copy of the catalog so index files are not left in configs/
+        self.tmp_dir = Path(tempfile.mkdtemp(prefix='shadowcaster-test-'))
+        shutil.copytree(ConfigLoader().config_dir, self.tmp_dir / 'configs', ignore=shutil.ignore_patterns('.*'))
+        self.loader = ConfigLoader(self.tmp_dir / 'configs')
         self.tests_passed = 0
         self.tests_failed = 0
     
@@ -62,6 +96,88 @@ class TestShadowCaster:
             self.assert_true('categories' in config, f"{tool['name']} has categories")
             self.assert_true('command' in config, f"{tool['name']} has command field")
     
+    def test_catalog_index(self):
+        """Test persistent catalog index"""
+        self.print_test_header("Catalog Index")
+        
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            for tool_id in ['nmap', 'hydra']:
+                shutil.copy(self.loader.config_dir / f"{tool_id}_config.json", tmp_dir)
+            
+            loader = ConfigLoader(tmp_dir)
+            tools = loader.list_available_tools()
+            self.assert_true([t['id'] for t in tools] == ['hydra', 'nmap'], "Index built on first scan")
+            self.assert_true(loader.index_file.exists(), "Index file written")
+            
+            # Change a config - only that entry should be refreshed
+            nmap_file = Path(tmp_dir) / 'nmap_config.json'
+            config = json.loads(nmap_file.read_text())
+            config['name'] = 'Nmap Renamed'
+            nmap_file.write_text(json.dumps(config))
+            tools = loader.list_available_tools()
+            self.assert_true('Nmap Renamed' in [t['name'] for t in tools], "Changed config re-indexed")
+            
+            # Removed configs drop out of the index
+            (Path(tmp_dir) / 'hydra_config.json').unlink()
+            tools = loader.list_available_tools()
+            self.assert_true([t['id'] for t in tools] == ['nmap'], "Removed config dropped from index")
+            
+            # A corrupt index falls back to a full rescan
+            loader.index_file.write_text('{not json')
+            tools = loader.list_available_tools()
+            self.assert_true(len(tools) == 1, "Corrupt index triggers rescan")
+            self.assert_true(json.loads(loader.index_file.read_text())['version'] == 1, "Index rewritten")
+            
+            loader.index_file.write_text(json.dumps({'version': 1, 'tools': ['nmap_config.json']}))
+            self.assert_true(len(ConfigLoader(tmp_dir).list_available_tools()) == 1,
+                             "Index with malformed tools triggers rescan")
+        finally:
+            shutil.rmtree(tmp_dir)
+    
+    def test_config_cache(self):
+        """Test in-process config cache"""
+        self.print_test_header("Config Cache")
+        
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            for tool_id in ['nmap', 'hydra', 'sqlmap']:
+                shutil.copy(self.loader.config_dir / f"{tool_id}_config.json", tmp_dir)
+            
+            loader = ConfigLoader(tmp_dir, cache_size=2)
+            first = loader.load_config('nmap')
+            second = loader.load_config('nmap')
+            self.assert_true(first is second, "Repeated load served from cache")
+            self.assert_true(loader.cache_stats()['hits'] == 1, "Cache hit counted")
+            self.assert_true(loader.cache_stats()['misses'] == 1, "Cache miss counted")
+            
+            try:
+                first['command'] = 'rm'
+                mutated = True
+            except TypeError:
+                mutated = False
+            self.assert_true(not mutated, "Cached config is read-only")
+            
+            thawed = thaw_config(first)
+            thawed['categories']['Scan Types']['options'].append({'flag': '-sY'})
+            self.assert_true(len(loader.load_config('nmap')['categories']['Scan Types']['options']) ==
+                             len(thawed['categories']['Scan Types']['options']) - 1,
+                             "Thawed copy does not affect cache")
+            
+            loader.load_config('hydra')
+            loader.load_config('sqlmap')
+            self.assert_true(loader.cache_stats()['evictions'] == 1, "LRU eviction counted")
+            self.assert_true(loader.cache_stats()['size'] == 2, "Cache stays bounded")
+            
+            sqlmap_file = Path(tmp_dir) / 'sqlmap_config.json'
+            config = json.loads(sqlmap_file.read_text())
+            config['name'] = 'SQLMap Changed'
+            sqlmap_file.write_text(json.dumps(config))
+            self.assert_true(loader.load_config('sqlmap')['name'] == 'SQLMap Changed',
+                             "Changed file invalidates cache entry")
+        finally:
+            shutil.rmtree(tmp_dir)
+    
     def test_nmap_builder(self):
         """Test Nmap command builder"""
         self.print_test_header("Nmap Builder")
@@ -76,15 +192,13 @@ class TestShadowCaster:
         builder.required_params = {'target': '192.168.1.100'}
         builder.selected_flags = ['-sS', '-p 80,443', '-T4']
         
-        # Manually construct command without calling build_command
-        cmd_parts = [builder.command]
-        cmd_parts.extend(builder.selected_flags)
-        cmd_parts.extend(builder._add_required_values())
-        command = ' '.join(cmd_parts)
+        # Render without calling build_command (which prompts)
+        command = builder.render_command()
         
         self.assert_true(command is not None, "Command builds successfully")
         self.assert_true('192.168.1.100' in command, "Target included in command")
         self.assert_true('-sS' in command, "Flags included in command")
+        self.assert_true(command == 'nmap -sS -p 80,443 -T4 192.168.1.100', "Target placed after the flags")
         
         print(f"  Generated: {Colors.YELLOW}{command}{Colors.END}")
     
@@ -104,15 +218,12 @@ class TestShadowCaster:
         }
         builder.selected_flags = ['-l root', '-P wordlist.txt', '-t 4']
         
-        # Manually construct command
-        cmd_parts = [builder.command]
-        cmd_parts.extend(builder.selected_flags)
-        cmd_parts.extend(builder._add_required_values())
-        command = ' '.join(cmd_parts)
+        command = builder.render_command()
         
         self.assert_true(command is not None, "Command builds successfully")
         self.assert_true('ssh' in command, "Service included in command")
         self.assert_true('192.168.1.50' in command, "Target included in command")
+        self.assert_true(command.endswith(' ssh 192.168.1.50'), "Service placed before the target")
         
         print(f"  Generated: {Colors.YELLOW}{command}{Colors.END}")
     
@@ -129,14 +240,11 @@ class TestShadowCaster:
         builder.required_params = {'url': 'http://target.com/page.php?id=1'}
         builder.selected_flags = ['--dbs', '--level 2', '--risk 1']
         
-        # Manually construct command
-        cmd_parts = [builder.command]
-        cmd_parts.extend(builder.selected_flags)
-        cmd_parts.extend(builder._add_required_values())
-        command = ' '.join(cmd_parts)
+        command = builder.render_command()
         
         self.assert_true(command is not None, "Command builds successfully")
         self.assert_true('http://target.com/page.php?id=1' in command, "URL included")
+        self.assert_true(command.endswith('-u "http://target.com/page.php?id=1"'), "URL quoted after -u")
         self.assert_true('--dbs' in command, "Flags included in command")
         
         print(f"  Generated: {Colors.YELLOW}{command}{Colors.END}")
@@ -154,14 +262,11 @@ class TestShadowCaster:
         builder.required_params = {'url': 'http://wordpress.local'}
         builder.selected_flags = ['--enumerate p', '--enumerate t', '--enumerate u']
         
-        # Manually construct command
-        cmd_parts = [builder.command]
-        cmd_parts.extend(builder.selected_flags)
-        cmd_parts.extend(builder._add_required_values())
-        command = ' '.join(cmd_parts)
+        command = builder.render_command()
         
         self.assert_true(command is not None, "Command builds successfully")
         self.assert_true('wordpress.local' in command, "URL included")
+        self.assert_true(command.endswith('--url "http://wordpress.local"'), "URL quoted after --url")
         
         print(f"  Generated: {Colors.YELLOW}{command}{Colors.END}")
     
@@ -178,12 +283,11 @@ class TestShadowCaster:
         builder.required_params = {}
         builder.selected_flags = ['dir', '-u http://target.com', '-w wordlist.txt']
         
-        # Manually construct command
-        cmd_parts = [builder.command]
-        cmd_parts.extend(builder.selected_flags)
-        command = ' '.join(cmd_parts)
+        command = builder.render_command()
         
         self.assert_true(command is not None, "Command builds successfully")
+        self.assert_true(command == 'gobuster dir -u http://target.com -w wordlist.txt',
+                         "Mode comes from the selected flags")
         
         print(f"  Generated: {Colors.YELLOW}{command}{Colors.END}")
     
@@ -200,17 +304,871 @@ class TestShadowCaster:
         builder.required_params = {'capture': '/path/to/capture.cap'}
         builder.selected_flags = ['-a 2', '-w wordlist.txt']
         
-        # Manually construct command
-        cmd_parts = [builder.command]
-        cmd_parts.extend(builder.selected_flags)
-        cmd_parts.extend(builder._add_required_values())
-        command = ' '.join(cmd_parts)
+        command = builder.render_command()
         
         self.assert_true(command is not None, "Command builds successfully")
         self.assert_true('capture.cap' in command, "Capture file included")
+        self.assert_true(command.endswith('-w wordlist.txt /path/to/capture.cap'), "Capture file placed last")
         
         print(f"  Generated: {Colors.YELLOW}{command}{Colors.END}")
     
+    def test_batch_engine(self):
+        """Test headless batch rendering"""
+        self.print_test_header("Batch Engine")
+        
+        engine = BatchEngine(self.loader)
+        records = [
+            {'tool': 'nmap', 'required': {'target': '10.0.0.1'},
+             'flags': ['-sS', {'flag': '-p', 'value': '80,443'}]},
+            {'tool': 'hydra', 'required': {'target': '10.0.0.2', 'service': 'ssh'},
+             'flags': [['-l', 'root']]},
+            {'tool': 'unknown_tool'},
+            {'tool': 'sqlmap', 'required': {}},
+            {'tool': 'sqlmap', 'required': {'url': 'http://target.com/?id=1'}}
+        ]
+        
+        commands = list(engine.render_stream(iter(records), skip_invalid=True))
+        self.assert_true(commands[0] == 'nmap -sS -p "80,443" 10.0.0.1', "Nmap spec rendered")
+        self.assert_true(commands[1] == 'hydra -l "root" ssh 10.0.0.2', "Hydra spec rendered")
+        self.assert_true(commands[2] == 'sqlmap -u "http://target.com/?id=1"', "SQLMap spec rendered")
+        self.assert_true(engine.skipped == 2, "Invalid records skipped")
+        
+        try:
+            list(engine.render_stream([{'tool': 'unknown_tool'}]))
+            raised = False
+        except BatchSpecError:
+            raised = True
+        self.assert_true(raised, "Invalid record raises without skip_invalid")
+        
+        try:
+            engine.render({'tool': 'gobuster', 'required': {'url': 'http://10.0.0.1', 'wordlist': 'common.txt'}})
+            self.assert_true(False, "Unknown required parameters rejected")
+        except BatchSpecError as e:
+            self.assert_true('unknown required parameter(s): url, wordlist' in str(e),
+                             "Unknown required parameters rejected")
+        
+        malformed = [
+            ({'tool': ['nmap']}, "Non-string tool rejected"),
+            ({'tool': 'nmap', 'required': ['target']}, "Non-mapping required rejected"),
+            ({'tool': 'nmap', 'required': {'target': None}}, "Null required value rejected"),
+            ({'tool': 'nmap', 'required': {'target': ['10.0.0.1']}}, "Non-scalar required value rejected")
+        ]
+        for record, message in malformed:
+            try:
+                engine.render(record)
+                self.assert_true(False, message)
+            except BatchSpecError:
+                self.assert_true(True, message)
+        skipping = BatchEngine(self.loader)
+        with contextlib.redirect_stderr(io.StringIO()):
+            commands = list(skipping.render_stream([record for record, _ in malformed], skip_invalid=True))
+        self.assert_true(commands == [] and skipping.skipped == len(malformed), "Malformed records skipped")
+        try:
+            list(engine.fan_out({'tool': 'nmap', 'required': ['x']}, ['10.0.0.1']))
+            self.assert_true(False, "Fan-out rejects non-mapping required")
+        except BatchSpecError:
+            self.assert_true(True, "Fan-out rejects non-mapping required")
+        
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            spec_file = Path(tmp_dir) / 'spec.jsonl'
+            spec_file.write_text('\n'.join(json.dumps(r) for r in records[:2]) + '\n')
+            self.assert_true(len(list(iter_spec(str(spec_file)))) == 2, "JSONL spec streamed")
+            
+            from modules.batch import main as batch_main
+            err = io.StringIO()
+            with contextlib.redirect_stderr(err):
+                code = batch_main(['render', str(spec_file), '-o', str(Path(tmp_dir) / 'missing' / 'out.txt')])
+            self.assert_true(code == 1 and err.getvalue().startswith('Error:'), "Unwritable output reported")
+        finally:
+            shutil.rmtree(tmp_dir)
+    
+    def test_target_fan_out(self):
+        """Test fanning one selection out over many targets"""
+        self.print_test_header("Target Fan-Out")
+        
+        engine = BatchEngine(self.loader)
+        targets = expand_target('10.0.0.0/30')
+        self.assert_true(list(targets) == ['10.0.0.1', '10.0.0.2'], "CIDR expanded to hosts")
+        self.assert_true(list(expand_target('http://a/b')) == ['http://a/b'], "URL passed through")
+        
+        record = {'tool': 'nmap', 'flags': ['-sS', ['-p', '80']]}
+        commands = engine.fan_out(record, expand_target('192.168.1.0/24'))
+        self.assert_true(next(commands) == 'nmap -sS -p "80" 192.168.1.1', "First target rendered")
+        self.assert_true(sum(1 for _ in commands) == 253, "Remaining targets rendered lazily")
+        
+        fan_out = engine.compile_fan_out({'tool': 'sqlmap', 'flags': ['--dbs']})
+        self.assert_true(fan_out.render('http://t/?id=1') == 'sqlmap --dbs -u "http://t/?id=1"',
+                         "Target placed by builder")
+        
+        fan_out = engine.compile_fan_out({'tool': 'hydra', 'required': {'service': 'ssh'}})
+        self.assert_true(fan_out.target_param == 'target', "Target parameter guessed")
+        self.assert_true(fan_out.render('10.0.0.5') == 'hydra ssh 10.0.0.5', "Hydra target rendered")
+    
+    def test_command_template(self):
+        """Test compiled command templates"""
+        self.print_test_header("Compiled Command Templates")
+        
+        builder = HydraBuilder(self.loader.load_config('hydra'))
+        builder.required_params = {'target': '192.168.1.50', 'service': 'ssh'}
+        builder.selected_flags = ['-l root', '-P {wordlist}.txt']
+        
+        template = builder.compile_template()
+        self.assert_true(template.fields == ('target', 'service'), "Required params become slots")
+        self.assert_true(template.render() == builder.render_command(), "Defaults reproduce original command")
+        self.assert_true(template.render(target='10.0.0.9') == 'hydra -l root -P {wordlist}.txt ssh 10.0.0.9',
+                         "Slot re-rendered with literal braces preserved")
+        self.assert_true(builder.required_params['target'] == '192.168.1.50', "Builder selection untouched")
+        
+        clone = pickle.loads(pickle.dumps(template))
+        self.assert_true(clone == template, "Template survives pickling")
+        self.assert_true(CommandTemplate.from_dict(template.to_dict()) == template, "Template survives dict round trip")
+        
+        try:
+            template.format_string = 'rm -rf /'
+            mutated = True
+        except AttributeError:
+            mutated = False
+        self.assert_true(not mutated, "Template is immutable")
+        
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            file_manager = FileManager(tmp_dir)
+            file_manager.save_template('ssh_brute', 'hydra', template.render(), compiled=template)
+            loaded = file_manager.load_compiled_template('ssh_brute')
+            self.assert_true(loaded == template, "Compiled template stored by FileManager")
+            self.assert_true(loaded.render(service='ftp').endswith('ftp 192.168.1.50'), "Stored template re-renders")
+        finally:
+            shutil.rmtree(tmp_dir)
+    
+    def test_executor(self):
+        """Test parallel command executor with stub commands"""
+        self.print_test_header("Command Executor")
+        
+        executor = CommandExecutor(max_concurrency=3, output=OUTPUT_DISCARD)
+        for _ in range(3):
+            executor.submit('sleep 0.3')
+        
+        start = time.monotonic()
+        executor.run_all()
+        elapsed = time.monotonic() - start
+        self.assert_true(all(job.status == 'done' for job in executor.jobs), "Jobs complete")
+        self.assert_true(elapsed < 0.8, f"Jobs overlap ({elapsed:.2f}s for 3 x 0.3s)")
+        
+        executor = CommandExecutor(max_concurrency=1, output=OUTPUT_DISCARD)
+        slow = executor.submit('sleep 5', timeout=0.2)
+        failing = executor.submit(['sh', '-c', 'exit 3'])
+        missing = executor.submit('shadowcaster-no-such-binary')
+        cancelled = executor.submit('echo never')
+        executor.cancel(cancelled.id)
+        executor.run_all()
+        
+        self.assert_true(slow.status == 'timeout', "Timed out job killed")
+        self.assert_true(failing.status == 'failed' and failing.returncode == 3, "Exit status recorded")
+        self.assert_true(missing.status == 'failed' and missing.error, "Missing binary reported")
+        self.assert_true(cancelled.status == 'cancelled' and cancelled.started is None, "Cancelled job never starts")
+        self.assert_true('timeout' in executor.status_table(), "Status table lists jobs")
+        
+        async def cancel_running():
+            running = CommandExecutor(output=OUTPUT_DISCARD)
+            job = running.submit('sleep 5')
+            task = asyncio.ensure_future(running.run())
+            await asyncio.sleep(0.2)
+            running.cancel(job.id)
+            await task
+            return job
+        
+        job = asyncio.run(cancel_running())
+        self.assert_true(job.status == 'cancelled' and job.duration < 2, "Running job cancelled")
+        
+        try:
+            executor.submit('nmap "unterminated')
+            accepted = True
+        except ValueError:
+            accepted = False
+        self.assert_true(not accepted, "Unbalanced quoting rejected")
+    
+    def test_output_capture(self):
+        """Test streaming output capture"""
+        self.print_test_header("Output Capture")
+        
+        ring = RingBuffer(10)
+        ring.write(b'line1\nline2\n')
+        ring.write(b'line3\n')
+        self.assert_true(ring.getvalue() == b'\nline2\nline3\n'[-10:], "Ring buffer keeps last bytes")
+        self.assert_true(ring.text() == 'line3\n', "Tail starts at a line boundary")
+        
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            writer = RotatingLogWriter(Path(tmp_dir) / 'job.log', 'gzip', max_bytes=1000, backup_count=2)
+            for _ in range(35):
+                writer.write(b'x' * 99 + b'\n')
+            writer.close()
+            segments = writer.segments()
+            self.assert_true([p.name for p in segments] == ['job.2.log.gz', 'job.1.log.gz', 'job.log.gz'],
+                             "Log rotated into gzip segments")
+            self.assert_true(len(read_log(segments[-1])) == 500, "Active segment holds the remainder")
+            
+            executor = CommandExecutor(output=OUTPUT_CAPTURE, capture_dir=tmp_dir, tail_bytes=1024)
+            script = "import sys\nfor i in range(20000): sys.stdout.write('%06d\\n' % i)\nsys.stderr.write('done\\n')"
+            job = executor.submit([sys.executable, '-c', script])
+            executor.run_all()
+            self.assert_true(job.status == 'done', "Captured job completes")
+            self.assert_true(job.capture.bytes_written == 140005, "All output streamed to disk")
+            self.assert_true(len(job.capture.tail.getvalue()) == 1024, "In-memory tail stays bounded")
+            self.assert_true(job.capture.tail_text().endswith('019999\ndone\n'), "Tail shows stdout and stderr")
+            self.assert_true(read_log(job.log_path).startswith(b'000000\n'), "Log file holds full output")
+            
+            # Another run numbers its jobs from the same id
+            other_executor = CommandExecutor(output=OUTPUT_CAPTURE, capture_dir=tmp_dir)
+            other = other_executor.submit([sys.executable, '-c', script])
+            other_executor.run_all()
+            self.assert_true(other.id == job.id and other.log_path != job.log_path and
+                             f"_{os.getpid()}_job" in job.log_path.name, "Log names unique across runs")
+            self.assert_true(read_log(job.log_path).startswith(b'000000\n'), "Earlier log not overwritten")
+        finally:
+            shutil.rmtree(tmp_dir)
+    
+    def test_template_store(self):
+        """Test SQLite and JSON template backends"""
+        self.print_test_header("Template Store")
+        
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            # Legacy JSON templates are imported once into SQLite
+            legacy = FileManager(tmp_dir, template_backend='json')
+            legacy.save_template('legacy_scan', 'nmap', 'nmap -sS 10.0.0.1', 'Old template')
+            self.assert_true(legacy.list_templates()[0]['name'] == 'legacy_scan', "JSON backend lists templates")
+            
+            file_manager = FileManager(tmp_dir, template_backend='sqlite')
+            self.assert_true(file_manager.load_template('legacy_scan')['command'] == 'nmap -sS 10.0.0.1',
+                             "Legacy JSON template imported")
+            
+            for i in range(250):
+                file_manager.save_template(f"web_{i:03d}", 'nikto', f"nikto -h 10.0.1.{i}")
+            file_manager.save_template('web_000', 'nikto', 'nikto -h replaced')
+            
+            self.assert_true(file_manager.count_templates() == 251, "Templates counted")
+            self.assert_true(file_manager.load_template('web_000')['command'] == 'nikto -h replaced',
+                             "Saving an existing name replaces it")
+            
+            page = file_manager.list_templates(offset=10, limit=5, prefix='web_')
+            self.assert_true([t['name'] for t in page] == [f"web_{i:03d}" for i in range(10, 15)], "Paged prefix listing")
+            self.assert_true(file_manager.count_templates(prefix='web_1') == 100, "Prefix count")
+            
+            deleted = file_manager.delete_templates([f"web_{i:03d}" for i in range(100)])
+            self.assert_true(deleted == 100, "Bulk delete")
+            self.assert_true(file_manager.delete_template('legacy_scan'), "Single delete")
+            self.assert_true(file_manager.clear_templates() == 150, "Clear all templates")
+            
+            # The import only happens once, so deleted legacy templates stay deleted
+            file_manager.template_store.close()
+            reopened = FileManager(tmp_dir)
+            self.assert_true(reopened.count_templates() == 0, "Import runs only once")
+            reopened.template_store.close()
+        finally:
+            shutil.rmtree(tmp_dir)
+    
+    def test_search_index(self):
+        """Test full-text search over the catalog"""
+        self.print_test_header("Search Index")
+        
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            for tool_id in ['nmap', 'ffuf', 'feroxbuster', 'proxychains', 'whois']:
+                shutil.copy(self.loader.config_dir / f"{tool_id}_config.json", tmp_dir)
+            
+            index = SearchIndex(tmp_dir)
+            self.assert_true(index.refresh(), "Index built from configs")
+            self.assert_true(index.index_file.exists(), "Index persisted next to configs")
+            
+            results = index.search('-sS')
+            self.assert_true(results and results[0]['tool'] == 'nmap' and results[0]['flag'] == '-sS',
+                             "Verbatim flag search")
+            results = index.search('rate limit')
+            self.assert_true({r['tool'] for r in results} == {'ffuf', 'feroxbuster'}, "Multi-word search")
+            self.assert_true(index.search('proxychai')[0]['tool'] == 'proxychains', "Prefix search as you type")
+            self.assert_true(index.search('nonexistentword') == [], "No match returns nothing")
+            
+            reloaded = SearchIndex(tmp_dir)
+            self.assert_true(not reloaded.refresh(), "Unchanged configs are not re-indexed")
+            self.assert_true(reloaded.search('-sS')[0]['flag'] == '-sS', "Persisted index answers queries")
+            
+            whois_file = Path(tmp_dir) / 'whois_config.json'
+            config = json.loads(whois_file.read_text())
+            config['description'] = 'Registry lookup with zebrafish support'
+            whois_file.write_text(json.dumps(config))
+            (Path(tmp_dir) / 'proxychains_config.json').unlink()
+            
+            self.assert_true(reloaded.refresh(), "Changed configs re-indexed")
+            self.assert_true(reloaded.search('zebrafish')[0]['tool'] == 'whois', "Updated config searchable")
+            self.assert_true(reloaded.search('proxychains') == [], "Removed config dropped")
+        finally:
+            shutil.rmtree(tmp_dir)
+    
+    def test_lazy_startup(self):
+        """Test that startup defers imports and filesystem work"""
+        self.print_test_header("Lazy Startup")
+        
+        script = ("import sys, main; main.ShadowCaster(); "
+                  "print(sorted(m for m in ('asyncio', 'sqlite3', 'modules.tool_builders', 'utils.executor') "
+                  "if m in sys.modules))")
+        result = subprocess.run([sys.executable, '-c', script], cwd=str(Path(__file__).parent),
+                                capture_output=True, text=True)
+        self.assert_true(result.returncode == 0, "Application initializes")
+        self.assert_true(result.stdout.strip() == "[]",
+                         f"Builders and executor not imported at startup ({result.stdout.strip()})")
+        
+        self.assert_true(get_builder_class('nmap') is NmapBuilder, "Builder resolved by dotted path")
+        self.assert_true(get_builder_class('gobuster') is GobusterBuilder, "Gobuster builder resolved")
+        self.assert_true(get_builder_class('ffuf').__name__ == 'CommandBuilder', "Unlisted tools use CommandBuilder")
+        
+        tmp_dir = Path(tempfile.mkdtemp())
+        try:
+            file_manager = FileManager(templates_dir=tmp_dir / 'templates', output_dir=tmp_dir / 'output')
+            self.assert_true(not (tmp_dir / 'templates').exists(), "No directories created at init")
+            path = file_manager.save_command_to_file('nmap 127.0.0.1', 'scan')
+            self.assert_true(path is not None and Path(path).exists(), "Directory created on first write")
+        finally:
+            shutil.rmtree(tmp_dir)
+    
+    def test_benchmark_compare(self):
+        """Test benchmark measurement and regression detection"""
+        self.print_test_header("Benchmark Compare")
+        
+        self.assert_true(percentile([5, 1, 4, 2, 3], 0.5) == 3, "p50 of odd list")
+        self.assert_true(percentile(list(range(1, 101)), 0.95) == 95, "p95 nearest rank")
+        
+        result = Scenario('sum', lambda: sum(range(1000)), 5, ops=1000).measure()
+        self.assert_true(result['iterations'] == 5 and result['p50_ms'] <= result['p95_ms'],
+                         "Scenario reports percentiles")
+        self.assert_true(result['throughput'] > 0 and result['peak_kb'] >= 0, "Scenario reports throughput and memory")
+        
+        baseline = {'results': {
+            'fast': {'p50_ms': 10.0, 'peak_kb': 100.0},
+            'noise': {'p50_ms': 0.01, 'peak_kb': 1.0},
+            'memory': {'p50_ms': 5.0, 'peak_kb': 100.0}
+        }}
+        current = {'results': {
+            'fast': {'p50_ms': 14.0, 'peak_kb': 100.0},
+            'noise': {'p50_ms': 0.03, 'peak_kb': 1.0},
+            'memory': {'p50_ms': 5.0, 'peak_kb': 200.0},
+            'new': {'p50_ms': 1.0, 'peak_kb': 1.0}
+        }}
+        regressions = compare_results(current, baseline, threshold=0.25)
+        self.assert_true(('fast', 'p50_ms', 10.0, 14.0) in regressions, "Slowdown beyond threshold flagged")
+        self.assert_true(('memory', 'peak_kb', 100.0, 200.0) in regressions, "Memory growth flagged")
+        self.assert_true(len(regressions) == 2, "Timer noise and new scenarios ignored")
+        self.assert_true(compare_results(current, baseline, threshold=1.5) == [], "Higher threshold tolerates slowdown")
+        self.assert_true(missing_from_baseline(current, baseline) == ['new'], "Scenarios missing from the baseline listed")
+    
+    def test_instrumentation(self):
+        """Test spans, counters and metric sinks"""
+        self.print_test_header("Instrumentation")
+        
+        instrumentation.disable()
+        self.assert_true(instrumentation.span('x') is instrumentation.NOOP_SPAN, "Disabled span is a shared no-op")
+        instrumentation.count('x')
+        self.assert_true(instrumentation.snapshot() == {'counters': {}, 'spans': {}}, "Disabled counters record nothing")
+        
+        tmp_dir = Path(tempfile.mkdtemp())
+        try:
+            trace_file = tmp_dir / 'trace.jsonl'
+            metrics_file = tmp_dir / 'shadowcaster.prom'
+            instrumentation.enable(trace_file, metrics_file)
+            
+            loader = ConfigLoader(self.loader.config_dir, use_bundle=False)
+            loader.load_config('nmap')
+            loader.load_config('nmap')
+            loader.list_available_tools()
+            
+            try:
+                with instrumentation.span('failing.op'):
+                    raise ValueError("boom")
+            except ValueError:
+                pass
+            
+            stats = instrumentation.snapshot()
+            self.assert_true(stats['counters'].get('config.cache_miss') == 1, "Cache miss counted")
+            self.assert_true(stats['counters'].get('config.cache_hit') == 1, "Cache hit counted")
+            self.assert_true(stats['spans']['config.parse']['count'] == 1, "Config parse span recorded")
+            self.assert_true('config.list_tools' in stats['spans'], "Decorated method traced")
+            
+            instrumentation.disable()
+            
+            records = [json.loads(line) for line in trace_file.read_text().splitlines()]
+            parse = [r for r in records if r['span'] == 'config.parse']
+            self.assert_true(parse and parse[0]['tool'] == 'nmap' and parse[0]['duration_ms'] >= 0,
+                             "Trace lines carry attributes and duration")
+            self.assert_true(any(r.get('error') == 'ValueError' for r in records), "Exceptions recorded on spans")
+            
+            metrics = metrics_file.read_text()
+            self.assert_true('shadowcaster_config_cache_hit_total 1' in metrics, "Counters exported")
+            self.assert_true('shadowcaster_span_duration_seconds_count{span="config.parse"} 1' in metrics,
+                             "Span histograms exported")
+            self.assert_true('le="+Inf"' in metrics and '# TYPE shadowcaster_span_duration_seconds histogram' in metrics,
+                             "Prometheus text format")
+        finally:
+            instrumentation.disable()
+            shutil.rmtree(tmp_dir)
+    
+    def test_config_bundle(self):
+        """Test the memory-mapped config bundle and its staleness checks"""
+        self.print_test_header("Config Bundle")
+        
+        tmp_dir = Path(tempfile.mkdtemp())
+        try:
+            for tool_id in ['nmap', 'hydra', 'whois']:
+                shutil.copy(self.loader.config_dir / f"{tool_id}_config.json", tmp_dir)
+            
+            bundle_file, written = build_bundle(tmp_dir)
+            self.assert_true(written == 3 and bundle_file.exists(), "Bundle built from config directory")
+            
+            bundle = ConfigBundle(bundle_file)
+            expected = json.loads((tmp_dir / 'nmap_config.json').read_text())
+            self.assert_true(len(bundle) == 3 and 'nmap' in bundle, "Offset table lists every tool")
+            self.assert_true(bundle.decode('nmap') == expected, "Bundled config matches JSON")
+            self.assert_true(bundle.stale_tools(tmp_dir) == {}, "Fresh bundle has no stale tools")
+            bundle.close()
+            
+            instrumentation.enable()
+            loader = ConfigLoader(tmp_dir)
+            self.assert_true(thaw_config(loader.load_config('nmap')) == expected, "Loader serves config from bundle")
+            self.assert_true(instrumentation.snapshot()['counters'].get('config.bundle_hit') == 1, "Bundle hit counted")
+            
+            # Same content, new mtime: the content digest keeps the bundle usable
+            whois_file = tmp_dir / 'whois_config.json'
+            os.utime(whois_file, ns=(time.time_ns(), time.time_ns() + 10**9))
+            self.assert_true(loader.load_config('whois') is not None and
+                             instrumentation.snapshot()['counters'].get('config.bundle_hit') == 2,
+                             "Touched but unchanged config still read from bundle")
+            
+            config = json.loads((tmp_dir / 'hydra_config.json').read_text())
+            config['description'] = 'Edited after bundling'
+            (tmp_dir / 'hydra_config.json').write_text(json.dumps(config))
+            self.assert_true(loader.load_config('hydra')['description'] == 'Edited after bundling',
+                             "Stale entry falls back to JSON")
+            self.assert_true(instrumentation.snapshot()['counters'].get('config.bundle_stale') == 1,
+                             "Stale entry counted")
+            instrumentation.disable()
+            loader.close_bundle()
+            
+            stale = ConfigBundle(bundle_file)
+            self.assert_true(stale.stale_tools(tmp_dir) == {'hydra': 'changed'}, "Check reports changed configs")
+            stale.close()
+            
+            bundle_file.write_bytes(b'not a bundle at all, just junk bytes here')
+            loader = ConfigLoader(tmp_dir)
+            self.assert_true(loader.load_config('nmap') is not None, "Corrupt bundle ignored")
+        finally:
+            instrumentation.disable()
+            shutil.rmtree(tmp_dir)
+    
+    def test_config_model(self):
+        """Test compiled ToolSpec configs"""
+        self.print_test_header("Config Model")
+        
+        loader = ConfigLoader(self.loader.config_dir)
+        compiled = 0
+        for tool in loader.list_available_tools():
+            spec = loader.load_spec(tool['id'])
+            if isinstance(spec, ToolSpec) and spec.to_config()['categories'] == \
+                    thaw_config(loader.load_config(tool['id']))['categories']:
+                compiled += 1
+        self.assert_true(compiled == len(loader.list_available_tools()), "Every config compiles to a ToolSpec")
+        
+        spec = loader.load_spec('nmap')
+        self.assert_true(loader.load_spec('nmap') is spec, "Spec served from cache")
+        self.assert_true(spec.required_names == ('target',), "Required parameter names")
+        
+        option = spec.category('Scan Types').options[0]
+        try:
+            option.flag = '-x'
+            self.assert_true(False, "Option is immutable")
+        except AttributeError:
+            self.assert_true(True, "Option is immutable")
+        self.assert_true(not hasattr(option, '__dict__'), "Option uses __slots__")
+        self.assert_true(pickle.loads(pickle.dumps(spec)) == spec, "Spec survives pickling")
+        
+        other = ConfigLoader(use_bundle=False).load_spec('nmap')
+        self.assert_true(other.category('Scan Types').options[0].flag is option.flag, "Flags are interned")
+        
+        for config, error in [
+            ({'command': 'x'}, "missing name"),
+            ({'name': 'X', 'command': 'x', 'categories': {'A': {'options': [{'description': 'no flag'}]}}},
+             "option without flag"),
+            ({'name': 'X', 'command': 'x', 'categories': {'A': {'options': [{'flag': '-a', 'variable': 'yes'}]}}},
+             "non-boolean variable"),
+            ({'name': 'X', 'command': 'x', 'required': ['target']}, "required as a list")
+        ]:
+            try:
+                compile_spec('broken', config)
+                self.assert_true(False, f"Rejects config with {error}")
+            except ConfigError:
+                self.assert_true(True, f"Rejects config with {error}")
+        
+        builder = NmapBuilder(spec)
+        builder.required_params = {'target': '10.0.0.1'}
+        builder.selected_flags = ['-sS']
+        self.assert_true(builder.render_command() == 'nmap -sS 10.0.0.1', "Builder renders from a ToolSpec")
+        
+        tmp_dir = Path(tempfile.mkdtemp())
+        try:
+            (tmp_dir / 'broken_config.json').write_text(json.dumps({'name': 'Broken'}))
+            with contextlib.redirect_stdout(io.StringIO()):
+                spec = ConfigLoader(tmp_dir).load_spec('broken')
+            self.assert_true(spec is None, "Invalid config is reported, not raised")
+        finally:
+            shutil.rmtree(tmp_dir)
+    
+    def test_flag_index(self):
+        """Test flag lookup and conflict/requires validation"""
+        self.print_test_header("Flag Index")
+        
+        index = self.loader.load_spec('nmap').flag_index
+        self.assert_true(index.lookup('-sS').flag == '-sS', "Flag looked up by name")
+        self.assert_true(index.lookup('-p "80,443"').flag == '-p', "Flag with value resolves to its option")
+        self.assert_true(index.lookup('-Z') is None, "Unknown flag has no option")
+        self.assert_true(self.loader.load_spec('wpscan').flag_index.lookup('--enumerate p').flag == '--enumerate p',
+                         "Multi-word flag matched exactly")
+        
+        self.assert_true(index.validate(['-sS', '-sU', '-p 80', '-T4']) == [], "Compatible flags accepted")
+        self.assert_true(index.validate(['-sS', '-sT']) == ['-sS conflicts with -sT'], "TCP scan types conflict")
+        self.assert_true(index.validate(['-sn', '-p 80']) == ['-sn conflicts with -p'], "Ping sweep conflicts with ports")
+        self.assert_true(index.validate(['-T3', '-T4']) == ['-T3 conflicts with -T4'], "Exclusive category enforced")
+        self.assert_true(index.validate(['-Z']) == ["unknown flag '-Z'"], "Unknown flag reported")
+        self.assert_true(index.validate(['-Z'], allow_unknown=True) == [], "Unknown flag allowed on request")
+        self.assert_true(index.validate(['-p']) == ['-p needs a value'] and index.validate(['-p "80"']) == [],
+                         "Variable option without a value reported")
+        try:
+            BatchEngine(self.loader).render({'tool': 'nmap', 'required': {'target': '1.2.3.4'}, 'flags': [['-p']]})
+            self.assert_true(False, "Batch record with a bare variable option rejected")
+        except BatchSpecError as e:
+            self.assert_true('-p needs a value' in str(e), "Batch record with a bare variable option rejected")
+        
+        mask, _ = index.mask(['-p 80', '-sn'])
+        self.assert_true(not index.valid(mask) and index.valid(index.mask(['-sS'])[0]), "Mask validation")
+        
+        gobuster = self.loader.load_spec('gobuster').flag_index
+        self.assert_true(gobuster.validate(['-d example.com']) == ['-d requires dns'], "Missing requirement reported")
+        self.assert_true(gobuster.validate(['dns', '-d example.com']) == [], "Requirement satisfied")
+        
+        try:
+            compile_spec('broken', {'name': 'X', 'command': 'x', 'categories': {
+                'A': {'options': [{'flag': '-a', 'conflicts': ['-b']}]}}})
+            self.assert_true(False, "Relation to unknown flag rejected")
+        except ConfigError:
+            self.assert_true(True, "Relation to unknown flag rejected")
+        
+        engine = BatchEngine()
+        try:
+            engine.render({'tool': 'nmap', 'required': {'target': '10.0.0.1'}, 'flags': ['-sn', ['-p', '80']]})
+            self.assert_true(False, "Batch rejects conflicting flags")
+        except BatchSpecError as e:
+            self.assert_true('-sn conflicts with -p' in str(e), "Batch rejects conflicting flags")
+        
+        record = {'tool': 'nmap', 'required': {'target': '10.0.0.1'}, 'flags': ['-Pn']}
+        try:
+            engine.render(record)
+            self.assert_true(False, "Batch rejects unknown flags")
+        except BatchSpecError:
+            self.assert_true(True, "Batch rejects unknown flags")
+        self.assert_true(BatchEngine(allow_unknown_flags=True).render(record) == 'nmap -Pn 10.0.0.1',
+                         "Batch accepts unknown flags when allowed")
+    
+    def test_render_spec(self):
+        """Test config-driven placement of required values"""
+        self.print_test_header("Render Spec")
+        
+        engine = BatchEngine(self.loader)
+        dropped = []
+        for tool in self.loader.list_available_tools():
+            config = self.loader.load_config(tool['id'])
+            if 'render' not in config:
+                dropped.append(tool['id'])
+                continue
+            
+            spec = self.loader.load_spec(tool['id'])
+            values = {name: f"VALUE{i}" for i, name in enumerate(spec.required_names)}
+            command = engine.create_builder(tool['id'], values).render_command()
+            if not command.startswith(spec.command) or any(v not in command for v in values.values()):
+                dropped.append(tool['id'])
+        self.assert_true(not dropped, f"Every tool declares and renders its required values ({dropped[:5]})")
+        
+        sslscan = engine.create_builder('sslscan', {'host': 'example.com:443'}, ['--no-failed'])
+        self.assert_true(sslscan.render_command() == 'sslscan --no-failed example.com:443',
+                         "Tools without a builder render their target")
+        cme = engine.create_builder('cme', {'protocol': 'smb', 'target': '10.0.0.0/24'}, [['-u', 'admin']])
+        self.assert_true(cme.render_command() == 'cme smb -u "admin" 10.0.0.0/24', "Subcommand placed first")
+        ffuf = engine.create_builder('ffuf', {'url': 'http://t/FUZZ', 'wordlist': 'w.txt'})
+        self.assert_true(ffuf.render_command() == 'ffuf -u "http://t/FUZZ" -w w.txt', "Flag prefixes and quoting")
+        hashcat = engine.create_builder('hashcat', {'hash_file': 'h.txt', 'wordlist': ''}, ['-a 3'])
+        self.assert_true(hashcat.render_command() == 'hashcat -a 3 h.txt', "Empty optional values left out")
+        
+        fan_out = engine.compile_fan_out({'tool': 'whois'})
+        self.assert_true(fan_out.render('example.org') == 'whois example.org', "Fan-out for a config-only tool")
+        
+        config = {'name': 'Tool', 'command': 'tool', 'required': {'host': {}, 'port': {}},
+                  'render': {'args': [{'param': 'port', 'flag': '--port='}, 'host']}}
+        spec = compile_spec('tool', config)
+        self.assert_true(spec.renderer(['-v'], {'host': 'h', 'port': '80'}) == 'tool -v --port=80 h',
+                         "Prefix ending in '=' joined to the value")
+        self.assert_true(spec.render == (RenderArg('port', '--port='), RenderArg('host')), "Render args compiled")
+        self.assert_true(compile_spec('tool', spec.to_config()) == spec, "Render section survives to_config")
+        self.assert_true(pickle.loads(pickle.dumps(spec)).renderer([], {'host': 'h', 'port': '1'}) == 'tool --port=1 h',
+                         "Renderer rebuilt after unpickling")
+        
+        default = compile_spec('tool', {'name': 'Tool', 'command': 'tool', 'required': {'a': {}, 'b': {}}})
+        self.assert_true(default.renderer([], {'a': '1', 'b': '2'}) == 'tool 1 2',
+                         "Configs without a render section use positional order")
+        
+        for render, message in [
+            ({'args': ['host']}, "Unrendered required parameter rejected"),
+            ({'args': ['host', 'port', 'user']}, "Unknown parameter rejected"),
+            ({'args': ['host', {'param': 'port', 'quote': 'single'}]}, "Unknown quote style rejected"),
+            ({'args': ['host', {'param': 'port', 'position': 'middle'}]}, "Unknown position rejected"),
+            ({'args': 'host port'}, "Args must be a list")
+        ]:
+            try:
+                compile_spec('tool', {**config, 'render': render})
+                self.assert_true(False, message)
+            except ConfigError:
+                self.assert_true(True, message)
+        
+        class LegacyBuilder(CommandBuilder):
+            def _add_required_values(self):
+                return [f"<{self.required_params['target']}>"]
+        
+        legacy = LegacyBuilder(self.loader.load_spec('nmap'))
+        legacy.required_params = {'target': 'h'}
+        self.assert_true(legacy.render_command() == 'nmap <h>', "Builders may still place values themselves")
+        
+        class DroppingBuilder(CommandBuilder):
+            def _add_required_values(self):
+                return []
+        
+        dropping = DroppingBuilder(self.loader.load_spec('nmap'))
+        dropping.required_params = {'target': TargetFanOut.PLACEHOLDER}
+        try:
+            TargetFanOut(dropping, 'target')
+            self.assert_true(False, "Fan-out refuses builders that drop the target")
+        except BatchSpecError:
+            self.assert_true(True, "Fan-out refuses builders that drop the target")
+    
+    def test_renderer(self):
+        """Test frame-buffered terminal output"""
+        self.print_test_header("Renderer")
+        
+        class Terminal(io.StringIO):
+            def isatty(self):
+                return True
+        
+        options = [(f"Tool {i}", f"Description {i}") for i in range(120)]
+        saved = Display.renderer
+        try:
+            pipe = io.StringIO()
+            Display.renderer = Renderer(pipe)
+            Display.clear_screen()
+            Display.print_header("Tools")
+            Menu.render_menu("Select a Tool", options)
+            self.assert_true(pipe.getvalue() == '', "Frame is buffered until flushed")
+            Display.flush()
+            self.assert_true(Display.renderer.writes == 1, "120-entry menu written in one call")
+            self.assert_true('\x1b' not in pipe.getvalue() and 'Tool 119' in pipe.getvalue(),
+                             "Non-terminal output has no escape codes")
+            
+            Display.print_error("outside a frame")
+            self.assert_true(pipe.getvalue().endswith("✗ outside a frame\n"), "Output outside a frame is written at once")
+            
+            tty = Terminal()
+            renderer = Display.renderer = Renderer(tty, size=(80, 24))
+            self.assert_true(renderer.color, "Terminal keeps colors")
+            
+            renderer.clear()
+            renderer.write("one\ntwo\nthree\n")
+            renderer.flush()
+            self.assert_true(tty.getvalue() == CLEAR_SCREEN + "one\ntwo\nthree\n", "First frame clears with ANSI escapes")
+            
+            tty.seek(0)
+            tty.truncate()
+            renderer.clear()
+            renderer.write("one\nTWO\n")
+            renderer.flush()
+            self.assert_true(tty.getvalue() == '\x1b[2;1HTWO\x1b[K\x1b[3;1H\x1b[K' + ERASE_DOWN,
+                             "Next frame only rewrites changed lines")
+            
+            tty.seek(0)
+            tty.truncate()
+            stdin = sys.stdin
+            sys.stdin = io.StringIO("n\n")
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    Menu.confirm("Continue?")
+            finally:
+                sys.stdin = stdin
+            renderer.clear()
+            renderer.write("one\n")
+            renderer.flush()
+            self.assert_true(tty.getvalue().startswith(CLEAR_SCREEN), "Frame after input redraws fully")
+            
+            tty.seek(0)
+            tty.truncate()
+            renderer.clear()
+            renderer.write("x" * 100 + "\n")
+            renderer.flush()
+            renderer.clear()
+            renderer.write("x" * 100 + "\n")
+            renderer.flush()
+            self.assert_true(tty.getvalue().count(CLEAR_SCREEN) == 2, "Wrapped frames are never diffed")
+        finally:
+            Display.renderer = saved
+    
+    def test_paged_menu(self):
+        """Test the filterable paged menu"""
+        self.print_test_header("Paged Menu")
+        
+        tools = ['nmap', 'hydra', 'gobuster', 'sqlmap']
+        options = [(f"scan_{i}", f"{tools[i % 4]} against host{i}.example.com") for i in range(10000)]
+        index = FilterIndex(options)
+        
+        for query in ['nmap', 'host12', 'HYDRA host9', 'scan_99', 'ho', 'zzz']:
+            words = query.lower().split()
+            expected = sorted(i for i, (key, desc) in enumerate(options)
+                              if all(w in f"{key}\n{desc}".lower() for w in words))
+            self.assert_true(sorted(index.filter(query)) == expected, f"Filter '{query}' matches a full scan")
+        
+        self.assert_true(index.filter('host1')[:1] == [1] and len(index.filter('host12')) == 111,
+                         "Extending a query narrows the previous result")
+        self.assert_true(index.filter('scan_1 nmap')[0] == 12, "Results stay in menu order")
+        
+        saved = Display.renderer
+        Display.renderer = Renderer(io.StringIO(), color=False, size=(80, 30))
+        try:
+            menu = PagedMenu("Templates", options, page_size=10)
+            menu.render()
+            Display.flush()
+            output = Display.renderer.stream.getvalue()
+            self.assert_true('scan_9' in output and 'scan_10' not in output, "Only the visible page is rendered")
+            
+            for key in 'host42':
+                menu.handle_key(key)
+            self.assert_true(len(menu.matches) == 111 and menu.matches[0] == 42, "Typing filters the list")
+            menu.handle_key(KEY_DOWN)
+            self.assert_true(menu.handle_key(KEY_ENTER) == [420], "Enter selects the entry under the cursor")
+            
+            menu.handle_key(KEY_BACKSPACE)
+            menu.handle_key(KEY_PAGE_DOWN)
+            self.assert_true(menu.cursor == 10 and menu.offset == 10, "Page down moves a whole page")
+            menu.handle_key(KEY_END)
+            self.assert_true(menu.cursor == len(menu.matches) - 1 and menu.offset == menu.cursor - 9,
+                             "End scrolls to the last entry")
+            
+            multi = PagedMenu("Options", options[:30], allow_multiple=True, page_size=10)
+            multi.handle_key(KEY_TAB)
+            multi.handle_key(KEY_TAB)
+            self.assert_true(multi.handle_key(KEY_ENTER) == [0, 1], "Tab marks several entries")
+            
+            self.assert_true(menu.handle_line('/nmap') is None and len(menu.matches) == 2500, "Line mode filters")
+            self.assert_true(menu.handle_line('5') == [4], "Line mode numbers refer to the full list")
+            self.assert_true(menu.handle_line('1,2') is None, "Single-choice menu rejects several numbers")
+            
+            stdin = sys.stdin
+            sys.stdin = io.StringIO("/host7\nn\n8\n")
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    selected = Menu.display_menu("Templates", options[:100])
+            finally:
+                sys.stdin = stdin
+            self.assert_true(selected == [7], "Long menus fall back to paged line input")
+        finally:
+            Display.renderer = saved
+    
+    def test_clipboard(self):
+        """Test clipboard backend detection, caching and OSC 52"""
+        self.print_test_header("Clipboard")
+        
+        import base64
+        
+        sequence = osc52_sequence("nmap -sS 10.0.0.1")
+        self.assert_true(sequence.startswith("\033]52;c;") and sequence.endswith("\a") and
+                         base64.b64decode(sequence[7:-1]).decode() == "nmap -sS 10.0.0.1",
+                         "OSC 52 sequence carries base64 text")
+        wrapped = osc52_sequence("x", tmux=True)
+        self.assert_true(wrapped.startswith("\033Ptmux;\033\033]52;") and wrapped.endswith("\033\\"),
+                         "OSC 52 wrapped for tmux")
+        
+        tmp_dir = Path(tempfile.mkdtemp())
+        saved_env = dict(os.environ)
+        saved_cache = ClipboardManager.cache_file
+        try:
+            bin_dir = tmp_dir / 'bin'
+            bin_dir.mkdir()
+            clip_file = tmp_dir / 'clipboard.txt'
+            fake_xclip = bin_dir / 'xclip'
+            fake_xclip.write_text(f"#!/bin/sh\n{shutil.which('cat')} > '{clip_file}'\n")
+            fake_xclip.chmod(0o755)
+            
+            for key in ('SSH_CONNECTION', 'SSH_TTY', 'WAYLAND_DISPLAY', 'TMUX', 'SHADOWCASTER_CLIPBOARD'):
+                os.environ.pop(key, None)
+            os.environ['PATH'] = str(bin_dir)
+            os.environ['DISPLAY'] = ':0'
+            ClipboardManager.cache_file = tmp_dir / 'cache' / 'clipboard.json'
+            ClipboardManager.reset()
+            
+            name, argv = ClipboardManager.detect_backend()
+            self.assert_true(name == 'xclip' and argv[0] == str(fake_xclip), "Backend found with shutil.which")
+            self.assert_true(ClipboardManager.detect_backend() is ClipboardManager.detect_backend(),
+                             "Backend resolved once per process")
+            self.assert_true(json.loads(ClipboardManager.cache_file.read_text())['backend'] == 'xclip',
+                             "Backend cached on disk")
+            
+            self.assert_true(ClipboardManager.copy_many(['nmap -sS a', 'nmap -sS b']) and
+                             clip_file.read_text() == "nmap -sS a\nnmap -sS b\n",
+                             "Batch copied in one operation")
+            
+            ClipboardManager.reset()
+            instrumentation.enable()
+            ClipboardManager.detect_backend()
+            self.assert_true(instrumentation.snapshot()['spans'].get('clipboard.probe', {}).get('count') == 1,
+                             "Detection traced")
+            instrumentation.disable()
+            self.assert_true(ClipboardManager._read_cache(ClipboardManager._environment()) == ('xclip', argv),
+                             "Cached backend reused in the same environment")
+            
+            os.environ['DISPLAY'] = ''
+            self.assert_true(ClipboardManager._read_cache(ClipboardManager._environment()) is None,
+                             "Cache ignored when the environment changes")
+            self.assert_true(ClipboardManager.detect_backend(refresh=True) == (None, None),
+                             "No OSC 52 fallback in a local session")
+            os.environ['TMUX'] = '/tmp/tmux-0/default,1,0'
+            has_terminal = ClipboardManager._has_terminal
+            ClipboardManager._has_terminal = staticmethod(lambda: True)
+            try:
+                self.assert_true(ClipboardManager.detect_backend(refresh=True)[0] == OSC52,
+                                 "OSC 52 fallback inside tmux")
+            finally:
+                ClipboardManager._has_terminal = has_terminal
+            os.environ.pop('TMUX')
+            
+            os.environ['SHADOWCASTER_CLIPBOARD'] = 'osc52'
+            self.assert_true(ClipboardManager.detect_backend(refresh=True)[0] == OSC52, "Backend can be forced")
+            self.assert_true(ClipboardManager._read_cache(ClipboardManager._environment()) is None,
+                             "Fallback backend not cached")
+            ClipboardManager._write_cache(ClipboardManager._environment(), OSC52, None)
+            self.assert_true(ClipboardManager._read_cache(ClipboardManager._environment()) is None,
+                             "Stale cached fallback ignored")
+            os.environ['SHADOWCASTER_CLIPBOARD'] = 'none'
+            self.assert_true(ClipboardManager.detect_backend(refresh=True) == (None, None) and
+                             not ClipboardManager.copy_to_clipboard("x"),
+                             "Clipboard can be disabled")
+        finally:
+            instrumentation.disable()
+            os.environ.clear()
+            os.environ.update(saved_env)
+            ClipboardManager.cache_file = saved_cache
+            ClipboardManager.reset()
+            shutil.rmtree(tmp_dir)
+    
     def test_config_structure(self):
         """Test configuration file structure"""
         self.print_test_header("Config Structure Validation")
@@ -223,18 +1181,650 @@ class TestShadowCaster:
             for field in required_fields:
                 self.assert_true(field in config, f"{tool['name']}: has '{field}' field")
     
+    def test_daemon(self):
+        """Test the catalog daemon and its client over a Unix socket"""
+        self.print_test_header("Catalog Daemon")
+        
+        import socket
+        import struct
+        import threading
+        
+        tmp_dir = Path(tempfile.mkdtemp())
+        socket_path = str(tmp_dir / 'daemon.sock')
+        file_manager = FileManager(templates_dir=tmp_dir / 'templates', output_dir=tmp_dir / 'output',
+                                   template_backend='sqlite')
+        file_manager.save_template('web', 'nmap', 'nmap -p 80 {target}',
+                                   compiled=CommandTemplate('nmap', 'nmap -p 80 {target}', ('target',)))
+        
+        catalog = CatalogDaemon(socket_path, config_loader=self.loader, file_manager=file_manager)
+        catalog.bind()
+        server = threading.Thread(target=catalog.serve_forever, daemon=True)
+        server.start()
+        
+        try:
+            self.assert_true(oct(os.stat(socket_path).st_mode & 0o777) == '0o600', "Socket private to the user")
+            
+            with DaemonClient(socket_path, timeout=5) as client:
+                self.assert_true(client.ping()['pid'] == os.getpid(), "Daemon answers ping")
+                
+                result = client.render([
+                    {'tool': 'nmap', 'required': {'target': '10.0.0.1'}, 'flags': ['-sS', ['-p', '80']]},
+                    {'tool': 'unknown_tool'}
+                ])
+                self.assert_true(result['commands'][0] == 'nmap -sS -p "80" 10.0.0.1', "Record rendered")
+                self.assert_true(result['commands'][1] is None and result['errors'][0][0] == 1,
+                                 "Bad record reported by index")
+                
+                commands = client.fan_out({'tool': 'nmap', 'flags': ['-sS']}, ['10.0.0.0/30', 'scanme.nmap.org'])
+                self.assert_true(commands == ['nmap -sS 10.0.0.1', 'nmap -sS 10.0.0.2', 'nmap -sS scanme.nmap.org'],
+                                 "Fan-out expands CIDR ranges")
+                
+                self.assert_true(client.validate('nmap', ['-sS']) == [], "Valid selection has no problems")
+                self.assert_true(any('-sT' in p for p in client.validate('nmap', ['-sS', '-sT'])),
+                                 "Conflicting flags reported")
+                self.assert_true(any('target' in p for p in client.validate('nmap', [], required={})),
+                                 "Missing required parameter reported")
+                
+                self.assert_true(client.search('proxy', 5) and len(client.search('proxy', 5)) <= 5,
+                                 "Search served from the resident index")
+                self.assert_true(any(t['id'] == 'nmap' for t in client.list('tools')), "Tools listed")
+                self.assert_true([t['name'] for t in client.list('templates')] == ['web'], "Templates listed")
+                self.assert_true(client.render_template('web', {'target': '10.0.0.9'}) == 'nmap -p 80 10.0.0.9',
+                                 "Template rendered")
+                with DaemonClient(socket_path, timeout=5) as second:
+                    self.assert_true([t['name'] for t in second.list('templates')] == ['web'] and
+                                     second.render_template('web', {'target': '10.0.0.8'}) == 'nmap -p 80 10.0.0.8',
+                                     "Template store shared across connection threads")
+                
+                try:
+                    client.request('launch')
+                    self.assert_true(False, "Unknown op rejected")
+                except DaemonError as e:
+                    self.assert_true('launch' in str(e), "Unknown op rejected")
+                
+                self.assert_true(client.ping() is not None, "Connection reusable after an error")
+                
+                stats = client.request('stats')
+                self.assert_true(stats['requests'] >= 10 and stats['errors'] == 0, "Requests counted")
+                self.assert_true(client.request('reload')['tools'] > 0, "Catalog reloaded")
+                for network in ('10.0.0.0/8', '2001:db8::/64'):
+                    try:
+                        client.fan_out({'tool': 'nmap', 'flags': ['-sS']}, [network])
+                        self.assert_true(False, f"Oversized fan-out {network} refused")
+                    except DaemonError as e:
+                        self.assert_true('more than' in str(e), f"Oversized fan-out {network} refused")
+            
+            from modules.daemon import main as daemon_main
+            
+            spec_file = tmp_dir / 'spec.jsonl'
+            spec_file.write_text('{"tool": "nmap", "required": {"target": "10.0.0.1"}}\n{"tool": \n')
+            for skip_invalid in (False, True):
+                out, err = io.StringIO(), io.StringIO()
+                with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+                    code = daemon_main(['-s', socket_path, 'render', str(spec_file)] +
+                                       (['--skip-invalid'] if skip_invalid else []))
+                self.assert_true(code == 1 and err.getvalue().startswith('Error: line 2:'),
+                                 f"Malformed spec record reported (skip_invalid={skip_invalid})")
+                self.assert_true((out.getvalue() == 'nmap 10.0.0.1\n') == skip_invalid,
+                                 f"Pending records flushed only when skipping (skip_invalid={skip_invalid})")
+            
+            # A frame that lies about its length is answered and the connection dropped
+            raw = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            raw.settimeout(5)
+            raw.connect(socket_path)
+            raw.sendall(struct.pack('!I', 3) + b'{x}')
+            reader = raw.makefile('rb')
+            response = read_message(reader)
+            self.assert_true(response['ok'] is False and 'invalid JSON' in response['error'],
+                             "Malformed frame rejected")
+            self.assert_true(read_message(reader) is None, "Connection closed after a protocol error")
+            reader.close()
+            raw.close()
+            
+            try:
+                CatalogDaemon(socket_path, config_loader=self.loader).bind()
+                self.assert_true(False, "Second daemon refused")
+            except OSError:
+                self.assert_true(True, "Second daemon refused")
+            
+            with DaemonClient(socket_path, timeout=5) as client:
+                client.request('shutdown')
+            server.join(5)
+            self.assert_true(not server.is_alive() and not os.path.exists(socket_path),
+                             "Shutdown stops serving and removes the socket")
+            
+            # A socket file left behind by a crashed daemon is replaced
+            stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            stale.bind(socket_path)
+            stale.close()
+            restarted = CatalogDaemon(socket_path, config_loader=self.loader)
+            restarted.bind()
+            self.assert_true(os.path.exists(socket_path), "Stale socket replaced")
+            restarted._server.server_close()
+        finally:
+            catalog.shutdown()
+            shutil.rmtree(tmp_dir)
+        
+        try:
+            DaemonClient(socket_path).connect()
+            self.assert_true(False, "Client reports a missing daemon")
+        except OSError:
+            self.assert_true(True, "Client reports a missing daemon")
+    
+    def test_result_cache(self):
+        """Test the command result cache"""
+        self.print_test_header("Result Cache")
+        
+        dig = self.loader.load_spec('dig')
+        self.assert_true(canonical_argv(['dig', '-t', 'MX', '+short', 'example.com'], dig) ==
+                         canonical_argv(['dig', 'example.com', '+short', '-t', 'MX'], dig),
+                         "Known flags are compared regardless of order")
+        self.assert_true(canonical_argv(['dig', '-t', 'MX', 'a.com', 'b.com'], dig) !=
+                         canonical_argv(['dig', '-t', 'MX', 'b.com', 'a.com'], dig),
+                         "Positional order is kept")
+        self.assert_true(canonical_argv(['dig', '-t', 'MX', 'a.com'], dig) !=
+                         canonical_argv(['dig', '-t', 'A', 'a.com'], dig),
+                         "Flag values are part of the key")
+        self.assert_true(dig.cache_ttl > 0 and dig.to_config()['cache_ttl'] == dig.cache_ttl,
+                         "cache_ttl loaded and written back")
+        for bad in (-1, 'soon', True):
+            try:
+                compile_spec('bad', {'name': 'Bad', 'command': 'bad', 'cache_ttl': bad})
+                self.assert_true(False, f"cache_ttl {bad!r} rejected")
+            except ConfigError:
+                self.assert_true(True, f"cache_ttl {bad!r} rejected")
+        
+        nmap = self.loader.load_spec('nmap')
+        self.assert_true(canonical_argv(['nmap', '--custom', '-sV', 'host'], nmap) ==
+                         (('nmap', '--custom', '-sV', 'host'), ()),
+                         "Everything after an unknown flag stays verbatim")
+        
+        class Loader:
+            """Serves cacheable echo and sh tools"""
+            specs = {
+                'echo': compile_spec('echo', {
+                    'name': 'Echo', 'command': 'echo', 'cache_ttl': 60,
+                    'categories': {'Output': {'options': [{'flag': '-n', 'description': 'No newline'}]}}
+                }),
+                'sh': compile_spec('sh', {'name': 'Shell', 'command': 'sh', 'cache_ttl': 60})
+            }
+            
+            def spec_for_command(self, program):
+                return self.specs.get(program)
+        
+        now = [1000.0]
+        tmp_dir = Path(tempfile.mkdtemp())
+        cache = ResultCache(tmp_dir / 'cache.db', Loader(), max_bytes=4000, clock=lambda: now[0])
+        try:
+            self.assert_true(cache.put('echo -n hi', 0, b'hi', 0.5), "Result stored")
+            hit = cache.get(['echo', 'hi', '-n'])
+            self.assert_true(hit is not None and hit.output == b'hi' and hit.duration == 0.5,
+                             "Reordered command hits the stored result")
+            self.assert_true(not cache.put('ls -l', 0, b'x', 0.1) and cache.get('ls -l') is None,
+                             "Tools without cache_ttl are not cached")
+            
+            now[0] += 61
+            self.assert_true(cache.get('echo -n hi') is None, "Result expires after the tool's TTL")
+            
+            for i in range(8):
+                now[0] += 1
+                cache.put(f'echo {i}', 0, os.urandom(600), 0.1)
+                if i == 0:
+                    now[0] += 1
+                    cache.get('echo 0')
+            stats = cache.stats()
+            self.assert_true(stats['bytes'] <= 4000 and stats['evictions'] > 0, "Store stays under max_bytes")
+            self.assert_true(cache.get('echo 0') is None and cache.get('echo 7') is not None,
+                             "Least recently used results are evicted first")
+            self.assert_true(not cache.put('echo big', 0, os.urandom(2000), 0.1), "Oversized output not stored")
+            
+            cache.clear()
+            now[0] = time.time()
+            executor = CommandExecutor(output=OUTPUT_CAPTURE, capture_dir=tmp_dir / 'logs', result_cache=cache)
+            first = executor.submit('echo cached-output')
+            executor.run_all()
+            again = executor.submit('echo cached-output')
+            forced = executor.submit('echo cached-output', force=True)
+            executor.run_all()
+            self.assert_true(first.cached is None and again.cached is not None and forced.cached is None,
+                             "Repeated command answered from the cache unless forced")
+            self.assert_true(read_log(again.log_path) == b'cached-output\n' and again.status == 'done',
+                             "Cached output replayed into the job log")
+            self.assert_true('cached' in executor.status_table(), "Status table marks cached jobs")
+            
+            failing = executor.submit(['sh', '-c', 'echo partial; exit 1'])
+            executor.run_all()
+            self.assert_true(failing.status == 'failed' and cache.get(failing.argv) is None,
+                             "Failed runs are not cached")
+        finally:
+            cache.close()
+            shutil.rmtree(tmp_dir)
+    
+    def test_scheduler(self):
+        """Test job scheduling with a fake clock and stub jobs"""
+        self.print_test_header("Job Scheduler")
+        
+        clock = FakeClock()
+        starts = []
+        
+        def stub(durations, failures=None):
+            """Runner that sleeps in virtual time and fails each item a given number of times"""
+            failures = dict(failures or {})
+            
+            async def run(name):
+                starts.append((clock.time(), name))
+                await asyncio.sleep(durations.get(name, 1))
+                if failures.get(name):
+                    failures[name] -= 1
+                    return True
+                return False
+            return run
+        
+        scheduler = Scheduler(max_concurrency=2)
+        for name, priority in (('low', 0), ('high', 5), ('mid', 1), ('low2', 0)):
+            scheduler.submit(name, priority)
+        clock.run(scheduler.run(stub({})))
+        self.assert_true([name for _, name in starts] == ['high', 'mid', 'low', 'low2'],
+                         "Higher priority first, then submission order")
+        self.assert_true(clock.time() == 2.0, "Global limit runs two at a time")
+        
+        clock, starts = FakeClock(), []
+        scheduler = Scheduler(max_concurrency=4, per_host=2)
+        for i in range(4):
+            scheduler.submit(f'a{i}', host='a.example.com')
+        scheduler.submit('b0', host='b.example.com')
+        clock.run(scheduler.run(stub({})))
+        self.assert_true(sorted(name for t, name in starts if t == 0) == ['a0', 'a1', 'b0'],
+                         "Per-host cap leaves room for other hosts")
+        self.assert_true(scheduler.stats()['max_depth'] == 5 and scheduler.stats()['wait_max'] == 1.0,
+                         "Queue depth and wait time reported")
+        
+        clock, starts = FakeClock(), []
+        scheduler = Scheduler(max_concurrency=10, rate=2, burst=2)
+        for i in range(5):
+            scheduler.submit(f'a{i}', host='a.example.com')
+        scheduler.submit('other', host='b.example.com')
+        clock.run(scheduler.run(stub({}, {})))
+        self.assert_true([t for t, name in starts if name != 'other'] == [0.0, 0.0, 0.5, 1.0, 1.5],
+                         "Token bucket paces one host after its burst")
+        self.assert_true((0.0, 'other') in starts, "Pacing is per host")
+        
+        clock, starts = FakeClock(), []
+        scheduler = Scheduler(retries=3, backoff=1)
+        scheduler.submit('flaky')
+        scheduler.submit('broken')
+        retried = []
+        clock.run(scheduler.run(stub({}, {'flaky': 2, 'broken': 9}),
+                                on_retry=lambda item, delay: retried.append((item, delay))))
+        self.assert_true([t for t, name in starts if name == 'flaky'] == [0.0, 2.0, 5.0],
+                         "Retries back off exponentially")
+        self.assert_true(len([name for _, name in starts if name == 'broken']) == 4 and
+                         ('broken', 4.0) in retried, "Retries stop after the limit")
+        
+        clock, starts = FakeClock(), []
+        scheduler = Scheduler(max_concurrency=1)
+        cancelled = {'skipped'}
+        for name in ('first', 'skipped', 'last'):
+            scheduler.submit(name)
+        clock.run(scheduler.run(stub({}), skip=lambda item: item in cancelled))
+        self.assert_true([name for _, name in starts] == ['first', 'last'] and scheduler.stats()['dropped'] == 1,
+                         "Skipped items never start")
+        
+        bucket = TokenBucket(rate=1, burst=1)
+        self.assert_true(bucket.take(0) and not bucket.take(0.5) and bucket.delay(0.5) == 0.5 and bucket.take(1),
+                         "Token bucket refills at its rate")
+        
+        self.assert_true(target_host(['nmap', '-sV', '-p', '80', '10.0.0.5']) == '10.0.0.5', "Host from IP argument")
+        self.assert_true(target_host(['gobuster', 'dir', '-u', 'http://Web.Example.com:8080/', '-w', 'words.txt'])
+                         == 'web.example.com', "Host from URL argument")
+        self.assert_true(target_host(['dig', '@8.8.8.8', 'example.com']) == 'example.com',
+                         "dig's resolver is not the target")
+        self.assert_true(target_host(['nmap', '-oN', 'scan.nmap', '-iL', 'hosts.txt']) is None,
+                         "File names are not hosts")
+        
+        executor = CommandExecutor(output=OUTPUT_DISCARD, retries=2, backoff=0)
+        flaky = executor.submit(['sh', '-c', 'exit 2'])
+        missing = executor.submit('shadowcaster-no-such-binary')
+        ok = executor.submit('true', priority=9)
+        executor.run_all()
+        self.assert_true(flaky.status == 'failed' and flaky.attempts == 3, "Executor retries non-zero exits")
+        self.assert_true(missing.attempts == 1 and ok.attempts == 1, "Spawn errors and successes are not retried")
+        self.assert_true('retried' in executor.status_table(), "Status table reports retries")
+        self.assert_true(Job(1, 'curl https://api.example.com/v1').host == 'api.example.com',
+                         "Jobs know their target host")
+    
+    def test_scope(self):
+        """Test the scope allowlist"""
+        self.print_test_header("Scope Allowlist")
+        
+        scope = Scope.from_lines([
+            '10.0.0.0/16   # lab', '!10.0.99.0/24', '10.1.0.0/24', '10.1.1.0/24',
+            '192.168.5.10-192.168.5.20', '2001:db8::/64', '!2001:db8::dead',
+            'app.example.com', '*.example.org', '!*.corp.example.org', '!vpn.example.org', '', '# comment'
+        ])
+        self.assert_true(len(scope) == 11, "Entries counted, comments skipped")
+        self.assert_true(scope.contains('10.0.5.5') and not scope.contains('10.0.99.7'), "Exclusion carved out")
+        self.assert_true(scope.contains('10.0.100.0') and not scope.contains('10.2.0.1'), "Network bounds")
+        self.assert_true(scope.contains('10.1.0.0/23'), "Adjacent networks merged")
+        self.assert_true(not scope.contains('10.0.98.0/23'), "Network overlapping an exclusion rejected")
+        self.assert_true(scope.contains('192.168.5.15') and not scope.contains('192.168.5.21'), "Address range")
+        self.assert_true(scope.contains('2001:db8::1') and not scope.contains('2001:db8::dead') and
+                         not scope.contains('2001:db8:1::1'), "IPv6 intervals")
+        self.assert_true(scope.contains('App.Example.com') and not scope.contains('www.app.example.com'),
+                         "Plain hostname is exact")
+        self.assert_true(scope.contains('www.example.org') and not scope.contains('example.org'),
+                         "Wildcard covers subdomains only")
+        self.assert_true(not scope.contains('hr.corp.example.org') and not scope.contains('vpn.example.org'),
+                         "Most specific hostname entry wins")
+        self.assert_true(scope.contains('https://a.example.org:8443/login') and scope.contains('root@10.0.0.9')
+                         and scope.contains('10.0.0.9:22'), "URLs, user@host and host:port unwrapped")
+        self.assert_true(scope.contains('127.0.0.1') and scope.contains('localhost') and scope.contains('::1'),
+                         "Loopback always allowed")
+        
+        self.assert_true(host_of('scan.xml') is None and host_of('80') is None, "File names and numbers ignored")
+        self.assert_true(scope.violations(['-sV', '-p', '80', '--proxy=http://127.0.0.1:8080', '10.9.9.9',
+                                           'app.example.com']) == ['10.9.9.9'], "Violations listed")
+        self.assert_true(scope.violations(['@8.8.8.8', '+short', 'www.example.org']) == [],
+                         "Resolver and dig options skipped")
+        try:
+            scope.check_command('nmap -sV 10.0.0.1 evil.example.net')
+            self.assert_true(False, "Out-of-scope command rejected")
+        except ScopeError as e:
+            self.assert_true('evil.example.net' in str(e), "Out-of-scope command rejected")
+        
+        for target in ('8.8.8.1-254', '8.8.8.*', '8.8.8.8,9', '[2001:db8:1::1]', '[2001:db8:1::1]:443',
+                       '10.0.98-100.1', '10.0.*.1', '10.0.0.5,8.8.8.8', '10.0.0.300', '10.0.0.7-3'):
+            try:
+                scope.check_command(['nmap', '-sV', target])
+                self.assert_true(False, f"nmap target {target} rejected")
+            except ScopeError:
+                self.assert_true(True, f"nmap target {target} rejected")
+        self.assert_true(scope.violations(['10.0.0.1-254', '10.0.0.*', '10.0.0.5,9', '10.0.0-98.*', '[2001:db8::1]',
+                                           '[2001:db8::1]:22', '127.0.0.*', '10.0.0.5,10.1.1.7']) == [],
+                         "In-scope nmap ranges, wildcards, lists and bracketed IPv6 allowed")
+        self.assert_true(not scope.contains('*.*.*.*') and not scope.contains('10.*.*.5'), "Oversized expansions refused")
+        
+        for target in ('8.8', '10.3.1', '134744072', '010.0.0.1', '0x08.8.8.8', 'intranet', '10.0.0.1/x', 'db_01'):
+            try:
+                scope.check_command(['nmap', target])
+                self.assert_true(False, f"Target {target} refused")
+            except ScopeError:
+                self.assert_true(True, f"Target {target} refused")
+        self.assert_true(scope.violations(['-sS', '8.8']) == ['8.0.0.8'], "Numeric address after a flag checked")
+        self.assert_true(scope.violations(['167772161', '10.0.5', '-p', '80', '-n', '1.5']) == ['1.0.0.5'],
+                         "Short and integer forms read like inet_aton")
+        self.assert_true(Scope(['intranet']).violations(['intranet']) == [], "Single-label hosts can be listed")
+        
+        nmap = self.loader.load_spec('nmap')
+        hydra = self.loader.load_spec('hydra')
+        self.assert_true(scope.violations(['-sS', '-oN', 'intranet', '-p', '80', '10.0.0.1'], nmap) == [],
+                         "Spec tells flag values from targets")
+        self.assert_true(scope.violations(['-sS', 'intranet'], nmap) == ['intranet'], "Spec-checked target refused")
+        self.assert_true(scope.violations(['-l', 'root', 'ssh', '10.0.0.2'], hydra) == [] and
+                         scope.violations(['-l', 'root', 'ssh', '10.0.0.2']) == ['ssh'],
+                         "Non-target positionals accepted only with the spec")
+        self.assert_true(scope.value_violations('10.1.1.5') == [] and scope.value_violations('fileserver') ==
+                         ['fileserver'] and scope.value_violations('ssh', target=False) == [],
+                         "Parameter values checked by role")
+        
+        try:
+            Scope.from_lines(['10.0.0.0/8', '10.0.0.300/24'], 'lab.scope')
+            self.assert_true(False, "Bad entry reported with its line")
+        except ScopeError as e:
+            self.assert_true(str(e).startswith('lab.scope:2:'), "Bad entry reported with its line")
+        
+        engine = BatchEngine(self.loader, scope=scope)
+        commands = list(engine.fan_out({'tool': 'nmap', 'flags': ['-sS']}, ['10.0.0.1', '8.8.8.8', '10.0.0.2']))
+        self.assert_true(commands == ['nmap -sS 10.0.0.1', 'nmap -sS 10.0.0.2'], "Fan-out skips out-of-scope targets")
+        try:
+            engine.render({'tool': 'nmap', 'required': {'target': '8.8.4.4'}})
+            self.assert_true(False, "Render refuses out-of-scope targets")
+        except BatchSpecError as e:
+            self.assert_true('out of scope' in str(e), "Render refuses out-of-scope targets")
+        
+        self.assert_true(engine.render({'tool': 'hydra', 'required': {'target': '10.0.0.2', 'service': 'ssh'},
+                                        'flags': [['-l', 'root']]}) == 'hydra -l "root" ssh 10.0.0.2',
+                         "Render checks parameters by role")
+        
+        executor = CommandExecutor(output=OUTPUT_DISCARD, scope=scope, config_loader=self.loader)
+        self.assert_true(executor.submit('ping -c 1 10.0.0.1').argv[-1] == '10.0.0.1', "In-scope job queued")
+        self.assert_true(executor.submit('hydra -l root ssh 10.0.0.2').argv[-2] == 'ssh',
+                         "Executor checks jobs with the tool's spec")
+        try:
+            executor.submit(['curl', 'https://www.example.com/'])
+            self.assert_true(False, "Executor refuses out-of-scope jobs")
+        except ScopeError:
+            self.assert_true(len(executor.jobs) == 2, "Executor refuses out-of-scope jobs")
+        
+        large = Scope(f'10.{i >> 8 & 255}.{i & 255}.0/25' for i in range(65536))
+        start = time.perf_counter()
+        large.compile()
+        checks = sum(large.contains(f'10.{i & 255}.{i >> 8 & 255}.{i & 127}') for i in range(20000))
+        elapsed = time.perf_counter() - start
+        self.assert_true(checks == 20000, "Large scope answers lookups")
+        self.assert_true(elapsed < 5, f"64k entries compiled and checked quickly ({elapsed:.2f}s)")
+    
+    def test_output_parsers(self):
+        """Test streaming parsers for nmap, gobuster and ffuf output"""
+        self.print_test_header("Output Parsers")
+        
+        nmap_xml = (
+            b'<?xml version="1.0"?>\n<!DOCTYPE nmaprun>\n<nmaprun scanner="nmap" args="nmap -sV -oX scan.xml">'
+            b'<scaninfo type="syn" protocol="tcp"/>'
+            b'<host><status state="up"/><address addr="10.0.0.1" addrtype="ipv4"/>'
+            b'<address addr="00:11:22:33:44:55" addrtype="mac"/><hostnames><hostname name="gw.lab"/></hostnames>'
+            b'<ports><extraports state="closed" count="998"/>'
+            b'<port protocol="tcp" portid="22"><state state="open"/>'
+            b'<service name="ssh" product="OpenSSH" version="9.6p1"/></port>'
+            b'<port protocol="udp" portid="161"><state state="open|filtered"/></port></ports></host>'
+            b'<host><status state="up"/><address addr="2001:db8::7" addrtype="ipv6"/></host>'
+            b'<runstats><finished time="1"/></runstats></nmaprun>'
+        )
+        findings = list(NmapXmlParser().parse(io.BytesIO(nmap_xml)))
+        self.assert_true(findings[0] == Finding('10.0.0.1', 22, 'tcp', 'open', 'ssh', detail='OpenSSH 9.6p1'),
+                         "nmap port with service and version")
+        self.assert_true(findings[1] == Finding('10.0.0.1', 161, 'udp', 'open|filtered'), "nmap port without service")
+        self.assert_true(findings[2] == Finding('2001:db8::7', state='up'), "Host without ports reported once")
+        
+        try:
+            list(NmapXmlParser().parse(io.BytesIO(b'<nmaprun><host>')))
+            self.assert_true(False, "Truncated XML rejected")
+        except ParseError:
+            self.assert_true(True, "Truncated XML rejected")
+        
+        host = (b'<host><status state="up"/><address addr="10.1.2.3" addrtype="ipv4"/><ports>'
+                + b''.join(b'<port protocol="tcp" portid="%d"><state state="open"/><service name="x"/></port>' % p
+                           for p in range(20)) + b'</ports></host>\n')
+        large = io.BytesIO(b'<nmaprun>' + host * 5000 + b'</nmaprun>')
+        import tracemalloc
+        tracemalloc.start()
+        count = sum(1 for _ in NmapXmlParser().parse(large))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        self.assert_true(count == 100000, "Every port of a large scan parsed")
+        self.assert_true(peak < len(large.getvalue()) / 10,
+                         f"Memory stays flat ({peak // 1024} KB for {len(large.getvalue()) // 1024} KB of XML)")
+        
+        gobuster = io.StringIO(
+            "/admin                (Status: 301) [Size: 178] [--> http://10.0.0.1/admin/]\n"
+            "\x1b[2K\rProgress: 120 / 4614 (2.60%)\r/index.html          (Status: 200) [Size: 612]\n"
+            "https://app.example.com:8443/login (Status: 200)\n"
+            "Found: www.example.com [10.0.0.5]\n"
+            "Found: dev.example.com Status: 200 [Size: 1234]\n"
+            "===============================================================\n"
+        )
+        findings = list(GobusterParser().parse(gobuster, 'http://10.0.0.1/'))
+        self.assert_true(len(findings) == 5, "Progress and banner lines skipped")
+        self.assert_true(findings[0] == Finding('10.0.0.1', 80, 'tcp', service='http', path='/admin', status=301,
+                                                size=178, detail='http://10.0.0.1/admin/'), "gobuster dir entry")
+        self.assert_true(findings[1].path == '/index.html', "Finding after a progress line kept")
+        self.assert_true((findings[2].host, findings[2].port, findings[2].path) == ('app.example.com', 8443, '/login'),
+                         "Expanded URL split into host, port and path")
+        self.assert_true(findings[3] == Finding('www.example.com', detail='10.0.0.5'), "gobuster dns entry")
+        self.assert_true(findings[4].status == 200 and findings[4].size == 1234, "gobuster vhost entry")
+        
+        report = json.dumps({
+            'commandline': 'ffuf -u http://t/FUZZ -o "results" -of json',
+            'time': '2025-01-01T00:00:00Z',
+            'results': [
+                {'input': {'FUZZ': 'a'}, 'status': 200, 'length': 10, 'url': 'http://t:8080/a?x=1',
+                 'redirectlocation': ''},
+                {'input': {'FUZZ': 'b'}, 'status': 301, 'length': 0, 'url': 'https://t/b',
+                 'redirectlocation': 'https://t/b/'}
+            ],
+            'config': {'matcher': [200, 301], 'threads': 40}
+        })
+        findings = list(FfufJsonParser(chunk_size=7).parse(io.StringIO(report)))
+        self.assert_true(findings == [
+            Finding('t', 8080, 'tcp', service='http', path='/a?x=1', status=200, size=10),
+            Finding('t', 443, 'tcp', service='https', path='/b', status=301, size=0, detail='https://t/b/')
+        ], "ffuf report decoded across small chunks")
+        
+        lines = io.BytesIO(b'{"status": 200, "length": 5, "url": "http://h/x"}\n'
+                           b'{"status": 403, "length": 7, "url": "http://h/y"}\n')
+        self.assert_true([f.status for f in FfufJsonParser().parse(lines)] == [200, 403], "ffuf JSON lines")
+        try:
+            list(FfufJsonParser().parse(io.StringIO('{"results": [{"url": "http://h/x"}, {"url": ')))
+            self.assert_true(False, "Truncated ffuf JSON rejected")
+        except ParseError:
+            self.assert_true(True, "Truncated ffuf JSON rejected")
+        
+        self.assert_true(isinstance(parser_for('nmap', self.loader), NmapXmlParser) and
+                         isinstance(parser_for('ffuf', self.loader), FfufJsonParser) and
+                         isinstance(parser_for('gobuster', self.loader), GobusterParser), "Parsers named in configs")
+        self.assert_true(parser_for('hydra', self.loader) is None, "Tools without a parser")
+        self.assert_true(isinstance(get_parser('modules.parsers.GobusterParser'), GobusterParser),
+                         "Parser resolved by dotted path")
+        try:
+            get_parser('nessus_xml')
+            self.assert_true(False, "Unknown parser rejected")
+        except ParseError:
+            self.assert_true(True, "Unknown parser rejected")
+        
+        nmap = NmapXmlParser()
+        self.assert_true(nmap.output_path(['nmap', '-oX', 'scan.xml', '10.0.0.1']) == 'scan.xml', "nmap -oX file")
+        self.assert_true(nmap.output_path(['nmap', '-oA', 'scan', '10.0.0.1']) == 'scan.xml', "nmap -oA file")
+        self.assert_true(FfufJsonParser().output_path(['ffuf', '-u', 'http://t/FUZZ', '-o', 'out.json'])
+                         == 'out.json', "ffuf -o file")
+        self.assert_true(compile_spec('x', {'name': 'X', 'command': 'x', 'parser': 'gobuster'}).to_config()['parser']
+                         == 'gobuster', "Parser kept in config round trip")
+    
+    def test_results_db(self):
+        """Test the indexed store of parsed findings"""
+        self.print_test_header("Results Database")
+        
+        tmp_dir = Path(tempfile.mkdtemp())
+        try:
+            db = ResultsDB(tmp_dir / 'results.db', self.loader, clock=lambda: 1000.0)
+            findings = [
+                Finding('10.0.0.1', 22, 'tcp', 'open', 'ssh', detail='OpenSSH 9.6p1'),
+                Finding('10.0.0.1', 443, 'tcp', 'open', 'https', detail='nginx 1.18.0'),
+                Finding('10.0.0.2', 443, 'tcp', 'open', 'https', detail='nginx 1.25.3'),
+                Finding('10.0.1.9', 443, 'tcp', 'closed', 'https', detail='nginx 1.18.0'),
+                Finding('10.0.1.9', 80, 'tcp', 'open', 'http', detail='100%_done')
+            ]
+            self.assert_true(db.ingest(findings, 'nmap', 'nmap -sV 10.0.0.0/23', 'lab-sweep', batch_size=2) == 5,
+                             "Findings ingested in batches")
+            nmap_run = db.last_run_id
+            
+            old_nginx = list(db.query(port=443, state='open', detail='nginx 1.18'))
+            self.assert_true([row['host'] for row in old_nginx] == ['10.0.0.1'], "Port, state and detail combined")
+            self.assert_true(old_nginx[0]['command'] == 'nmap -sV 10.0.0.0/23' and old_nginx[0]['template'] ==
+                             'lab-sweep' and old_nginx[0]['created'] == 1000.0, "Findings linked to their command")
+            self.assert_true(db.count(host='10.0.0.*') == 3 and db.count(port=[22, 80]) == 2, "Glob and port list")
+            self.assert_true(db.count(detail='NGINX') == 3, "Detail matches case-insensitively")
+            self.assert_true(db.count(detail='0%_') == 1 and db.count(detail='1%8') == 0, "Wildcards in detail are literal")
+            self.assert_true(db.hosts(service='https') == ['10.0.0.1', '10.0.0.2', '10.0.1.9'], "Distinct hosts")
+            self.assert_true(len(list(db.query(limit=2))) == 2, "Query limit")
+            
+            gobuster = io.StringIO("/admin (Status: 301) [Size: 178]\n/.git/HEAD (Status: 200) [Size: 23]\n")
+            db.ingest(GobusterParser().parse(gobuster, 'https://app.example.com/'), 'gobuster')
+            self.assert_true([row['path'] for row in db.query(tool='gobuster', status=200)] == ['/.git/HEAD'],
+                             "Filter by tool and status")
+            
+            try:
+                db.ingest(NmapXmlParser().parse(io.BytesIO(
+                    b'<nmaprun><host><address addr="10.9.9.9" addrtype="ipv4"/><ports><port protocol="tcp" portid="21">'
+                    b'<state state="open"/></port></ports></host><host><address')), 'nmap')
+                self.assert_true(False, "Truncated scan raises")
+            except ParseError:
+                self.assert_true(db.count(host='10.9.9.9') == 1, "Findings before a parse error are kept")
+            
+            runs = db.runs()
+            self.assert_true([run['findings'] for run in runs] == [1, 2, 5], "Runs listed with counts")
+            self.assert_true(db.delete_run(nmap_run) and db.count(tool='nmap') == 1, "Run deleted with its findings")
+            
+            output = io.StringIO()
+            self.assert_true(write_rows(db.query(tool='gobuster'), output, 'csv') == 2, "CSV export")
+            self.assert_true(output.getvalue().splitlines()[0].startswith('tool,host,port'), "CSV header")
+            output = io.StringIO()
+            write_rows(db.query(tool='gobuster'), output, 'jsonl')
+            self.assert_true(json.loads(output.getvalue().splitlines()[0])['host'] == 'app.example.com', "JSONL export")
+            
+            xml_path = tmp_dir / 'scan.xml'
+            xml_path.write_bytes(b'<nmaprun><host><address addr="10.5.5.5" addrtype="ipv4"/><ports>'
+                                 b'<port protocol="tcp" portid="3306"><state state="open"/><service name="mysql"/>'
+                                 b'</port></ports></host></nmaprun>')
+            job = Job(1, ['nmap', '-sV', '-oX', str(xml_path), '10.5.5.5'], template='db-scan')
+            self.assert_true(db.ingest_job(job) == 1, "Job result file found from its -oX flag")
+            self.assert_true(next(db.query(service='mysql'))['template'] == 'db-scan', "Job template recorded")
+            self.assert_true(self.loader.spec_for_command('nmap').id == 'nmap' and
+                             self.loader.spec_for_command('aircrack-ng').id == 'aircrack', "Tools found by command")
+            self.assert_true(db.ingest_job(Job(2, 'hydra -l root ssh://10.0.0.1')) is None, "Tools without a parser")
+            self.assert_true(db.ingest_job(Job(3, 'nmap -sV 10.0.0.1')) is None, "nmap text output not parsed")
+            
+            config_dir = tmp_dir / 'configs'
+            config_dir.mkdir()
+            (config_dir / 'sh_config.json').write_text(json.dumps({'name': 'sh', 'command': 'sh', 'parser': 'gobuster'}))
+            executor = CommandExecutor(output=OUTPUT_CAPTURE, capture_dir=tmp_dir / 'logs',
+                                       results_db=ResultsDB(tmp_dir / 'jobs.db', ConfigLoader(str(config_dir))))
+            job = executor.submit(['sh', '-c', 'echo "/backup.zip (Status: 200) [Size: 9]"'], template='quick')
+            executor.run_all()
+            self.assert_true(job.findings == 1, "Executor stores findings from the captured log")
+            self.assert_true('1 findings stored' in executor.status_table(), "Status table counts findings")
+            db.close()
+        finally:
+            shutil.rmtree(tmp_dir)
+    
     def run_all_tests(self):
         """Run all tests"""
         print(f"\n{Colors.BOLD}{Colors.HEADER}ShadowCaster Functionality Tests{Colors.END}\n")
         
         self.test_config_loading()
         self.test_config_structure()
+        self.test_catalog_index()
+        self.test_config_cache()
         self.test_nmap_builder()
         self.test_hydra_builder()
         self.test_sqlmap_builder()
         self.test_wpscan_builder()
         self.test_gobuster_builder()
         self.test_aircrack_builder()
+        self.test_batch_engine()
+        self.test_target_fan_out()
+        self.test_command_template()
+        self.test_executor()
+        self.test_output_capture()
+        self.test_template_store()
+        self.test_search_index()
+        self.test_lazy_startup()
+        self.test_benchmark_compare()
+        self.test_instrumentation()
+        self.test_config_bundle()
+        self.test_config_model()
+        self.test_flag_index()
+        self.test_render_spec()
+        self.test_renderer()
+        self.test_paged_menu()
+        self.test_clipboard()
+        self.test_daemon()
+        self.test_result_cache()
+        self.test_scheduler()
+        self.test_scope()
+        self.test_output_parsers()
+        self.test_results_db()
+        
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
         
         # Summary
         total = self.tests_passed + self.tests_failed
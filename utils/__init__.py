@@ -1,18 +1,43 @@
 """
 ShadowCaster Utils Package
+
+Attributes are imported on first access so that importing one submodule
+(e.g. utils.config_loader) does not pull in asyncio, sqlite3 and friends.
 """
 
-from .config_loader import ConfigLoader
-from .display import Display, Menu, Colors
-from .file_manager import FileManager, ClipboardManager
-from .command_builder import CommandBuilder
-
-__all__ = [
-    'ConfigLoader',
-    'Display',
-    'Menu',
-    'Colors',
-    'FileManager',
-    'ClipboardManager',
-    'CommandBuilder'
-]
+import importlib
+
+_EXPORTS = {
+    'ConfigLoader': 'config_loader',
+    'freeze_config': 'config_loader',
+    'thaw_config': 'config_loader',
+    'Display': 'display',
+    'Menu': 'display',
+    'Colors': 'display',
+    'FileManager': 'file_manager',
+    'ClipboardManager': 'file_manager',
+    'CommandBuilder': 'command_builder',
+    'CommandTemplate': 'command_template',
+    'CommandExecutor': 'executor',
+    'Job': 'executor',
+    'ResultCache': 'result_cache',
+    'Scheduler': 'scheduler',
+    'Scope': 'scope',
+    'SearchIndex': 'search_index'
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
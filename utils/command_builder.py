@@ -18,21 +18,29 @@ You should have received a copy of the GNU Affero General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Iterable
 from utils.display import Display, Menu, Colors
-import subprocess
+from utils.command_template import CommandTemplate
+from utils.config_model import ToolSpec, as_spec
+from utils.instrumentation import span
 
 
 class CommandBuilder:
     """Base class for building tool-specific commands"""
     
-    def __init__(self, config: Dict[str, Any]):
-        """Initialize command builder with tool configuration"""
-        self.config = config
-        self.tool_name = config.get('name')
-        self.command = config.get('command')
-        self.categories = config.get('categories', {})
-        self.required = config.get('required', {})
+    def __init__(self, config):
+        """
+        Initialize command builder with tool configuration
+        
+        Args:
+            config: ToolSpec from ConfigLoader.load_spec, or a raw config
+                    dict which is compiled into one
+        """
+        self.spec = as_spec(config)
+        self.tool_name = self.spec.name
+        self.command = self.spec.command
+        self.categories = self.spec.categories
+        self.required = self.spec.required
         self.hint_mode = False
         self.selected_flags = []
         self.required_params = {}
@@ -45,20 +53,25 @@ class CommandBuilder:
         """Get required parameters from user"""
         Display.print_subheader(f"Required Parameters for {self.tool_name}")
         
-        for param_name, param_config in self.required.items():
-            prompt = param_config.get('prompt')
-            description = param_config.get('description', '')
-            
+        for param in self.required:
             if self.hint_mode:
-                Display.print_info(description)
+                Display.print_info(param.description)
             
-            value = Menu.get_text_input(prompt)
-            self.required_params[param_name] = value
+            value = Menu.get_text_input(param.prompt)
+            self.required_params[param.name] = value
         
         return len(self.required_params) == len(self.required)
     
     def build_command(self) -> Optional[str]:
         """Build the complete command"""
+        # Includes the time spent answering prompts
+        with span('builder.build', tool=self.command) as s:
+            command = self._build_command()
+            s.set(built=command is not None)
+        return command
+    
+    def _build_command(self) -> Optional[str]:
+        """Prompt for parameters and render the command"""
         try:
             # Get required parameters first
             if not self.get_required_parameters():
@@ -68,21 +81,73 @@ class CommandBuilder:
             # Get optional parameters
             self.get_optional_parameters()
             
-            # Construct the command
-            cmd_parts = [self.command]
-            
-            # Add flags
-            cmd_parts.extend(self.selected_flags)
+            for problem in self.validate_flags():
+                Display.print_warning(problem)
             
-            # Add required parameters based on tool
-            cmd_parts.extend(self._add_required_values())
-            
-            return ' '.join(cmd_parts)
+            return self.render_command()
         
         except Exception as e:
             Display.print_error(f"Error building command: {e}")
             return None
     
+    def render_command(self) -> str:
+        """Render the command from the current selection without prompting"""
+        if type(self)._add_required_values is not CommandBuilder._add_required_values:
+            # The builder places required values itself
+            return ' '.join([self.command, *self.selected_flags, *self._add_required_values()])
+        
+        # Placement of required values comes from the config's "render" section
+        return self.spec.renderer(self.selected_flags, self.required_params)
+    
+    def validate_flags(self, allow_unknown: bool = True) -> List[str]:
+        """Check the selected flags for conflicts and missing requirements"""
+        return self.spec.flag_index.validate(self.selected_flags, allow_unknown)
+    
+    def compile_template(self, slots: Iterable[str] = None) -> CommandTemplate:
+        """
+        Compile the current selection into a reusable command template
+        
+        Args:
+            slots: Required parameters to turn into template slots
+                   (default: all required parameters)
+        
+        Returns:
+            CommandTemplate whose defaults are the current required values
+        """
+        if slots is None:
+            slots = list(self.spec.required_names)
+        
+        for name in slots:
+            if not name.isidentifier():
+                raise ValueError(f"Invalid template slot name: {name}")
+        
+        placeholders = {name: f'\x00{name}\x00' for name in slots}
+        saved_params = self.required_params
+        self.required_params = {**saved_params, **placeholders}
+        
+        try:
+            command = self.render_command()
+        finally:
+            self.required_params = saved_params
+        
+        format_string = command.replace('{', '{{').replace('}', '}}')
+        fields = []
+        
+        for name, placeholder in placeholders.items():
+            if placeholder in format_string:
+                format_string = format_string.replace(placeholder, '{' + name + '}')
+                fields.append(name)
+        
+        defaults = {name: saved_params[name] for name in fields if saved_params.get(name)}
+        return CommandTemplate(self.tool_name, format_string, fields, defaults)
+    
+    @staticmethod
+    def format_flag(flag: str, value: str = None) -> str:
+        """Format a flag and its optional value for the command line"""
+        if value:
+            return f'{flag} "{value}"'
+        return flag
+    
     def get_optional_parameters(self):
         """Interactively get optional parameters"""
         if not self.categories:
@@ -93,31 +158,31 @@ class CommandBuilder:
         selected_categories = Menu.display_categories(self.categories)
         
         for category in selected_categories:
-            options = self.categories[category].get('options', [])
-            
-            if not options:
+            if not category.options:
                 continue
             
-            Display.print_subheader(f"Options in {category}")
-            selected_options = Menu.display_options(category, options)
+            Display.print_subheader(f"Options in {category.name}")
+            selected_options = Menu.display_options(category.name, category.options)
             
             for option in selected_options:
                 if self.hint_mode:
-                    Display.print_info(option.get('description', ''))
+                    Display.print_info(option.description)
                 
-                if option.get('variable'):
-                    prompt_text = option.get('prompt_text', f"Enter value for {option.get('flag')}: ")
-                    value = Menu.get_text_input(prompt_text, required=False)
+                if option.variable:
+                    value = Menu.get_text_input(option.prompt, required=False)
                     
                     if value:
-                        flag = option.get('flag')
-                        self.selected_flags.append(f'{flag} "{value}"')
+                        self.selected_flags.append(self.format_flag(option.flag, value))
                 else:
-                    self.selected_flags.append(option.get('flag'))
+                    self.selected_flags.append(option.flag)
     
     def _add_required_values(self) -> List[str]:
-        """Add required parameter values to command (tool-specific)"""
-        # Default implementation - override in subclasses
+        """
+        Required values to append after the flags
+        
+        Only consulted when a subclass overrides it; tools normally
+        describe this with the "render" section of their config.
+        """
         return []
     
     def preview_command(self, command: str):
@@ -126,17 +191,77 @@ class CommandBuilder:
         Display.print_header(f"{self.tool_name} Command Preview")
         Display.print_command(command)
     
-    def execute_command(self, command: str) -> bool:
-        """Execute command with user confirmation"""
+    def execute_command(self, command: str, capture_dir=None, compression: str = None,
+                        result_cache=None, force: bool = False, scope=None, results_db=None,
+                        template: str = None) -> bool:
+        """
+        Execute command with user confirmation
+        
+        Args:
+            command: Command line to run
+            capture_dir: When set, output is also streamed into a log file here
+            compression: None, 'gzip' or 'zstd' for the captured log
+            result_cache: ResultCache to answer repeated commands from
+            force: Run the command even if a cached result exists
+            scope: Scope the command's targets must be inside
+            results_db: ResultsDB to store the parsed output in
+            template: Name of the saved template the command came from
+        """
+        if scope is not None:
+            try:
+                scope.check_command(command, self.spec)
+            except ValueError as e:
+                Display.print_error(f"Refusing to run: {e}")
+                return False
+        
         Display.print_warning("This will execute a command on your system!")
         
         if not Menu.confirm("Are you sure you want to execute this command?"):
             Display.print_info("Command execution cancelled.")
             return False
         
+        return self._run(command, capture_dir, compression, result_cache, force, results_db, template)
+    
+    def _run(self, command: str, capture_dir, compression: str, result_cache, force: bool,
+             results_db=None, template: str = None) -> bool:
+        """Run a confirmed command and report how it went"""
+        # asyncio is only worth importing once something actually runs
+        from utils.executor import CommandExecutor, CANCELLED, OUTPUT_CAPTURE
+        
         try:
-            subprocess.run(command, shell=True)
-            return True
+            with span('builder.execute', tool=self.command) as s:
+                if capture_dir is None:
+                    executor = CommandExecutor(max_concurrency=1, result_cache=result_cache, results_db=results_db)
+                else:
+                    executor = CommandExecutor(max_concurrency=1, output=OUTPUT_CAPTURE, capture_dir=capture_dir,
+                                               compression=compression, tee=True, result_cache=result_cache,
+                                               results_db=results_db)
+                job = executor.submit(command, force=force, template=template)
+                executor.run_all()
+                s.set(status=job.status, returncode=job.returncode, cached=job.cached is not None)
         except Exception as e:
             Display.print_error(f"Error executing command: {e}")
             return False
+        
+        if job.error:
+            Display.print_error(f"Error executing command: {job.error}")
+            return False
+        
+        if job.status == CANCELLED:
+            Display.print_warning("Command interrupted")
+        elif job.returncode:
+            Display.print_warning(f"Command exited with status {job.returncode}")
+        
+        if job.log_path:
+            Display.print_info(f"Output saved to: {job.log_path}")
+        if job.findings:
+            Display.print_info(f"Stored {job.findings} findings in the results database")
+        
+        if job.cached is not None:
+            from utils.result_cache import format_age
+            Display.print_info(f"Cached result from {format_age(job.cached.age())} ago "
+                               f"(the run took {job.cached.duration:.1f}s)")
+            if Menu.confirm("Run the command again anyway?"):
+                return self._run(command, capture_dir, compression, result_cache, True, results_db, template)
+        
+        return True
@@ -0,0 +1,97 @@
+"""
+Compiled Command Templates
+Immutable, picklable command renderers produced from a builder selection
+
+Copyright (C) 2025
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from types import MappingProxyType
+from typing import Dict, Any, Tuple
+
+
+class CommandTemplate:
+    """
+    A finished command with named slots for its required values
+    
+    The command is stored as a single str.format() string, e.g.
+    'nmap -sS -p "80" {target}', so rendering needs neither the tool
+    config nor a builder.
+    """
+    
+    __slots__ = ('tool', 'format_string', 'fields', 'defaults')
+    
+    def __init__(self, tool: str, format_string: str, fields: Tuple[str, ...],
+                 defaults: Dict[str, str] = None):
+        """Initialize template"""
+        object.__setattr__(self, 'tool', tool)
+        object.__setattr__(self, 'format_string', format_string)
+        object.__setattr__(self, 'fields', tuple(fields))
+        object.__setattr__(self, 'defaults', MappingProxyType(dict(defaults or {})))
+    
+    def __setattr__(self, name, value):
+        raise AttributeError("CommandTemplate is immutable")
+    
+    def __delattr__(self, name):
+        raise AttributeError("CommandTemplate is immutable")
+    
+    def __reduce__(self):
+        return (CommandTemplate, (self.tool, self.format_string, self.fields, dict(self.defaults)))
+    
+    def __eq__(self, other):
+        if not isinstance(other, CommandTemplate):
+            return NotImplemented
+        return (self.tool, self.format_string, self.fields, dict(self.defaults)) == \
+            (other.tool, other.format_string, other.fields, dict(other.defaults))
+    
+    def __hash__(self):
+        return hash((self.tool, self.format_string, self.fields))
+    
+    def __repr__(self):
+        return f"CommandTemplate({self.tool!r}, {self.format_string!r})"
+    
+    def render(self, **values: str) -> str:
+        """
+        Render the command
+        
+        Args:
+            values: Slot values; slots left out use the compiled defaults
+        
+        Returns:
+            Rendered command string
+        """
+        if not values:
+            values = self.defaults
+        elif self.defaults:
+            values = {**self.defaults, **values}
+        
+        try:
+            return self.format_string.format_map(values)
+        except KeyError as e:
+            raise ValueError(f"Missing value for template slot {e}")
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert template to a JSON-serializable dict"""
+        return {
+            'tool': self.tool,
+            'format': self.format_string,
+            'fields': list(self.fields),
+            'defaults': dict(self.defaults)
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'CommandTemplate':
+        """Create template from a dict produced by to_dict()"""
+        return cls(data.get('tool', ''), data['format'], data.get('fields', ()), data.get('defaults'))
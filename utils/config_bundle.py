@@ -0,0 +1,296 @@
+"""
+Config Bundle
+Compiles the config directory into one memory-mapped file of pre-parsed configs
+
+Copyright (C) 2025
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Layout (little endian):
+
+    header   magic(8) version(I) marshal version(I) entry count(I) catalog hash(32)
+    table    entry count x [name offset(I) name length(H) data offset(I)
+                            data length(I) mtime_ns(q) size(Q) content digest(16)]
+    names    tool ids, utf-8, concatenated
+    data     marshal-encoded configs
+"""
+
+import argparse
+import hashlib
+import json
+import marshal
+import mmap
+import os
+import struct
+import sys
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+
+
+CONFIG_BUNDLE_FILE = '.catalog.bundle'
+
+BUNDLE_MAGIC = b'SCBUNDLE'
+BUNDLE_VERSION = 1
+
+# marshal output is only readable by the same marshal format
+MARSHAL_VERSION = 4
+
+HEADER = struct.Struct('<8sIII32s')
+ENTRY = struct.Struct('<IHIIqQ16s')
+
+CONFIG_SUFFIX = '_config.json'
+
+
+def content_digest(data: bytes) -> bytes:
+    """Digest of a config file's bytes as stored in the bundle"""
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def catalog_hash(digests: Dict[str, bytes]) -> bytes:
+    """Hash of every tool id and its content digest"""
+    h = hashlib.sha256()
+    for tool_id in sorted(digests):
+        h.update(tool_id.encode('utf-8') + b'\0' + digests[tool_id])
+    return h.digest()
+
+
+def build_bundle(config_dir: str, bundle_file: str = None) -> Tuple[Path, int]:
+    """
+    Compile every *_config.json in a directory into a bundle
+    
+    Invalid JSON files are skipped; the loader reads them from disk and
+    reports the error as before.
+    
+    Args:
+        config_dir: Directory of tool configs
+        bundle_file: Output path (defaults to <config_dir>/.catalog.bundle)
+    
+    Returns:
+        Bundle path and number of configs written
+    """
+    config_dir = Path(config_dir)
+    bundle_file = Path(bundle_file) if bundle_file else config_dir / CONFIG_BUNDLE_FILE
+    
+    records = []
+    with os.scandir(config_dir) as it:
+        for entry in sorted(it, key=lambda e: e.name):
+            if not entry.name.endswith(CONFIG_SUFFIX) or not entry.is_file():
+                continue
+            
+            stat = entry.stat()
+            with open(entry.path, 'rb') as f:
+                raw = f.read()
+            
+            try:
+                config = json.loads(raw)
+            except ValueError:
+                continue
+            
+            records.append((entry.name[:-len(CONFIG_SUFFIX)], stat, content_digest(raw),
+                            marshal.dumps(config, MARSHAL_VERSION)))
+    
+    names = b''
+    name_spans = []
+    for tool_id, _, _, _ in records:
+        encoded = tool_id.encode('utf-8')
+        name_spans.append((len(names), len(encoded)))
+        names += encoded
+    
+    data_start = HEADER.size + ENTRY.size * len(records) + len(names)
+    table = []
+    offset = data_start
+    for (tool_id, stat, digest, data), (name_offset, name_len) in zip(records, name_spans):
+        table.append(ENTRY.pack(name_offset, name_len, offset, len(data),
+                                stat.st_mtime_ns, stat.st_size, digest))
+        offset += len(data)
+    
+    header = HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION, MARSHAL_VERSION, len(records),
+                         catalog_hash({r[0]: r[2] for r in records}))
+    
+    tmp_file = bundle_file.with_name(f"{bundle_file.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_file, 'wb') as f:
+            f.write(header)
+            f.write(b''.join(table))
+            f.write(names)
+            for record in records:
+                f.write(record[3])
+        os.replace(tmp_file, bundle_file)
+    except OSError:
+        try:
+            tmp_file.unlink()
+        except OSError:
+            pass
+        raise
+    
+    return bundle_file, len(records)
+
+
+class ConfigBundle:
+    """
+    Read-only view of a bundle file
+    
+    The file is memory-mapped and only the offset table is decoded up
+    front; each config is unmarshalled when it is first asked for.
+    """
+    
+    def __init__(self, path: str):
+        """
+        Open a bundle
+        
+        Raises:
+            ValueError: If the file is not a bundle this Python can read
+            OSError: If the file cannot be opened
+        """
+        self.path = Path(path)
+        
+        with open(self.path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < HEADER.size:
+                raise ValueError(f"{self.path} is not a config bundle")
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        try:
+            magic, version, marshal_version, entry_count, self.catalog_hash = HEADER.unpack_from(self._map, 0)
+            if magic != BUNDLE_MAGIC or version != BUNDLE_VERSION:
+                raise ValueError(f"{self.path} is not a version {BUNDLE_VERSION} config bundle")
+            if marshal_version != MARSHAL_VERSION:
+                raise ValueError(f"{self.path} was built with marshal version {marshal_version}")
+            
+            names_start = HEADER.size + ENTRY.size * entry_count
+            self.entries = {}
+            for name_offset, name_len, data_offset, data_len, mtime_ns, size, digest in \
+                    ENTRY.iter_unpack(self._map[HEADER.size:names_start]):
+                start = names_start + name_offset
+                tool_id = self._map[start:start + name_len].decode('utf-8')
+                self.entries[tool_id] = (data_offset, data_len, mtime_ns, size, digest)
+        except (struct.error, UnicodeDecodeError) as e:
+            self.close()
+            raise ValueError(f"{self.path} is corrupt: {e}")
+        except ValueError:
+            self.close()
+            raise
+    
+    def __contains__(self, tool_id: str) -> bool:
+        return tool_id in self.entries
+    
+    def __len__(self) -> int:
+        return len(self.entries)
+    
+    def decode(self, tool_id: str) -> Any:
+        """Unmarshal one config without any freshness check"""
+        data_offset, data_len, _, _, _ = self.entries[tool_id]
+        return marshal.loads(self._map[data_offset:data_offset + data_len])
+    
+    def get(self, tool_id: str, stat: os.stat_result, config_file: Path) -> Optional[Any]:
+        """
+        Get a config if the bundled copy matches the file on disk
+        
+        The stored mtime and size are checked first; when only the mtime
+        moved (e.g. after a checkout) the file's content digest decides.
+        
+        Returns:
+            The parsed config, or None if the tool is missing or stale
+        """
+        entry = self.entries.get(tool_id)
+        if entry is None:
+            return None
+        
+        _, _, mtime_ns, size, digest = entry
+        if stat.st_size != size:
+            return None
+        
+        if stat.st_mtime_ns != mtime_ns:
+            try:
+                with open(config_file, 'rb') as f:
+                    if content_digest(f.read()) != digest:
+                        return None
+            except OSError:
+                return None
+        
+        return self.decode(tool_id)
+    
+    def stale_tools(self, config_dir: str) -> Dict[str, str]:
+        """
+        Compare the bundle against a config directory by content
+        
+        Returns:
+            Tool id -> 'changed', 'added' or 'removed' for every difference
+        """
+        differences = {}
+        seen = set()
+        
+        for config_file in Path(config_dir).glob(f"*{CONFIG_SUFFIX}"):
+            tool_id = config_file.name[:-len(CONFIG_SUFFIX)]
+            seen.add(tool_id)
+            entry = self.entries.get(tool_id)
+            
+            if entry is None:
+                differences[tool_id] = 'added'
+            elif content_digest(config_file.read_bytes()) != entry[4]:
+                differences[tool_id] = 'changed'
+        
+        for tool_id in self.entries:
+            if tool_id not in seen:
+                differences[tool_id] = 'removed'
+        
+        return differences
+    
+    def close(self):
+        """Unmap the bundle"""
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+
+def main(argv=None) -> int:
+    """Build or check a config bundle from the command line"""
+    default_dir = Path(__file__).resolve().parent.parent / 'configs'
+    
+    parser = argparse.ArgumentParser(
+        prog='python3 -m utils.config_bundle',
+        description="Compile tool configs into a single memory-mapped bundle"
+    )
+    parser.add_argument('action', choices=['build', 'check'], help="build the bundle or list stale configs")
+    parser.add_argument('--config-dir', default=str(default_dir), help="config directory (default: configs/)")
+    parser.add_argument('-o', '--output', help=f"bundle file (default: <config-dir>/{CONFIG_BUNDLE_FILE})")
+    args = parser.parse_args(argv)
+    
+    bundle_file = Path(args.output) if args.output else Path(args.config_dir) / CONFIG_BUNDLE_FILE
+    
+    if args.action == 'build':
+        path, written = build_bundle(args.config_dir, bundle_file)
+        print(f"Bundled {written} configs into {path} ({path.stat().st_size} bytes)")
+        return 0
+    
+    try:
+        bundle = ConfigBundle(bundle_file)
+    except (OSError, ValueError) as e:
+        print(f"No usable bundle: {e}", file=sys.stderr)
+        return 1
+    
+    differences = bundle.stale_tools(args.config_dir)
+    bundle.close()
+    
+    if not differences:
+        print(f"{bundle_file} is up to date")
+        return 0
+    
+    for tool_id, change in sorted(differences.items()):
+        print(f"{change:<8} {tool_id}")
+    print(f"{len(differences)} config(s) differ; run 'python3 -m utils.config_bundle build'", file=sys.stderr)
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -20,54 +20,353 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import json
 import os
+from collections import OrderedDict
 from pathlib import Path
+from types import MappingProxyType
 from typing import Dict, Any, Optional
+from utils.instrumentation import span, count, traced
+from utils.config_bundle import ConfigBundle, CONFIG_BUNDLE_FILE
+from utils.config_model import ToolSpec, ConfigError, compile_spec
+
+
+# Bumped whenever the layout of the catalog index file changes
+CATALOG_INDEX_VERSION = 1
+CATALOG_INDEX_FILE = '.catalog_index.json'
+
+# Parsed configs kept in memory; large enough to hold the whole catalog
+DEFAULT_CACHE_SIZE = 256
+
+# Cache entries are (file signature, frozen config, ToolSpec); either may be None
+CACHE_CONFIG = 1
+CACHE_SPEC = 2
+
+
+def freeze_config(value: Any) -> Any:
+    """Recursively convert a parsed config into read-only mappings and tuples"""
+    if isinstance(value, dict):
+        return MappingProxyType({k: freeze_config(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze_config(v) for v in value)
+    return value
+
+
+def thaw_config(value: Any) -> Any:
+    """Return a plain, mutable deep copy of a frozen config"""
+    if isinstance(value, (dict, MappingProxyType)):
+        return {k: thaw_config(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [thaw_config(v) for v in value]
+    return value
 
 
 class ConfigLoader:
     """Loads and manages configuration files for various tools"""
     
-    def __init__(self, config_dir: str = None):
-        """Initialize config loader with config directory path"""
+    def __init__(self, config_dir: str = None, index_file: str = None,
+                 cache_size: int = DEFAULT_CACHE_SIZE, bundle_file: str = None, use_bundle: bool = True):
+        """
+        Initialize config loader with config directory path
+        
+        Args:
+            config_dir: Directory of *_config.json files
+            index_file: Catalog index path (defaults to <config_dir>/.catalog_index.json)
+            cache_size: Number of parsed configs kept in memory
+            bundle_file: Pre-parsed config bundle (defaults to <config_dir>/.catalog.bundle)
+            use_bundle: Read configs from the bundle when it is present and fresh
+        """
         if config_dir is None:
             config_dir = os.path.join(os.path.dirname(__file__), '..', 'configs')
         self.config_dir = Path(config_dir)
+        
+        if index_file is None:
+            index_file = self.config_dir / CATALOG_INDEX_FILE
+        self.index_file = Path(index_file)
+        
+        if bundle_file is None:
+            bundle_file = self.config_dir / CONFIG_BUNDLE_FILE
+        self.bundle_file = Path(bundle_file)
+        self.use_bundle = use_bundle
+        self._bundle = None
+        
+        # LRU cache of tool id -> (file signature, frozen config, ToolSpec)
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_evictions = 0
+        self._commands = None   # program name -> tool id, for spec_for_command
     
     def load_config(self, tool_name: str) -> Optional[Dict[str, Any]]:
-        """Load configuration for a specific tool"""
+        """
+        Load configuration for a specific tool
+        
+        Configs are returned as read-only views (see freeze_config) and
+        served from an LRU cache until the file's mtime, inode or size
+        changes. Use thaw_config() for a private, mutable copy.
+        """
+        return self._load(tool_name, CACHE_CONFIG)
+    
+    def load_spec(self, tool_name: str) -> Optional[ToolSpec]:
+        """
+        Load a tool config compiled into a validated ToolSpec
+        
+        Specs share the config cache and are compiled straight from the
+        parsed file, so holding the whole catalog as specs does not also
+        keep the nested dicts alive.
+        """
+        return self._load(tool_name, CACHE_SPEC)
+    
+    def spec_for_command(self, program: str) -> Optional[ToolSpec]:
+        """
+        Find the spec of the tool a program name belongs to
+        
+        Most tools are named after their command; for the others the
+        catalog is scanned once. When several tools share a command, the
+        one whose id is the command wins (nmap over nmap_vulners).
+        """
+        spec = self.load_spec(program)
+        if spec is not None and spec.command == program:
+            return spec
+        
+        if self._commands is None:
+            self._commands = {}
+            for tool in self.list_available_tools():
+                candidate = self.load_spec(tool['id'])
+                if candidate is not None:
+                    self._commands.setdefault(candidate.command, tool['id'])
+                    if candidate.id == candidate.command:
+                        self._commands[candidate.command] = tool['id']
+        
+        tool_id = self._commands.get(program)
+        return self.load_spec(tool_id) if tool_id else None
+    
+    def _load(self, tool_name: str, slot: int):
+        """Serve a config or spec from the cache, reading the file on a miss"""
         config_file = self.config_dir / f"{tool_name}_config.json"
         
-        if not config_file.exists():
+        try:
+            stat = config_file.stat()
+        except OSError:
+            self._cache.pop(tool_name, None)
+            return None
+        
+        signature = (stat.st_mtime_ns, stat.st_ino, stat.st_size)
+        cached = self._cache.get(tool_name)
+        
+        if cached is not None and cached[0] == signature and cached[slot] is not None:
+            self._cache.move_to_end(tool_name)
+            self.cache_hits += 1
+            count('config.cache_hit')
+            return cached[slot]
+        
+        self.cache_misses += 1
+        count('config.cache_miss')
+        
+        raw = self._read_config(tool_name, stat, config_file)
+        if raw is None:
+            self._cache.pop(tool_name, None)
             return None
         
+        if slot == CACHE_CONFIG:
+            value = freeze_config(raw)
+        else:
+            try:
+                value = compile_spec(tool_name, raw)
+            except ConfigError as e:
+                self._cache.pop(tool_name, None)
+                print(f"Invalid config file: {e}")
+                return None
+        
+        if self.cache_size > 0:
+            entry = list(cached) if cached is not None and cached[0] == signature else [signature, None, None]
+            entry[slot] = value
+            self._cache[tool_name] = tuple(entry)
+            self._cache.move_to_end(tool_name)
+            
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+                self.cache_evictions += 1
+                count('config.cache_eviction')
+        
+        return value
+    
+    def _read_config(self, tool_name: str, stat: os.stat_result, config_file: Path) -> Optional[Dict[str, Any]]:
+        """Parse a config from the bundle, or from its JSON file when not bundled"""
+        config = self._load_from_bundle(tool_name, stat, config_file)
+        if config is not None:
+            return config
+        
         try:
-            with open(config_file, 'r') as f:
-                return json.load(f)
+            with span('config.parse', tool=tool_name, bytes=stat.st_size):
+                with open(config_file, 'r') as f:
+                    return json.load(f)
         except json.JSONDecodeError as e:
             print(f"Error parsing config file: {e}")
             return None
     
+    def _get_bundle(self) -> Optional[ConfigBundle]:
+        """Open the config bundle once; a missing or unreadable bundle disables it"""
+        if self._bundle is None:
+            try:
+                self._bundle = ConfigBundle(self.bundle_file)
+            except (OSError, ValueError):
+                self._bundle = False
+        
+        return self._bundle or None
+    
+    def _load_from_bundle(self, tool_name: str, stat: os.stat_result, config_file: Path) -> Optional[Dict[str, Any]]:
+        """Decode a config from the bundle if its bundled copy is still current"""
+        if not self.use_bundle:
+            return None
+        
+        bundle = self._get_bundle()
+        if bundle is None:
+            return None
+        
+        try:
+            with span('config.bundle_decode', tool=tool_name):
+                config = bundle.get(tool_name, stat, config_file)
+        except (ValueError, EOFError, TypeError):
+            config = None
+        
+        if config is None:
+            count('config.bundle_stale')
+            return None
+        
+        count('config.bundle_hit')
+        return config
+    
+    def close_bundle(self):
+        """Unmap the config bundle; it is reopened on next use"""
+        if self._bundle:
+            self._bundle.close()
+        self._bundle = None
+    
+    def cache_stats(self) -> Dict[str, int]:
+        """Get config cache counters"""
+        return {
+            'size': len(self._cache),
+            'max_size': self.cache_size,
+            'hits': self.cache_hits,
+            'misses': self.cache_misses,
+            'evictions': self.cache_evictions
+        }
+    
+    def clear_cache(self):
+        """Drop all cached configs"""
+        self._cache.clear()
+        self._commands = None
+    
+    @traced('config.list_tools')
     def list_available_tools(self) -> list:
-        """List all available tools from config files"""
-        tools = []
+        """
+        List all available tools from config files
         
+        Tool metadata is served from the catalog index; only configs whose
+        mtime or size changed since the index was written are re-parsed.
+        """
         if not self.config_dir.exists():
-            return tools
+            return []
         
-        for config_file in self.config_dir.glob("*_config.json"):
-            try:
-                with open(config_file, 'r') as f:
-                    config = json.load(f)
-                    tools.append({
-                        'id': config_file.stem.replace('_config', ''),
-                        'name': config.get('name'),
-                        'description': config.get('description')
-                    })
-            except json.JSONDecodeError:
-                continue
+        index = self._load_catalog_index()
+        entries = {}
+        changed = False
+        
+        with os.scandir(self.config_dir) as it:
+            for entry in it:
+                if not entry.name.endswith('_config.json') or not entry.is_file():
+                    continue
+                
+                stat = entry.stat()
+                cached = index.get(entry.name)
+                
+                if cached and cached['mtime'] == stat.st_mtime_ns and cached['size'] == stat.st_size:
+                    entries[entry.name] = cached
+                    continue
+                
+                try:
+                    with open(entry.path, 'r') as f:
+                        config = json.load(f)
+                except (json.JSONDecodeError, OSError):
+                    continue
+                
+                changed = True
+                count('config.index_reparse')
+                entries[entry.name] = {
+                    'id': entry.name[:-len('_config.json')],
+                    'name': config.get('name'),
+                    'description': config.get('description'),
+                    'mtime': stat.st_mtime_ns,
+                    'size': stat.st_size
+                }
         
+        if changed or len(entries) != len(index):
+            self._save_catalog_index(entries)
+        
+        tools = [
+            {'id': e['id'], 'name': e['name'], 'description': e['description']}
+            for e in entries.values()
+        ]
         return sorted(tools, key=lambda x: x['name'])
     
+    def rebuild_catalog_index(self) -> list:
+        """Discard the catalog index and rescan every config file"""
+        try:
+            self.index_file.unlink()
+        except OSError:
+            pass
+        return self.list_available_tools()
+    
+    def _load_catalog_index(self) -> Dict[str, Dict[str, Any]]:
+        """Load the catalog index, returning an empty index if missing or corrupt"""
+        try:
+            with open(self.index_file, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        
+        if not isinstance(data, dict) or data.get('version') != CATALOG_INDEX_VERSION:
+            return {}
+        tools = data.get('tools', {})
+        if not isinstance(tools, dict):
+            return {}
+        
+        index = {}
+        for filename, entry in tools.items():
+            try:
+                index[filename] = {
+                    'id': entry[0],
+                    'name': entry[1],
+                    'description': entry[2],
+                    'mtime': int(entry[3]),
+                    'size': int(entry[4])
+                }
+            except (TypeError, IndexError, ValueError):
+                return {}
+        
+        return index
+    
+    def _save_catalog_index(self, entries: Dict[str, Dict[str, Any]]):
+        """Write the catalog index atomically; failures only cost a rescan"""
+        data = {
+            'version': CATALOG_INDEX_VERSION,
+            'tools': {
+                filename: [e['id'], e['name'], e['description'], e['mtime'], e['size']]
+                for filename, e in sorted(entries.items())
+            }
+        }
+        
+        tmp_file = self.index_file.with_name(f"{self.index_file.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp_file, 'w') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(tmp_file, self.index_file)
+        except OSError:
+            try:
+                tmp_file.unlink()
+            except OSError:
+                pass
+    
     def get_tool_categories(self, config: Dict[str, Any]) -> Dict[str, Any]:
         """Get categories from tool configuration"""
         return config.get('categories', {})
@@ -0,0 +1,629 @@
+"""
+Config Model
+Compiles raw tool configs into immutable, slot-based objects
+
+Copyright (C) 2025
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import sys
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+
+class ConfigError(ValueError):
+    """A tool config does not match the expected schema"""
+
+
+QUOTE_NONE = 'none'
+QUOTE_DOUBLE = 'double'
+QUOTE_STYLES = (QUOTE_NONE, QUOTE_DOUBLE)
+
+POSITION_START = 'start'
+POSITION_END = 'end'
+POSITIONS = (POSITION_START, POSITION_END)
+
+
+class _Frozen:
+    """Base for model objects: attributes are set once in __init__"""
+    
+    __slots__ = ()
+    
+    # Slots that make up the object's value, in __init__ argument order
+    _fields = None
+    
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+    
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+    
+    def _set(self, **values):
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+    
+    def _values(self) -> tuple:
+        return tuple(getattr(self, name) for name in (self._fields or self.__slots__))
+    
+    def __reduce__(self):
+        return (type(self), self._values())
+    
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return self._values() == other._values()
+    
+    def __hash__(self):
+        return hash(self._values())
+
+
+class Option(_Frozen):
+    """A single flag a tool accepts"""
+    
+    __slots__ = ('flag', 'description', 'variable', 'prompt_text', 'conflicts', 'requires')
+    
+    def __init__(self, flag: str, description: str = '', variable: bool = False, prompt_text: str = None,
+                 conflicts: Tuple[str, ...] = (), requires: Tuple[str, ...] = ()):
+        """
+        Initialize option
+        
+        Args:
+            conflicts: Flags that cannot be combined with this one
+            requires: Flags of which at least one must also be selected
+        """
+        self._set(
+            flag=sys.intern(flag),
+            description=description,
+            variable=variable,
+            prompt_text=prompt_text,
+            conflicts=tuple(sys.intern(f) for f in conflicts),
+            requires=tuple(sys.intern(f) for f in requires)
+        )
+    
+    def __repr__(self):
+        return f"Option({self.flag!r}{', variable=True' if self.variable else ''})"
+    
+    @property
+    def prompt(self) -> str:
+        """Prompt shown when asking for the option's value"""
+        return self.prompt_text or f"Enter value for {self.flag}: "
+
+
+class Category(_Frozen):
+    """A named group of options"""
+    
+    __slots__ = ('name', 'options', 'exclusive')
+    
+    def __init__(self, name: str, options: Tuple[Option, ...] = (), exclusive: bool = False):
+        """Initialize category; at most one option of an exclusive category may be selected"""
+        self._set(name=sys.intern(name), options=tuple(options), exclusive=exclusive)
+    
+    def __repr__(self):
+        return f"Category({self.name!r}, {len(self.options)} options)"
+
+
+class RequiredParam(_Frozen):
+    """A value the user must always supply, such as a target"""
+    
+    __slots__ = ('name', 'prompt', 'description')
+    
+    def __init__(self, name: str, prompt: str = None, description: str = ''):
+        """Initialize required parameter"""
+        self._set(name=sys.intern(name), prompt=prompt or f"Enter {name}: ", description=description)
+    
+    def __repr__(self):
+        return f"RequiredParam({self.name!r})"
+
+
+class RenderArg(_Frozen):
+    """Where and how a required parameter's value goes on the command line"""
+    
+    __slots__ = ('param', 'flag', 'quote', 'position')
+    
+    def __init__(self, param: str, flag: str = '', quote: str = QUOTE_NONE, position: str = POSITION_END):
+        """
+        Initialize render argument
+        
+        Args:
+            param: Required parameter name
+            flag: Prefix such as "-u"; a prefix ending in '=' is joined without a space
+            quote: QUOTE_NONE, or QUOTE_DOUBLE to wrap the value in double quotes
+            position: POSITION_END (after the flags) or POSITION_START (right
+                      after the command, e.g. a subcommand)
+        """
+        self._set(param=sys.intern(param), flag=flag, quote=quote, position=position)
+    
+    def __repr__(self):
+        return f"RenderArg({self.param!r})"
+    
+    def format(self, value: str) -> str:
+        """Format a value as it appears on the command line"""
+        if self.quote == QUOTE_DOUBLE:
+            value = f'"{value}"'
+        if not self.flag:
+            return value
+        return self.flag + value if self.flag.endswith('=') else f"{self.flag} {value}"
+
+
+def compile_renderer(command: str, args: Iterable[RenderArg]):
+    """
+    Compile render arguments into a function (flags, params) -> command line
+    
+    Each argument is reduced to a (param, prefix, suffix) triple up front,
+    so rendering is a dict lookup and a concatenation per argument. Empty
+    or missing values are left out, as optional prompts may be skipped.
+    """
+    def pieces(position):
+        triples = []
+        for arg in args:
+            if arg.position != position:
+                continue
+            prefix = arg.flag if not arg.flag or arg.flag.endswith('=') else arg.flag + ' '
+            if arg.quote == QUOTE_DOUBLE:
+                triples.append((arg.param, prefix + '"', '"'))
+            else:
+                triples.append((arg.param, prefix, ''))
+        return tuple(triples)
+    
+    head, tail = pieces(POSITION_START), pieces(POSITION_END)
+    
+    if not head and len(tail) == 1 and not tail[0][1] and not tail[0][2]:
+        # A single bare positional, the most common shape in the catalog
+        param = tail[0][0]
+        
+        def render(flags: List[str], params: Dict[str, str]) -> str:
+            value = params.get(param)
+            if flags:
+                command_line = command + ' ' + ' '.join(flags)
+            else:
+                command_line = command
+            return command_line + ' ' + value if value else command_line
+        
+        return render
+    
+    def render(flags: List[str], params: Dict[str, str]) -> str:
+        parts = [command]
+        for param, prefix, suffix in head:
+            value = params.get(param)
+            if value:
+                parts.append(prefix + value + suffix)
+        parts.extend(flags)
+        for param, prefix, suffix in tail:
+            value = params.get(param)
+            if value:
+                parts.append(prefix + value + suffix)
+        return ' '.join(parts)
+    
+    return render
+
+
+class FlagIndex:
+    """
+    Flag lookup and precomputed flag relations for one tool
+    
+    Every flagged option gets a bit; a selection is an int with those
+    bits set. conflicts[i] and requires[i] are the masks option i may
+    not be combined with and needs one of, so checking a selection is
+    a few bitwise operations per selected flag.
+    """
+    
+    __slots__ = ('bits', 'options', 'conflicts', 'requires', 'constrained')
+    
+    def __init__(self, categories: Iterable[Category], tool_id: str = ''):
+        """
+        Build the index
+        
+        Raises:
+            ConfigError: If a conflicts/requires entry names an unknown flag
+        """
+        self.bits = {}
+        self.options = []
+        
+        for category in categories:
+            for option in category.options:
+                # Bare positional values ("flag": "") cannot be referred to
+                if option.flag and option.flag not in self.bits:
+                    self.bits[option.flag] = len(self.options)
+                    self.options.append(option)
+        
+        self.conflicts = [0] * len(self.options)
+        self.requires = [0] * len(self.options)
+        
+        for category in categories:
+            if not category.exclusive:
+                continue
+            group = 0
+            for option in category.options:
+                if option.flag in self.bits:
+                    group |= 1 << self.bits[option.flag]
+            for option in category.options:
+                if option.flag in self.bits:
+                    i = self.bits[option.flag]
+                    self.conflicts[i] |= group & ~(1 << i)
+        
+        for i, option in enumerate(self.options):
+            for flag in option.conflicts:
+                j = self._reference(tool_id, option, flag, 'conflicts')
+                # Conflicts are symmetric even if only one side declares them
+                self.conflicts[i] |= 1 << j
+                self.conflicts[j] |= 1 << i
+            for flag in option.requires:
+                self.requires[i] |= 1 << self._reference(tool_id, option, flag, 'requires')
+        
+        self.constrained = 0
+        for i in range(len(self.options)):
+            if self.conflicts[i] or self.requires[i]:
+                self.constrained |= 1 << i
+    
+    def _reference(self, tool_id: str, option: Option, flag: str, relation: str) -> int:
+        """Bit of a flag named in an option's relation"""
+        i = self.bits.get(flag)
+        if i is None:
+            raise ConfigError(f"{tool_id}: option {option.flag!r} {relation} unknown flag {flag!r}")
+        return i
+    
+    def bit(self, flag: str) -> int:
+        """
+        Get the bit of a selected flag, or -1 if the tool has no such flag
+        
+        Selected flags may carry their value ("-p 80" or '-p "80"'); trailing
+        words are dropped until a known flag matches, so multi-word flags
+        such as "--enumerate p" still resolve exactly.
+        """
+        i = self.bits.get(flag)
+        while i is None and ' ' in flag:
+            flag = flag.rsplit(' ', 1)[0]
+            i = self.bits.get(flag)
+        return -1 if i is None else i
+    
+    def lookup(self, flag: str) -> Optional[Option]:
+        """Get the option behind a selected flag"""
+        i = self.bit(flag)
+        return None if i < 0 else self.options[i]
+    
+    def mask(self, flags: Iterable[str]) -> Tuple[int, List[str]]:
+        """Get the selection mask for flags and the flags that are unknown"""
+        mask = 0
+        unknown = []
+        for flag in flags:
+            i = self.bit(flag)
+            if i < 0:
+                unknown.append(flag)
+            else:
+                mask |= 1 << i
+        return mask, unknown
+    
+    def valid(self, mask: int) -> bool:
+        """Check a selection mask; only constrained bits are visited"""
+        conflicts, requires = self.conflicts, self.requires
+        pending = mask & self.constrained
+        
+        while pending:
+            low = pending & -pending
+            i = low.bit_length() - 1
+            if mask & conflicts[i] or (requires[i] and not mask & requires[i]):
+                return False
+            pending ^= low
+        
+        return True
+    
+    def problems(self, mask: int) -> List[str]:
+        """Describe everything wrong with a selection mask"""
+        problems = []
+        
+        for i, option in enumerate(self.options):
+            if not mask >> i & 1:
+                continue
+            
+            clash = mask & self.conflicts[i]
+            for j in range(i + 1, len(self.options)):
+                if clash >> j & 1:
+                    problems.append(f"{option.flag} conflicts with {self.options[j].flag}")
+            
+            if self.requires[i] and not mask & self.requires[i]:
+                needed = [o.flag for j, o in enumerate(self.options) if self.requires[i] >> j & 1]
+                problems.append(f"{option.flag} requires {' or '.join(needed)}")
+        
+        return problems
+    
+    def validate(self, flags: Iterable[str], allow_unknown: bool = False) -> List[str]:
+        """
+        Check selected flags against the tool's config
+        
+        Args:
+            flags: Selected flags, optionally with their values
+            allow_unknown: Accept flags the config does not list
+        
+        Returns:
+            Problem descriptions; empty if the selection is valid
+        """
+        flags = list(flags)
+        mask, unknown = self.mask(flags)
+        problems = [] if allow_unknown else [f"unknown flag {flag!r}" for flag in unknown]
+        
+        # A variable option selected bare would take the next word as its value
+        for flag in flags:
+            option = self.lookup(flag)
+            if option is not None and option.variable and flag.strip() == option.flag:
+                problems.append(f"{option.flag} needs a value")
+        
+        if not self.valid(mask):
+            problems.extend(self.problems(mask))
+        
+        return problems
+
+
+class ToolSpec(_Frozen):
+    """A validated tool config"""
+    
+    _fields = ('id', 'name', 'command', 'description', 'categories', 'required', 'render', 'cache_ttl',
+               'parser')
+    __slots__ = _fields + ('flag_index', 'renderer')
+    
+    def __init__(self, tool_id: str, name: str, command: str, description: str = '',
+                 categories: Tuple[Category, ...] = (), required: Tuple[RequiredParam, ...] = (),
+                 render: Tuple[RenderArg, ...] = None, cache_ttl: float = 0, parser: str = None):
+        """
+        Initialize tool spec
+        
+        Args:
+            render: Placement of required values; defaults to every required
+                    parameter as a bare positional after the flags, in order
+            cache_ttl: Seconds a result of this tool may be reused (0: never)
+            parser: Name of the output parser for the tool's result files
+        """
+        required = tuple(required)
+        if render is None:
+            render = tuple(RenderArg(param.name) for param in required)
+        
+        self._set(
+            id=tool_id,
+            name=name,
+            command=command,
+            description=description,
+            categories=tuple(categories),
+            required=required,
+            render=tuple(render),
+            cache_ttl=cache_ttl,
+            parser=parser
+        )
+        self._set(flag_index=FlagIndex(self.categories, tool_id),
+                  renderer=compile_renderer(command, self.render))
+    
+    def __repr__(self):
+        return f"ToolSpec({self.id!r})"
+    
+    def category(self, name: str) -> Optional[Category]:
+        """Get a category by name"""
+        for category in self.categories:
+            if category.name == name:
+                return category
+        return None
+    
+    @property
+    def category_names(self) -> Tuple[str, ...]:
+        """Category names in config order"""
+        return tuple(category.name for category in self.categories)
+    
+    @property
+    def required_names(self) -> Tuple[str, ...]:
+        """Required parameter names in config order"""
+        return tuple(param.name for param in self.required)
+    
+    def options(self):
+        """Iterate over (category, option) pairs"""
+        for category in self.categories:
+            for option in category.options:
+                yield category, option
+    
+    def to_config(self) -> Dict[str, Any]:
+        """Convert back to the JSON config layout"""
+        categories = {}
+        for category in self.categories:
+            options = []
+            for option in category.options:
+                data = {'flag': option.flag, 'description': option.description}
+                if option.variable:
+                    data['variable'] = True
+                if option.prompt_text is not None:
+                    data['prompt_text'] = option.prompt_text
+                if option.conflicts:
+                    data['conflicts'] = list(option.conflicts)
+                if option.requires:
+                    data['requires'] = list(option.requires)
+                options.append(data)
+            categories[category.name] = {'options': options}
+            if category.exclusive:
+                categories[category.name]['exclusive'] = True
+        
+        args = []
+        for arg in self.render:
+            data = {'param': arg.param}
+            if arg.flag:
+                data['flag'] = arg.flag
+            if arg.quote != QUOTE_NONE:
+                data['quote'] = arg.quote
+            if arg.position != POSITION_END:
+                data['position'] = arg.position
+            args.append(data if len(data) > 1 else arg.param)
+        
+        config = {
+            'name': self.name,
+            'description': self.description,
+            'command': self.command,
+            'categories': categories,
+            'required': {
+                param.name: {'prompt': param.prompt, 'description': param.description}
+                for param in self.required
+            },
+            'render': {'args': args}
+        }
+        if self.cache_ttl:
+            config['cache_ttl'] = self.cache_ttl
+        if self.parser:
+            config['parser'] = self.parser
+        return config
+
+
+def _expect(value: Any, kind: type, where: str, optional: bool = False) -> Any:
+    """Check a config value's type"""
+    if value is None and optional:
+        return None
+    if not isinstance(value, kind):
+        expected = ' or '.join(k.__name__ for k in kind) if isinstance(kind, tuple) else kind.__name__
+        raise ConfigError(f"{where}: expected {expected}, got {type(value).__name__}")
+    return value
+
+
+def _flag_list(value: Any, where: str) -> Tuple[str, ...]:
+    """Check a list of flag names"""
+    flags = _expect(value, (list, tuple), where)
+    for flag in flags:
+        _expect(flag, str, where)
+    return tuple(flags)
+
+
+def _choice(value: Any, choices: Tuple[str, ...], where: str) -> str:
+    """Check a config value is one of a fixed set of strings"""
+    if value not in choices:
+        raise ConfigError(f"{where}: expected one of {', '.join(choices)}, got {value!r}")
+    return value
+
+
+def _render_args(tool_id: str, render: Any, required: List[RequiredParam]) -> Optional[Tuple[RenderArg, ...]]:
+    """Check a config's "render" section; None when the config has none"""
+    if render is None:
+        return None
+    if not hasattr(render, 'get'):
+        raise ConfigError(f"{tool_id}.render: expected object")
+    
+    names = [param.name for param in required]
+    args = []
+    for i, entry in enumerate(_expect(render.get('args', ()), (list, tuple), f"{tool_id}.render.args")):
+        where = f"{tool_id}.render.args[{i}]"
+        
+        if isinstance(entry, str):
+            entry = {'param': entry}
+        elif not hasattr(entry, 'get'):
+            raise ConfigError(f"{where}: expected parameter name or object")
+        
+        param = _expect(entry.get('param'), str, f"{where}.param")
+        if param not in names:
+            raise ConfigError(f"{where}: {param!r} is not a required parameter")
+        
+        args.append(RenderArg(
+            param,
+            _expect(entry.get('flag', ''), str, f"{where}.flag"),
+            _choice(entry.get('quote', QUOTE_NONE), QUOTE_STYLES, f"{where}.quote"),
+            _choice(entry.get('position', POSITION_END), POSITIONS, f"{where}.position")
+        ))
+    
+    # A required value nobody places would be asked for and then dropped
+    missing = [name for name in names if name not in {arg.param for arg in args}]
+    if missing:
+        raise ConfigError(f"{tool_id}.render: required parameter(s) not rendered: {', '.join(missing)}")
+    
+    return tuple(args)
+
+
+def compile_spec(tool_id: str, config: Dict[str, Any]) -> ToolSpec:
+    """
+    Validate a parsed config and compile it into a ToolSpec
+    
+    Args:
+        tool_id: Tool id (config file name without _config.json)
+        config: Parsed config (plain or frozen mappings both work)
+    
+    Returns:
+        Immutable tool spec
+    
+    Raises:
+        ConfigError: If the config does not match the schema
+    """
+    if not hasattr(config, 'get'):
+        raise ConfigError(f"{tool_id}: config must be an object")
+    
+    name = _expect(config.get('name'), str, f"{tool_id}.name")
+    command = _expect(config.get('command'), str, f"{tool_id}.command")
+    description = _expect(config.get('description', ''), str, f"{tool_id}.description")
+    
+    categories = []
+    raw_categories = config.get('categories') or {}
+    if not hasattr(raw_categories, 'items'):
+        raise ConfigError(f"{tool_id}.categories: expected object")
+    
+    for category_name, category_config in raw_categories.items():
+        where = f"{tool_id}.categories[{category_name!r}]"
+        if not hasattr(category_config, 'get'):
+            raise ConfigError(f"{where}: expected object")
+        
+        options = []
+        raw_options = _expect(category_config.get('options', ()), (list, tuple), f"{where}.options")
+        for i, option in enumerate(raw_options):
+            option_where = f"{where}.options[{i}]"
+            if not hasattr(option, 'get'):
+                raise ConfigError(f"{option_where}: expected object")
+            
+            # An empty flag is a bare positional value (e.g. aircrack's capture file)
+            flag = _expect(option.get('flag'), str, f"{option_where}.flag")
+            
+            options.append(Option(
+                flag,
+                _expect(option.get('description', ''), str, f"{option_where}.description"),
+                bool(_expect(option.get('variable', False), bool, f"{option_where}.variable")),
+                _expect(option.get('prompt_text'), str, f"{option_where}.prompt_text", optional=True),
+                _flag_list(option.get('conflicts', ()), f"{option_where}.conflicts"),
+                _flag_list(option.get('requires', ()), f"{option_where}.requires")
+            ))
+        
+        exclusive = _expect(category_config.get('exclusive', False), bool, f"{where}.exclusive")
+        categories.append(Category(category_name, options, exclusive))
+    
+    required = []
+    raw_required = config.get('required') or {}
+    if not hasattr(raw_required, 'items'):
+        raise ConfigError(f"{tool_id}.required: expected object")
+    
+    for param_name, param_config in raw_required.items():
+        where = f"{tool_id}.required[{param_name!r}]"
+        if not hasattr(param_config, 'get'):
+            raise ConfigError(f"{where}: expected object")
+        
+        required.append(RequiredParam(
+            param_name,
+            _expect(param_config.get('prompt'), str, f"{where}.prompt", optional=True),
+            _expect(param_config.get('description', ''), str, f"{where}.description")
+        ))
+    
+    render = _render_args(tool_id, config.get('render'), required)
+    
+    cache_ttl = config.get('cache_ttl', 0)
+    # bool is an int subclass, but "cache_ttl": true is a mistake
+    if isinstance(cache_ttl, bool) or not isinstance(cache_ttl, (int, float)) or cache_ttl < 0:
+        raise ConfigError(f"{tool_id}.cache_ttl: expected a number of seconds >= 0, got {cache_ttl!r}")
+    
+    parser = _expect(config.get('parser'), str, f"{tool_id}.parser", optional=True)
+    
+    return ToolSpec(tool_id, name, command, description, categories, required, render, cache_ttl, parser)
+
+
+def as_spec(config: Any, tool_id: str = None) -> ToolSpec:
+    """Accept a ToolSpec or a raw config dict, compiling the latter"""
+    if isinstance(config, ToolSpec):
+        return config
+    
+    if tool_id is None:
+        command = config.get('command') if hasattr(config, 'get') else None
+        tool_id = (command or '').split(' ')[0] or 'custom'
+    return compile_spec(tool_id, config)
@@ -17,8 +17,13 @@ You should have received a copy of the GNU Affero General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
-from typing import List, Dict, Any, Tuple
-import os
+import atexit
+from typing import List, Dict, Any, Sequence, Tuple
+from utils.renderer import Renderer
+
+
+# Menus longer than this are shown a page at a time with a filter
+PAGED_MENU_THRESHOLD = 20
 
 
 class Colors:
@@ -38,49 +43,59 @@ class Colors:
 class Display:
     """Handles terminal output and formatting"""
     
+    # Shared frame-buffered output; everything on screen goes through it
+    renderer = Renderer()
+    
     @staticmethod
     def clear_screen():
-        """Clear the terminal screen"""
-        os.system('clear' if os.name == 'posix' else 'cls')
+        """Clear the terminal screen and start a new frame"""
+        Display.renderer.clear()
+    
+    @staticmethod
+    def flush():
+        """Write any buffered output now"""
+        Display.renderer.flush()
+    
+    @staticmethod
+    def print_text(text: str = ''):
+        """Print plain text"""
+        Display.renderer.line(text)
     
     @staticmethod
     def print_header(text: str):
         """Print a formatted header"""
-        print(f"\n{Colors.BOLD}{Colors.CYAN}{'='*60}{Colors.END}")
-        print(f"{Colors.BOLD}{Colors.CYAN}{text.center(60)}{Colors.END}")
-        print(f"{Colors.BOLD}{Colors.CYAN}{'='*60}{Colors.END}\n")
+        rule = f"{Colors.BOLD}{Colors.CYAN}{'='*60}{Colors.END}"
+        Display.renderer.write(f"\n{rule}\n{Colors.BOLD}{Colors.CYAN}{text.center(60)}{Colors.END}\n{rule}\n\n")
     
     @staticmethod
     def print_subheader(text: str):
         """Print a formatted subheader"""
-        print(f"\n{Colors.BOLD}{Colors.BLUE}▸ {text}{Colors.END}")
-        print(f"{Colors.GRAY}{'-'*55}{Colors.END}\n")
+        Display.renderer.write(f"\n{Colors.BOLD}{Colors.BLUE}▸ {text}{Colors.END}\n{Colors.GRAY}{'-'*55}{Colors.END}\n\n")
     
     @staticmethod
     def print_info(text: str):
         """Print info message"""
-        print(f"{Colors.CYAN}ℹ {text}{Colors.END}")
+        Display.renderer.line(f"{Colors.CYAN}ℹ {text}{Colors.END}")
     
     @staticmethod
     def print_success(text: str):
         """Print success message"""
-        print(f"{Colors.GREEN}✓ {text}{Colors.END}")
+        Display.renderer.line(f"{Colors.GREEN}✓ {text}{Colors.END}")
     
     @staticmethod
     def print_error(text: str):
         """Print error message"""
-        print(f"{Colors.RED}✗ {text}{Colors.END}")
+        Display.renderer.line(f"{Colors.RED}✗ {text}{Colors.END}")
     
     @staticmethod
     def print_warning(text: str):
         """Print warning message"""
-        print(f"{Colors.YELLOW}⚠ {text}{Colors.END}")
+        Display.renderer.line(f"{Colors.YELLOW}⚠ {text}{Colors.END}")
     
     @staticmethod
     def print_command(command: str):
         """Print a command in highlighted format"""
-        print(f"\n{Colors.BOLD}{Colors.GREEN}Command:{Colors.END}")
-        print(f"{Colors.YELLOW}{command}{Colors.END}\n")
+        Display.renderer.write(f"\n{Colors.BOLD}{Colors.GREEN}Command:{Colors.END}\n{Colors.YELLOW}{command}{Colors.END}\n\n")
 
 
 class Menu:
@@ -99,19 +114,16 @@ class Menu:
         Returns:
             List of selected indices
         """
-        Display.print_subheader(title)
-        
-        for i, (key, desc) in enumerate(options, 1):
-            print(f"  {Colors.BOLD}{i}{Colors.END}. {Colors.CYAN}{key}{Colors.END}")
-            if desc:
-                print(f"     {Colors.GRAY}{desc}{Colors.END}")
+        if len(options) > PAGED_MENU_THRESHOLD:
+            from utils.picker import PagedMenu
+            return PagedMenu(title, options, allow_multiple).run()
         
-        print()
+        Menu.render_menu(title, options)
         
         while True:
             try:
                 if allow_multiple:
-                    user_input = input(f"{Colors.BOLD}Select options (comma-separated, e.g., 1,3,5) [1-{len(options)}]: {Colors.END}").strip()
+                    user_input = Display.renderer.input(f"{Colors.BOLD}Select options (comma-separated, e.g., 1,3,5) [1-{len(options)}]: {Colors.END}").strip()
                     selections = [int(x.strip()) - 1 for x in user_input.split(',')]
                     
                     if all(0 <= s < len(options) for s in selections):
@@ -119,7 +131,7 @@ class Menu:
                     else:
                         Display.print_error("Invalid selection. Please try again.")
                 else:
-                    user_input = input(f"{Colors.BOLD}Select an option [1-{len(options)}]: {Colors.END}").strip()
+                    user_input = Display.renderer.input(f"{Colors.BOLD}Select an option [1-{len(options)}]: {Colors.END}").strip()
                     selection = int(user_input) - 1
                     
                     if 0 <= selection < len(options):
@@ -130,6 +142,19 @@ class Menu:
             except ValueError:
                 Display.print_error("Please enter valid numbers.")
     
+    @staticmethod
+    def render_menu(title: str, options: List[Tuple[str, str]]):
+        """Write a numbered menu as one block of output"""
+        lines = [f"\n{Colors.BOLD}{Colors.BLUE}▸ {title}{Colors.END}", f"{Colors.GRAY}{'-'*55}{Colors.END}", ""]
+        
+        for i, (key, desc) in enumerate(options, 1):
+            lines.append(f"  {Colors.BOLD}{i}{Colors.END}. {Colors.CYAN}{key}{Colors.END}")
+            if desc:
+                lines.append(f"     {Colors.GRAY}{desc}{Colors.END}")
+        
+        lines.append("\n")
+        Display.renderer.write('\n'.join(lines))
+    
     @staticmethod
     def display_tools(tools: List[Dict[str, str]]) -> int:
         """Display available tools and get selection"""
@@ -138,11 +163,11 @@ class Menu:
         return indices[0]
     
     @staticmethod
-    def display_categories(categories: Dict[str, Any]) -> List[str]:
-        """Display tool categories and get selections"""
-        options = [(cat, "") for cat in categories.keys()]
+    def display_categories(categories: Sequence[Any]) -> List[Any]:
+        """Display tool categories (config model Category objects) and get selections"""
+        options = [(category.name, "") for category in categories]
         indices = Menu.display_menu("Select Categories (you can select multiple)", options, allow_multiple=True)
-        return [list(categories.keys())[i] for i in indices]
+        return [categories[i] for i in indices]
     
     @staticmethod
     def get_text_input(prompt: str, required: bool = True, hint: str = None) -> str:
@@ -152,7 +177,7 @@ class Menu:
             full_prompt += f" {Colors.GRAY}({hint}){Colors.END}"
         
         while True:
-            value = input(full_prompt).strip()
+            value = Display.renderer.input(full_prompt).strip()
             
             if not value and required:
                 Display.print_error("This field is required.")
@@ -163,19 +188,24 @@ class Menu:
     @staticmethod
     def confirm(message: str) -> bool:
         """Ask for yes/no confirmation"""
-        response = input(f"{Colors.BOLD}{message} [y/N]: {Colors.END}").strip().lower()
+        response = Display.renderer.input(f"{Colors.BOLD}{message} [y/N]: {Colors.END}").strip().lower()
         return response in ['y', 'yes']
     
     @staticmethod
-    def display_options(category_name: str, options: List[Dict[str, Any]]) -> List[str]:
-        """Display options for a category and get selections"""
-        opt_list = []
-        for opt in options:
-            flag = opt.get('flag', '')
-            desc = opt.get('description', '')
-            opt_list.append((flag, desc))
+    def pause():
+        """Wait for Enter"""
+        Display.renderer.input(f"{Colors.BOLD}Press Enter to continue...{Colors.END}")
+    
+    @staticmethod
+    def display_options(category_name: str, options: Sequence[Any]) -> List[Any]:
+        """Display options (config model Option objects) for a category and get selections"""
+        opt_list = [(opt.flag, opt.description) for opt in options]
         
         indices = Menu.display_menu(f"Select options for {category_name}", opt_list, allow_multiple=True)
         selected_options = [options[i] for i in indices]
         
         return selected_options
+
+
+# A frame still open at exit would otherwise never reach the terminal
+atexit.register(Display.flush)
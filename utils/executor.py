@@ -0,0 +1,544 @@
+"""
+Command Executor
+Runs queued commands concurrently with a bounded number of processes
+
+Copyright (C) 2025
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import asyncio
+import os
+import re
+import shlex
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional, Union, Callable
+
+from utils.display import Colors, Display
+from utils.instrumentation import span, count
+from utils.scheduler import Scheduler, target_host, DEFAULT_BACKOFF
+from utils.output_capture import (
+    OutputCapture, DEFAULT_MAX_LOG_BYTES, DEFAULT_BACKUP_COUNT, DEFAULT_TAIL_BYTES
+)
+
+
+# Job states
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+TIMEOUT = 'timeout'
+CANCELLED = 'cancelled'
+
+FINISHED_STATES = (DONE, FAILED, TIMEOUT, CANCELLED)
+
+# What to do with a job's stdout/stderr
+OUTPUT_INHERIT = 'inherit'
+OUTPUT_DISCARD = 'discard'
+OUTPUT_CAPTURE = 'capture'
+
+# Bytes read from a job's output pipe at a time
+READ_CHUNK_SIZE = 64 * 1024
+
+STATUS_COLORS = {
+    QUEUED: Colors.GRAY,
+    RUNNING: Colors.CYAN,
+    DONE: Colors.GREEN,
+    FAILED: Colors.RED,
+    TIMEOUT: Colors.YELLOW,
+    CANCELLED: Colors.YELLOW
+}
+
+
+def split_command(command: Union[str, List[str]]) -> List[str]:
+    """Split a command line into an argv list without involving a shell"""
+    if isinstance(command, str):
+        argv = shlex.split(command)
+    else:
+        argv = list(command)
+    
+    if not argv:
+        raise ValueError("Empty command")
+    
+    return argv
+
+
+class Job:
+    """A single queued command"""
+    
+    def __init__(self, job_id: int, command: Union[str, List[str]], timeout: float = None, label: str = None,
+                 force: bool = False, priority: int = 0, host: str = None, template: str = None):
+        """
+        Initialize job
+        
+        Args:
+            force: Run even if a cached result exists
+            priority: Higher priorities start first
+            host: Target host for per-host limits (default: guessed from the arguments)
+            template: Name of the saved template the command came from
+        """
+        self.id = job_id
+        self.argv = split_command(command)
+        self.command = command if isinstance(command, str) else shlex.join(self.argv)
+        self.label = label or self.argv[0]
+        self.timeout = timeout
+        self.priority = priority
+        self.host = host or target_host(self.argv)
+        self.attempts = 0
+        self.status = QUEUED
+        self.returncode = None
+        self.error = None
+        self.started = None
+        self.finished = None
+        self.capture = None
+        self.force = force
+        self.cached = None      # CachedResult the job was answered from
+        self.template = template
+        self.findings = None    # Findings stored in the results database
+        self._process = None
+        self._cache_output = None
+        self._cancel_requested = False
+    
+    @property
+    def duration(self) -> Optional[float]:
+        """Wall-clock run time in seconds, if the job has started"""
+        if self.started is None:
+            return None
+        return (self.finished or time.monotonic()) - self.started
+    
+    @property
+    def log_path(self) -> Optional[Path]:
+        """Path of the captured output log, if output is captured"""
+        return self.capture.path if self.capture else None
+    
+    @property
+    def is_finished(self) -> bool:
+        """Check whether the job reached a final state"""
+        return self.status in FINISHED_STATES
+
+
+class CommandExecutor:
+    """Runs jobs with asyncio subprocesses, started in order by a Scheduler"""
+    
+    def __init__(self, max_concurrency: int = 4, default_timeout: float = None, output: str = OUTPUT_INHERIT,
+                 capture_dir: Path = None, compression: str = None, tee: bool = False,
+                 max_log_bytes: int = DEFAULT_MAX_LOG_BYTES, backup_count: int = DEFAULT_BACKUP_COUNT,
+                 tail_bytes: int = DEFAULT_TAIL_BYTES, result_cache=None, per_host: int = None,
+                 host_rate: float = None, retries: int = 0, backoff: float = DEFAULT_BACKOFF, scope=None,
+                 results_db=None, config_loader=None):
+        """
+        Initialize executor
+        
+        Args:
+            max_concurrency: Maximum number of processes running at once
+            default_timeout: Per-job timeout in seconds (None for no limit)
+            output: OUTPUT_INHERIT to share the terminal, OUTPUT_DISCARD to drop output,
+                    OUTPUT_CAPTURE to stream output into per-job log files
+            capture_dir: Directory for captured logs (OUTPUT_CAPTURE only)
+            compression: None, 'gzip' or 'zstd' for captured logs
+            tee: Also echo captured output to the terminal
+            max_log_bytes: Rotate a job's log after this many bytes
+            backup_count: Rotated log segments kept per job
+            tail_bytes: Output kept in memory per job for the tail view
+            result_cache: ResultCache answering repeated commands; only
+                          successful captured runs are stored in it
+            per_host: Maximum jobs running at once against one target host
+            host_rate: Maximum jobs started per second against one target host
+            retries: Extra attempts for jobs that exit non-zero
+            backoff: Seconds before the first retry; doubled for each further one
+            scope: Scope that submitted commands must stay inside
+            results_db: ResultsDB that the parsed output of finished jobs goes into
+            config_loader: Loader used to find each command's tool spec, so
+                           the scope check can tell flag values from targets
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        if output == OUTPUT_CAPTURE and capture_dir is None:
+            raise ValueError("capture_dir is required to capture output")
+        
+        self.max_concurrency = max_concurrency
+        self.default_timeout = default_timeout
+        self.output = output
+        self.capture_dir = Path(capture_dir) if capture_dir else None
+        self.compression = compression
+        self.tee = tee
+        self.max_log_bytes = max_log_bytes
+        self.backup_count = backup_count
+        self.tail_bytes = tail_bytes
+        self.result_cache = result_cache
+        self.per_host = per_host
+        self.host_rate = host_rate
+        self.retries = retries
+        self.backoff = backoff
+        self.scope = scope
+        self.results_db = results_db
+        self.config_loader = config_loader
+        self.scheduler = None   # Scheduler of the latest run, kept for its stats
+        self.jobs = []
+        self._next_id = 1
+    
+    def submit(self, command: Union[str, List[str]], timeout: float = None, label: str = None,
+               force: bool = False, priority: int = 0, host: str = None, template: str = None) -> Job:
+        """
+        Queue a command; returns the created job (see Job for the options)
+        
+        Raises:
+            ScopeError: If the command names a target outside the scope
+        """
+        job = Job(self._next_id, command, timeout if timeout is not None else self.default_timeout, label, force,
+                  priority, host, template)
+        if self.scope is not None:
+            spec = self.config_loader.spec_for_command(job.argv[0]) if self.config_loader is not None else None
+            self.scope.check_command(job.argv, spec)
+        self._next_id += 1
+        self.jobs.append(job)
+        return job
+    
+    def get_job(self, job_id: int) -> Optional[Job]:
+        """Look up a job by id"""
+        for job in self.jobs:
+            if job.id == job_id:
+                return job
+        return None
+    
+    def cancel(self, job_id: int) -> bool:
+        """Cancel a queued or running job"""
+        job = self.get_job(job_id)
+        
+        if job is None or job.is_finished:
+            return False
+        
+        job._cancel_requested = True
+        
+        if job.status == QUEUED:
+            job.status = CANCELLED
+        elif job._process is not None and job._process.returncode is None:
+            job._process.kill()
+        
+        return True
+    
+    def cancel_all(self):
+        """Cancel every unfinished job"""
+        for job in self.jobs:
+            self.cancel(job.id)
+    
+    def clear_finished(self):
+        """Forget jobs that reached a final state"""
+        self.jobs = [job for job in self.jobs if not job.is_finished]
+    
+    def pending_jobs(self) -> List[Job]:
+        """Get jobs still waiting to run"""
+        return [job for job in self.jobs if job.status == QUEUED]
+    
+    def _stdio(self):
+        """Get the stdin/stdout/stderr targets for new processes"""
+        if self.output == OUTPUT_DISCARD:
+            devnull = asyncio.subprocess.DEVNULL
+            return devnull, devnull, devnull
+        if self.output == OUTPUT_CAPTURE:
+            # stderr is merged so the log keeps the original interleaving
+            stdin = None if self.tee else asyncio.subprocess.DEVNULL
+            return stdin, asyncio.subprocess.PIPE, asyncio.subprocess.STDOUT
+        # Interactive tools keep the terminal
+        return None, None, None
+    
+    def _open_capture(self, job: Job) -> OutputCapture:
+        """Create the output capture for a job"""
+        label = re.sub(r'[^A-Za-z0-9_-]+', '_', job.label)
+        now = time.time()
+        # Job ids restart in every process; the pid and milliseconds keep
+        # concurrent runs sharing a capture directory from colliding
+        timestamp = f"{time.strftime('%Y%m%d_%H%M%S', time.localtime(now))}_{int(now % 1 * 1000):03d}"
+        path = self.capture_dir / f"{timestamp}_{os.getpid()}_job{job.id}_{label}.log"
+        return OutputCapture(path, self.compression, self.max_log_bytes, self.backup_count, self.tail_bytes)
+    
+    async def _pump_output(self, job: Job, stream: asyncio.StreamReader):
+        """Copy a job's output pipe into its capture in fixed-size chunks"""
+        echo = sys.stdout.buffer if self.tee else None
+        if echo is not None:
+            # Echoed output lands wherever the cursor is; the next frame redraws fully
+            Display.renderer.invalidate()
+        
+        while True:
+            chunk = await stream.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            
+            job.capture.write(chunk)
+            if job._cache_output is not None:
+                job._cache_output += chunk
+                if len(job._cache_output) > self.result_cache.max_bytes:
+                    # Too big to be worth caching; stop collecting
+                    job._cache_output = None
+            if echo is not None:
+                echo.write(chunk)
+                echo.flush()
+    
+    async def _wait_process(self, job: Job) -> int:
+        """Wait for a job's process, draining captured output"""
+        if job._process.stdout is None:
+            return await job._process.wait()
+        
+        await asyncio.gather(self._pump_output(job, job._process.stdout), job._process.wait())
+        return job._process.returncode
+    
+    def _cached_result(self, job: Job):
+        """Look up a fresh cached result for a job, unless it is forced to run"""
+        if self.result_cache is None or job.force:
+            return None
+        try:
+            return self.result_cache.get(job.argv)
+        except Exception:
+            # A broken cache must never stop a command from running
+            return None
+    
+    def _replay(self, job: Job, result):
+        """Finish a job from a cached result as if it had just run"""
+        job.cached = result
+        job.started = job.finished = time.monotonic()
+        job.returncode = result.returncode
+        
+        if self.output == OUTPUT_CAPTURE:
+            job.capture = self._open_capture(job)
+            try:
+                job.capture.write(result.output)
+            finally:
+                job.capture.close()
+        
+        if self.output == OUTPUT_INHERIT or self.tee:
+            Display.renderer.invalidate()
+            sys.stdout.buffer.write(result.output)
+            sys.stdout.buffer.flush()
+        
+        job.status = DONE if job.returncode == 0 else FAILED
+        count('executor.cache_hits')
+    
+    def _store_result(self, job: Job):
+        """Remember a successful captured run"""
+        output, job._cache_output = job._cache_output, None
+        if output is None or job.status != DONE:
+            return
+        try:
+            if self.result_cache.put(job.argv, job.returncode, bytes(output), job.finished - job.started):
+                count('executor.cache_stores')
+        except Exception:
+            pass
+    
+    async def _ingest(self, job: Job):
+        """Store the parsed findings of a finished job"""
+        try:
+            # Parsing a large scan must not hold up the other jobs' output
+            job.findings = await asyncio.get_running_loop().run_in_executor(None, self.results_db.ingest_job, job)
+        except Exception:
+            # Unparseable output must never fail the job itself
+            job.findings = None
+        if job.findings:
+            count('executor.findings', job.findings)
+    
+    async def _run_job(self, job: Job, on_update: Callable = None) -> bool:
+        """
+        Run a single job once the scheduler starts it
+        
+        Returns:
+            Whether the job exited non-zero and may be retried
+        """
+        if job.status != QUEUED:
+            return False
+        
+        job.attempts += 1
+        cached = self._cached_result(job)
+        if cached is not None:
+            self._replay(job, cached)
+            if on_update:
+                on_update(job)
+            return False
+        
+        job.status = RUNNING
+        job.started = time.monotonic()
+        if on_update:
+            on_update(job)
+        
+        with span('executor.job', tool=job.label) as s:
+            stdin, stdout, stderr = self._stdio()
+            
+            try:
+                if self.output == OUTPUT_CAPTURE:
+                    job.capture = self._open_capture(job)
+                    if self.result_cache is not None and self.result_cache.ttl_for(job.argv) > 0:
+                        job._cache_output = bytearray()
+                
+                job._process = await asyncio.create_subprocess_exec(
+                    *job.argv, stdin=stdin, stdout=stdout, stderr=stderr
+                )
+            except (OSError, ValueError) as e:
+                job.status = FAILED
+                job.error = str(e)
+            else:
+                try:
+                    job.returncode = await asyncio.wait_for(self._wait_process(job), timeout=job.timeout)
+                    if job._cancel_requested:
+                        job.status = CANCELLED
+                    else:
+                        job.status = DONE if job.returncode == 0 else FAILED
+                except asyncio.TimeoutError:
+                    job._process.kill()
+                    job.returncode = await job._process.wait()
+                    job.status = TIMEOUT
+                except asyncio.CancelledError:
+                    if job._process.returncode is None:
+                        job._process.kill()
+                        await job._process.wait()
+                    job.status = CANCELLED
+                    job.finished = time.monotonic()
+                    raise
+                finally:
+                    job._process = None
+            finally:
+                if job.capture is not None:
+                    job.capture.close()
+            
+            s.set(status=job.status, returncode=job.returncode)
+        count(f'executor.jobs_{job.status}')
+        
+        job.finished = time.monotonic()
+        if job._cache_output is not None:
+            self._store_result(job)
+        if self.results_db is not None and job.status in (DONE, TIMEOUT):
+            await self._ingest(job)
+        if on_update:
+            on_update(job)
+        
+        # Missing binaries (no returncode) would only fail again
+        return job.status == FAILED and job.returncode is not None
+    
+    def _requeue(self, job: Job, delay: float):
+        """Put a failed job back in the queue for another attempt"""
+        job.status = QUEUED
+        job.returncode = None
+        job.started = job.finished = None
+        count('executor.job_retries')
+    
+    async def run(self, on_update: Callable = None) -> List[Job]:
+        """
+        Run every queued job
+        
+        Args:
+            on_update: Called with a job whenever it starts or finishes
+        
+        Returns:
+            The jobs that were run in this call
+        """
+        jobs = self.pending_jobs()
+        
+        self.scheduler = Scheduler(self.max_concurrency, self.per_host, self.host_rate,
+                                   retries=self.retries, backoff=self.backoff)
+        for job in jobs:
+            self.scheduler.submit(job, job.priority, job.host)
+        
+        async def runner(job: Job) -> bool:
+            return await self._run_job(job, on_update)
+        
+        try:
+            # Jobs cancelled while waiting are dropped instead of started
+            await self.scheduler.run(runner, skip=lambda job: job.status != QUEUED, on_retry=self._requeue)
+        except asyncio.CancelledError:
+            for job in jobs:
+                if job.status == QUEUED:
+                    job.status = CANCELLED
+            raise
+        
+        return jobs
+    
+    async def _live_status(self, interval: float):
+        """Redraw the status table until cancelled"""
+        renderer = Display.renderer
+        while True:
+            # Only rows whose status changed are rewritten between ticks
+            renderer.clear()
+            renderer.line(self.status_table())
+            renderer.flush()
+            await asyncio.sleep(interval)
+    
+    async def _run_with_status(self, live: bool, interval: float) -> List[Job]:
+        """Run jobs, optionally with a live status table"""
+        if not live:
+            return await self.run()
+        
+        ticker = asyncio.ensure_future(self._live_status(interval))
+        try:
+            return await self.run()
+        finally:
+            ticker.cancel()
+            await asyncio.gather(ticker, return_exceptions=True)
+    
+    def run_all(self, live: bool = False, interval: float = 0.5) -> List[Job]:
+        """
+        Run every queued job from synchronous code
+        
+        Args:
+            live: Redraw a status table while jobs run
+            interval: Seconds between status table redraws
+        
+        Returns:
+            The jobs that were run
+        """
+        jobs = self.pending_jobs()
+        
+        try:
+            asyncio.run(self._run_with_status(live, interval))
+        except KeyboardInterrupt:
+            for job in jobs:
+                if not job.is_finished:
+                    job.status = CANCELLED
+        
+        if live:
+            Display.print_text(self.status_table())
+        
+        return jobs
+    
+    def status_table(self, width: int = 60) -> str:
+        """Render a table of jobs and their states"""
+        lines = [
+            f"{Colors.BOLD}{'ID':>4}  {'STATUS':<10} {'EXIT':>4} {'TIME':>8}  COMMAND{Colors.END}"
+        ]
+        
+        for job in self.jobs:
+            exit_code = '' if job.returncode is None else str(job.returncode)
+            duration = '' if job.duration is None else f"{job.duration:.1f}s"
+            command = job.command if len(job.command) <= width else job.command[:width - 3] + '...'
+            color = STATUS_COLORS.get(job.status, '')
+            status = 'cached' if job.cached else job.status
+            
+            lines.append(
+                f"{job.id:>4}  {color}{status:<10}{Colors.END} {exit_code:>4} {duration:>8}  {command}"
+            )
+        
+        counts = {}
+        for job in self.jobs:
+            counts[job.status] = counts.get(job.status, 0) + 1
+        summary = ', '.join(f"{count} {status}" for status, count in counts.items())
+        if summary and self.scheduler is not None and self.scheduler.started:
+            stats = self.scheduler.stats()
+            summary += (f"; queue depth {stats['depth']} (max {stats['max_depth']}), "
+                        f"wait avg {stats['wait_mean']:.1f}s / p95 {stats['wait_p95']:.1f}s")
+            if stats['retried']:
+                summary += f", {stats['retried']} retried"
+        findings = sum(job.findings or 0 for job in self.jobs)
+        if findings:
+            summary += f"; {findings} findings stored"
+        lines.append(f"{Colors.GRAY}{summary or 'No jobs queued'}{Colors.END}")
+        
+        return '\n'.join(lines)
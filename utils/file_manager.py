@@ -18,23 +18,65 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
 import os
-import json
+import sys
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterable, List, Optional, Tuple
 from datetime import datetime
+from utils.command_template import CommandTemplate
+from utils.instrumentation import span, count, traced
 
 
 class FileManager:
     """Handles file operations for commands and templates"""
     
-    def __init__(self, templates_dir: str = None):
-        """Initialize file manager"""
+    def __init__(self, templates_dir: str = None, output_dir: str = None, template_backend: str = None):
+        """
+        Initialize file manager
+        
+        Args:
+            templates_dir: Directory for templates and saved commands
+            output_dir: Directory for captured command output
+            template_backend: 'sqlite' (default) or 'json'; falls back to
+                              $SHADOWCASTER_TEMPLATE_BACKEND
+        """
         if templates_dir is None:
             templates_dir = os.path.join(os.path.dirname(__file__), '..', 'templates')
         
+        if output_dir is None:
+            output_dir = os.path.join(os.path.dirname(__file__), '..', 'output')
+        
+        # Directories are created on first write, not here
         self.templates_dir = Path(templates_dir)
-        self.templates_dir.mkdir(exist_ok=True)
+        self.output_dir = Path(output_dir)
+        
+        if template_backend is None:
+            template_backend = os.environ.get('SHADOWCASTER_TEMPLATE_BACKEND', 'sqlite')
+        
+        if template_backend not in ('json', 'sqlite'):
+            raise ValueError(f"Unknown template backend: {template_backend}")
+        
+        self.template_backend = template_backend
+        self._template_store = None
+    
+    @property
+    def template_store(self):
+        """Template storage backend, created on first use"""
+        if self._template_store is None:
+            from utils.template_store import JSONTemplateStore, SQLiteTemplateStore, TEMPLATE_DB_FILE
+            
+            if self.template_backend == 'json':
+                self._template_store = JSONTemplateStore(self.templates_dir)
+            else:
+                self._template_store = SQLiteTemplateStore(self.templates_dir / TEMPLATE_DB_FILE,
+                                                           import_dir=self.templates_dir)
+        
+        return self._template_store
     
+    def get_output_dir(self) -> Path:
+        """Get today's directory for captured command output (created on first write)"""
+        return self.output_dir / datetime.now().strftime("%Y%m%d")
+    
+    @traced('files.save_command')
     def save_command_to_file(self, command: str, filename: str = None) -> Optional[str]:
         """Save command to a file"""
         if filename is None:
@@ -48,6 +90,7 @@ class FileManager:
         file_path = self.templates_dir / filename
         
         try:
+            self.templates_dir.mkdir(parents=True, exist_ok=True)
             with open(file_path, 'w') as f:
                 f.write("#!/bin/bash\n")
                 f.write("# Generated command - Always review before executing\n\n")
@@ -60,8 +103,10 @@ class FileManager:
             print(f"Error saving file: {e}")
             return None
     
-    def save_template(self, name: str, tool: str, command: str, description: str = "") -> Optional[str]:
-        """Save command template"""
+    @traced('templates.save')
+    def save_template(self, name: str, tool: str, command: str, description: str = "",
+                      compiled: CommandTemplate = None) -> Optional[str]:
+        """Save command template, optionally with its compiled form"""
         template = {
             'name': name,
             'tool': tool,
@@ -70,95 +115,289 @@ class FileManager:
             'created': datetime.now().isoformat()
         }
         
-        template_file = self.templates_dir / f"{name}.json"
+        if compiled is not None:
+            template['compiled'] = compiled.to_dict()
         
-        try:
-            with open(template_file, 'w') as f:
-                json.dump(template, f, indent=2)
-            
-            return str(template_file)
-        
-        except IOError as e:
-            print(f"Error saving template: {e}")
-            return None
+        return self.template_store.save(template)
     
+    @traced('templates.load')
     def load_template(self, name: str) -> Optional[Dict[str, Any]]:
         """Load a saved template"""
-        template_file = self.templates_dir / f"{name}.json"
+        return self.template_store.load(name)
+    
+    def load_compiled_template(self, name: str) -> Optional[CommandTemplate]:
+        """Load the compiled form of a saved template, if it has one"""
+        template = self.load_template(name)
         
-        if not template_file.exists():
+        if not template or not template.get('compiled'):
             return None
         
         try:
-            with open(template_file, 'r') as f:
-                return json.load(f)
-        
-        except json.JSONDecodeError:
+            return CommandTemplate.from_dict(template['compiled'])
+        except (KeyError, TypeError):
             return None
     
-    def list_templates(self) -> list:
-        """List all saved templates"""
-        templates = []
+    @traced('templates.list')
+    def list_templates(self, offset: int = 0, limit: int = None, prefix: str = None) -> list:
+        """
+        List saved templates sorted by name
         
-        for template_file in self.templates_dir.glob("*.json"):
-            try:
-                with open(template_file, 'r') as f:
-                    template = json.load(f)
-                    templates.append({
-                        'name': template_file.stem,
-                        'tool': template.get('tool'),
-                        'description': template.get('description', ''),
-                        'command': template.get('command', '')
-                    })
-            except json.JSONDecodeError:
-                continue
-        
-        return sorted(templates, key=lambda x: x['name'])
+        Args:
+            offset: Number of templates to skip (for paging)
+            limit: Maximum number of templates to return (None for all)
+            prefix: Only list templates whose name starts with this
+        """
+        return self.template_store.list(offset, limit, prefix)
+    
+    @traced('templates.count')
+    def count_templates(self, prefix: str = None) -> int:
+        """Count saved templates"""
+        return self.template_store.count(prefix)
     
+    @traced('templates.delete')
     def delete_template(self, name: str) -> bool:
         """Delete a template"""
-        template_file = self.templates_dir / f"{name}.json"
+        return self.template_store.delete(name)
+    
+    @traced('templates.delete')
+    def delete_templates(self, names: List[str]) -> int:
+        """Delete several templates at once"""
+        return self.template_store.delete_many(names)
+    
+    @traced('templates.clear')
+    def clear_templates(self) -> int:
+        """Delete all templates"""
+        return self.template_store.clear()
+
+
+# Clipboard commands in order of preference: (name, argv, environment
+# variable that must be set for the command to work)
+CLIPBOARD_COMMANDS = (
+    ('wl-copy', ['wl-copy'], 'WAYLAND_DISPLAY'),
+    ('xclip', ['xclip', '-selection', 'clipboard'], 'DISPLAY'),
+    ('xsel', ['xsel', '--clipboard', '--input'], 'DISPLAY'),
+    ('pbcopy', ['pbcopy'], None),
+    ('clip.exe', ['clip.exe'], None)
+)
+
+# Terminal escape backend: the terminal itself sets the clipboard, which
+# works over SSH and needs no child process
+OSC52 = 'osc52'
+
+# Many terminals drop larger OSC 52 payloads
+OSC52_MAX_BYTES = 100000
+
+# Forces a backend (a command name, 'osc52' or 'none')
+CLIPBOARD_ENV = 'SHADOWCASTER_CLIPBOARD'
+
+# Environment that decides which backend works; a cached result is only
+# reused while all of it is unchanged
+CLIPBOARD_ENV_KEYS = ('PATH', 'DISPLAY', 'WAYLAND_DISPLAY', 'SSH_CONNECTION', 'SSH_TTY', 'TMUX', 'TERM',
+                      CLIPBOARD_ENV)
+
+
+def _default_clipboard_cache() -> Path:
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return Path(cache_home) / 'shadowcaster' / 'clipboard.json'
+
+
+def osc52_sequence(text: str, tmux: bool = False) -> str:
+    """Terminal escape that puts text on the clipboard"""
+    import base64
+    
+    payload = base64.b64encode(text.encode('utf-8')).decode('ascii')
+    sequence = f"\033]52;c;{payload}\a"
+    if tmux:
+        # tmux passes the sequence on to the outer terminal when wrapped in DCS
+        sequence = "\033Ptmux;" + sequence.replace("\033", "\033\033") + "\033\\"
+    return sequence
+
+
+class ClipboardManager:
+    """
+    Handles clipboard operations
+    
+    The backend is resolved once per process with shutil.which (no shell);
+    a clipboard command is remembered in an on-disk cache keyed by the
+    relevant environment, so later runs skip the PATH search too. Set cache_file to None to
+    keep the result in memory only.
+    """
+    
+    cache_file: Optional[Path] = _default_clipboard_cache()
+    
+    # (name, argv) of the resolved backend; None until detect_backend() runs
+    _backend = None
+    
+    @staticmethod
+    def _environment() -> Dict[str, str]:
+        return {key: os.environ.get(key, '') for key in CLIPBOARD_ENV_KEYS}
+    
+    @staticmethod
+    def _has_terminal() -> bool:
+        try:
+            return sys.stdout.isatty() or os.path.exists('/dev/tty')
+        except (AttributeError, ValueError):
+            return False
+    
+    @classmethod
+    def _resolve(cls) -> Tuple[Optional[str], Optional[List[str]]]:
+        """Find the best working backend for the current environment"""
+        import shutil
+        
+        forced = os.environ.get(CLIPBOARD_ENV, '').strip().lower()
+        if forced == 'none':
+            return None, None
+        if forced == OSC52:
+            return OSC52, None
+        
+        remote = os.environ.get('SSH_CONNECTION') or os.environ.get('SSH_TTY')
+        has_display = os.environ.get('DISPLAY') or os.environ.get('WAYLAND_DISPLAY')
+        multiplexed = os.environ.get('TMUX')
+        
+        # Over SSH without a forwarded display, only the local terminal can help
+        if remote and not has_display and not forced and cls._has_terminal():
+            return OSC52, None
+        
+        for name, argv, required_env in CLIPBOARD_COMMANDS:
+            if forced and name != forced:
+                continue
+            if required_env and not forced and not os.environ.get(required_env):
+                continue
+            path = shutil.which(argv[0])
+            if path:
+                return name, [path] + argv[1:]
+        
+        # Locally a terminal usually exists but may ignore OSC 52, so it is
+        # only a fallback where it is the usual way to reach the clipboard
+        if not forced and (remote or multiplexed) and cls._has_terminal():
+            return OSC52, None
+        return None, None
+    
+    @classmethod
+    def _read_cache(cls, environment: Dict[str, str]) -> Optional[Tuple[Optional[str], Optional[List[str]]]]:
+        """Get the cached backend if it was resolved in the same environment"""
+        import json
+        
+        try:
+            with open(cls.cache_file, 'r') as f:
+                data = json.load(f)
+            if data.get('environment') != environment:
+                return None
+            name, argv = data['backend'], data['argv']
+        except (OSError, ValueError, TypeError, KeyError, AttributeError):
+            return None
         
-        if template_file.exists():
+        # Only commands are cached; one that was uninstalled since is resolved again
+        if not argv or not os.access(argv[0], os.X_OK):
+            return None
+        return name, argv
+    
+    @classmethod
+    def _write_cache(cls, environment: Dict[str, str], name: Optional[str], argv: Optional[List[str]]):
+        """Remember the resolved backend; a failed write only costs a PATH search"""
+        import json
+        
+        tmp_file = cls.cache_file.with_name(f"{cls.cache_file.name}.{os.getpid()}.tmp")
+        try:
+            cls.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_file, 'w') as f:
+                json.dump({'environment': environment, 'backend': name, 'argv': argv}, f)
+            os.replace(tmp_file, cls.cache_file)
+        except OSError:
             try:
-                template_file.unlink()
-                return True
+                tmp_file.unlink()
             except OSError:
-                return False
+                pass
+    
+    @classmethod
+    def detect_backend(cls, refresh: bool = False) -> Tuple[Optional[str], Optional[List[str]]]:
+        """
+        Get the clipboard backend, resolving it on first use
         
-        return False
-
-
-class ClipboardManager:
-    """Handles clipboard operations"""
+        Args:
+            refresh: Ignore the in-memory and on-disk caches
+        
+        Returns:
+            (backend name, argv) - argv is None for OSC 52; name is None
+            when no backend is available
+        """
+        if cls._backend is not None and not refresh:
+            return cls._backend
+        
+        with span('clipboard.probe') as s:
+            environment = cls._environment()
+            backend = None if refresh or cls.cache_file is None else cls._read_cache(environment)
+            s.set(cached=backend is not None)
+            
+            if backend is None:
+                backend = cls._resolve()
+                # A fallback (OSC 52 or nothing) is not cached, so a command
+                # installed later is found on the next run
+                if cls.cache_file is not None and backend[1]:
+                    cls._write_cache(environment, *backend)
+        
+        cls._backend = backend
+        return backend
+    
+    @classmethod
+    def reset(cls):
+        """Forget the resolved backend (e.g. after changing $DISPLAY)"""
+        cls._backend = None
     
     @staticmethod
     def copy_to_clipboard(text: str) -> bool:
         """Copy text to clipboard"""
+        with span('clipboard.copy', bytes=len(text)) as s:
+            copied = ClipboardManager._copy(text, s)
+        
+        count('clipboard.copied' if copied else 'clipboard.failed')
+        return copied
+    
+    @staticmethod
+    def copy_many(commands: Iterable[str]) -> bool:
+        """Copy a batch of commands, one per line, in a single clipboard operation"""
+        text = '\n'.join(commands)
+        if not text:
+            return False
+        return ClipboardManager.copy_to_clipboard(text + '\n')
+    
+    @staticmethod
+    def _copy(text: str, s) -> bool:
+        """Copy text with the resolved backend"""
+        name, argv = ClipboardManager.detect_backend()
+        s.set(backend=name)
+        
+        if name is None:
+            return False
+        
+        if name == OSC52:
+            return ClipboardManager._copy_osc52(text)
+        
         try:
             import subprocess
             
-            # Try different clipboard managers
-            if os.system('which xclip > /dev/null 2>&1') == 0:
-                process = subprocess.Popen(['xclip', '-selection', 'clipboard'],
-                                         stdin=subprocess.PIPE)
-                process.communicate(text.encode('utf-8'))
-                return True
-            
-            elif os.system('which xsel > /dev/null 2>&1') == 0:
-                process = subprocess.Popen(['xsel', '--clipboard', '--input'],
-                                         stdin=subprocess.PIPE)
-                process.communicate(text.encode('utf-8'))
-                return True
-            
-            elif os.system('which pbcopy > /dev/null 2>&1') == 0:  # macOS
-                process = subprocess.Popen(['pbcopy'],
-                                         stdin=subprocess.PIPE)
-                process.communicate(text.encode('utf-8'))
-                return True
-            
-            else:
-                return False
+            process = subprocess.Popen(argv, stdin=subprocess.PIPE,
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            process.communicate(text.encode('utf-8'))
+            return process.returncode == 0
         
         except Exception:
             return False
+    
+    @staticmethod
+    def _copy_osc52(text: str) -> bool:
+        """Ask the terminal to set the clipboard"""
+        sequence = osc52_sequence(text, tmux=bool(os.environ.get('TMUX')))
+        if len(sequence) > OSC52_MAX_BYTES:
+            return False
+        
+        try:
+            if sys.stdout.isatty():
+                sys.stdout.write(sequence)
+                sys.stdout.flush()
+            else:
+                with open('/dev/tty', 'w') as tty:
+                    tty.write(sequence)
+            return True
+        except (OSError, ValueError):
+            return False
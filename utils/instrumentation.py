@@ -0,0 +1,302 @@
+"""
+Instrumentation
+Named timing spans and counters with JSON-lines and Prometheus sinks
+
+Copyright (C) 2025
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import atexit
+import functools
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+
+# Environment variables that switch instrumentation on at import time
+TRACE_ENV = 'SHADOWCASTER_TRACE'
+METRICS_ENV = 'SHADOWCASTER_METRICS'
+
+METRIC_PREFIX = 'shadowcaster'
+
+# Histogram bucket upper bounds in seconds
+SPAN_BUCKETS = (0.0001, 0.001, 0.01, 0.1, 1.0, 10.0, 60.0)
+
+
+class _NoopSpan:
+    """Returned by span() while instrumentation is disabled"""
+    
+    __slots__ = ()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        return False
+    
+    def set(self, **attrs):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """A timed section of work; use as a context manager"""
+    
+    __slots__ = ('recorder', 'name', 'attrs', 'start', 'wall_start')
+    
+    def __init__(self, recorder: 'Recorder', name: str, attrs: Dict[str, Any]):
+        """Initialize span"""
+        self.recorder = recorder
+        self.name = name
+        self.attrs = attrs
+        self.start = None
+        self.wall_start = None
+    
+    def __enter__(self):
+        self.wall_start = time.time()
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        if exc_type is not None:
+            self.attrs['error'] = exc_type.__name__
+        self.recorder.record_span(self, duration)
+        return False
+    
+    def set(self, **attrs):
+        """Attach attributes discovered while the span runs"""
+        self.attrs.update(attrs)
+
+
+class Recorder:
+    """Aggregates spans and counters and writes them to the configured sinks"""
+    
+    def __init__(self, trace_file: str = None, metrics_file: str = None):
+        """
+        Initialize recorder
+        
+        Args:
+            trace_file: JSON-lines file that receives one line per finished span
+            metrics_file: Prometheus text-format file rewritten by flush()
+        """
+        self.trace_file = Path(trace_file) if trace_file else None
+        self.metrics_file = Path(metrics_file) if metrics_file else None
+        self.counters = {}
+        self.spans = {}     # name -> [count, total seconds, bucket counts]
+        self._lock = threading.Lock()
+        self._trace = None
+    
+    def record_span(self, span: Span, duration: float):
+        """Aggregate a finished span and append it to the trace"""
+        with self._lock:
+            stats = self.spans.get(span.name)
+            if stats is None:
+                stats = self.spans[span.name] = [0, 0.0, [0] * len(SPAN_BUCKETS)]
+            
+            stats[0] += 1
+            stats[1] += duration
+            for i, bound in enumerate(SPAN_BUCKETS):
+                if duration <= bound:
+                    stats[2][i] += 1
+            
+            if self.trace_file is not None:
+                self._write_trace({
+                    'span': span.name,
+                    'ts': round(span.wall_start, 6),
+                    'duration_ms': round(duration * 1000, 4),
+                    **span.attrs
+                })
+    
+    def count(self, name: str, value: float = 1):
+        """Increment a counter"""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+    
+    def _write_trace(self, record: Dict[str, Any]):
+        """Append one trace line; the file is opened on first use"""
+        try:
+            if self._trace is None:
+                self.trace_file.parent.mkdir(parents=True, exist_ok=True)
+                self._trace = open(self.trace_file, 'a', buffering=1)
+            self._trace.write(json.dumps(record, default=str, separators=(',', ':')) + '\n')
+        except OSError:
+            # A broken trace sink must never break the application
+            self.trace_file = None
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Get a copy of the current counters and span statistics"""
+        with self._lock:
+            return {
+                'counters': dict(self.counters),
+                'spans': {
+                    name: {'count': count, 'total_seconds': total}
+                    for name, (count, total, _) in self.spans.items()
+                }
+            }
+    
+    def prometheus_text(self) -> str:
+        """Render counters and span histograms in Prometheus text format"""
+        lines = []
+        
+        with self._lock:
+            for name, value in sorted(self.counters.items()):
+                metric = f"{METRIC_PREFIX}_{metric_name(name)}_total"
+                lines.append(f"# TYPE {metric} counter")
+                lines.append(f"{metric} {value}")
+            
+            if self.spans:
+                metric = f"{METRIC_PREFIX}_span_duration_seconds"
+                lines.append(f"# HELP {metric} Time spent in instrumented operations")
+                lines.append(f"# TYPE {metric} histogram")
+                
+                for name, (count, total, buckets) in sorted(self.spans.items()):
+                    label = f'span="{name}"'
+                    for bound, bucket_count in zip(SPAN_BUCKETS, buckets):
+                        lines.append(f'{metric}_bucket{{{label},le="{bound}"}} {bucket_count}')
+                    lines.append(f'{metric}_bucket{{{label},le="+Inf"}} {count}')
+                    lines.append(f"{metric}_sum{{{label}}} {total:.6f}")
+                    lines.append(f"{metric}_count{{{label}}} {count}")
+        
+        return '\n'.join(lines) + '\n' if lines else ''
+    
+    def flush(self):
+        """Rewrite the metrics file atomically (the textfile collector may read it at any time)"""
+        if self._trace is not None:
+            self._trace.flush()
+        
+        if self.metrics_file is None:
+            return
+        
+        tmp_file = self.metrics_file.with_name(f"{self.metrics_file.name}.{os.getpid()}.tmp")
+        try:
+            self.metrics_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_file, 'w') as f:
+                f.write(self.prometheus_text())
+            os.replace(tmp_file, self.metrics_file)
+        except OSError:
+            try:
+                tmp_file.unlink()
+            except OSError:
+                pass
+    
+    def close(self):
+        """Flush sinks and close the trace file"""
+        self.flush()
+        if self._trace is not None:
+            self._trace.close()
+            self._trace = None
+
+
+def metric_name(name: str) -> str:
+    """Turn a dotted span/counter name into a valid Prometheus metric name"""
+    return re.sub(r'[^a-zA-Z0-9_]', '_', name)
+
+
+# The active recorder; None means disabled and every call is a no-op
+_recorder: Optional[Recorder] = None
+
+
+def span(name: str, **attrs):
+    """
+    Time a block of code
+    
+    Usage:
+        with span('config.parse', tool=tool_id) as s:
+            ...
+            s.set(cached=False)
+    """
+    if _recorder is None:
+        return NOOP_SPAN
+    return Span(_recorder, name, attrs)
+
+
+def traced(name: str):
+    """Decorator that wraps every call of a function in a span"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _recorder is None:
+                return func(*args, **kwargs)
+            with Span(_recorder, name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name: str, value: float = 1):
+    """Increment a named counter"""
+    if _recorder is not None:
+        _recorder.count(name, value)
+
+
+def enabled() -> bool:
+    """Check whether instrumentation is active"""
+    return _recorder is not None
+
+
+def enable(trace_file: str = None, metrics_file: str = None) -> Recorder:
+    """
+    Start recording spans and counters
+    
+    Args:
+        trace_file: JSON-lines trace destination (optional)
+        metrics_file: Prometheus textfile destination, e.g.
+                      /var/lib/node_exporter/textfile/shadowcaster.prom (optional)
+    
+    Returns:
+        The active recorder
+    """
+    global _recorder
+    
+    if _recorder is not None:
+        _recorder.close()
+    
+    _recorder = Recorder(trace_file, metrics_file)
+    return _recorder
+
+
+def disable():
+    """Flush sinks and stop recording"""
+    global _recorder
+    
+    if _recorder is not None:
+        _recorder.close()
+        _recorder = None
+
+
+def flush():
+    """Write the metrics file now"""
+    if _recorder is not None:
+        _recorder.flush()
+
+
+def snapshot() -> Dict[str, Any]:
+    """Get current counters and span statistics (empty when disabled)"""
+    if _recorder is None:
+        return {'counters': {}, 'spans': {}}
+    return _recorder.snapshot()
+
+
+if os.environ.get(TRACE_ENV) or os.environ.get(METRICS_ENV):
+    enable(os.environ.get(TRACE_ENV), os.environ.get(METRICS_ENV))
+
+atexit.register(disable)
@@ -0,0 +1,240 @@
+"""
+Output Capture
+Streams command output to rotating, optionally compressed log files
+
+Copyright (C) 2025
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import gzip
+import os
+from pathlib import Path
+from typing import List
+
+
+# Supported compression formats -> file suffix
+COMPRESSION_SUFFIXES = {
+    None: '',
+    'gzip': '.gz',
+    'zstd': '.zst'
+}
+
+DEFAULT_TAIL_BYTES = 64 * 1024
+DEFAULT_MAX_LOG_BYTES = 100 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 5
+
+
+def _open_zstd(path: Path):
+    """Open a zstd-compressed file for writing"""
+    try:
+        from compression import zstd  # Python 3.14+
+        return zstd.open(path, 'wb')
+    except ImportError:
+        pass
+    
+    try:
+        import zstandard
+    except ImportError:
+        raise ValueError("zstd compression requires the 'zstandard' package (pip install zstandard)")
+    
+    return zstandard.ZstdCompressor().stream_writer(open(path, 'wb'), closefd=True)
+
+
+def open_log(path: Path, compression: str = None):
+    """Open a binary log file for writing with the given compression"""
+    if compression is None:
+        return open(path, 'wb')
+    if compression == 'gzip':
+        return gzip.open(path, 'wb', compresslevel=6)
+    if compression == 'zstd':
+        return _open_zstd(path)
+    raise ValueError(f"Unknown compression: {compression}")
+
+
+class RingBuffer:
+    """Keeps the last `capacity` bytes written to it"""
+    
+    def __init__(self, capacity: int = DEFAULT_TAIL_BYTES):
+        """Initialize ring buffer"""
+        self.capacity = capacity
+        self._buffer = bytearray()
+        self.total_bytes = 0
+    
+    def write(self, data: bytes):
+        """Append data, discarding the oldest bytes beyond capacity"""
+        self.total_bytes += len(data)
+        
+        if len(data) >= self.capacity:
+            self._buffer = bytearray(data[-self.capacity:])
+            return
+        
+        self._buffer += data
+        excess = len(self._buffer) - self.capacity
+        if excess > 0:
+            del self._buffer[:excess]
+    
+    def getvalue(self) -> bytes:
+        """Get buffered bytes"""
+        return bytes(self._buffer)
+    
+    def text(self) -> str:
+        """Get buffered output as text, starting at a line boundary when truncated"""
+        data = self.getvalue()
+        
+        if self.total_bytes > len(data):
+            newline = data.find(b'\n')
+            if newline != -1:
+                data = data[newline + 1:]
+        
+        return data.decode('utf-8', errors='replace')
+
+
+class RotatingLogWriter:
+    """
+    Writes a byte stream to a log file, rotating by uncompressed size
+    
+    Rotated segments are named like logrotate: job.log.gz, job.1.log.gz,
+    job.2.log.gz, ... with .1 being the most recent full segment.
+    """
+    
+    def __init__(self, path: Path, compression: str = None, max_bytes: int = DEFAULT_MAX_LOG_BYTES,
+                 backup_count: int = DEFAULT_BACKUP_COUNT):
+        """
+        Initialize log writer
+        
+        Args:
+            path: Log file path without compression suffix (e.g. output/job-1.log)
+            compression: None, 'gzip' or 'zstd'
+            max_bytes: Rotate after this many uncompressed bytes (0 disables rotation)
+            backup_count: Number of rotated segments to keep
+        """
+        if compression not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"Unknown compression: {compression}")
+        
+        path = Path(path)
+        self.compression = compression
+        self.path = path.with_name(path.name + COMPRESSION_SUFFIXES[compression])
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.bytes_written = 0
+        self._segment_bytes = 0
+        
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open_log(self.path, compression)
+    
+    def segment_path(self, index: int) -> Path:
+        """Get the path of a rotated segment (0 is the active file)"""
+        if index == 0:
+            return self.path
+        
+        name = self.path.name
+        stem, dot, rest = name.partition('.')
+        return self.path.with_name(f"{stem}.{index}{dot}{rest}")
+    
+    def segments(self) -> List[Path]:
+        """List existing log segments, oldest first"""
+        paths = [self.segment_path(i) for i in range(self.backup_count, -1, -1)]
+        return [p for p in paths if p.exists()]
+    
+    def write(self, data: bytes):
+        """Write data, rotating when the active segment is full"""
+        while data:
+            if self.max_bytes and self._segment_bytes >= self.max_bytes:
+                self._rotate()
+            
+            if self.max_bytes:
+                room = self.max_bytes - self._segment_bytes
+                chunk, data = data[:room], data[room:]
+            else:
+                chunk, data = data, b''
+            
+            self._file.write(chunk)
+            self._segment_bytes += len(chunk)
+            self.bytes_written += len(chunk)
+    
+    def _rotate(self):
+        """Close the active segment and shift older segments up"""
+        self._file.close()
+        
+        if self.backup_count > 0:
+            for index in range(self.backup_count - 1, 0, -1):
+                source = self.segment_path(index)
+                if source.exists():
+                    os.replace(source, self.segment_path(index + 1))
+            os.replace(self.path, self.segment_path(1))
+        
+        self._file = open_log(self.path, self.compression)
+        self._segment_bytes = 0
+    
+    def close(self):
+        """Flush and close the active segment"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class OutputCapture:
+    """Captures a job's output to disk while keeping a tail in memory"""
+    
+    def __init__(self, path: Path, compression: str = None, max_bytes: int = DEFAULT_MAX_LOG_BYTES,
+                 backup_count: int = DEFAULT_BACKUP_COUNT, tail_bytes: int = DEFAULT_TAIL_BYTES):
+        """Initialize output capture"""
+        self.writer = RotatingLogWriter(path, compression, max_bytes, backup_count)
+        self.tail = RingBuffer(tail_bytes)
+    
+    @property
+    def path(self) -> Path:
+        """Active log file path"""
+        return self.writer.path
+    
+    @property
+    def bytes_written(self) -> int:
+        """Total bytes captured"""
+        return self.writer.bytes_written
+    
+    def write(self, data: bytes):
+        """Capture a chunk of output"""
+        self.writer.write(data)
+        self.tail.write(data)
+    
+    def tail_text(self) -> str:
+        """Get the most recent output as text"""
+        return self.tail.text()
+    
+    def close(self):
+        """Close the log file"""
+        self.writer.close()
+
+
+def read_log(path: Path) -> bytes:
+    """Read a (possibly compressed) log segment back"""
+    path = Path(path)
+    
+    if path.suffix == '.gz':
+        with gzip.open(path, 'rb') as f:
+            return f.read()
+    
+    if path.suffix == '.zst':
+        try:
+            from compression import zstd
+            with zstd.open(path, 'rb') as f:
+                return f.read()
+        except ImportError:
+            import zstandard
+            with open(path, 'rb') as f:
+                return zstandard.ZstdDecompressor().stream_reader(f).read()
+    
+    with open(path, 'rb') as f:
+        return f.read()
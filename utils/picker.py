@@ -0,0 +1,432 @@
+"""
+Paged Menus
+Type-to-filter, paginated selection for long option lists
+
+Copyright (C) 2025
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import sys
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+from utils.display import Display, Colors
+
+
+# Rows used by everything but the entries (header, filter line, status, prompt)
+CHROME_ROWS = 8
+MIN_PAGE_SIZE = 5
+
+# Keys returned by read_key() besides printable text; the NUL prefix keeps
+# them apart from anything typed
+KEY_UP = '\0up'
+KEY_DOWN = '\0down'
+KEY_PAGE_UP = '\0page_up'
+KEY_PAGE_DOWN = '\0page_down'
+KEY_HOME = '\0home'
+KEY_END = '\0end'
+KEY_ENTER = '\0enter'
+KEY_BACKSPACE = '\0backspace'
+KEY_ESCAPE = '\0escape'
+KEY_TAB = '\0tab'
+KEY_CLEAR = '\0clear'
+
+ESCAPE_SEQUENCES = {
+    '\x1b[A': KEY_UP, '\x1bOA': KEY_UP,
+    '\x1b[B': KEY_DOWN, '\x1bOB': KEY_DOWN,
+    '\x1b[5~': KEY_PAGE_UP,
+    '\x1b[6~': KEY_PAGE_DOWN,
+    '\x1b[H': KEY_HOME, '\x1b[1~': KEY_HOME, '\x1bOH': KEY_HOME,
+    '\x1b[F': KEY_END, '\x1b[4~': KEY_END, '\x1bOF': KEY_END,
+    '\x1b': KEY_ESCAPE
+}
+
+CONTROL_KEYS = {
+    '\r': KEY_ENTER, '\n': KEY_ENTER,
+    '\x7f': KEY_BACKSPACE, '\x08': KEY_BACKSPACE,
+    '\t': KEY_TAB,
+    '\x15': KEY_CLEAR,      # Ctrl-U
+    '\x10': KEY_UP,         # Ctrl-P
+    '\x0e': KEY_DOWN        # Ctrl-N
+}
+
+
+# Trigrams of a long query word used to narrow candidates; the substring
+# check afterwards makes the result exact either way
+MAX_WORD_TRIGRAMS = 4
+
+
+def _trigrams(word: str) -> List[str]:
+    """Distinct trigrams of a word, spread over its length"""
+    trigrams = list(dict.fromkeys(word[i:i + 3] for i in range(len(word) - 2)))
+    if len(trigrams) > MAX_WORD_TRIGRAMS:
+        step = (len(trigrams) - 1) / (MAX_WORD_TRIGRAMS - 1)
+        trigrams = [trigrams[round(i * step)] for i in range(MAX_WORD_TRIGRAMS)]
+    return trigrams
+
+
+class FilterIndex:
+    """
+    Substring filter over menu entries
+    
+    Names and descriptions are lowercased once up front. Trigram postings
+    are filled in on first use, each with a single pass over the entries,
+    so opening a menu costs nothing extra and every later query word
+    containing a known trigram is only checked against the entries that
+    have it. Typing that extends the previous query narrows the previous
+    result instead of starting over.
+    """
+    
+    def __init__(self, options: List[Tuple[str, str]]):
+        """Index (name, description) entries"""
+        self.size = len(options)
+        self.names = [key.lower() for key, _ in options]
+        self.texts = [f"{key}\n{desc}".lower() for key, desc in options]
+        self.postings = {}      # trigram -> entry indices, in menu order
+        
+        self._last_query = ''
+        self._last_result = None
+    
+    def posting(self, trigram: str) -> List[int]:
+        """Entries containing a trigram"""
+        ids = self.postings.get(trigram)
+        if ids is None:
+            ids = self.postings[trigram] = [i for i, text in enumerate(self.texts) if trigram in text]
+        return ids
+    
+    def _candidates(self, word: str) -> Optional[set]:
+        """Entries containing the word's trigrams (None: word too short to narrow)"""
+        if len(word) < 3:
+            return None
+        
+        lists = sorted((self.posting(trigram) for trigram in _trigrams(word)), key=len)
+        if len(lists[0]) == self.size:
+            return None
+        candidates = set(lists[0])
+        for ids in lists[1:]:
+            if not candidates:
+                break
+            candidates.intersection_update(ids)
+        return candidates
+    
+    def filter(self, query: str) -> List[int]:
+        """
+        Find entries matching every word of a query
+        
+        Returns:
+            Entry indices, name matches first, otherwise in menu order
+        """
+        query = query.lower().strip()
+        if not query:
+            self._last_query = ''
+            return list(range(self.size))
+        
+        words = query.split()
+        
+        if self._last_query and query.startswith(self._last_query):
+            pool = self._last_result
+        else:
+            pool = None
+            for word in words:
+                candidates = self._candidates(word)
+                if candidates is not None:
+                    pool = candidates if pool is None else pool & candidates
+            pool = range(self.size) if pool is None else sorted(pool)
+        
+        texts = self.texts
+        matches = pool
+        # Longest (usually most selective) word first
+        for word in sorted(words, key=len, reverse=True):
+            matches = [i for i in matches if word in texts[i]]
+        
+        self._last_query = query
+        self._last_result = matches
+        
+        names = self.names
+        first = words[0]
+        in_name = [i for i in matches if first in names[i]]
+        if len(in_name) == len(matches):
+            return matches
+        return in_name + [i for i in matches if first not in names[i]]
+
+
+class PagedMenu:
+    """
+    A menu that shows one page of a filtered option list at a time
+    
+    The state machine (handle_key/handle_line) is separate from the
+    terminal so it can be driven from raw keys, typed lines or tests.
+    """
+    
+    def __init__(self, title: str, options: List[Tuple[str, str]], allow_multiple: bool = False,
+                 page_size: int = None):
+        """
+        Initialize paged menu
+        
+        Args:
+            title: Menu title
+            options: List of (key, description) tuples
+            allow_multiple: Allow selecting several entries
+            page_size: Entries per page (default: fit the terminal)
+        """
+        self.title = title
+        self.options = options
+        self.allow_multiple = allow_multiple
+        self.index = FilterIndex(options)
+        
+        if page_size is None:
+            page_size = Display.renderer.terminal_size()[1] - CHROME_ROWS
+        self.page_size = max(MIN_PAGE_SIZE, page_size)
+        
+        self.query = ''
+        self.matches = list(range(len(options)))
+        self.cursor = 0         # position in matches
+        self.offset = 0         # first visible position
+        self.selected = []      # option indices, in selection order
+        self.message = ''
+    
+    def set_query(self, query: str):
+        """Change the filter and reset the cursor"""
+        self.query = query
+        self.matches = self.index.filter(query)
+        self.cursor = 0
+        self.offset = 0
+    
+    def move(self, delta: int):
+        """Move the cursor, scrolling the window to keep it visible"""
+        if not self.matches:
+            return
+        self.cursor = max(0, min(len(self.matches) - 1, self.cursor + delta))
+        if self.cursor < self.offset:
+            self.offset = self.cursor
+        elif self.cursor >= self.offset + self.page_size:
+            self.offset = self.cursor - self.page_size + 1
+    
+    def page(self, delta: int):
+        """Scroll by whole pages"""
+        if not self.matches:
+            return
+        last_page = (len(self.matches) - 1) // self.page_size * self.page_size
+        self.offset = max(0, min(last_page, self.offset + delta * self.page_size))
+        self.cursor = self.offset
+    
+    def toggle(self):
+        """Add or remove the entry under the cursor from the selection"""
+        if not self.matches:
+            return
+        current = self.matches[self.cursor]
+        if current in self.selected:
+            self.selected.remove(current)
+        else:
+            self.selected.append(current)
+    
+    def handle_key(self, key: str) -> Optional[List[int]]:
+        """
+        Apply a key from read_key()
+        
+        Returns:
+            The selected option indices once the menu is done, else None
+        """
+        self.message = ''
+        
+        if key == KEY_UP:
+            self.move(-1)
+        elif key == KEY_DOWN:
+            self.move(1)
+        elif key == KEY_PAGE_UP:
+            self.page(-1)
+        elif key == KEY_PAGE_DOWN:
+            self.page(1)
+        elif key == KEY_HOME:
+            self.move(-len(self.matches))
+        elif key == KEY_END:
+            self.move(len(self.matches))
+        elif key == KEY_TAB and self.allow_multiple:
+            self.toggle()
+            self.move(1)
+        elif key == KEY_BACKSPACE:
+            if self.query:
+                self.set_query(self.query[:-1])
+        elif key in (KEY_ESCAPE, KEY_CLEAR):
+            self.set_query('')
+        elif key == KEY_ENTER:
+            if self.selected:
+                return list(self.selected)
+            if self.matches:
+                return [self.matches[self.cursor]]
+            self.message = "Nothing matches the filter"
+        elif key.isprintable():
+            self.set_query(self.query + key)
+        
+        return None
+    
+    def handle_line(self, line: str) -> Optional[List[int]]:
+        """
+        Apply a typed line (fallback when raw keys are unavailable)
+        
+        Numbers always refer to the full list, as in the plain menu;
+        '/text' filters, 'n'/'p' (or an empty line) change page.
+        
+        Returns:
+            The selected option indices once the menu is done, else None
+        """
+        self.message = ''
+        line = line.strip()
+        
+        if line.startswith('/'):
+            self.set_query(line[1:])
+        elif line in ('', 'n'):
+            self.page(1)
+        elif line == 'p':
+            self.page(-1)
+        else:
+            try:
+                selections = [int(part.strip()) - 1 for part in line.split(',')]
+            except ValueError:
+                self.message = "Enter numbers, /filter, n or p"
+                return None
+            
+            if not selections or (len(selections) > 1 and not self.allow_multiple):
+                self.message = "Select a single option"
+            elif all(0 <= s < len(self.options) for s in selections):
+                return selections
+            else:
+                self.message = "Invalid selection. Please try again."
+        
+        return None
+    
+    def render(self, raw: bool = True):
+        """Draw the visible window as one frame"""
+        renderer = Display.renderer
+        columns = renderer.terminal_size()[0]
+        total = len(self.matches)
+        
+        lines = [
+            f"\n{Colors.BOLD}{Colors.BLUE}▸ {self.title}{Colors.END}",
+            f"{Colors.GRAY}{'-'*55}{Colors.END}",
+            f"{Colors.BOLD}Filter:{Colors.END} {self.query}{Colors.GRAY}  "
+            f"({total} of {len(self.options)}){Colors.END}"
+        ]
+        
+        for position in range(self.offset, min(total, self.offset + self.page_size)):
+            i = self.matches[position]
+            key, desc = self.options[i]
+            
+            pointer = '>' if raw and position == self.cursor else ' '
+            mark = '*' if i in self.selected else ' '
+            prefix = f"{pointer}{mark}{i + 1:>5}. "
+            
+            # One row per entry keeps the page height fixed
+            room = columns - len(prefix) - len(key) - 2
+            desc = desc if len(desc) <= room else desc[:max(0, room - 1)] + '…'
+            line = f"{prefix}{Colors.CYAN}{key}{Colors.END}"
+            if desc and room > 1:
+                line += f"  {Colors.GRAY}{desc}{Colors.END}"
+            if raw and position == self.cursor:
+                line = f"{Colors.BOLD}{line}{Colors.END}"
+            lines.append(line)
+        
+        if total:
+            page = self.offset // self.page_size + 1
+            pages = (total - 1) // self.page_size + 1
+            status = f"Page {page}/{pages}"
+        else:
+            status = "Nothing matches the filter"
+        
+        if raw:
+            keys = "type to filter, ↑/↓ PgUp/PgDn move, Enter select"
+            if self.allow_multiple:
+                keys += ", Tab mark"
+        else:
+            keys = "number(s) to select, /text to filter, n/p for next/previous page"
+        lines.append(f"{Colors.GRAY}{status} - {keys}{Colors.END}")
+        
+        if self.message:
+            lines.append(f"{Colors.RED}✗ {self.message}{Colors.END}")
+        
+        renderer.clear()
+        renderer.write('\n'.join(lines) + '\n')
+    
+    def run(self) -> List[int]:
+        """Show the menu until a selection is made"""
+        if raw_input_available():
+            with raw_keys() as read_key:
+                while True:
+                    self.render()
+                    Display.renderer.flush()
+                    result = self.handle_key(read_key())
+                    if result is not None:
+                        return result
+        
+        while True:
+            self.render(raw=False)
+            prompt = "Select options (comma-separated)" if self.allow_multiple else "Select an option"
+            result = self.handle_line(Display.renderer.input(
+                f"{Colors.BOLD}{prompt} [1-{len(self.options)}]: {Colors.END}"))
+            if result is not None:
+                return result
+
+
+def raw_input_available() -> bool:
+    """Check whether single keys can be read from the terminal"""
+    if os.name != 'posix' or not Display.renderer.color:
+        return False
+    try:
+        return sys.stdin.isatty()
+    except (AttributeError, ValueError):
+        return False
+
+
+def decode_key(data: str) -> str:
+    """Map raw terminal input to a key constant or printable text ('' to ignore)"""
+    if data in ESCAPE_SEQUENCES:
+        return ESCAPE_SEQUENCES[data]
+    if data in CONTROL_KEYS:
+        return CONTROL_KEYS[data]
+    if data.startswith('\x1b'):
+        return ''
+    return ''.join(c for c in data if c.isprintable())
+
+
+@contextmanager
+def raw_keys():
+    """
+    Put the terminal in cbreak mode and yield a function that reads one key
+    
+    Output processing stays on, so the renderer's newlines still work;
+    Ctrl-C still raises KeyboardInterrupt.
+    """
+    import termios
+    import tty
+    
+    fd = sys.stdin.fileno()
+    saved = termios.tcgetattr(fd)
+    
+    def read_key() -> str:
+        while True:
+            data = os.read(fd, 32).decode('utf-8', errors='ignore')
+            if not data:
+                raise EOFError
+            # A paste arrives as one read and is applied as one filter change
+            key = decode_key(data)
+            if key:
+                return key
+    
+    try:
+        tty.setcbreak(fd)
+        yield read_key
+    finally:
+        termios.tcsetattr(fd, termios.TCSADRAIN, saved)
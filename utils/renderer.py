@@ -0,0 +1,194 @@
+"""
+Terminal Renderer
+Buffers screen output into frames written with a single call
+
+Copyright (C) 2025
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import re
+import sys
+from typing import List, Optional, Tuple
+
+
+ANSI_RE = re.compile(r'\x1b\[[0-9;?]*[A-Za-z]')
+
+CLEAR_SCREEN = '\x1b[H\x1b[2J'
+ERASE_LINE = '\x1b[K'
+ERASE_DOWN = '\x1b[J'
+
+# Used when the stream is not a terminal
+DEFAULT_SIZE = (80, 24)
+
+
+def strip_ansi(text: str) -> str:
+    """Remove ANSI escape sequences from text"""
+    return ANSI_RE.sub('', text) if '\x1b' in text else text
+
+
+def supports_color(stream) -> bool:
+    """Check whether a stream is a terminal that should get color codes"""
+    if os.environ.get('NO_COLOR') or os.environ.get('TERM') == 'dumb':
+        return False
+    try:
+        return bool(stream.isatty())
+    except (AttributeError, ValueError):
+        return False
+
+
+class Renderer:
+    """
+    Frame-buffered terminal output
+    
+    clear() opens a frame; everything written until the next flush() or
+    input() is collected and written in one call. On a terminal the frame
+    replaces the screen with ANSI escapes (no `clear` process), and when
+    the previous frame is known to still be on screen only the lines that
+    changed are rewritten. Elsewhere (pipes, files, TERM=dumb) clearing is
+    a no-op and color codes are dropped.
+    """
+    
+    def __init__(self, stream=None, color: bool = None, size: Tuple[int, int] = None):
+        """
+        Initialize renderer
+        
+        Args:
+            stream: Output stream (default: whatever sys.stdout is at write time)
+            color: Force color codes on or off (default: on for terminals)
+            size: Fixed (columns, lines) instead of asking the terminal
+        """
+        self._stream = stream
+        self._color = color
+        self._color_cache = (None, False)
+        self.size = size
+        self._frame = None      # chunks of the open frame
+        self._screen = None     # lines of the last frame if it is still on screen
+        self.writes = 0
+    
+    @property
+    def stream(self):
+        return self._stream if self._stream is not None else sys.stdout
+    
+    @property
+    def color(self) -> bool:
+        """Whether color codes are kept for the current stream"""
+        if self._color is not None:
+            return self._color
+        
+        stream = self.stream
+        if self._color_cache[0] is not stream:
+            self._color_cache = (stream, supports_color(stream))
+        return self._color_cache[1]
+    
+    @property
+    def in_frame(self) -> bool:
+        return self._frame is not None
+    
+    def terminal_size(self) -> Tuple[int, int]:
+        """Get (columns, lines) of the terminal"""
+        if self.size is not None:
+            return self.size
+        try:
+            size = os.get_terminal_size(self.stream.fileno())
+        except (AttributeError, ValueError, OSError):
+            return DEFAULT_SIZE
+        return size.columns, size.lines
+    
+    def _emit(self, text: str):
+        """Write text to the stream with a single write and flush"""
+        if not text:
+            return
+        stream = self.stream
+        stream.write(text)
+        stream.flush()
+        self.writes += 1
+    
+    def write(self, text: str):
+        """Write text, buffering it while a frame is open"""
+        if not self.color:
+            text = strip_ansi(text)
+        
+        if self._frame is not None:
+            self._frame.append(text)
+        else:
+            # Output outside a frame scrolls whatever was on screen
+            self._screen = None
+            self._emit(text)
+    
+    def line(self, text: str = ''):
+        """Write a line of text"""
+        self.write(text + '\n')
+    
+    def clear(self):
+        """Start a new frame; unflushed output of an open frame is dropped"""
+        if self._frame is not None and not self.color:
+            # Without a screen to clear the old frame is still worth keeping
+            self._emit(''.join(self._frame))
+        self._frame = []
+    
+    def flush(self):
+        """Write the open frame, if any"""
+        if self._frame is None:
+            return
+        
+        text = ''.join(self._frame)
+        self._frame = None
+        
+        if not self.color:
+            self._screen = None
+            self._emit(text)
+            return
+        
+        output, self._screen = self._frame_output(text)
+        self._emit(output)
+    
+    def _frame_output(self, text: str) -> Tuple[str, Optional[List[str]]]:
+        """Escape sequences that put a frame on screen, and the lines to diff against next time"""
+        lines = text.split('\n')
+        columns, height = self.terminal_size()
+        
+        # Frames that scroll or wrap cannot be addressed line by line
+        fits = len(lines) <= height and all(
+            len(line) <= columns or len(strip_ansi(line)) <= columns for line in lines
+        )
+        previous = self._screen
+        
+        if not fits or previous is None:
+            return CLEAR_SCREEN + text, lines if fits else None
+        
+        out = []
+        last = len(lines)
+        for row, line in enumerate(lines, 1):
+            # The last line is always rewritten so the cursor ends where the frame does
+            if row < last and row <= len(previous) and previous[row - 1] == line:
+                continue
+            out.append(f'\x1b[{row};1H{line}{ERASE_LINE}')
+        
+        if len(previous) > last:
+            out.append(ERASE_DOWN)
+        
+        return ''.join(out), lines
+    
+    def invalidate(self):
+        """Forget the screen contents, e.g. after something else wrote to the terminal"""
+        self._screen = None
+    
+    def input(self, prompt: str = '') -> str:
+        """Flush the frame, then read a line of input"""
+        self.flush()
+        # The echoed answer moves the cursor, so the next frame redraws fully
+        self._screen = None
+        return input(prompt if self.color else strip_ansi(prompt))
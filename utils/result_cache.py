@@ -0,0 +1,317 @@
+"""
+Result Cache
+Remembers the exit code, output and timing of recent command runs
+
+Copyright (C) 2025
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Results are keyed by a hash of the canonical command line, so
+"dig -t MX example.com" and "dig example.com -t MX" share an entry. How
+long a result stays valid comes from the "cache_ttl" of the tool's
+config; tools without one are never cached.
+"""
+
+import hashlib
+import json
+import shlex
+import sqlite3
+import time
+import zlib
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+
+RESULT_CACHE_FILE = 'result_cache.db'
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Larger outputs would evict too much of the cache at once
+MAX_ENTRY_FRACTION = 4
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    command TEXT NOT NULL,
+    returncode INTEGER NOT NULL,
+    output BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    duration REAL NOT NULL,
+    created REAL NOT NULL,
+    expires REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_results_last_used ON results (last_used);
+CREATE INDEX IF NOT EXISTS idx_results_expires ON results (expires);
+"""
+
+
+def canonical_argv(argv: List[str], spec=None) -> Tuple[Tuple[str, ...], Tuple[Tuple[str, ...], ...]]:
+    """
+    Reduce an argv to a form shared by equivalent command lines
+    
+    With the tool's spec, flags it knows are paired with their values
+    ("-p 80", "-p=80") and sorted, since option order does not change
+    what these tools do. Positionals and subcommands keep their order,
+    and everything after the first unknown flag is kept verbatim because
+    its arity cannot be known. Without a spec the argv is used as is.
+    
+    Returns:
+        (ordered words, sorted flag groups)
+    """
+    if spec is None:
+        return tuple(argv), ()
+    
+    bits = spec.flag_index.bits
+    options = spec.flag_index.options
+    ordered = [argv[0]]
+    groups = []
+    
+    i = 1
+    while i < len(argv):
+        token = argv[i]
+        
+        # Known non-dash flags (dig's +short) are options too
+        if (not token.startswith('-') or token == '-') and token not in bits:
+            ordered.append(token)
+            i += 1
+            continue
+        
+        # Multi-word flags such as hashcat's "-a 3" or wpscan's "--enumerate p"
+        if i + 1 < len(argv) and f"{token} {argv[i + 1]}" in bits:
+            groups.append((f"{token} {argv[i + 1]}",))
+            i += 2
+            continue
+        
+        name, equals, inline = token.partition('=')
+        index = bits.get(name)
+        if index is None:
+            ordered.extend(argv[i:])
+            break
+        
+        if not options[index].variable:
+            groups.append((token,))
+            i += 1
+        elif equals:
+            groups.append((name, inline))
+            i += 1
+        elif i + 1 < len(argv):
+            groups.append((name, argv[i + 1]))
+            i += 2
+        else:
+            groups.append((name,))
+            i += 1
+    
+    return tuple(ordered), tuple(sorted(groups))
+
+
+class CachedResult:
+    """A stored run of a command"""
+    
+    __slots__ = ('command', 'returncode', 'output', 'duration', 'created')
+    
+    def __init__(self, command: str, returncode: int, output: bytes, duration: float, created: float):
+        self.command = command
+        self.returncode = returncode
+        self.output = output
+        self.duration = duration
+        self.created = created
+    
+    def age(self, now: float = None) -> float:
+        """Seconds since the command was run"""
+        return (time.time() if now is None else now) - self.created
+
+
+def format_age(seconds: float) -> str:
+    """Describe an age briefly, e.g. '45s', '3m' or '2h'"""
+    if seconds < 60:
+        return f"{seconds:.0f}s"
+    if seconds < 3600:
+        return f"{seconds // 60:.0f}m"
+    return f"{seconds // 3600:.0f}h"
+
+
+class ResultCache:
+    """
+    Size-bounded SQLite store of command results
+    
+    Entries expire after their tool's TTL. When the stored (compressed)
+    output exceeds max_bytes, the least recently used entries are evicted.
+    """
+    
+    def __init__(self, db_path: Path, config_loader=None, max_bytes: int = DEFAULT_MAX_BYTES,
+                 clock: Callable[[], float] = time.time):
+        """
+        Initialize result cache
+        
+        Args:
+            db_path: Database file, created on first use
+            config_loader: Loader used to find each tool's cache_ttl and flags;
+                           without one nothing is cached
+            max_bytes: Upper bound for the stored output of all entries
+            clock: Time source (replaceable in tests)
+        """
+        self.db_path = Path(db_path)
+        self.config_loader = config_loader
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self._conn = None
+        self._specs = {}         # argv[0] -> ToolSpec or None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Database connection, opened on first use"""
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.db_path))
+            # Every hit updates last_used; losing the last few of those in a
+            # crash only blurs the LRU order, so skip the fsync per commit
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+    
+    def close(self):
+        """Close the database connection"""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+    
+    @property
+    def max_entry_bytes(self) -> int:
+        """Largest output worth storing"""
+        return self.max_bytes // MAX_ENTRY_FRACTION
+    
+    def spec_for(self, program: str):
+        """Get the spec of the tool a program name belongs to, if any"""
+        if program in self._specs:
+            return self._specs[program]
+        
+        spec = self.config_loader.spec_for_command(program) if self.config_loader is not None else None
+        self._specs[program] = spec
+        return spec
+    
+    def ttl_for(self, argv: List[str]) -> float:
+        """Seconds a result of this command stays valid (0: never cached)"""
+        spec = self.spec_for(argv[0])
+        return spec.cache_ttl if spec is not None else 0
+    
+    def key(self, argv: List[str]) -> str:
+        """Content address of a command line"""
+        canonical = canonical_argv(argv, self.spec_for(argv[0]))
+        return hashlib.sha256(json.dumps(canonical).encode('utf-8')).hexdigest()
+    
+    @staticmethod
+    def _argv(command: Union[str, List[str]]) -> List[str]:
+        return shlex.split(command) if isinstance(command, str) else list(command)
+    
+    def get(self, command: Union[str, List[str]]) -> Optional[CachedResult]:
+        """Get a fresh result for a command, or None"""
+        argv = self._argv(command)
+        if not argv or self.ttl_for(argv) <= 0:
+            return None
+        
+        key = self.key(argv)
+        now = self.clock()
+        row = self.conn.execute(
+            "SELECT command, returncode, output, duration, created, expires FROM results WHERE key = ?", (key,)
+        ).fetchone()
+        
+        if row is None or row[5] <= now:
+            self.misses += 1
+            return None
+        
+        with self.conn:
+            self.conn.execute("UPDATE results SET last_used = ? WHERE key = ?", (now, key))
+        self.hits += 1
+        return CachedResult(row[0], row[1], zlib.decompress(row[2]), row[3], row[4])
+    
+    def put(self, command: Union[str, List[str]], returncode: int, output: bytes, duration: float) -> bool:
+        """
+        Store a result if the tool is cacheable and the output is small enough
+        
+        Returns:
+            Whether the result was stored
+        """
+        argv = self._argv(command)
+        ttl = self.ttl_for(argv) if argv else 0
+        if ttl <= 0:
+            return False
+        
+        compressed = zlib.compress(output, 6)
+        if len(compressed) > self.max_entry_bytes:
+            return False
+        
+        now = self.clock()
+        try:
+            with self.conn:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO results "
+                    "(key, command, returncode, output, size, duration, created, expires, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (self.key(argv), shlex.join(argv), returncode, compressed, len(compressed),
+                     duration, now, now + ttl, now)
+                )
+                self._evict(now)
+        except sqlite3.Error:
+            return False
+        return True
+    
+    def _evict(self, now: float):
+        """Drop expired entries, then least recently used ones until under max_bytes"""
+        self.conn.execute("DELETE FROM results WHERE expires <= ?", (now,))
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        
+        while total > self.max_bytes:
+            victims = self.conn.execute(
+                "SELECT key, size FROM results ORDER BY last_used LIMIT 32"
+            ).fetchall()
+            if not victims:
+                break
+            
+            dropped = []
+            for key, size in victims:
+                if total <= self.max_bytes:
+                    break
+                dropped.append((key,))
+                total -= size
+            
+            self.conn.executemany("DELETE FROM results WHERE key = ?", dropped)
+            self.evictions += len(dropped)
+    
+    def invalidate(self, command: Union[str, List[str]]) -> bool:
+        """Forget the result of one command"""
+        argv = self._argv(command)
+        with self.conn:
+            return self.conn.execute("DELETE FROM results WHERE key = ?", (self.key(argv),)).rowcount > 0
+    
+    def clear(self) -> int:
+        """Forget every result; returns how many were dropped"""
+        with self.conn:
+            return self.conn.execute("DELETE FROM results").rowcount
+    
+    def stats(self) -> Dict[str, int]:
+        """Get entry count, stored bytes and hit/miss/eviction counters"""
+        entries, size = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        return {
+            'entries': entries,
+            'bytes': size,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
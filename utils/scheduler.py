@@ -0,0 +1,442 @@
+"""
+Job Scheduler
+Decides which queued job runs next and when
+
+Copyright (C) 2025
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Jobs run in priority order (higher first, then submission order) under a
+global concurrency limit. Jobs against the same target host are further
+limited to a number running at once and paced by a token bucket, so a
+large fan-out does not hammer one fragile service. Failed jobs can be
+retried with exponential backoff. Everything runs on one asyncio loop and
+uses loop.time(), so tests can drive it with FakeClock instead of waiting.
+"""
+
+import asyncio
+import heapq
+import itertools
+import selectors
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from utils.instrumentation import count
+from utils.scope import host_of
+
+
+DEFAULT_BACKOFF = 1.0
+BACKOFF_FACTOR = 2.0
+MAX_BACKOFF = 300.0
+
+
+def target_host(argv: List[str]) -> Optional[str]:
+    """
+    Guess the host a command is aimed at
+    
+    The first argument that is a URL, IP address, network or hostname wins.
+    Flags and dig's @server (the resolver, not the target) are skipped.
+    
+    Returns:
+        Lower-cased host, or None when no argument looks like one
+    """
+    for token in argv[1:]:
+        if not token or token[0] in '-@+':
+            continue
+        host = host_of(token)
+        if host:
+            return host.lower()
+    return None
+
+
+class TokenBucket:
+    """Allows `rate` events per second on average, with bursts of up to `burst`"""
+    
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+    
+    # Refilling in float steps can land a hair short of a whole token
+    EPSILON = 1e-9
+    
+    def __init__(self, rate: float, burst: int = 1, now: float = 0.0):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        if burst < 1:
+            raise ValueError("burst must be at least 1")
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = now
+    
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+    
+    def delay(self, now: float) -> float:
+        """Seconds until a token is available (0 if one is available now)"""
+        self._refill(now)
+        if self.tokens >= 1 - self.EPSILON:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+    
+    def take(self, now: float) -> bool:
+        """Use a token if one is available"""
+        if self.delay(now) > 0:
+            return False
+        self.tokens = max(0.0, self.tokens - 1)
+        return True
+
+
+class _Entry:
+    """A submitted item and its scheduling state"""
+    
+    __slots__ = ('item', 'priority', 'seq', 'host', 'attempts', 'ready_at')
+    
+    def __init__(self, item: Any, priority: int, seq: int, host: Optional[str], ready_at: Optional[float]):
+        self.item = item
+        self.priority = priority
+        self.seq = seq
+        self.host = host
+        self.attempts = 0
+        self.ready_at = ready_at
+    
+    @property
+    def order(self):
+        return (-self.priority, self.seq)
+
+
+class Scheduler:
+    """
+    Runs submitted items with priorities, per-host caps, pacing and retries
+    
+    Items are opaque: run() hands each one to a runner coroutine, which
+    returns True when the item failed in a way worth retrying.
+    """
+    
+    def __init__(self, max_concurrency: int = 4, per_host: int = None, rate: float = None, burst: int = 1,
+                 retries: int = 0, backoff: float = DEFAULT_BACKOFF, backoff_factor: float = BACKOFF_FACTOR,
+                 max_backoff: float = MAX_BACKOFF):
+        """
+        Initialize scheduler
+        
+        Args:
+            max_concurrency: Items running at once, over all hosts
+            per_host: Items running at once against one host (None: no cap)
+            rate: Items started per second against one host (None: unpaced)
+            burst: Items a host may start back to back before pacing applies
+            retries: Extra attempts for an item whose runner reports failure
+            backoff: Delay before the first retry, in seconds
+            backoff_factor: Multiplier for each further retry's delay
+            max_backoff: Upper bound for a retry's delay
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        if per_host is not None and per_host < 1:
+            raise ValueError("per_host must be at least 1")
+        if rate is not None and rate <= 0:
+            raise ValueError("rate must be positive")
+        if retries < 0 or backoff < 0:
+            raise ValueError("retries and backoff cannot be negative")
+        
+        self.max_concurrency = max_concurrency
+        self.per_host = per_host
+        self.rate = rate
+        self.burst = burst
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        
+        self._queues = {}           # host -> heap of (order, entry) ready to run
+        self._delayed = []          # heap of (ready_at, seq, entry) waiting out a backoff
+        self._active = {}           # host -> items running
+        self._buckets = {}          # host -> TokenBucket
+        self._seq = itertools.count()
+        self._loop = None
+        self._wake = None
+        
+        self.depth = 0
+        self.max_depth = 0
+        self.running = 0
+        self.started = 0
+        self.completed = 0
+        self.retried = 0
+        self.dropped = 0
+        self.waits = []
+    
+    def _now(self) -> Optional[float]:
+        return self._loop.time() if self._loop is not None else None
+    
+    def submit(self, item: Any, priority: int = 0, host: str = None):
+        """
+        Queue an item; may be called before or while run() is active
+        
+        Args:
+            item: Anything the runner understands
+            priority: Higher runs first; equal priorities run in submission order
+            host: Target host the per-host cap and pacing apply to (None: neither)
+        """
+        entry = _Entry(item, priority, next(self._seq), host, self._now())
+        self._push(entry)
+        if self._wake is not None:
+            self._wake.set()
+    
+    def _push(self, entry: _Entry):
+        heapq.heappush(self._queues.setdefault(entry.host, []), (entry.order, entry))
+        self.depth += 1
+        self.max_depth = max(self.max_depth, self.depth)
+    
+    def backoff_delay(self, attempt: int) -> float:
+        """Delay before retrying after the given (1-based) failed attempt"""
+        return min(self.max_backoff, self.backoff * self.backoff_factor ** (attempt - 1))
+    
+    def _startable(self, host: Optional[str], now: float, skip: Callable = None):
+        """
+        Check whether a host's best entry may start now
+        
+        Returns:
+            ((order, entry) or None, seconds until pacing allows a start or None)
+        """
+        queue = self._queues.get(host)
+        while queue and skip is not None and skip(queue[0][1].item):
+            heapq.heappop(queue)
+            self.depth -= 1
+            self.dropped += 1
+        if not queue:
+            self._queues.pop(host, None)
+            return None, None
+        
+        if host is not None:
+            # A finished job wakes the loop, so a full host needs no timer
+            if self.per_host is not None and self._active.get(host, 0) >= self.per_host:
+                return None, None
+            bucket = self._buckets.get(host)
+            if bucket is not None:
+                wait = bucket.delay(now)
+                if wait > 0:
+                    return None, wait
+        
+        return queue[0], None
+    
+    def _claim(self, entry: _Entry, now: float):
+        """Take an entry off its queue and count it as running"""
+        heapq.heappop(self._queues[entry.host])
+        self.depth -= 1
+        self.running += 1
+        self.started += 1
+        entry.attempts += 1
+        self.waits.append(now - entry.ready_at)
+        
+        if entry.host is not None:
+            self._active[entry.host] = self._active.get(entry.host, 0) + 1
+            if self.rate is not None:
+                bucket = self._buckets.get(entry.host)
+                if bucket is None:
+                    bucket = self._buckets[entry.host] = TokenBucket(self.rate, self.burst, now)
+                bucket.take(now)
+    
+    def _due(self, now: float, skip: Callable = None):
+        """
+        Claim every entry that may start now, best first
+        
+        Returns:
+            (claimed entries, seconds until more may become startable or None)
+        """
+        while self._delayed and self._delayed[0][0] <= now:
+            _, _, entry = heapq.heappop(self._delayed)
+            self.depth -= 1
+            self._push(entry)
+        
+        delay = self._delayed[0][0] - now if self._delayed else None
+        free = self.max_concurrency - self.running
+        if free <= 0:
+            return [], delay
+        
+        # Merge the hosts' queues by priority; a host rejoins after each
+        # claim only while its cap and bucket still allow another start
+        heads = []
+        for host in list(self._queues):
+            head, wait = self._startable(host, now, skip)
+            if head is not None:
+                heads.append(head)
+            elif wait is not None:
+                delay = wait if delay is None else min(delay, wait)
+        heapq.heapify(heads)
+        
+        due = []
+        while heads and len(due) < free:
+            _, entry = heapq.heappop(heads)
+            self._claim(entry, now)
+            due.append(entry)
+            
+            head, wait = self._startable(entry.host, now, skip)
+            if head is not None:
+                heapq.heappush(heads, head)
+            elif wait is not None:
+                delay = wait if delay is None else min(delay, wait)
+        
+        return due, delay
+    
+    async def _execute(self, entry: _Entry, runner: Callable[[Any], Awaitable[bool]], on_retry: Callable):
+        """Run one attempt of an entry and requeue it if it should be retried"""
+        retry = False
+        try:
+            retry = await runner(entry.item)
+        finally:
+            self.running -= 1
+            self.completed += 1
+            if entry.host is not None:
+                self._active[entry.host] -= 1
+            
+            if retry and entry.attempts <= self.retries:
+                delay = self.backoff_delay(entry.attempts)
+                entry.ready_at = self._loop.time() + delay
+                heapq.heappush(self._delayed, (entry.ready_at, entry.seq, entry))
+                self.depth += 1
+                self.max_depth = max(self.max_depth, self.depth)
+                self.retried += 1
+                count('scheduler.retries')
+                if on_retry is not None:
+                    on_retry(entry.item, delay)
+            
+            self._wake.set()
+    
+    async def run(self, runner: Callable[[Any], Awaitable[bool]], skip: Callable[[Any], bool] = None,
+                  on_retry: Callable[[Any, float], None] = None):
+        """
+        Run every queued item, including ones submitted while running
+        
+        Args:
+            runner: Coroutine function run for each attempt; returns True to
+                    ask for a retry
+            skip: Called before an item starts; True drops it (e.g. cancelled)
+            on_retry: Called with (item, delay) when an item is requeued
+        """
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        
+        now = self._loop.time()
+        for queue in self._queues.values():
+            for _, entry in queue:
+                if entry.ready_at is None:
+                    entry.ready_at = now
+        
+        tasks = []
+        active = set()
+        try:
+            while True:
+                due, delay = self._due(self._loop.time(), skip)
+                for entry in due:
+                    task = self._loop.create_task(self._execute(entry, runner, on_retry))
+                    tasks.append(task)
+                    active.add(task)
+                    task.add_done_callback(active.discard)
+                if due:
+                    continue
+                
+                # running drops before the task is done, so gather() below
+                # still waits for the last ones to return
+                if not self.running and not self.depth:
+                    break
+                
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+        except asyncio.CancelledError:
+            for task in active:
+                task.cancel()
+            await asyncio.gather(*active, return_exceptions=True)
+            raise
+        finally:
+            self._wake = None
+            self._loop = None
+        
+        # Surface the first runner exception, if any
+        await asyncio.gather(*tasks)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, wait times (seconds from ready to start) and counters"""
+        waits = sorted(self.waits)
+        return {
+            'depth': self.depth,
+            'max_depth': self.max_depth,
+            'running': self.running,
+            'started': self.started,
+            'completed': self.completed,
+            'retried': self.retried,
+            'dropped': self.dropped,
+            'wait_mean': sum(waits) / len(waits) if waits else 0.0,
+            'wait_p95': waits[min(len(waits) - 1, int(0.95 * len(waits)))] if waits else 0.0,
+            'wait_max': waits[-1] if waits else 0.0,
+            'hosts': {host: len(queue) for host, queue in self._queues.items() if host is not None}
+        }
+
+
+class _FakeSelector(selectors.DefaultSelector):
+    """Selector that advances a FakeClock instead of blocking for a timeout"""
+    
+    def __init__(self, clock: 'FakeClock'):
+        super().__init__()
+        self._clock = clock
+    
+    def select(self, timeout=None):
+        ready = super().select(0)
+        if ready:
+            return ready
+        if timeout is None:
+            # Nothing scheduled: only real I/O (e.g. a subprocess) can wake us
+            return super().select(None)
+        if timeout > 0:
+            self._clock.now += timeout
+        return []
+
+
+class _FakeLoop(asyncio.SelectorEventLoop):
+    """Event loop whose time() is a FakeClock"""
+    
+    def __init__(self, clock: 'FakeClock'):
+        self._fake_clock = clock
+        super().__init__(_FakeSelector(clock))
+    
+    def time(self) -> float:
+        return self._fake_clock.now
+
+
+class FakeClock:
+    """
+    Virtual time for tests
+    
+    Coroutines run with run() see loop.time() start at `start`; whenever
+    every task is waiting on a timer (asyncio.sleep, wait_for timeouts,
+    the scheduler's pacing) the clock jumps to the next timer instead of
+    waiting for it.
+    """
+    
+    def __init__(self, start: float = 0.0):
+        self.now = start
+    
+    def time(self) -> float:
+        return self.now
+    
+    def new_event_loop(self) -> asyncio.AbstractEventLoop:
+        return _FakeLoop(self)
+    
+    def run(self, coro):
+        """Run a coroutine to completion in virtual time"""
+        loop = self.new_event_loop()
+        try:
+            return loop.run_until_complete(coro)
+        finally:
+            loop.close()
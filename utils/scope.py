@@ -0,0 +1,585 @@
+"""
+Scope Allowlist
+Checks targets against the hosts and networks a test is authorized for
+
+Copyright (C) 2025
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+A scope file lists one entry per line; '#' starts a comment and a leading
+'!' marks an exclusion:
+    
+    10.0.0.0/16                 # a network
+    192.168.5.10-192.168.5.40   # an address range
+    2001:db8::/64
+    app.example.com             # exactly this host
+    fileserver                  # a single-label name
+    *.example.com               # any subdomain (not example.com itself)
+    !10.0.99.0/24               # carved out of the network above
+    !*.corp.example.com
+
+Addresses and networks are compiled into sorted, merged integer intervals
+per address family with the exclusions already subtracted, so a check is
+one bisect. Hostnames go into a trie of reversed labels where the most
+specific entry wins. Hostnames are never resolved: a host must be listed
+by name to be in scope, whatever it resolves to. Loopback targets are
+always allowed, since they only reach the tester's own machine.
+"""
+
+import ipaddress
+import os
+import re
+import socket
+from bisect import bisect_right
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+
+SCOPE_ENV = 'SHADOWCASTER_SCOPE'
+
+HOSTNAME_RE = re.compile(
+    r'^(?=.{1,253}$)(?:[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?\.)+[A-Za-z]{2,63}\.?$'
+)
+
+# Arguments like "scan.xml" look like hostnames but name files
+FILE_SUFFIXES = (
+    '.txt', '.lst', '.list', '.json', '.jsonl', '.xml', '.csv', '.log', '.html', '.conf', '.cfg',
+    '.nmap', '.gnmap', '.cap', '.pcap', '.pcapng', '.hccapx', '.hash', '.rule', '.db', '.gz', '.zip',
+    '.py', '.sh'
+)
+
+LOOPBACK_NAMES = ('localhost', 'localhost.localdomain')
+
+# A single-label host name such as "intranet" (at least one letter, so
+# plain numbers are not mistaken for names)
+LABEL_RE = re.compile(r'^(?=[0-9-]*[A-Za-z])[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?$')
+
+# Numeric IPv4 forms inet_aton() accepts: "10.1", "167772161", "0x0a.0.0.1"
+INET_ATON_RE = re.compile(r'^(?:0[xX][0-9A-Fa-f]+|[0-9]+)(?:\.(?:0[xX][0-9A-Fa-f]+|[0-9]+)){0,3}$')
+
+# Required parameters whose values are never hosts: files, modes,
+# services, interfaces, search queries and wrapped commands
+NON_TARGET_PARAMS = frozenset((
+    'file', 'capture', 'path', 'image', 'wordlist', 'hash_file', 'rules', 'config',
+    'protocol', 'service', 'interface', 'query', 'command'
+))
+
+# nmap-style IPv4 target: four octets of numbers, ranges ("1-254"),
+# lists ("5,9") or '*'. Anything shaped like this that does not parse is
+# treated as out of scope rather than ignored.
+OCTET_TARGET_RE = re.compile(r'^(?:[0-9*,-]+\.){3}[0-9*,-]+$')
+
+# Expanding "10.*.*.5" gives one interval per value of the leading octets;
+# targets needing more than this are refused instead of checked
+MAX_TARGET_INTERVALS = 4096
+
+# How strictly an argument is read (see Scope.violations)
+_VALUE = 0      # flag value or non-target parameter: only recognizable hosts count
+_MAYBE = 1      # may be a flag value: numeric addresses count too
+_TARGET = 2     # target argument: anything that is not a file must be an in-scope host
+
+_FAMILIES = ((4, socket.AF_INET), (6, socket.AF_INET6))
+
+
+class ScopeError(ValueError):
+    """Raised for out-of-scope targets and malformed scope entries"""
+
+
+def host_of(token: str) -> Optional[str]:
+    """
+    Get the host a single argument names, if it names one
+    
+    URLs give their hostname, "user@host", "host:port" and "[v6]:port"
+    their host, and addresses, networks (CIDR), nmap octet targets
+    ("10.0.0.1-254", "10.0.*.1", "10.0.0.5,9") and hostnames are
+    returned as written. Anything else (numbers, file names, words) gives
+    None.
+    """
+    if '://' in token:
+        try:
+            return urlsplit(token).hostname
+        except ValueError:
+            return None
+    
+    token = token.rsplit('@', 1)[-1]
+    if token.startswith('['):
+        host, _, port = token[1:].partition(']')
+        return host if not port or port[0] == ':' else token
+    if token.count(':') == 1:
+        token = token.split(':', 1)[0]
+    
+    if _address(token) is not None:
+        return token
+    if token.count('.') == 3 and INET_ATON_RE.match(token):
+        # Dotted quads with octal or hex parts ("010.0.0.1" is 8.0.0.1)
+        address = _inet_aton(token)
+        return token if address is None else address
+    if OCTET_TARGET_RE.match(token):
+        return token
+    if '/' in token:
+        try:
+            ipaddress.ip_network(token, strict=False)
+            return token
+        except ValueError:
+            return None
+    
+    if token.lower() in LOOPBACK_NAMES:
+        return token
+    if HOSTNAME_RE.match(token) and not token.lower().endswith(FILE_SUFFIXES) and not os.path.exists(token):
+        return token
+    return None
+
+
+def _inet_aton(token: str) -> Optional[str]:
+    """Read a numeric IPv4 form the way inet_aton() (and so nmap) does"""
+    try:
+        return socket.inet_ntoa(socket.inet_aton(token))
+    except OSError:
+        return None
+
+
+def _hosts(token: str, strictness: int) -> List[str]:
+    """
+    Get the hosts an argument names, read as strictly as asked
+    
+    At _TARGET strictness, an argument that is not a file and cannot be
+    classified is returned as is, so it fails the scope check instead of
+    being skipped. Integers below 2**24 (ports, counts) would land in
+    0.0.0.0/8, which is not a destination, and are never hosts.
+    """
+    host = host_of(token)
+    if host is not None:
+        return [host]
+    if ',' in token:
+        return [host for part in token.split(',') if part for host in _hosts(part, strictness)]
+    if strictness == _VALUE:
+        return []
+    
+    if INET_ATON_RE.match(token):
+        address = _inet_aton(token)
+        if address is None:
+            return [token]
+        return [] if address.startswith('0.') else [address]
+    if strictness == _MAYBE:
+        return []
+    
+    network, slash, _ = token.partition('/')
+    if slash and (INET_ATON_RE.match(network) or OCTET_TARGET_RE.match(network)):
+        return [token]
+    if LABEL_RE.match(token) and not os.path.exists(token):
+        return [token]
+    if slash or token.lower().endswith(FILE_SUFFIXES) or os.path.exists(token):
+        return []
+    return [token]
+
+
+def _address(text: str) -> Optional[Tuple[int, int]]:
+    """Parse a single address into (family, integer) quickly, or None"""
+    for family, af in _FAMILIES:
+        try:
+            return family, int.from_bytes(socket.inet_pton(af, text), 'big')
+        except (OSError, ValueError):
+            continue
+    return None
+
+
+def _interval(entry: str) -> Optional[Tuple[int, int, int]]:
+    """Parse an address, network or range into (family, first, last), or None for hostnames"""
+    address = _address(entry)
+    if address is not None:
+        return address[0], address[1], address[1]
+    
+    if '/' in entry:
+        try:
+            network = ipaddress.ip_network(entry, strict=False)
+        except ValueError:
+            raise ScopeError(f"invalid network {entry!r}")
+        return network.version, int(network.network_address), int(network.broadcast_address)
+    
+    if '-' in entry:
+        first, _, last = entry.partition('-')
+        first, last = _address(first.strip()), _address(last.strip())
+        if first is not None and last is not None:
+            if first[0] != last[0] or first[1] > last[1]:
+                raise ScopeError(f"invalid address range {entry!r}")
+            return first[0], first[1], last[1]
+    
+    return None
+
+
+def _octet_ranges(spec: str) -> List[Tuple[int, int]]:
+    """Parse one nmap octet ("7", "1-254", "-5", "5,9", "*") into merged ranges"""
+    ranges = []
+    for part in spec.split(','):
+        if part == '*':
+            first, last = 0, 255
+        elif '-' in part:
+            first, _, last = part.partition('-')
+            first, last = int(first or 0), int(last or 255)
+        else:
+            first = last = int(part)
+        if not 0 <= first <= last <= 255:
+            raise ValueError(f"bad octet {spec!r}")
+        ranges.append((first, last))
+    return _merge(ranges)
+
+
+def _octet_intervals(target: str) -> Optional[List[Tuple[int, int]]]:
+    """
+    Expand an nmap octet target into IPv4 intervals
+    
+    Returns None if the target does not parse or would need more than
+    MAX_TARGET_INTERVALS intervals.
+    """
+    try:
+        octets = [_octet_ranges(spec) for spec in target.split('.')]
+    except ValueError:
+        return None
+    if len(octets) != 4:
+        return None
+    
+    # Trailing octets that take every value fold into one block per prefix
+    k = 3
+    while k > 0 and octets[k] == [(0, 255)]:
+        k -= 1
+    shift = 8 * (3 - k)
+    
+    prefixes = [0]
+    for ranges in octets[:k]:
+        count = sum(last - first + 1 for first, last in ranges)
+        if len(prefixes) * count * len(octets[k]) > MAX_TARGET_INTERVALS:
+            return None
+        prefixes = [prefix << 8 | value for prefix in prefixes
+                    for first, last in ranges for value in range(first, last + 1)]
+    
+    fill = (1 << shift) - 1
+    return [((prefix << 8 | first) << shift, (prefix << 8 | last) << shift | fill)
+            for prefix in prefixes for first, last in octets[k]]
+
+
+def _merge(intervals: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Sort intervals and merge overlapping or adjacent ones"""
+    merged = []
+    for first, last in sorted(intervals):
+        if merged and first <= merged[-1][1] + 1:
+            if last > merged[-1][1]:
+                merged[-1] = (merged[-1][0], last)
+        else:
+            merged.append((first, last))
+    return merged
+
+
+def _subtract(included: List[Tuple[int, int]], excluded: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Remove merged excluded intervals from merged included ones"""
+    result = []
+    j = 0
+    for first, last in included:
+        # Skip exclusions that end before this interval
+        while j < len(excluded) and excluded[j][1] < first:
+            j += 1
+        k = j
+        while first <= last and k < len(excluded) and excluded[k][0] <= last:
+            if excluded[k][0] > first:
+                result.append((first, excluded[k][0] - 1))
+            first = max(first, excluded[k][1] + 1)
+            k += 1
+        if first <= last:
+            result.append((first, last))
+    return result
+
+
+class _Node:
+    """Trie node for one hostname label"""
+    
+    __slots__ = ('children', 'exact', 'wild')
+    
+    def __init__(self):
+        self.children = {}
+        self.exact = None       # True/False when the host itself is listed
+        self.wild = None        # True/False when its subdomains are listed
+
+
+class Scope:
+    """
+    Compiled scope allowlist
+    
+    Entries are added with add() or loaded from a file; lookups compile
+    the entries on first use.
+    """
+    
+    def __init__(self, entries: Iterable[str] = ()):
+        self._ranges = {4: ([], []), 6: ([], [])}       # family -> (included, excluded)
+        self._trie = _Node()
+        self._starts = None                             # family -> interval starts
+        self._ends = None                               # family -> interval ends
+        self.entries = 0
+        for entry in entries:
+            self.add(entry)
+    
+    @classmethod
+    def from_lines(cls, lines: Iterable[str], source: str = 'scope') -> 'Scope':
+        """Build a scope from scope-file lines"""
+        scope = cls()
+        for line_no, line in enumerate(lines, 1):
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            try:
+                scope.add(line)
+            except ScopeError as e:
+                raise ScopeError(f"{source}:{line_no}: {e}")
+        return scope
+    
+    @classmethod
+    def from_file(cls, path: Union[str, Path]) -> 'Scope':
+        """Load a scope file"""
+        with open(path, 'r') as f:
+            return cls.from_lines(f, str(path))
+    
+    def add(self, entry: str):
+        """Add an entry; a leading '!' excludes it instead"""
+        entry = entry.strip()
+        include = not entry.startswith('!')
+        if not include:
+            entry = entry[1:].strip()
+        if not entry:
+            raise ScopeError("empty entry")
+        
+        interval = _interval(entry)
+        if interval is not None:
+            family, first, last = interval
+            self._ranges[family][0 if include else 1].append((first, last))
+        else:
+            self._add_hostname(entry.lower(), include)
+        
+        self._starts = None
+        self.entries += 1
+    
+    def _add_hostname(self, entry: str, include: bool):
+        wild = entry.startswith('*.')
+        name = entry[2:] if wild else entry
+        if not HOSTNAME_RE.match(name) and not LABEL_RE.match(name):
+            raise ScopeError(f"not an address, network or hostname: {entry!r}")
+        
+        node = self._trie
+        for label in reversed(name.rstrip('.').split('.')):
+            node = node.children.setdefault(label, _Node())
+        
+        # An exclusion beats an inclusion of the same entry
+        if wild:
+            node.wild = include and node.wild is not False
+        else:
+            node.exact = include and node.exact is not False
+    
+    def compile(self):
+        """Merge the address entries into lookup intervals"""
+        self._starts = {}
+        self._ends = {}
+        for family, (included, excluded) in self._ranges.items():
+            intervals = _subtract(_merge(included), _merge(excluded))
+            self._starts[family] = [first for first, _ in intervals]
+            self._ends[family] = [last for _, last in intervals]
+    
+    def _covers(self, family: int, first: int, last: int) -> bool:
+        """Check whether one in-scope interval holds [first, last]"""
+        if self._starts is None:
+            self.compile()
+        i = bisect_right(self._starts[family], first) - 1
+        return i >= 0 and last <= self._ends[family][i]
+    
+    def _host_allowed(self, host: str) -> bool:
+        """Look up a lower-case hostname in the trie"""
+        labels = host.rstrip('.').split('.')
+        node = self._trie
+        allowed = False
+        for i in range(len(labels) - 1, -1, -1):
+            node = node.children.get(labels[i])
+            if node is None:
+                return allowed
+            if i == 0:
+                return node.exact if node.exact is not None else allowed
+            if node.wild is not None:
+                allowed = node.wild
+        return allowed
+    
+    def contains(self, target: str) -> bool:
+        """
+        Check a target: an address, network, range, hostname or URL
+        
+        Networks, ranges and nmap octet targets must lie entirely inside
+        the scope; address-like targets that do not parse are refused.
+        """
+        address = _address(target)
+        if address is None and INET_ATON_RE.match(target):
+            # Short and integer forms ("10.1", "167772161")
+            numeric = _inet_aton(target)
+            address = _address(numeric) if numeric is not None else None
+        if address is not None:
+            family, value = address
+            return self._covers(family, value, value) or _is_loopback(family, value)
+        
+        if OCTET_TARGET_RE.match(target):
+            intervals = _octet_intervals(target)
+            return intervals is not None and all(
+                self._covers(4, first, last) or (_is_loopback(4, first) and _is_loopback(4, last))
+                for first, last in intervals
+            )
+        
+        if '://' in target or '@' in target or target.count(':') == 1 or target.startswith('['):
+            host = host_of(target)
+            return host is not None and host != target and self.contains(host)
+        
+        if '/' in target or '-' in target:
+            try:
+                interval = _interval(target)
+            except ScopeError:
+                return False
+            if interval is not None:
+                return self._covers(*interval)
+        
+        target = target.lower()
+        return target in LOOPBACK_NAMES or self._host_allowed(target)
+    
+    def violations(self, tokens: Iterable[str], spec=None) -> List[str]:
+        """
+        Get the targets named in command-line tokens that are out of scope
+        
+        Flags are skipped (the value of "--flag=value" is checked), as are
+        dig-style @resolver arguments, and comma-separated lists are
+        checked item by item. Positional arguments are targets: short and
+        integer IPv4 forms are read as inet_aton() reads them, single-label
+        names are hosts, and anything that is neither a host nor a file is
+        reported. A word after a flag may be the flag's value, so only
+        hosts and numeric addresses count there.
+        
+        With the tool's spec (a ToolSpec), flag values and the positional
+        parameters that hold files, services and the like are told apart
+        from targets exactly.
+        """
+        bad = []
+        for token, strictness in self._arguments(tokens, spec):
+            for host in _hosts(token, strictness):
+                if not self.contains(host):
+                    bad.append(host)
+        return bad
+    
+    @staticmethod
+    def _arguments(tokens: Iterable[str], spec) -> List[Tuple[str, int]]:
+        """Pair each argument worth checking with how strictly to read it"""
+        from utils.config_model import POSITION_START
+        
+        render = spec.render if spec is not None else ()
+        flagged = {arg.flag.rstrip('='): arg.param for arg in render if arg.flag}
+        
+        arguments = []
+        positional = []
+        pending = None
+        for token in tokens:
+            if not token or token[0] in '+@':
+                # dig options and @resolver arguments
+                continue
+            if token[0] == '-' and len(token) > 1:
+                name, equals, value = token.partition('=')
+                param = flagged.get(name)
+                option = spec.flag_index.lookup(name) if spec is not None and param is None else None
+                if param is not None:
+                    strictness = _VALUE if param in NON_TARGET_PARAMS else _TARGET
+                elif option is not None:
+                    strictness = _VALUE if option.variable else None
+                else:
+                    # A flag the spec does not know may take a value
+                    strictness = _MAYBE
+                if equals:
+                    if strictness is not None:
+                        arguments.append((value, strictness))
+                    strictness = None
+                pending = strictness
+            elif pending is not None:
+                arguments.append((token, pending))
+                pending = None
+            elif spec is not None and token in spec.flag_index.bits:
+                # Word flags such as gobuster's "dir"
+                continue
+            else:
+                positional.append(token)
+        
+        # Bare positional parameters open and close the argument list; anything
+        # in between that the spec does not account for is read as a target
+        start = [arg.param for arg in render if not arg.flag and arg.position == POSITION_START]
+        end = [arg.param for arg in render if not arg.flag and arg.position != POSITION_START]
+        params = [None] * len(positional)
+        for i, param in enumerate(start[:len(positional)]):
+            params[i] = param
+        for i, param in enumerate(end[-len(positional):] if positional else ()):
+            params[len(positional) - min(len(end), len(positional)) + i] = param
+        
+        for token, param in zip(positional, params):
+            arguments.append((token, _VALUE if param in NON_TARGET_PARAMS else _TARGET))
+        return arguments
+    
+    def value_violations(self, value: str, target: bool = True) -> List[str]:
+        """
+        Get the out-of-scope targets in one parameter value
+        
+        Args:
+            value: The value as it would appear on the command line
+            target: The parameter holds a target; otherwise (files,
+                    services, ...) only recognizable hosts are checked
+        """
+        return [host for host in _hosts(value, _TARGET if target else _VALUE) if not self.contains(host)]
+    
+    def check_command(self, command: Union[str, List[str]], spec=None):
+        """
+        Raise ScopeError if a command line names an out-of-scope target
+        
+        The first word (the program) is not checked; spec is the tool's
+        ToolSpec, if known (see violations()).
+        """
+        if isinstance(command, str):
+            import shlex
+            command = shlex.split(command)
+        bad = self.violations(command[1:], spec)
+        if bad:
+            raise ScopeError(f"out of scope: {', '.join(dict.fromkeys(bad))}")
+    
+    def __len__(self):
+        return self.entries
+
+
+def _is_loopback(family: int, value: int) -> bool:
+    if family == 4:
+        return value >> 24 == 127
+    return value == 1
+
+
+def load_scope(path: Union[str, Path] = None) -> Optional[Scope]:
+    """
+    Load the scope file given, or the one named by $SHADOWCASTER_SCOPE
+    
+    Returns:
+        Compiled scope, or None when no scope file is configured
+    
+    Raises:
+        ScopeError: If the file cannot be read or has a bad entry
+    """
+    path = path or os.environ.get(SCOPE_ENV)
+    if not path:
+        return None
+    try:
+        scope = Scope.from_file(path)
+    except OSError as e:
+        raise ScopeError(f"cannot read scope file: {e}")
+    scope.compile()
+    return scope
@@ -0,0 +1,343 @@
+"""
+Search Index
+Full-text search over tool configs, categories, flags and descriptions
+
+Copyright (C) 2025
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import json
+import math
+import os
+import re
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, Any, List
+
+
+# Bumped whenever the layout of the search index file changes
+SEARCH_INDEX_VERSION = 1
+SEARCH_INDEX_FILE = '.search_index.json'
+
+# Relative weight of a token depending on the field it came from
+FIELD_WEIGHTS = {
+    'flag': 4.0,
+    'name': 4.0,
+    'description': 2.0,
+    'category': 1.0,
+    'prompt': 1.0
+}
+
+# Upper bound on vocabulary entries a trailing prefix may expand to
+MAX_PREFIX_EXPANSION = 64
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase alphanumeric tokens"""
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
+def _doc_terms(doc: List[Any]) -> Dict[str, float]:
+    """Weighted term frequencies for a document"""
+    _, tool_name, category, flag, description, prompt = doc
+    terms = {}
+    
+    fields = [
+        ('name', tool_name if flag is None else ''),
+        ('category', category or ''),
+        ('flag', flag or ''),
+        ('description', description or ''),
+        ('prompt', prompt or '')
+    ]
+    
+    for field, text in fields:
+        weight = FIELD_WEIGHTS[field]
+        for token in tokenize(text):
+            terms[token] = terms.get(token, 0.0) + weight
+    
+    # Whole flags such as "--rate-limit" or "-ss" are searchable verbatim
+    if flag:
+        for part in flag.lower().split():
+            terms[part] = terms.get(part, 0.0) + FIELD_WEIGHTS['flag']
+    
+    return terms
+
+
+def _config_docs(tool_id: str, config: Dict[str, Any]) -> List[List[Any]]:
+    """Build search documents for a tool config: one for the tool, one per option"""
+    tool_name = config.get('name') or tool_id
+    categories = config.get('categories', {}) or {}
+    
+    docs = [[tool_id, tool_name, ' '.join(categories), None, config.get('description', ''), '']]
+    
+    for category, category_config in categories.items():
+        for option in category_config.get('options', []):
+            if not option.get('flag'):
+                continue
+            docs.append([
+                tool_id, tool_name, category, option['flag'],
+                option.get('description', ''), option.get('prompt_text', '')
+            ])
+    
+    return docs
+
+
+class SearchIndex:
+    """
+    Inverted index over the tool catalog
+    
+    Postings map token -> {doc id: weighted term frequency}; inverse
+    document frequency is applied at query time so the index can be
+    updated one config at a time. The index is persisted next to the
+    catalog index and refreshed incrementally by file mtime and size.
+    """
+    
+    def __init__(self, config_dir: str = None, index_file: str = None):
+        """Initialize search index for a config directory"""
+        if config_dir is None:
+            config_dir = os.path.join(os.path.dirname(__file__), '..', 'configs')
+        self.config_dir = Path(config_dir)
+        
+        if index_file is None:
+            index_file = self.config_dir / SEARCH_INDEX_FILE
+        self.index_file = Path(index_file)
+        
+        self.files = {}      # config filename -> [mtime_ns, size, doc ids]
+        self.docs = {}       # doc id -> [tool_id, tool name, category, flag, description, prompt]
+        self.postings = {}   # token -> {doc id: weight}
+        self.next_doc_id = 0
+        self._vocabulary = None
+        self._loaded = False
+    
+    def _load(self):
+        """Load the persisted index; a missing or corrupt file means starting empty"""
+        self._loaded = True
+        
+        try:
+            with open(self.index_file, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        
+        if not isinstance(data, dict) or data.get('version') != SEARCH_INDEX_VERSION:
+            return
+        
+        try:
+            self.files = {name: [int(m), int(s), list(ids)] for name, (m, s, ids) in data['files'].items()}
+            self.docs = {int(doc_id): doc for doc_id, doc in data['docs'].items()}
+            self.postings = {
+                token: {int(doc_id): weight for doc_id, weight in postings}
+                for token, postings in data['postings'].items()
+            }
+            self.next_doc_id = int(data['next_doc_id'])
+        except (KeyError, TypeError, ValueError):
+            self.files, self.docs, self.postings, self.next_doc_id = {}, {}, {}, 0
+    
+    def _save(self):
+        """Persist the index atomically; failures only cost a rebuild"""
+        data = {
+            'version': SEARCH_INDEX_VERSION,
+            'next_doc_id': self.next_doc_id,
+            'files': self.files,
+            'docs': self.docs,
+            'postings': {token: list(postings.items()) for token, postings in self.postings.items()}
+        }
+        
+        tmp_file = self.index_file.with_name(f"{self.index_file.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp_file, 'w') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(tmp_file, self.index_file)
+        except OSError:
+            try:
+                tmp_file.unlink()
+            except OSError:
+                pass
+    
+    def _remove_file(self, filename: str):
+        """Drop all documents that came from a config file"""
+        _, _, doc_ids = self.files.pop(filename)
+        
+        for doc_id in doc_ids:
+            doc = self.docs.pop(doc_id, None)
+            if doc is None:
+                continue
+            for token in _doc_terms(doc):
+                postings = self.postings.get(token)
+                if postings is not None:
+                    postings.pop(doc_id, None)
+                    if not postings:
+                        del self.postings[token]
+    
+    def _add_file(self, filename: str, stat: os.stat_result, tool_id: str, config: Dict[str, Any]):
+        """Index all documents of a config file"""
+        doc_ids = []
+        
+        for doc in _config_docs(tool_id, config):
+            doc_id = self.next_doc_id
+            self.next_doc_id += 1
+            self.docs[doc_id] = doc
+            doc_ids.append(doc_id)
+            
+            for token, weight in _doc_terms(doc).items():
+                self.postings.setdefault(token, {})[doc_id] = weight
+        
+        self.files[filename] = [stat.st_mtime_ns, stat.st_size, doc_ids]
+    
+    def refresh(self) -> bool:
+        """
+        Bring the index up to date with the config directory
+        
+        Returns:
+            True if any config was (re)indexed or removed
+        """
+        if not self._loaded:
+            self._load()
+        
+        if not self.config_dir.exists():
+            return False
+        
+        seen = set()
+        changed = False
+        
+        with os.scandir(self.config_dir) as it:
+            for entry in it:
+                if not entry.name.endswith('_config.json') or not entry.is_file():
+                    continue
+                
+                seen.add(entry.name)
+                stat = entry.stat()
+                known = self.files.get(entry.name)
+                
+                if known and known[0] == stat.st_mtime_ns and known[1] == stat.st_size:
+                    continue
+                
+                try:
+                    with open(entry.path, 'r') as f:
+                        config = json.load(f)
+                except (json.JSONDecodeError, OSError):
+                    continue
+                
+                if known:
+                    self._remove_file(entry.name)
+                self._add_file(entry.name, stat, entry.name[:-len('_config.json')], config)
+                changed = True
+        
+        for filename in [name for name in self.files if name not in seen]:
+            self._remove_file(filename)
+            changed = True
+        
+        if changed:
+            self._vocabulary = None
+            self._save()
+        
+        return changed
+    
+    def _expand_prefix(self, prefix: str) -> List[str]:
+        """Find indexed tokens starting with prefix"""
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self.postings)
+        
+        vocabulary = self._vocabulary
+        tokens = []
+        i = bisect_left(vocabulary, prefix)
+        
+        while i < len(vocabulary) and vocabulary[i].startswith(prefix) and len(tokens) < MAX_PREFIX_EXPANSION:
+            tokens.append(vocabulary[i])
+            i += 1
+        
+        return tokens
+    
+    def _term_scores(self, tokens: List[str]) -> Dict[int, float]:
+        """Score documents matching any of the given (alternative) tokens"""
+        total_docs = len(self.docs) or 1
+        scores = {}
+        
+        for token in tokens:
+            postings = self.postings.get(token)
+            if not postings:
+                continue
+            
+            idf = math.log(1 + total_docs / len(postings))
+            for doc_id, weight in postings.items():
+                score = weight * idf
+                if score > scores.get(doc_id, 0.0):
+                    scores[doc_id] = score
+        
+        return scores
+    
+    def search(self, query: str, limit: int = 20, prefix: bool = True) -> List[Dict[str, Any]]:
+        """
+        Search tools and options
+        
+        Args:
+            query: Free text, e.g. "proxy" or "rate limit"
+            limit: Maximum number of results
+            prefix: Treat the last query word as a prefix (as-you-type search)
+        
+        Returns:
+            Ranked results; tool-level hits have flag None
+        """
+        if not self._loaded:
+            self.refresh()
+        
+        words = tokenize(query)
+        # Verbatim flags like "-sS" are indexed as whole tokens too
+        flags = [w.lower() for w in query.split() if w.startswith('-')]
+        
+        if not words and not flags:
+            return []
+        
+        term_groups = [[word] for word in words]
+        if prefix and words and not query[-1:].isspace():
+            term_groups[-1] = self._expand_prefix(words[-1]) or [words[-1]]
+        term_groups.extend([flag] for flag in flags)
+        
+        matched = None
+        for group in term_groups:
+            scores = self._term_scores(group)
+            
+            if matched is None:
+                matched = scores
+            else:
+                # Every query term has to match
+                matched = {doc_id: matched[doc_id] + score for doc_id, score in scores.items() if doc_id in matched}
+            
+            if not matched:
+                return []
+        
+        ranked = sorted(matched.items(), key=lambda item: -item[1])[:limit]
+        return [self._result(doc_id, score) for doc_id, score in ranked]
+    
+    def _result(self, doc_id: int, score: float) -> Dict[str, Any]:
+        tool_id, tool_name, category, flag, description, _ = self.docs[doc_id]
+        return {
+            'tool': tool_id,
+            'tool_name': tool_name,
+            'category': category if flag is not None else None,
+            'flag': flag,
+            'description': description,
+            'score': round(score, 3)
+        }
+    
+    def tools_with(self, query: str) -> List[str]:
+        """Get ids of tools that have an option or description matching query"""
+        seen = []
+        for result in self.search(query, limit=len(self.docs) or 1):
+            if result['tool'] not in seen:
+                seen.append(result['tool'])
+        return seen
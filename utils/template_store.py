@@ -0,0 +1,317 @@
+"""
+Template Stores
+Storage backends for saved command templates (SQLite and JSON files)
+
+Copyright (C) 2025
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import json
+import sqlite3
+from pathlib import Path
+from typing import Dict, Any, Iterable, List, Optional
+
+
+TEMPLATE_DB_FILE = 'templates.db'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS templates (
+    name TEXT PRIMARY KEY,
+    tool TEXT,
+    command TEXT NOT NULL DEFAULT '',
+    description TEXT NOT NULL DEFAULT '',
+    created TEXT,
+    compiled TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_templates_tool ON templates (tool);
+CREATE INDEX IF NOT EXISTS idx_templates_created ON templates (created);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def _summary(template: Dict[str, Any], name: str = None) -> Dict[str, Any]:
+    """Reduce a template to the fields shown in template lists"""
+    return {
+        'name': name or template.get('name'),
+        'tool': template.get('tool'),
+        'description': template.get('description', ''),
+        'command': template.get('command', '')
+    }
+
+
+def glob_escape(text: str) -> str:
+    """Escape glob metacharacters in a literal prefix"""
+    return ''.join(f"[{c}]" if c in '*?[' else c for c in text)
+
+
+class JSONTemplateStore:
+    """One JSON file per template in the templates directory"""
+    
+    def __init__(self, templates_dir: Path):
+        """Initialize JSON template store"""
+        self.templates_dir = Path(templates_dir)
+    
+    def _path(self, name: str) -> Path:
+        return self.templates_dir / f"{name}.json"
+    
+    def save(self, template: Dict[str, Any]) -> Optional[str]:
+        """Save a template"""
+        template_file = self._path(template['name'])
+        
+        try:
+            self.templates_dir.mkdir(parents=True, exist_ok=True)
+            with open(template_file, 'w') as f:
+                json.dump(template, f, indent=2)
+            
+            return str(template_file)
+        
+        except IOError as e:
+            print(f"Error saving template: {e}")
+            return None
+    
+    def load(self, name: str) -> Optional[Dict[str, Any]]:
+        """Load a template by name"""
+        template_file = self._path(name)
+        
+        if not template_file.exists():
+            return None
+        
+        try:
+            with open(template_file, 'r') as f:
+                return json.load(f)
+        
+        except json.JSONDecodeError:
+            return None
+    
+    def list(self, offset: int = 0, limit: int = None, prefix: str = None, tool: str = None) -> List[Dict[str, Any]]:
+        """List template summaries sorted by name"""
+        templates = []
+        
+        for template_file in self.templates_dir.glob(f"{glob_escape(prefix or '')}*.json"):
+            try:
+                with open(template_file, 'r') as f:
+                    template = json.load(f)
+            except json.JSONDecodeError:
+                continue
+            
+            if tool is not None and template.get('tool') != tool:
+                continue
+            templates.append(_summary(template, template_file.stem))
+        
+        templates.sort(key=lambda x: x['name'])
+        end = None if limit is None else offset + limit
+        return templates[offset:end]
+    
+    def count(self, prefix: str = None) -> int:
+        """Count templates"""
+        return sum(1 for _ in self.templates_dir.glob(f"{glob_escape(prefix or '')}*.json"))
+    
+    def delete(self, name: str) -> bool:
+        """Delete a template"""
+        template_file = self._path(name)
+        
+        if template_file.exists():
+            try:
+                template_file.unlink()
+                return True
+            except OSError:
+                return False
+        
+        return False
+    
+    def delete_many(self, names: Iterable[str]) -> int:
+        """Delete several templates, returning how many were removed"""
+        return sum(1 for name in names if self.delete(name))
+    
+    def clear(self) -> int:
+        """Delete every template"""
+        return self.delete_many([p.stem for p in self.templates_dir.glob("*.json")])
+
+
+class SQLiteTemplateStore:
+    """
+    Templates in a single SQLite database
+    
+    Names are the primary key, with extra indexes on tool and creation
+    time, so listing a page or a name prefix never scans the whole library.
+    """
+    
+    def __init__(self, db_path: Path, import_dir: Path = None):
+        """
+        Initialize SQLite template store
+        
+        Args:
+            db_path: Database file
+            import_dir: Directory of legacy *.json templates imported once
+                        the first time the database is opened
+        """
+        self.db_path = Path(db_path)
+        self.import_dir = Path(import_dir) if import_dir else None
+        self._conn = None
+    
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Database connection, opened (and migrated) on first use"""
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            # The catalog daemon uses one store from its handler threads,
+            # one request at a time under its own lock
+            self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.executescript(SCHEMA)
+            
+            if self.import_dir is not None and self._get_meta('json_imported') is None:
+                self.import_json_dir(self.import_dir)
+                self._set_meta('json_imported', '1')
+        
+        return self._conn
+    
+    def close(self):
+        """Close the database connection"""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+    
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+    
+    def _set_meta(self, key: str, value: str):
+        with self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+    
+    @staticmethod
+    def _row_values(template: Dict[str, Any]) -> tuple:
+        compiled = template.get('compiled')
+        return (
+            template['name'],
+            template.get('tool'),
+            template.get('command', ''),
+            template.get('description', ''),
+            template.get('created'),
+            json.dumps(compiled) if compiled is not None else None
+        )
+    
+    def save(self, template: Dict[str, Any]) -> Optional[str]:
+        """Save a template, replacing one with the same name"""
+        return self.save_many([template])
+    
+    def save_many(self, templates: Iterable[Dict[str, Any]]) -> Optional[str]:
+        """Save several templates in one transaction"""
+        try:
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO templates (name, tool, command, description, created, compiled) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (self._row_values(t) for t in templates)
+                )
+            return str(self.db_path)
+        
+        except sqlite3.Error as e:
+            print(f"Error saving template: {e}")
+            return None
+    
+    def load(self, name: str) -> Optional[Dict[str, Any]]:
+        """Load a template by name"""
+        row = self.conn.execute(
+            "SELECT name, tool, command, description, created, compiled FROM templates WHERE name = ?", (name,)
+        ).fetchone()
+        
+        if row is None:
+            return None
+        
+        template = dict(row)
+        if template['compiled'] is not None:
+            template['compiled'] = json.loads(template['compiled'])
+        else:
+            del template['compiled']
+        
+        return template
+    
+    @staticmethod
+    def _prefix_clause(prefix: str, tool: str = None):
+        """Build a WHERE clause that uses the name index for prefix search"""
+        clauses, params = [], []
+        
+        if prefix:
+            # name >= prefix AND name < prefix + U+10FFFF stays on the primary key index
+            clauses.append("name >= ? AND name < ?")
+            params.extend([prefix, prefix + '\U0010ffff'])
+        
+        if tool is not None:
+            clauses.append("tool = ?")
+            params.append(tool)
+        
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+    
+    def list(self, offset: int = 0, limit: int = None, prefix: str = None, tool: str = None) -> List[Dict[str, Any]]:
+        """List template summaries sorted by name, one page at a time"""
+        where, params = self._prefix_clause(prefix, tool)
+        params.extend([-1 if limit is None else limit, offset])
+        
+        rows = self.conn.execute(
+            f"SELECT name, tool, description, command FROM templates{where} ORDER BY name LIMIT ? OFFSET ?",
+            params
+        )
+        return [dict(row) for row in rows]
+    
+    def count(self, prefix: str = None) -> int:
+        """Count templates"""
+        where, params = self._prefix_clause(prefix)
+        return self.conn.execute(f"SELECT COUNT(*) FROM templates{where}", params).fetchone()[0]
+    
+    def delete(self, name: str) -> bool:
+        """Delete a template"""
+        return self.delete_many([name]) == 1
+    
+    def delete_many(self, names: Iterable[str]) -> int:
+        """Delete several templates in one transaction"""
+        with self.conn:
+            cursor = self.conn.executemany("DELETE FROM templates WHERE name = ?", ((n,) for n in names))
+        return cursor.rowcount
+    
+    def clear(self) -> int:
+        """Delete every template"""
+        with self.conn:
+            cursor = self.conn.execute("DELETE FROM templates")
+        return cursor.rowcount
+    
+    def import_json_dir(self, templates_dir: Path) -> int:
+        """Import legacy one-file-per-template JSON templates"""
+        templates = []
+        
+        for template_file in Path(templates_dir).glob("*.json"):
+            try:
+                with open(template_file, 'r') as f:
+                    template = json.load(f)
+            except (json.JSONDecodeError, OSError):
+                continue
+            
+            if isinstance(template, dict):
+                template['name'] = template_file.stem
+                templates.append(template)
+        
+        if templates:
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO templates (name, tool, command, description, created, compiled) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (self._row_values(t) for t in templates)
+                )
+        
+        return len(templates)